@@ -486,6 +486,16 @@ def merge_broker_protocol_data(new_data_path: str, scrape_run_id: str = None, dr
     job.result()
     print(f"[SUCCESS] Updated scrape log")
     
+    # Refresh the point-in-time membership intervals (derived; never fails the merge)
+    print("Refreshing membership interval index...")
+    try:
+        import membership_index
+        membership_index.refresh_saved_index(client)
+        print(f"[SUCCESS] Refreshed membership interval index")
+    except Exception as e:
+        print(f"[WARNING] Membership index refresh failed: {str(e)}")
+        print(f"  Rebuild with: python membership_index.py --rebuild")
+    
     print("\n=== MERGE COMPLETE ===")
     
     return {
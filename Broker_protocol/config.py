@@ -30,6 +30,7 @@ TABLE_MEMBERS = f"{GCP_PROJECT_ID}.{OUTPUT_DATASET}.broker_protocol_members"
 TABLE_HISTORY = f"{GCP_PROJECT_ID}.{OUTPUT_DATASET}.broker_protocol_history"
 TABLE_SCRAPE_LOG = f"{GCP_PROJECT_ID}.{OUTPUT_DATASET}.broker_protocol_scrape_log"
 TABLE_MANUAL_MATCHES = f"{GCP_PROJECT_ID}.{OUTPUT_DATASET}.broker_protocol_manual_matches"
+TABLE_MEMBERSHIP_INTERVALS = f"{GCP_PROJECT_ID}.{OUTPUT_DATASET}.broker_protocol_membership_intervals"
 
 # FINTRX source tables
 TABLE_FINTRX_FIRMS = f"{GCP_PROJECT_ID}.{FINTRX_DATASET}.ria_firms_current"
@@ -90,6 +91,10 @@ def get_fintrx_export_path():
     """Get path for FINTRX firms export"""
     return OUTPUT_DIR / "fintrx_firms_latest.csv"
 
+def get_membership_index_dir():
+    """Get directory for the persisted membership interval index"""
+    return OUTPUT_DIR / "membership_index"
+
 # ===== GOOGLE CLOUD AUTHENTICATION =====
 # Path to service account key (for local development)
 # In production (n8n), this is handled via service account credentials
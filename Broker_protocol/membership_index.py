@@ -0,0 +1,416 @@
+"""
+Broker Protocol Membership Index
+Point-in-time membership intervals built from broker_protocol_members and
+broker_protocol_history, answering "was firm X in the Broker Protocol on
+date D" for many (firm_crd, date) pairs in one vectorized call.
+
+Intervals are half-open [valid_from, valid_to). A missing valid_from means
+the join date is unknown (member since the start of the data); a missing
+valid_to means the firm is still a member. Firm CRD matches are applied
+retroactively: a MATCHED correction re-labels the whole history of that
+Broker Protocol entry, since it fixes our mapping rather than a real event.
+
+Usage:
+    import membership_index
+
+    index = membership_index.MembershipIndex.from_bigquery()
+    flags = index.is_member(leads['firm_crd'], leads['contacted_date'])
+
+    # After each scrape (broker_protocol_updater does this)
+    index = membership_index.MembershipIndex.load()
+    index.refresh()
+    index.save()
+"""
+
+import json
+import sys
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import config
+
+MEMBER_COLUMNS = ['broker_protocol_firm_name', 'firm_crd_id', 'date_joined', 'date_withdrawn',
+                  'is_current_member', 'first_seen_date', 'last_seen_date', 'last_updated']
+HISTORY_COLUMNS = ['history_id', 'broker_protocol_firm_name', 'firm_crd_id', 'change_type',
+                   'change_date', 'detected_at', 'new_values']
+
+# Day offsets are kept below this so (firm code, day) fits one sortable int64 key
+_SPAN = 1 << 20
+_EPOCH = np.datetime64('1970-01-01', 'D')
+_OPEN_START = -(_SPAN // 2)
+_OPEN_END = _SPAN // 2 - 1
+
+
+def _days(values):
+    """Convert dates to int64 day offsets from the epoch, with a mask of valid entries."""
+    dates = pd.to_datetime(pd.Series(values), errors='coerce')
+    mask = dates.notna().to_numpy()
+    days = np.zeros(len(dates), dtype=np.int64)
+    days[mask] = (dates[mask].to_numpy().astype('datetime64[D]') - _EPOCH).astype(np.int64)
+    return days, mask
+
+
+def _day(value):
+    """Epoch day of a single date, or None when missing/unparseable."""
+    value = pd.to_datetime(value, errors='coerce')
+    if pd.isna(value):
+        return None
+    return int((np.datetime64(value, 'D') - _EPOCH).astype(np.int64))
+
+
+def _to_date(day):
+    return (_EPOCH + np.timedelta64(int(day), 'D')).astype('datetime64[D]')
+
+
+def _withdrawal_date(row):
+    """
+    Effective date of a WITHDREW change.
+
+    Withdrawals parsed from the list carry the published date_withdrawn in
+    new_values; firms that simply dropped off the list use the detection date.
+    """
+    try:
+        values = json.loads(row['new_values']) if pd.notna(row['new_values']) else {}
+    except (TypeError, ValueError):
+        values = {}
+    if isinstance(values, dict) and values.get('field') == 'date_withdrawn':
+        parsed = pd.to_datetime(values.get('value'), errors='coerce')
+        if pd.notna(parsed):
+            return parsed
+    return pd.to_datetime(row['change_date'], errors='coerce')
+
+
+def entity_intervals(member, history, unknown_join='open'):
+    """
+    Membership intervals for one Broker Protocol entry.
+
+    Joins come from date_joined and JOINED changes, withdrawals from
+    date_withdrawn and WITHDREW changes; a sweep over the sorted events
+    ignores repeats (a join while already a member, a withdrawal while out).
+
+    Args:
+        member: Row of broker_protocol_members (dict-like)
+        history: History rows for this entry
+        unknown_join: 'open' treats a missing join date as member since the
+            start of the data (the current-state join's behaviour);
+            'first_seen' starts membership at first_seen_date
+
+    Returns:
+        List of (start_day, end_day) tuples in epoch days, end exclusive
+    """
+    joins = [member.get('date_joined')]
+    withdrawals = [member.get('date_withdrawn')]
+    if len(history):
+        joins += list(history.loc[history['change_type'] == 'JOINED', 'change_date'])
+        withdrawals += [_withdrawal_date(row) for row in
+                        history[history['change_type'] == 'WITHDREW'].to_dict('records')]
+    events = [(day, 1) for day in map(_day, joins) if day is not None]
+    events += [(day, 0) for day in map(_day, withdrawals) if day is not None]
+
+    if unknown_join == 'first_seen' and _day(member.get('first_seen_date')) is not None:
+        unknown_start = _day(member.get('first_seen_date'))
+    else:
+        unknown_start = _OPEN_START
+
+    intervals = []
+    start = None
+    for day, is_join in sorted(events, key=lambda e: (e[0], -e[1])):
+        if is_join and start is None:
+            start = day
+        elif not is_join:
+            if start is None and not intervals:
+                start = unknown_start
+            if start is not None:
+                intervals.append((start, day))
+                start = None
+
+    if start is None and not events:
+        start = unknown_start
+    if start is not None:
+        if member.get('is_current_member', True) in (False, 0):
+            # Withdrawn without any dated withdrawal: last day we saw it listed
+            last_seen = _day(member.get('last_seen_date'))
+            intervals.append((start, last_seen if last_seen is not None else start))
+        else:
+            intervals.append((start, _OPEN_END))
+
+    return [(s, e) for s, e in intervals if e > s]
+
+
+class MembershipIndex:
+    """
+    Sorted interval index over Broker Protocol membership by firm CRD.
+
+    Intervals of all entries matched to the same CRD (DBAs, former names)
+    are unioned, so each firm has disjoint sorted intervals. Lookups pack
+    (firm code, day) into one int64 key and binary-search the interval
+    starts, so a query is O(log n) with no per-lead range join.
+    """
+
+    def __init__(self, members: pd.DataFrame, history: pd.DataFrame = None, unknown_join: str = 'open'):
+        if unknown_join not in ('open', 'first_seen'):
+            raise ValueError(f"unknown_join must be 'open' or 'first_seen', got {unknown_join!r}")
+        self.unknown_join = unknown_join
+        self.members = self._clean_members(members)
+        self.history = self._clean_history(history)
+        self._entity_intervals = {}
+        self._rebuild_entities(self.members['broker_protocol_firm_name'])
+        self._build_arrays()
+
+    @staticmethod
+    def _clean_members(members):
+        members = members.reindex(columns=MEMBER_COLUMNS).copy()
+        members['firm_crd_id'] = pd.to_numeric(members['firm_crd_id'], errors='coerce').astype('Int64')
+        return members.drop_duplicates('broker_protocol_firm_name', keep='last').reset_index(drop=True)
+
+    @staticmethod
+    def _clean_history(history):
+        if history is None:
+            history = pd.DataFrame(columns=HISTORY_COLUMNS)
+        history = history.reindex(columns=HISTORY_COLUMNS).copy()
+        history['firm_crd_id'] = pd.to_numeric(history['firm_crd_id'], errors='coerce').astype('Int64')
+        return history.drop_duplicates('history_id', keep='last').reset_index(drop=True)
+
+    def _rebuild_entities(self, names):
+        """Recompute intervals for the given entries (their current CRD match)."""
+        names = set(names)
+        members = self.members[self.members['broker_protocol_firm_name'].isin(names)]
+        history = self.history[self.history['broker_protocol_firm_name'].isin(names)]
+        by_name = dict(tuple(history.groupby('broker_protocol_firm_name')))
+        empty = history.iloc[:0]
+        for name in names:
+            self._entity_intervals.pop(name, None)
+        for row in members.to_dict('records'):
+            if pd.isna(row['firm_crd_id']):
+                continue
+            intervals = entity_intervals(row, by_name.get(row['broker_protocol_firm_name'], empty),
+                                         self.unknown_join)
+            if intervals:
+                self._entity_intervals[row['broker_protocol_firm_name']] = (int(row['firm_crd_id']), intervals)
+
+    def _build_arrays(self):
+        """Union intervals per firm and pack them into sorted key arrays."""
+        firms, starts, ends = [], [], []
+        for firm_crd, intervals in self._entity_intervals.values():
+            for start, end in intervals:
+                firms.append(firm_crd)
+                starts.append(start)
+                ends.append(end)
+
+        frame = pd.DataFrame({'firm_crd': np.asarray(firms, dtype=np.int64),
+                              'start': np.asarray(starts, dtype=np.int64),
+                              'end': np.asarray(ends, dtype=np.int64)}).sort_values(['firm_crd', 'start'])
+
+        # Merge overlapping/adjacent intervals within each firm
+        new_run = (frame['firm_crd'].ne(frame['firm_crd'].shift()) |
+                   frame['start'].gt(frame.groupby('firm_crd')['end'].cummax().shift()))
+        merged = frame.groupby(new_run.cumsum()).agg(firm_crd=('firm_crd', 'first'),
+                                                     start=('start', 'min'), end=('end', 'max'))
+
+        self.firm_keys = np.unique(merged['firm_crd'].to_numpy())
+        codes = np.searchsorted(self.firm_keys, merged['firm_crd'].to_numpy())
+        self._codes = codes
+        self._starts = merged['start'].to_numpy()
+        self._ends = merged['end'].to_numpy()
+        self._keys = codes * _SPAN + (self._starts - _OPEN_START)
+
+    @property
+    def n_intervals(self) -> int:
+        return len(self._keys)
+
+    def is_member(self, firm_crds, dates) -> np.ndarray:
+        """
+        Vectorized as-of membership.
+
+        Args:
+            firm_crds: Firm CRDs (array-like; missing values are never members)
+            dates: As-of dates aligned with firm_crds
+
+        Returns:
+            Boolean array, True where the firm was a member on that date
+        """
+        crds = pd.to_numeric(pd.Series(firm_crds), errors='coerce').astype(float).to_numpy()
+        days, valid = _days(dates)
+        result = np.zeros(len(crds), dtype=bool)
+        if not len(self._keys):
+            return result
+
+        known = valid & ~np.isnan(crds)
+        crd_int = np.where(known, crds, -1).astype(np.int64)
+        codes = np.searchsorted(self.firm_keys, crd_int)
+        codes_clipped = np.minimum(codes, len(self.firm_keys) - 1)
+        known &= self.firm_keys[codes_clipped] == crd_int
+
+        query = codes_clipped * _SPAN + (np.clip(days, _OPEN_START, _OPEN_END) - _OPEN_START)
+        pos = np.searchsorted(self._keys, query, side='right') - 1
+        pos_clipped = np.maximum(pos, 0)
+        result = (known & (pos >= 0) & (self._codes[pos_clipped] == codes_clipped) &
+                  (days < self._ends[pos_clipped]))
+        return result
+
+    def update(self, members: pd.DataFrame = None, history: pd.DataFrame = None) -> int:
+        """
+        Apply a scrape's changes incrementally.
+
+        Member rows are upserted by broker_protocol_firm_name and history rows
+        appended by history_id; only the touched entries are re-swept before
+        the (small) key arrays are rebuilt.
+
+        Args:
+            members: Changed broker_protocol_members rows
+            history: New broker_protocol_history rows
+
+        Returns:
+            Number of Broker Protocol entries recomputed
+        """
+        touched = set()
+        if members is not None and len(members):
+            members = self._clean_members(members)
+            touched |= set(members['broker_protocol_firm_name'])
+            self.members = self._clean_members(pd.concat([self.members, members], ignore_index=True))
+        if history is not None and len(history):
+            history = self._clean_history(history)
+            touched |= set(history['broker_protocol_firm_name'])
+            self.history = self._clean_history(pd.concat([self.history, history], ignore_index=True))
+        if touched:
+            self._rebuild_entities(touched)
+            self._build_arrays()
+        return len(touched)
+
+    def watermark(self):
+        """Latest last_updated / detected_at already applied (None when empty)."""
+        stamps = [pd.to_datetime(self.members['last_updated'], errors='coerce').max(),
+                  pd.to_datetime(self.history['detected_at'], errors='coerce').max()]
+        stamps = [s for s in stamps if pd.notna(s)]
+        return max(stamps) if stamps else None
+
+    def refresh(self, client=None) -> int:
+        """
+        Pull member and history rows changed since the watermark and apply them.
+
+        Withdrawals of firms that dropped off the list only touch last_seen_date
+        on the member row, but always log a WITHDREW history row, so history
+        detected after the watermark drives which members are re-read.
+
+        Returns:
+            Number of Broker Protocol entries recomputed
+        """
+        from google.cloud import bigquery
+        client = client or bigquery.Client(project=config.GCP_PROJECT_ID)
+        since = self.watermark()
+        if since is None:
+            since = pd.Timestamp('1970-01-01')
+
+        history = client.query(f"""
+            SELECT {', '.join(HISTORY_COLUMNS)}
+            FROM `{config.TABLE_HISTORY}`
+            WHERE detected_at > TIMESTAMP('{since}')
+              AND change_type IN ('JOINED', 'WITHDREW')
+        """).to_dataframe()
+        members = client.query(f"""
+            SELECT {', '.join(MEMBER_COLUMNS)}
+            FROM `{config.TABLE_MEMBERS}`
+            WHERE last_updated > TIMESTAMP('{since}')
+               OR broker_protocol_firm_name IN (
+                   SELECT broker_protocol_firm_name FROM `{config.TABLE_HISTORY}`
+                   WHERE detected_at > TIMESTAMP('{since}')
+                     AND change_type IN ('JOINED', 'WITHDREW'))
+        """).to_dataframe()
+        return self.update(members, history)
+
+    @classmethod
+    def from_bigquery(cls, client=None, unknown_join: str = 'open'):
+        """Build the index from the full members and history tables."""
+        from google.cloud import bigquery
+        client = client or bigquery.Client(project=config.GCP_PROJECT_ID)
+        members = client.query(f"SELECT {', '.join(MEMBER_COLUMNS)} FROM `{config.TABLE_MEMBERS}`").to_dataframe()
+        history = client.query(f"""
+            SELECT {', '.join(HISTORY_COLUMNS)}
+            FROM `{config.TABLE_HISTORY}`
+            WHERE change_type IN ('JOINED', 'WITHDREW')
+        """).to_dataframe()
+        return cls(members, history, unknown_join=unknown_join)
+
+    def to_frame(self) -> pd.DataFrame:
+        """Merged intervals per firm, with open ends as NaT."""
+        return pd.DataFrame({
+            'firm_crd_id': self.firm_keys[self._codes],
+            'valid_from': pd.to_datetime([None if s <= _OPEN_START else _to_date(s) for s in self._starts]),
+            'valid_to': pd.to_datetime([None if e >= _OPEN_END else _to_date(e) for e in self._ends]),
+        })
+
+    def save(self, path: Path = None) -> Path:
+        """Persist the source rows so later runs can refresh incrementally."""
+        path = Path(path or config.get_membership_index_dir())
+        path.mkdir(parents=True, exist_ok=True)
+        self.members.to_parquet(path / "members.parquet", index=False)
+        self.history.to_parquet(path / "history.parquet", index=False)
+        self.to_frame().to_parquet(path / "intervals.parquet", index=False)
+        return path
+
+    @classmethod
+    def load(cls, path: Path = None, unknown_join: str = 'open'):
+        path = Path(path or config.get_membership_index_dir())
+        return cls(pd.read_parquet(path / "members.parquet"), pd.read_parquet(path / "history.parquet"),
+                   unknown_join=unknown_join)
+
+    def publish(self, client=None, table: str = None):
+        """Replace the BigQuery interval table read by the feature SQL."""
+        from google.cloud import bigquery
+        client = client or bigquery.Client(project=config.GCP_PROJECT_ID)
+        frame = self.to_frame()
+        for column in ['valid_from', 'valid_to']:
+            frame[column] = frame[column].dt.date
+        job_config = bigquery.LoadJobConfig(
+            write_disposition='WRITE_TRUNCATE',
+            schema=[
+                bigquery.SchemaField('firm_crd_id', 'INT64'),
+                bigquery.SchemaField('valid_from', 'DATE'),
+                bigquery.SchemaField('valid_to', 'DATE'),
+            ]
+        )
+        job = client.load_table_from_dataframe(frame, table or config.TABLE_MEMBERSHIP_INTERVALS,
+                                               job_config=job_config)
+        job.result()
+
+
+def refresh_saved_index(client=None, publish: bool = True) -> MembershipIndex:
+    """Load the saved index (or build it), apply changes since the last run, save and publish."""
+    path = config.get_membership_index_dir()
+    if (path / "members.parquet").exists():
+        index = MembershipIndex.load(path)
+        touched = index.refresh(client)
+        print(f"Membership index: recomputed {touched} entries")
+    else:
+        index = MembershipIndex.from_bigquery(client)
+        print(f"Membership index: built from full tables")
+    index.save(path)
+    if publish:
+        index.publish(client)
+    print(f"  Intervals: {index.n_intervals} across {len(index.firm_keys)} firms")
+    return index
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build or refresh the Broker Protocol membership index')
+    parser.add_argument('--rebuild', action='store_true', help='Rebuild from the full tables')
+    parser.add_argument('--no-publish', action='store_true', help='Do not write the BigQuery interval table')
+
+    args = parser.parse_args()
+
+    try:
+        if args.rebuild:
+            index = MembershipIndex.from_bigquery()
+            index.save()
+            if not args.no_publish:
+                index.publish()
+            print(f"Intervals: {index.n_intervals} across {len(index.firm_keys)} firms")
+        else:
+            refresh_saved_index(publish=not args.no_publish)
+    except Exception as e:
+        print(f"ERROR: {str(e)}", file=sys.stderr)
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
@@ -0,0 +1,109 @@
+"""
+Unit tests for the Broker Protocol membership interval index.
+"""
+
+import json
+import pytest
+import pandas as pd
+import numpy as np
+import sys
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from membership_index import MembershipIndex, entity_intervals
+
+
+def member(name, crd, joined=None, withdrawn=None, current=True, last_seen='2025-06-01'):
+    return {
+        'broker_protocol_firm_name': name,
+        'firm_crd_id': crd,
+        'date_joined': joined,
+        'date_withdrawn': withdrawn,
+        'is_current_member': current,
+        'first_seen_date': '2025-06-01',
+        'last_seen_date': last_seen,
+        'last_updated': '2025-06-01 09:00:00',
+    }
+
+
+def withdrew(history_id, name, crd, change_date, new_values=None):
+    return {
+        'history_id': history_id,
+        'broker_protocol_firm_name': name,
+        'firm_crd_id': crd,
+        'change_type': 'WITHDREW',
+        'change_date': change_date,
+        'detected_at': f'{change_date} 09:00:00',
+        'new_values': json.dumps(new_values or {'is_current_member': False}),
+    }
+
+
+@pytest.fixture
+def index():
+    return MembershipIndex(pd.DataFrame([
+        member('Alpha', 1, joined='2015-01-01'),
+        member('Alpha DBA', 1, joined='2012-01-01', withdrawn='2016-01-01', current=False),
+        member('Beta', 2, joined='2010-01-01', withdrawn='2020-05-01', current=False),
+        member('Gamma', 3),
+        member('Unmatched', None, joined='2012-01-01'),
+    ]))
+
+
+class TestLookups:
+    """Test vectorized as-of membership."""
+
+    def test_dated_intervals(self, index):
+        flags = index.is_member([2, 2, 2], ['2009-12-31', '2010-01-01', '2020-05-01'])
+        assert flags.tolist() == [False, True, False]
+
+    def test_entries_for_same_crd_are_unioned(self, index):
+        frame = index.to_frame()
+        alpha = frame[frame['firm_crd_id'] == 1]
+        assert len(alpha) == 1
+        assert alpha['valid_from'].iloc[0] == pd.Timestamp('2012-01-01')
+        assert pd.isna(alpha['valid_to'].iloc[0])
+
+    def test_unknown_join_date_is_open(self, index):
+        assert index.is_member([3], ['2001-01-01']).tolist() == [True]
+
+    def test_unknown_join_first_seen(self):
+        strict = MembershipIndex(pd.DataFrame([member('Gamma', 3)]), unknown_join='first_seen')
+        assert strict.is_member([3, 3], ['2025-05-31', '2025-06-01']).tolist() == [False, True]
+
+    def test_missing_and_unknown_inputs(self, index):
+        flags = index.is_member(pd.Series([None, 99, 1], dtype='Int64'), ['2020-01-01', '2020-01-01', None])
+        assert flags.tolist() == [False, False, False]
+
+
+class TestIncrementalUpdates:
+    """Test that updates after a scrape match a full rebuild."""
+
+    def test_withdrawal_from_history(self, index):
+        changed = pd.DataFrame([member('Gamma', 3, current=False, last_seen='2025-07-01')])
+        history = pd.DataFrame([withdrew('h1', 'Gamma', 3, '2025-07-01')])
+
+        assert index.update(changed, history) == 1
+        assert index.is_member([3, 3], ['2025-06-30', '2025-07-01']).tolist() == [True, False]
+
+    def test_published_withdrawal_date_wins(self):
+        history = pd.DataFrame([withdrew('h1', 'Beta', 2, '2025-07-01',
+                                         {'field': 'date_withdrawn', 'value': '2024-03-01'})])
+        intervals = entity_intervals(member('Beta', 2, joined='2010-01-01', current=False), history)
+        end = (np.datetime64('2024-03-01') - np.datetime64('1970-01-01')).astype(int)
+        assert intervals[-1][1] == end
+
+    def test_update_matches_rebuild(self, index):
+        changed = pd.DataFrame([member('Gamma', 3, current=False, last_seen='2025-07-01'),
+                                member('Unmatched', 4, joined='2012-01-01')])
+        history = pd.DataFrame([withdrew('h1', 'Gamma', 3, '2025-07-01')])
+        index.update(changed, history)
+
+        rebuilt = MembershipIndex(index.members, index.history)
+        pd.testing.assert_frame_equal(index.to_frame(), rebuilt.to_frame())
+
+    def test_save_and_load(self, index, tmp_path):
+        index.save(tmp_path)
+        loaded = MembershipIndex.load(tmp_path)
+        pd.testing.assert_frame_equal(index.to_frame(), loaded.to_frame())
@@ -1,3 +1,5 @@
+import hashlib
+import numpy as np
 import pandas as pd
 from typing import List, Dict, Tuple, Optional, Union
 import logging
@@ -43,6 +45,120 @@ class CleaningReport:
         return "\n".join(lines)
 
 
+def _normalized_values(series: pd.Series) -> pd.Series:
+    """Null-aware, dtype-normalized form of a column for fingerprinting."""
+    if pd.api.types.is_bool_dtype(series) or pd.api.types.is_numeric_dtype(series):
+        values = series.to_numpy(dtype='float64', na_value=np.nan)
+        # One NaN bit pattern and no negative zero, so equal values hash equally
+        values = np.where(np.isnan(values), np.nan, values + 0.0)
+        return pd.Series(values, copy=False)
+    return series.astype('string').reset_index(drop=True)
+
+
+def fingerprint_columns(df: pd.DataFrame, columns: List[str] = None) -> Dict[str, bytes]:
+    """
+    Fingerprint every column once.
+    
+    Each column is normalized (numbers and booleans as float64, one null
+    representation, everything else as string), hashed row-wise with
+    hash_pandas_object and digested to 128 bits. Columns with equal
+    fingerprints hold the same values in the same rows.
+    
+    Parameters:
+    -----------
+    df : pd.DataFrame
+        Input dataframe
+    columns : List[str], optional
+        Columns to fingerprint (default: all)
+    
+    Returns:
+    --------
+    Dict[str, bytes]
+        Column name -> fingerprint
+    """
+    columns = list(df.columns) if columns is None else columns
+    fingerprints = {}
+    for col in columns:
+        row_hashes = pd.util.hash_pandas_object(_normalized_values(df[col]), index=False)
+        fingerprints[col] = hashlib.blake2b(row_hashes.to_numpy().tobytes(), digest_size=16).digest()
+    return fingerprints
+
+
+def group_identical_columns(fingerprints: Dict[str, bytes]) -> List[List[str]]:
+    """Group columns with equal fingerprints (groups of 2+, in column order)."""
+    groups: Dict[bytes, List[str]] = {}
+    for col, fingerprint in fingerprints.items():
+        groups.setdefault(fingerprint, []).append(col)
+    return [cols for cols in groups.values() if len(cols) > 1]
+
+
+def correlation_matrix(df: pd.DataFrame, columns: List[str],
+                       block_rows: int = None) -> np.ndarray:
+    """
+    Pairwise-complete Pearson correlation of numeric columns in float32.
+    
+    Same definition as DataFrame.corr() (each pair uses rows where both
+    are non-null), computed with a few matrix products accumulated over
+    row blocks instead of a per-pair loop.
+    
+    Parameters:
+    -----------
+    df : pd.DataFrame
+        Input dataframe
+    columns : List[str]
+        Numeric columns
+    block_rows : int, optional
+        Rows per block (default keeps each block around 64MB)
+    
+    Returns:
+    --------
+    np.ndarray
+        (len(columns), len(columns)) correlation matrix (NaN where undefined)
+    """
+    p = len(columns)
+    block_rows = block_rows or max(1024, (1 << 24) // max(p, 1))
+    
+    # Center on the column means first to keep float32 sums well conditioned
+    means = df[columns].mean().to_numpy(dtype='float64')
+    shape = (p, p)
+    n_ij, s_i, s_ii, s_ij = (np.zeros(shape, dtype='float64') for _ in range(4))
+    
+    for start in range(0, len(df), block_rows):
+        block = df[columns].iloc[start:start + block_rows].to_numpy(dtype='float64', na_value=np.nan)
+        mask = ~np.isnan(block)
+        x = np.where(mask, block - means, 0.0).astype('float32')
+        m = mask.astype('float32')
+        n_ij += m.T @ m
+        s_i += x.T @ m          # sum of column i over rows where j is present
+        s_ii += (x * x).T @ m
+        s_ij += x.T @ x
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cov = s_ij - s_i * s_i.T / n_ij
+        var_i = s_ii - s_i * s_i / n_ij
+        var_j = var_i.T
+        corr = cov / np.sqrt(var_i * var_j)
+    corr[(n_ij < 2) | (var_i <= 0) | (var_j <= 0)] = np.nan
+    return np.clip(corr, -1.0, 1.0)
+
+
+def find_correlated_pairs(df: pd.DataFrame, columns: List[str],
+                          threshold: float = 0.98) -> List[Tuple[str, str, float]]:
+    """
+    Numeric column pairs with |correlation| >= threshold.
+    
+    Returns:
+    --------
+    List[Tuple[str, str, float]]
+        (column_i, column_j, |corr|) with i before j in column order
+    """
+    if len(columns) < 2:
+        return []
+    corr = np.abs(correlation_matrix(df, columns))
+    rows, cols = np.nonzero(np.triu(np.nan_to_num(corr) >= threshold, k=1))
+    return [(columns[i], columns[j], float(corr[i, j])) for i, j in zip(rows, cols)]
+
+
 class ColumnCleaner:
     """Enhanced column cleaner with verbosity control."""
     
@@ -90,7 +206,8 @@ class ColumnCleaner:
                             correlation_threshold: float = 0.98,
                             perfect_correlation_threshold: float = 0.9999,
                             inplace: bool = False,
-                            return_report: bool = False) -> Union[pd.DataFrame, Tuple[pd.DataFrame, CleaningReport]]:
+                            return_report: bool = False,
+                            cross_group: bool = False) -> Union[pd.DataFrame, Tuple[pd.DataFrame, CleaningReport]]:
         """
         Clean merged columns by removing duplicates and highly correlated columns.
         
@@ -108,6 +225,9 @@ class ColumnCleaner:
             Whether to modify the dataframe in place
         return_report : bool, default=False
             Whether to return the cleaning report along with the dataframe
+        cross_group : bool, default=False
+            Also drop identical/correlated columns across suffix groups
+            (see deduplicate_columns) before the per-group pass
         
         Returns:
         --------
@@ -130,9 +250,18 @@ class ColumnCleaner:
             self._log(logging.INFO, f"Starting column cleaning with {len(df.columns)} columns")
             self._log(logging.INFO, f"Looking for suffixes: {suffixes}")
         
+        # Optional whole-frame pass (duplicates across suffix groups)
+        if cross_group:
+            self._deduplicate(df, correlation_threshold)
+        
         # Step 1: Identify and group columns by base name
         base_column_groups = self._group_columns_by_base(df.columns, suffixes)
         
+        # Fingerprint every grouped column once
+        fingerprints = fingerprint_columns(
+            df, [col for cols in base_column_groups.values() if len(cols) > 1 for col in cols]
+        )
+        
         if self.verbosity >= VerbosityLevel.DETAILED:
             self._log(logging.INFO, f"Found {len(base_column_groups)} column groups to process")
         
@@ -145,7 +274,7 @@ class ColumnCleaner:
                 self._log(logging.INFO, f"Processing group '{base_name}' with {len(cols)} columns")
             
             # Step 3: Handle identical columns
-            cols_to_keep = self._handle_identical_columns(df, base_name, cols)
+            cols_to_keep = self._handle_identical_columns(df, base_name, cols, fingerprints)
             
             if len(cols_to_keep) <= 1:
                 continue
@@ -198,32 +327,25 @@ class ColumnCleaner:
         return base_column_groups
     
     def _handle_identical_columns(self, df: pd.DataFrame, base_name: str, 
-                                 cols: List[str]) -> List[str]:
+                                 cols: List[str],
+                                 fingerprints: Dict[str, bytes] = None) -> List[str]:
         """Remove columns that are identical to others in the group."""
-        cols_to_keep = cols.copy()
+        if fingerprints is None:
+            fingerprints = fingerprint_columns(df, cols)
+        group_fingerprints = {col: fingerprints[col] for col in cols}
         
-        for i in range(len(cols)):
-            if cols[i] not in cols_to_keep:
-                continue
+        cols_to_keep = cols.copy()
+        for identical in group_identical_columns(group_fingerprints):
+            keep_col = identical[0]
+            for drop_col in identical[1:]:
+                df.drop(columns=[drop_col], inplace=True)
+                cols_to_keep.remove(drop_col)
                 
-            for j in range(i + 1, len(cols)):
-                if cols[j] not in cols_to_keep:
-                    continue
-                    
-                try:
-                    if df[cols[i]].equals(df[cols[j]]):
-                        df.drop(columns=[cols[j]], inplace=True)
-                        cols_to_keep.remove(cols[j])
-                        
-                        self.report.columns_dropped.append(cols[j])
-                        self.report.identical_pairs.append((cols[i], cols[j]))
-                        
-                        if self.verbosity >= VerbosityLevel.DETAILED:
-                            self._log(logging.INFO, f"    Dropped {cols[j]} (identical to {cols[i]})")
-                            
-                except Exception as e:
-                    if self.verbosity == VerbosityLevel.DEBUG:
-                        self._log(logging.WARNING, f"    Error comparing {cols[i]} and {cols[j]}: {e}")
+                self.report.columns_dropped.append(drop_col)
+                self.report.identical_pairs.append((keep_col, drop_col))
+                
+                if self.verbosity >= VerbosityLevel.DETAILED:
+                    self._log(logging.INFO, f"    Dropped {drop_col} (identical to {keep_col})")
         
         # Rename single remaining column to base name if possible
         if len(cols_to_keep) == 1 and base_name not in df.columns:
@@ -282,41 +404,96 @@ class ColumnCleaner:
             return
         
         try:
-            corr_matrix = df[numeric_cols].corr().abs()
-            cols_to_drop = set()
-            
-            # Check all pairs
-            for i in range(len(numeric_cols)):
-                if numeric_cols[i] in cols_to_drop:
-                    continue
-                    
-                for j in range(i + 1, len(numeric_cols)):
-                    if numeric_cols[j] in cols_to_drop:
-                        continue
-                        
-                    correlation = corr_matrix.iloc[i, j]
-                    
-                    if correlation >= correlation_threshold:
-                        keep_col, drop_col = self._choose_column_to_keep(
-                            df, numeric_cols[i], numeric_cols[j]
-                        )
-                        cols_to_drop.add(drop_col)
-                        
-                        self.report.correlations_found.append((keep_col, drop_col, correlation))
-                        
-                        if self.verbosity >= VerbosityLevel.DETAILED:
-                            self._log(logging.INFO, 
-                                    f"    Dropped {drop_col} (corr={correlation:.3f} with {keep_col})")
-            
-            # Drop the selected columns
-            if cols_to_drop:
-                df.drop(columns=list(cols_to_drop), inplace=True)
-                self.report.columns_dropped.extend(list(cols_to_drop))
+            self._drop_correlated(df, find_correlated_pairs(df, numeric_cols, correlation_threshold))
                 
         except Exception as e:
             if self.verbosity >= VerbosityLevel.NORMAL:
                 self._log(logging.WARNING, f"Error handling correlated columns for {base_name}: {e}")
     
+    def _drop_correlated(self, df: pd.DataFrame, pairs: List[Tuple[str, str, float]]) -> None:
+        """Greedily drop one column of each correlated pair (pairs in column order)."""
+        cols_to_drop = set()
+        for col_i, col_j, correlation in pairs:
+            if col_i in cols_to_drop or col_j in cols_to_drop:
+                continue
+            
+            keep_col, drop_col = self._choose_column_to_keep(df, col_i, col_j)
+            cols_to_drop.add(drop_col)
+            
+            self.report.correlations_found.append((keep_col, drop_col, correlation))
+            
+            if self.verbosity >= VerbosityLevel.DETAILED:
+                self._log(logging.INFO, 
+                        f"    Dropped {drop_col} (corr={correlation:.3f} with {keep_col})")
+        
+        if cols_to_drop:
+            df.drop(columns=list(cols_to_drop), inplace=True)
+            self.report.columns_dropped.extend(list(cols_to_drop))
+    
+    def deduplicate_columns(self, df: pd.DataFrame, 
+                            correlation_threshold: float = 0.98,
+                            inplace: bool = False,
+                            return_report: bool = False) -> Union[pd.DataFrame, Tuple[pd.DataFrame, CleaningReport]]:
+        """
+        Drop identical and highly correlated columns across the whole frame.
+        
+        Every column is fingerprinted once, so identical columns are grouped
+        in O(columns) regardless of suffix. Numeric pairs are then checked
+        with one blocked float32 correlation over all numeric columns.
+        
+        Parameters:
+        -----------
+        df : pd.DataFrame
+            Input dataframe (e.g. the merged Salesforce + FINTRX frame)
+        correlation_threshold : float, default=0.98
+            Threshold for considering columns as highly correlated
+        inplace : bool, default=False
+            Whether to modify the dataframe in place
+        return_report : bool, default=False
+            Whether to return the cleaning report along with the dataframe
+        
+        Returns:
+        --------
+        pd.DataFrame or Tuple[pd.DataFrame, CleaningReport]
+            Deduplicated dataframe (and optionally the cleaning report)
+        """
+        self.report = CleaningReport()
+        self.report.total_columns_before = len(df.columns)
+        
+        if not inplace:
+            df = df.copy()
+        
+        self._deduplicate(df, correlation_threshold)
+        
+        self.report.total_columns_after = len(df.columns)
+        if self.verbosity >= VerbosityLevel.MINIMAL:
+            self._log(logging.INFO, "\n" + self.report.summary())
+        
+        if return_report:
+            return df, self.report
+        return df
+    
+    def _deduplicate(self, df: pd.DataFrame, correlation_threshold: float) -> None:
+        """Whole-frame identical + correlated column removal (in place)."""
+        identical_groups = group_identical_columns(fingerprint_columns(df))
+        for identical in identical_groups:
+            keep_col = min(identical, key=len)
+            for drop_col in identical:
+                if drop_col == keep_col:
+                    continue
+                self.report.columns_dropped.append(drop_col)
+                self.report.identical_pairs.append((keep_col, drop_col))
+                
+                if self.verbosity >= VerbosityLevel.DETAILED:
+                    self._log(logging.INFO, f"  Dropped {drop_col} (identical to {keep_col})")
+            df.drop(columns=[col for col in identical if col != keep_col], inplace=True)
+        
+        if self.verbosity >= VerbosityLevel.NORMAL:
+            self._log(logging.INFO, f"Found {len(identical_groups)} groups of identical columns")
+        
+        numeric_cols = [col for col in df.columns if pd.api.types.is_numeric_dtype(df[col])]
+        self._drop_correlated(df, find_correlated_pairs(df, numeric_cols, correlation_threshold))
+    
     def _choose_column_to_keep(self, df: pd.DataFrame, col1: str, col2: str) -> Tuple[str, str]:
         """Decide which column to keep based on data quality metrics."""
         na_count1 = df[col1].isna().sum()
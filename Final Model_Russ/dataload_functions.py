@@ -1,7 +1,16 @@
 import simple_salesforce
 import pandas as pd
+import numpy as np
 import os
+import re
+import shutil
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
 from dotenv import load_dotenv
+from salesforce_functions import SalesforceConnection, query_salesforce_pages
 
 load_dotenv()
 
@@ -19,28 +28,165 @@ def create_sf_client():
         instance_url=base
     )
 
-# Initialize once, but through a function call
-sf_client = create_sf_client()
 
-def query_salesforce(query, sf_client=sf_client):
+def __getattr__(name):
+    # sf_client is created on first access instead of at import (no login on import)
+    if name == 'sf_client':
+        global sf_client
+        sf_client = create_sf_client()
+        return sf_client
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def query_salesforce(query, sf_client=None):
     """
-    Connects to Salesforce using simple_salesforce and executes the provided query.
+    Executes the provided SOQL query page by page.
+    
+    Relationship fields are flattened to dotted columns (Owner.Name) and
+    'attributes' entries are dropped.
     
     Args:
         query: The SOQL query string.
-        sf_client: Salesforce client (defaults to module-level client)
+        sf_client: simple_salesforce client (defaults to the lazy pooled connection)
     
     Returns:
         A pandas DataFrame containing the query results.
     """
-    results = sf_client.query_all(query)
-    df = pd.DataFrame(results['records'])
-    return df
+    connection = None
+    if sf_client is not None:
+        connection = SalesforceConnection(sf_client.sf_instance, sf_client.session_id,
+                                          api_version=sf_client.sf_version)
+    return query_salesforce_pages(query, connection)
+
+## Merge key profiling
+def _joint_key_codes(left_keys, right_keys):
+    """Factorize both key columns into one code space (nulls share one code, as in pd.merge)."""
+    codes, uniques = pd.factorize(pd.concat([pd.Series(left_keys), pd.Series(right_keys)], ignore_index=True))
+    null_code = len(uniques)
+    codes = np.where(codes < 0, null_code, codes)
+    n_left = len(left_keys)
+    return codes[:n_left], codes[n_left:], null_code + 1
+
+
+class JoinKeyProfile:
+    """
+    Outer-join statistics computed from the key columns alone.
+    
+    Keys from both sides are hashed into one code space (pd.factorize) and
+    counted per code, so match counts, fan-out and the exact row counts of
+    pd.merge(how='outer') come from two bincounts instead of a materialized
+    merge. Null keys match each other, as they do in pd.merge.
+    
+    Parameters:
+    -----------
+    left_keys, right_keys : array-like - Join key columns
+    left_weights : array-like, optional - Rows each left key stands for
+        (used to chain a profile onto the result of a previous join)
+    """
+    
+    def __init__(self, left_keys, right_keys, left_weights=None):
+        self.left_codes, self.right_codes, n_codes = _joint_key_codes(left_keys, right_keys)
+        self.null_code = n_codes - 1
+        self.left_count = np.bincount(self.left_codes, weights=left_weights, minlength=n_codes)
+        self.right_count = np.bincount(self.right_codes, minlength=n_codes)
+        
+        in_both = (self.left_count > 0) & (self.right_count > 0)
+        self.both = int(np.dot(self.left_count[in_both], self.right_count[in_both]))
+        self.left_only = int(self.left_count[self.right_count == 0].sum())
+        self.right_only = int(self.right_count[self.left_count == 0].sum())
+        self.total_rows = self.both + self.left_only + self.right_only
+        # Extra rows created by duplicate keys on the right side of matched left rows
+        self.fan_out = self.both - int(self.left_count[in_both].sum())
+    
+    def right_matches(self):
+        """Matching right-side rows for each left row (0 if unmatched)."""
+        return self.right_count[self.left_codes]
+    
+    def left_matches(self):
+        """Matching (weighted) left-side rows for each right row (0 if unmatched)."""
+        return self.left_count[self.right_codes]
+    
+    def stats(self):
+        """Indicator counts, as value_counts() of the merge indicator would give them."""
+        return {'both': self.both, 'left_only': self.left_only, 'right_only': self.right_only}
+
+
+def _key_quality(df, column):
+    """Null and duplicate counts of a key column (None if the column is missing)."""
+    if column not in df.columns:
+        return None
+    keys = df[column]
+    return {'nulls': int(keys.isna().sum()), 'duplicates': int(keys.duplicated().sum())}
+
+
+def profile_merges(sf, dd_rep, dd_firm):
+    """
+    Profile the SF -> Rep -> Firm merges from the join keys only.
+    
+    Returns the same row counts as the outer merges in analyze_merge_operations
+    (SF+Rep on FA_CRD__c/RepCRD, then + Firm on RIAFirmCRD, and Rep+Firm)
+    without building them.
+    
+    Parameters:
+    -----------
+    sf : DataFrame - Salesforce data
+    dd_rep : DataFrame - Representative data
+    dd_firm : DataFrame - Firm data
+    
+    Returns:
+    --------
+    dict : JoinKeyProfile per merge plus Salesforce-centric counts and key quality
+    """
+    sf_rep = JoinKeyProfile(sf['FA_CRD__c'], dd_rep['RepCRD'])
+    
+    # Rows of the SF+Rep result per rep row: one per matching SF row (or the rep row alone);
+    # unmatched SF rows carry a null RIAFirmCRD
+    rep_rows = np.maximum(sf_rep.left_matches(), 1)
+    merged_firm_keys = pd.concat([dd_rep['RIAFirmCRD'], pd.Series([np.nan])], ignore_index=True)
+    merged_weights = np.append(rep_rows, sf_rep.left_only)
+    sf_rep_firm = JoinKeyProfile(merged_firm_keys, dd_firm['RIAFirmCRD'], left_weights=merged_weights)
+    
+    # SF-centric breakdown of the final result
+    firm_rows = sf_rep_firm.right_matches()
+    sf_on_rep = sf_rep.left_matches()
+    rep_firm_rows, null_firm_rows = firm_rows[:-1], firm_rows[-1]
+    sf_with_rep_and_firm = int(np.dot(sf_on_rep, rep_firm_rows))
+    sf_with_rep_only = int(sf_on_rep[rep_firm_rows == 0].sum())
+    sf_no_matches = int(sf_rep.left_only * max(null_firm_rows, 1))
+    
+    return {
+        'sf_rep': sf_rep,
+        'sf_rep_firm': sf_rep_firm,
+        'rep_firm': JoinKeyProfile(dd_rep['RIAFirmCRD'], dd_firm['RIAFirmCRD']),
+        'sf_with_rep_and_firm': sf_with_rep_and_firm,
+        'sf_with_rep_only': sf_with_rep_only,
+        'sf_no_matches': sf_no_matches,
+        'key_quality': {
+            'sf.FA_CRD__c': _key_quality(sf, 'FA_CRD__c'),
+            'dd_rep.RepCRD': _key_quality(dd_rep, 'RepCRD'),
+            'dd_rep.RIAFirmCRD': _key_quality(dd_rep, 'RIAFirmCRD'),
+            'dd_firm.RIAFirmCRD': _key_quality(dd_firm, 'RIAFirmCRD'),
+        }
+    }
+
+
+def _prune(df, columns, keys):
+    """Select requested columns (join keys always kept)."""
+    if columns is None:
+        return df
+    return df[list(dict.fromkeys(list(keys) + [col for col in columns if col not in keys]))]
+
 
 ## Merge Data with analysis
-def analyze_merge_operations(sf, dd_rep, dd_firm, verbosity='high'):
+def analyze_merge_operations(sf, dd_rep, dd_firm, verbosity='high',
+                             materialize=('sf_rep', 'sf_rep_firm', 'rep_firm'), columns=None):
     """
-    Perform merge operations and generate a detailed analysis report
+    Profile the merge operations, generate a detailed analysis report and
+    build only the requested merges
+    
+    All statistics come from the join keys (see profile_merges); a merge is
+    materialized only if named in `materialize`, and sf_rep is built once
+    and reused for sf_rep_firm.
     
     Parameters:
     -----------
@@ -51,10 +197,15 @@ def analyze_merge_operations(sf, dd_rep, dd_firm, verbosity='high'):
         - 'none': No output, just return results
         - 'low': Essential statistics only
         - 'high': Full detailed report
+    materialize : iterable - Merges to build: 'sf_rep', 'sf_rep_firm', 'rep_firm'
+        (default: all three; pass ['sf_rep_firm'] for the modelling frame only)
+    columns : dict, optional - Columns to keep per input ({'sf': [...], 'dd_rep': [...],
+        'dd_firm': [...]}); join keys are always kept
     
     Returns:
     --------
     tuple : (data_sf_rep, data_sf_rep_firm, data_rep_firm, report_dict)
+        Merges not requested are None
     """
     
     # Helper function for conditional printing
@@ -84,29 +235,24 @@ def analyze_merge_operations(sf, dd_rep, dd_firm, verbosity='high'):
     vprint(f"   Representatives (dd_rep): {initial_counts['dd_rep']:,} rows", 'high')
     vprint(f"   Firms (dd_firm):         {initial_counts['dd_firm']:,} rows", 'high')
     
+    # Profile all three merges from the join keys (nothing is materialized here)
+    profiles = profile_merges(sf, dd_rep, dd_firm)
+    key_quality = profiles['key_quality']
+    
     # ============ MERGE 1: SF + REP ============
     vprint("\n2. MERGE 1: Salesforce + Representatives", 'high')
     vprint("-"*40, 'high')
     vprint(f"   Join Keys: sf['FA_CRD__c'] <-> dd_rep['RepCRD']", 'high')
     vprint(f"   Join Type: OUTER", 'high')
     
-    data_sf_rep = pd.merge(
-        sf, 
-        dd_rep, 
-        left_on="FA_CRD__c", 
-        right_on="RepCRD", 
-        how="outer", 
-        indicator='_merge_sf_rep', 
-        suffixes=('_sf', '_rep')
-    )
+    merge1_stats = profiles['sf_rep'].stats()
+    merge1_rows = profiles['sf_rep'].total_rows
     
-    merge1_stats = data_sf_rep['_merge_sf_rep'].value_counts()
-    
-    vprint(f"\n   Result: {len(data_sf_rep):,} total rows", 'high')
+    vprint(f"\n   Result: {merge1_rows:,} total rows", 'high')
     vprint("\n   Merge Breakdown:", 'high')
     for category in ['both', 'left_only', 'right_only']:
         count = merge1_stats.get(category, 0)
-        pct = (count / len(data_sf_rep)) * 100
+        pct = (count / merge1_rows) * 100
         
         if category == 'both':
             vprint(f"     • Matched records:           {count:,} ({pct:.1f}%)", 'high')
@@ -127,15 +273,16 @@ def analyze_merge_operations(sf, dd_rep, dd_firm, verbosity='high'):
     vprint(f"     • Unmatched SF records: {sf_unmatched_count:,} ({(sf_unmatched_count/initial_counts['sf']*100):.1f}%)", 'high')
     
     # Check for duplicate join keys
-    if 'FA_CRD__c' in sf.columns:
-        sf_duplicates = sf['FA_CRD__c'].duplicated().sum()
-        if sf_duplicates > 0:
-            vprint(f"\n   ⚠️  Warning: {sf_duplicates} duplicate FA_CRD__c values in SF data", 'high')
+    sf_duplicates = key_quality['sf.FA_CRD__c']['duplicates']
+    if sf_duplicates > 0:
+        vprint(f"\n   ⚠️  Warning: {sf_duplicates} duplicate FA_CRD__c values in SF data", 'high')
+    
+    rep_duplicates = key_quality['dd_rep.RepCRD']['duplicates']
+    if rep_duplicates > 0:
+        vprint(f"   ⚠️  Warning: {rep_duplicates} duplicate RepCRD values in Rep data", 'high')
     
-    if 'RepCRD' in dd_rep.columns:
-        rep_duplicates = dd_rep['RepCRD'].duplicated().sum()
-        if rep_duplicates > 0:
-            vprint(f"   ⚠️  Warning: {rep_duplicates} duplicate RepCRD values in Rep data", 'high')
+    if profiles['sf_rep'].fan_out > 0:
+        vprint(f"   ⚠️  Warning: duplicate keys add {profiles['sf_rep'].fan_out:,} rows to matched SF records", 'high')
     
     # ============ MERGE 2: (SF+REP) + FIRM ============
     vprint("\n3. MERGE 2: (Salesforce + Representatives) + Firms", 'high')
@@ -143,22 +290,14 @@ def analyze_merge_operations(sf, dd_rep, dd_firm, verbosity='high'):
     vprint(f"   Join Keys: RIAFirmCRD (from both datasets)", 'high')
     vprint(f"   Join Type: OUTER", 'high')
     
-    data_sf_rep_firm = pd.merge(
-        data_sf_rep, 
-        dd_firm, 
-        on="RIAFirmCRD", 
-        how="outer", 
-        indicator='_merge_sf_rep_firm', 
-        suffixes=('_merge1', '_firm')
-    )
-    
-    merge2_stats = data_sf_rep_firm['_merge_sf_rep_firm'].value_counts()
+    merge2_stats = profiles['sf_rep_firm'].stats()
+    merge2_rows = profiles['sf_rep_firm'].total_rows
     
-    vprint(f"\n   Result: {len(data_sf_rep_firm):,} total rows", 'high')
+    vprint(f"\n   Result: {merge2_rows:,} total rows", 'high')
     vprint("\n   Merge Breakdown:", 'high')
     for category in ['both', 'left_only', 'right_only']:
         count = merge2_stats.get(category, 0)
-        pct = (count / len(data_sf_rep_firm)) * 100
+        pct = (count / merge2_rows) * 100
         
         if category == 'both':
             vprint(f"     • Matched records:              {count:,} ({pct:.1f}%)", 'high')
@@ -169,17 +308,9 @@ def analyze_merge_operations(sf, dd_rep, dd_firm, verbosity='high'):
     
     # Calculate Salesforce-based firm match rate
     # Count SF records that have both Rep AND Firm matches
-    sf_with_rep_and_firm = len(data_sf_rep_firm[
-        (data_sf_rep_firm['_merge_sf_rep'] == 'both') & 
-        (data_sf_rep_firm['_merge_sf_rep_firm'] == 'both')
-    ])
-    sf_with_rep_only = len(data_sf_rep_firm[
-        (data_sf_rep_firm['_merge_sf_rep'] == 'both') & 
-        (data_sf_rep_firm['_merge_sf_rep_firm'] == 'left_only')
-    ])
-    sf_no_matches = len(data_sf_rep_firm[
-        data_sf_rep_firm['_merge_sf_rep'] == 'left_only'
-    ])
+    sf_with_rep_and_firm = profiles['sf_with_rep_and_firm']
+    sf_with_rep_only = profiles['sf_with_rep_only']
+    sf_no_matches = profiles['sf_no_matches']
     
     vprint(f"\n   📊 Salesforce-based Firm Match Analysis:", 'low')
     vprint(f"     • SF records with Rep AND Firm: {sf_with_rep_and_firm:,} ({(sf_with_rep_and_firm/initial_counts['sf']*100):.1f}%)", 'low')
@@ -192,22 +323,14 @@ def analyze_merge_operations(sf, dd_rep, dd_firm, verbosity='high'):
     vprint(f"   Join Keys: RIAFirmCRD (from both datasets)", 'high')
     vprint(f"   Join Type: OUTER", 'high')
     
-    data_rep_firm = pd.merge(
-        dd_rep, 
-        dd_firm, 
-        on="RIAFirmCRD", 
-        how="outer", 
-        indicator='_merge_rep_firm', 
-        suffixes=('_merge1', '_firm')
-    )
-    
-    merge3_stats = data_rep_firm['_merge_rep_firm'].value_counts()
+    merge3_stats = profiles['rep_firm'].stats()
+    merge3_rows = profiles['rep_firm'].total_rows
     
-    vprint(f"\n   Result: {len(data_rep_firm):,} total rows", 'high')
+    vprint(f"\n   Result: {merge3_rows:,} total rows", 'high')
     vprint("\n   Merge Breakdown:", 'high')
     for category in ['both', 'left_only', 'right_only']:
         count = merge3_stats.get(category, 0)
-        pct = (count / len(data_rep_firm)) * 100
+        pct = (count / merge3_rows) * 100
         
         if category == 'both':
             vprint(f"     • Matched records:           {count:,} ({pct:.1f}%)", 'high')
@@ -222,22 +345,22 @@ def analyze_merge_operations(sf, dd_rep, dd_firm, verbosity='high'):
     
     vprint("\n   Row Count Progression:", 'high')
     vprint(f"     • Initial total rows:     {sum(initial_counts.values()):,}", 'high')
-    vprint(f"     • After Merge 1 (SF+Rep): {len(data_sf_rep):,}", 'high')
-    vprint(f"     • After Merge 2 (All):    {len(data_sf_rep_firm):,}", 'high')
-    vprint(f"     • Rep+Firm merge:         {len(data_rep_firm):,}", 'high')
+    vprint(f"     • After Merge 1 (SF+Rep): {merge1_rows:,}", 'high')
+    vprint(f"     • After Merge 2 (All):    {merge2_rows:,}", 'high')
+    vprint(f"     • Rep+Firm merge:         {merge3_rows:,}", 'high')
     
     # Calculate success rates (original method)
     vprint("\n   Match Success Rates (% of merge result):", 'high')
-    if len(data_sf_rep) > 0:
-        merge1_success = (merge1_stats.get('both', 0) / len(data_sf_rep)) * 100
+    if merge1_rows > 0:
+        merge1_success = (merge1_stats.get('both', 0) / merge1_rows) * 100
         vprint(f"     • Merge 1 (SF+Rep):       {merge1_success:.1f}% matched", 'high')
     
-    if len(data_sf_rep_firm) > 0:
-        merge2_success = (merge2_stats.get('both', 0) / len(data_sf_rep_firm)) * 100
+    if merge2_rows > 0:
+        merge2_success = (merge2_stats.get('both', 0) / merge2_rows) * 100
         vprint(f"     • Merge 2 (SF+Rep+Firm):  {merge2_success:.1f}% matched", 'high')
     
-    if len(data_rep_firm) > 0:
-        merge3_success = (merge3_stats.get('both', 0) / len(data_rep_firm)) * 100
+    if merge3_rows > 0:
+        merge3_success = (merge3_stats.get('both', 0) / merge3_rows) * 100
         vprint(f"     • Merge 3 (Rep+Firm):     {merge3_success:.1f}% matched", 'high')
     
     # NEW: Salesforce-centric success summary
@@ -254,25 +377,21 @@ def analyze_merge_operations(sf, dd_rep, dd_firm, verbosity='high'):
     
     # Check for null key values
     null_checks = []
-    if 'FA_CRD__c' in sf.columns:
-        null_count = sf['FA_CRD__c'].isna().sum()
-        if null_count > 0:
-            null_checks.append(f"   • SF: {null_count:,} null FA_CRD__c values ({(null_count/len(sf)*100):.1f}% of SF)")
-    
-    if 'RepCRD' in dd_rep.columns:
-        null_count = dd_rep['RepCRD'].isna().sum()
-        if null_count > 0:
-            null_checks.append(f"   • Rep: {null_count:,} null RepCRD values")
-    
-    if 'RIAFirmCRD' in dd_rep.columns:
-        null_count = dd_rep['RIAFirmCRD'].isna().sum()
-        if null_count > 0:
-            null_checks.append(f"   • Rep: {null_count:,} null RIAFirmCRD values")
-    
-    if 'RIAFirmCRD' in dd_firm.columns:
-        null_count = dd_firm['RIAFirmCRD'].isna().sum()
-        if null_count > 0:
-            null_checks.append(f"   • Firm: {null_count:,} null RIAFirmCRD values")
+    null_count = key_quality['sf.FA_CRD__c']['nulls']
+    if null_count > 0:
+        null_checks.append(f"   • SF: {null_count:,} null FA_CRD__c values ({(null_count/len(sf)*100):.1f}% of SF)")
+    
+    null_count = key_quality['dd_rep.RepCRD']['nulls']
+    if null_count > 0:
+        null_checks.append(f"   • Rep: {null_count:,} null RepCRD values")
+    
+    null_count = key_quality['dd_rep.RIAFirmCRD']['nulls']
+    if null_count > 0:
+        null_checks.append(f"   • Rep: {null_count:,} null RIAFirmCRD values")
+    
+    null_count = key_quality['dd_firm.RIAFirmCRD']['nulls']
+    if null_count > 0:
+        null_checks.append(f"   • Firm: {null_count:,} null RIAFirmCRD values")
     
     if null_checks:
         vprint("   Null Values in Join Keys:", 'high')
@@ -285,32 +404,33 @@ def analyze_merge_operations(sf, dd_rep, dd_firm, verbosity='high'):
     report = {
         'initial_counts': initial_counts,
         'merge1_stats': {
-            'total_rows': len(data_sf_rep),
+            'total_rows': merge1_rows,
             'matched': merge1_stats.get('both', 0),
             'sf_only': merge1_stats.get('left_only', 0),
             'rep_only': merge1_stats.get('right_only', 0),
-            'match_rate': (merge1_stats.get('both', 0) / len(data_sf_rep) * 100) if len(data_sf_rep) > 0 else 0,
+            'match_rate': (merge1_stats.get('both', 0) / merge1_rows * 100) if merge1_rows > 0 else 0,
             'sf_based_match_rate': sf_match_rate,
             'sf_matched_count': sf_matched_count,
-            'sf_unmatched_count': sf_unmatched_count
+            'sf_unmatched_count': sf_unmatched_count,
+            'fan_out_rows': profiles['sf_rep'].fan_out
         },
         'merge2_stats': {
-            'total_rows': len(data_sf_rep_firm),
+            'total_rows': merge2_rows,
             'matched': merge2_stats.get('both', 0),
             'sf_rep_only': merge2_stats.get('left_only', 0),
             'firm_only': merge2_stats.get('right_only', 0),
-            'match_rate': (merge2_stats.get('both', 0) / len(data_sf_rep_firm) * 100) if len(data_sf_rep_firm) > 0 else 0,
+            'match_rate': (merge2_stats.get('both', 0) / merge2_rows * 100) if merge2_rows > 0 else 0,
             'sf_with_rep_and_firm': sf_with_rep_and_firm,
             'sf_with_rep_only': sf_with_rep_only,
             'sf_no_matches': sf_no_matches,
             'sf_based_complete_match_rate': (sf_with_rep_and_firm/initial_counts['sf']*100) if initial_counts['sf'] > 0 else 0
         },
         'merge3_stats': {
-            'total_rows': len(data_rep_firm),
+            'total_rows': merge3_rows,
             'matched': merge3_stats.get('both', 0),
             'rep_only': merge3_stats.get('left_only', 0),
             'firm_only': merge3_stats.get('right_only', 0),
-            'match_rate': (merge3_stats.get('both', 0) / len(data_rep_firm) * 100) if len(data_rep_firm) > 0 else 0
+            'match_rate': (merge3_stats.get('both', 0) / merge3_rows * 100) if merge3_rows > 0 else 0
         },
         'salesforce_summary': {
             'total_records': initial_counts['sf'],
@@ -320,9 +440,54 @@ def analyze_merge_operations(sf, dd_rep, dd_firm, verbosity='high'):
             'matched_with_both_pct': (sf_with_rep_and_firm/initial_counts['sf']*100) if initial_counts['sf'] > 0 else 0,
             'no_matches': sf_no_matches,
             'no_matches_pct': (sf_no_matches/initial_counts['sf']*100) if initial_counts['sf'] > 0 else 0
-        }
+        },
+        'key_quality': key_quality
     }
     
+    # ============ MATERIALIZE REQUESTED MERGES ============
+    materialize = set(materialize or [])
+    columns = columns or {}
+    sf_in = _prune(sf, columns.get('sf'), ['FA_CRD__c'])
+    rep_in = _prune(dd_rep, columns.get('dd_rep'), ['RepCRD', 'RIAFirmCRD'])
+    firm_in = _prune(dd_firm, columns.get('dd_firm'), ['RIAFirmCRD'])
+    
+    data_sf_rep = data_sf_rep_firm = data_rep_firm = None
+    if materialize & {'sf_rep', 'sf_rep_firm'}:
+        vprint(f"\n   Building SF+Rep merge ({merge1_rows:,} rows)", 'high')
+        data_sf_rep = pd.merge(
+            sf_in, 
+            rep_in, 
+            left_on="FA_CRD__c", 
+            right_on="RepCRD", 
+            how="outer", 
+            indicator='_merge_sf_rep', 
+            suffixes=('_sf', '_rep')
+        )
+    
+    if 'sf_rep_firm' in materialize:
+        vprint(f"   Building SF+Rep+Firm merge ({merge2_rows:,} rows)", 'high')
+        data_sf_rep_firm = pd.merge(
+            data_sf_rep, 
+            firm_in, 
+            on="RIAFirmCRD", 
+            how="outer", 
+            indicator='_merge_sf_rep_firm', 
+            suffixes=('_merge1', '_firm')
+        )
+        if 'sf_rep' not in materialize:
+            data_sf_rep = None
+    
+    if 'rep_firm' in materialize:
+        vprint(f"   Building Rep+Firm merge ({merge3_rows:,} rows)", 'high')
+        data_rep_firm = pd.merge(
+            rep_in, 
+            firm_in, 
+            on="RIAFirmCRD", 
+            how="outer", 
+            indicator='_merge_rep_firm', 
+            suffixes=('_merge1', '_firm')
+        )
+    
     vprint("\n" + "="*80, 'low')
     vprint("ANALYSIS COMPLETE", 'low')
     vprint("="*80, 'low')
@@ -355,23 +520,21 @@ def create_discovery_data_pkl(debug=True):
     
     log(f"Found {len(csv_files)} CSV files to process")
     
-    # Initialize empty list to store dataframes
-    dfs = []
-    
-    # Read and append each CSV file with type inference
-    for i, file in enumerate(csv_files, 1):
-        log(f"Reading file {i}/{len(csv_files)}: {file}")
-        
+    def read_file(file):
         # Read CSV with low_memory=False to allow pandas to infer types properly
-        df = pd.read_csv(
+        return pd.read_csv(
             os.path.join('data/raw_discovery_data', file),
             low_memory=False,  # This allows pandas to scan entire columns for type inference
             na_values=['', 'NA', 'N/A', 'null', 'NULL', 'None'],  # Standardize NA values
             keep_default_na=True
         )
-        
-        # Store the dataframe
-        dfs.append(df)
+    
+    # Read the CSV files in parallel (results stay in file order)
+    with ThreadPoolExecutor() as pool:
+        dfs = list(pool.map(read_file, csv_files))
+    
+    for i, (file, df) in enumerate(zip(csv_files, dfs), 1):
+        log(f"Read file {i}/{len(csv_files)}: {file}")
         log(f"  - Shape: {df.shape}")
     
     # Before concatenating, let's check and align data types
@@ -478,4 +641,244 @@ def create_discovery_data_pkl(debug=True):
     discovery_data.to_csv(csv_backup_path, index=False, encoding='utf-8')
     log(f"CSV backup saved to {csv_backup_path}")
     
-    return discovery_data
\ No newline at end of file
+    return discovery_data
+
+## Columnar discovery dataset
+RAW_DISCOVERY_DIR = 'data/raw_discovery_data'
+DISCOVERY_DATASET_DIR = 'data/discovery_dataset'
+
+# pandas' default NA strings plus the ones create_discovery_data_pkl adds
+DISCOVERY_NA_VALUES = [
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'
+]
+
+# Arrow type for each pandas dtype kind seen in the header samples
+_KIND_TO_ARROW = {'b': pa.bool_(), 'i': pa.int64(), 'u': pa.int64(), 'f': pa.float64()}
+
+# Stable pandas dtypes for hashing, so a value hashes the same in every batch
+_HASH_TYPES = {
+    pa.int64(): pd.Int64Dtype(),
+    pa.float64(): pd.Float64Dtype(),
+    pa.bool_(): pd.BooleanDtype(),
+    pa.string(): pd.StringDtype(),
+}
+
+
+def _unify_types(types):
+    """Widest common Arrow type (same precedence as create_discovery_data_pkl)."""
+    types = set(types)
+    if len(types) == 1:
+        return types.pop()
+    if pa.string() in types:
+        return pa.string()
+    if pa.float64() in types:
+        return pa.float64()
+    if pa.int64() in types:
+        return pa.int64()
+    return pa.string()
+
+
+def infer_discovery_schema(csv_paths, sample_rows=10000, n_jobs=None):
+    """
+    Unify the schema of all CSV files from their headers and small samples.
+    
+    Parameters:
+    -----------
+    csv_paths : list of str - CSV files to ingest
+    sample_rows : int - Rows read from each file for type inference
+    n_jobs : int - Parallel sample reads (default: number of CPUs)
+    
+    Returns:
+    --------
+    pa.Schema : Column order of first appearance, widest type per column
+    """
+    def sample_types(path):
+        sample = pd.read_csv(path, nrows=sample_rows, na_values=DISCOVERY_NA_VALUES, keep_default_na=True)
+        return {col: _KIND_TO_ARROW.get(dtype.kind, pa.string()) for col, dtype in sample.dtypes.items()}
+
+    with ThreadPoolExecutor(max_workers=n_jobs) as pool:
+        samples = list(pool.map(sample_types, csv_paths))
+
+    column_types = {}
+    for types in samples:
+        for col, arrow_type in types.items():
+            column_types.setdefault(col, []).append(arrow_type)
+    return pa.schema([(col, _unify_types(types)) for col, types in column_types.items()])
+
+
+class _ColumnTypeConflict(Exception):
+    """A CSV value did not parse as the sampled type of its column."""
+
+    def __init__(self, column, message):
+        super().__init__(message)
+        self.column = column
+
+
+def _conform_batch(batch, schema):
+    """Add missing columns as nulls and cast a record batch to the unified schema."""
+    columns = []
+    for field in schema:
+        if field.name in batch.schema.names:
+            columns.append(batch.column(field.name).cast(field.type))
+        else:
+            columns.append(pa.nulls(batch.num_rows, type=field.type))
+    return pa.Table.from_arrays(columns, schema=schema)
+
+
+def _row_hashes(table):
+    """64-bit hash of every row (null-aware, dtype-stable across batches)."""
+    frame = table.to_pandas(types_mapper=_HASH_TYPES.get)
+    return pd.util.hash_pandas_object(frame, index=False).to_numpy()
+
+
+def _partition_name(path):
+    """Hive-style partition value for a source file."""
+    return re.sub(r'[^0-9A-Za-z_.-]+', '_', os.path.splitext(os.path.basename(path))[0])
+
+
+def _read_csv_batches(path, read_options, convert_options):
+    """Stream record batches, reporting type conflicts by column name."""
+    try:
+        for batch in pa_csv.open_csv(path, read_options=read_options, convert_options=convert_options):
+            yield batch
+    except pa.ArrowInvalid as e:
+        match = re.search(r"CSV column #(\d+)", str(e))
+        if not match:
+            raise
+        header = pd.read_csv(path, nrows=0).columns
+        raise _ColumnTypeConflict(header[int(match.group(1))], str(e)) from e
+
+
+def _read_discovery_file(path, schema, read_options, convert_options):
+    """Parse one CSV into the unified schema and hash its rows (runs in the read pool)."""
+    batches = [_conform_batch(batch, schema)
+               for batch in _read_csv_batches(path, read_options, convert_options)]
+    table = pa.concat_tables(batches) if batches else schema.empty_table()
+    return table, _row_hashes(table)
+
+
+def _map_in_order(pool, fn, items, window):
+    """pool.map with at most `window` files parsed ahead of the consumer."""
+    pending = deque()
+    for item in items:
+        pending.append(pool.submit(fn, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def _ingest_discovery_files(csv_paths, schema, output_dir, block_size, log, n_jobs=None):
+    """Parse CSVs in a thread pool, drop rows whose hash was already seen (in file order), write Parquet."""
+    seen = np.empty(0, dtype=np.uint64)  # sorted hashes of rows already written
+    stats = {'rows_read': 0, 'rows_written': 0}
+    convert_options = pa_csv.ConvertOptions(
+        column_types={field.name: field.type for field in schema},
+        null_values=DISCOVERY_NA_VALUES,
+        strings_can_be_null=True
+    )
+    read_options = pa_csv.ReadOptions(use_threads=True, block_size=block_size)
+    n_jobs = n_jobs or os.cpu_count() or 1
+
+    def read(path):
+        return _read_discovery_file(path, schema, read_options, convert_options)
+
+    with ThreadPoolExecutor(max_workers=n_jobs) as pool:
+        files = _map_in_order(pool, read, csv_paths, window=n_jobs)
+        for i, (path, (table, hashes)) in enumerate(zip(csv_paths, files), 1):
+            # Keep first occurrence: within the file, then against earlier files
+            unique, first = np.unique(hashes, return_index=True)
+            new = ~np.isin(unique, seen, assume_unique=True)
+            keep = np.zeros(len(hashes), dtype=bool)
+            keep[first[new]] = True
+            seen = np.union1d(seen, unique[new])
+
+            file_rows, file_written = table.num_rows, int(keep.sum())
+            if file_written:
+                partition_dir = os.path.join(output_dir, f"source_file={_partition_name(path)}")
+                os.makedirs(partition_dir, exist_ok=True)
+                pq.write_table(table.filter(pa.array(keep)),
+                               os.path.join(partition_dir, 'part-0.parquet'), compression='zstd')
+            stats['rows_read'] += file_rows
+            stats['rows_written'] += file_written
+            log(f"  [{i}/{len(csv_paths)}] {os.path.basename(path)}: {file_rows:,} rows, "
+                f"{file_rows - file_written:,} duplicates dropped")
+
+    return stats
+
+
+def create_discovery_dataset(raw_dir=RAW_DISCOVERY_DIR, output_dir=DISCOVERY_DATASET_DIR,
+                             sample_rows=10000, block_size=64 << 20, n_jobs=None, debug=True):
+    """
+    Ingest raw discovery CSVs into a partitioned, zstd-compressed Parquet dataset.
+    
+    Replaces the pickle + CSV backup of create_discovery_data_pkl:
+    1. Schema is unified up front from headers and small samples (read in parallel)
+    2. Files are parsed, cast to the schema and row-hashed in a thread pool,
+       at most n_jobs files ahead of the writer
+    3. Exact duplicate rows are dropped in file order with 64-bit row hashes
+       (np.unique within a file, np.isin against earlier files)
+    4. Each source file becomes one partition (source_file=<name>)
+    
+    If a value later in a file does not parse as the sampled type, that
+    column is widened to string and the ingestion restarts.
+    
+    Parameters:
+    -----------
+    raw_dir : str - Directory with the raw CSV files
+    output_dir : str - Dataset directory (replaced on each run)
+    sample_rows : int - Rows per file used for type inference
+    block_size : int - Bytes per streamed CSV block
+    n_jobs : int - Files parsed in parallel (default: number of CPUs)
+    debug : bool, default=True - Print progress information
+    
+    Returns:
+    --------
+    dict : files, columns, rows_read, rows_written, schema
+    """
+    def log(message, force=False):
+        """Helper function to conditionally print messages"""
+        if debug or force:
+            print(message)
+
+    csv_paths = sorted(os.path.join(raw_dir, f) for f in os.listdir(raw_dir) if f.endswith('.csv'))
+    log(f"Found {len(csv_paths)} CSV files to process")
+
+    schema = infer_discovery_schema(csv_paths, sample_rows, n_jobs)
+    log(f"Unified schema: {len(schema)} columns")
+
+    while True:
+        shutil.rmtree(output_dir, ignore_errors=True)
+        os.makedirs(output_dir, exist_ok=True)
+        try:
+            stats = _ingest_discovery_files(csv_paths, schema, output_dir, block_size, log, n_jobs)
+            break
+        except _ColumnTypeConflict as conflict:
+            log(f"  Widening column '{conflict.column}' to string: {conflict}")
+            index = schema.get_field_index(conflict.column)
+            if schema.field(index).type == pa.string():
+                raise
+            schema = schema.set(index, pa.field(conflict.column, pa.string()))
+
+    log(f"\nRows read: {stats['rows_read']:,} | written: {stats['rows_written']:,}")
+    log(f"Dataset saved to {output_dir}", force=True)
+    return {'files': len(csv_paths), 'columns': len(schema), 'schema': schema, **stats}
+
+
+def load_discovery_dataset(columns=None, dataset_dir=DISCOVERY_DATASET_DIR, memory_map=True):
+    """
+    Open the discovery Parquet dataset (memory-mapped) as a DataFrame.
+    
+    Parameters:
+    -----------
+    columns : list of str - Optional column subset (only these are read)
+    dataset_dir : str - Dataset directory written by create_discovery_dataset
+    memory_map : bool - Memory-map the Parquet files instead of buffering them
+    
+    Returns:
+    --------
+    pd.DataFrame : Discovery data plus the source_file partition column
+    """
+    table = pq.read_table(dataset_dir, columns=columns, memory_map=memory_map)
+    return table.to_pandas()
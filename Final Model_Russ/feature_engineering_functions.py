@@ -1,7 +1,9 @@
 import pandas as pd
 import numpy as np
-from typing import List, Dict, Any, Optional
-from dataclasses import dataclass
+from typing import List, Dict, Any, Optional, Tuple
+from dataclasses import dataclass, asdict
+from pathlib import Path
+import json
 import logging
 
 # Configure logging
@@ -17,21 +19,63 @@ class FeatureConfig:
     metro_area_prefix: str = "Home_MetropolitanArea_"
 
 
+# Declarative transformation spec shared by fit and transform
+TRANSFORMATIONS: Dict[str, Any] = {
+    # Boolean conversions (source, output, value that maps to True)
+    'boolean_mappings': [
+        ('DuallyRegisteredBDRIARep', 'IsDuallyRegistered', "Yes"),
+        ('OwnershipType', 'IsIndependent', "Independent"),
+    ],
+    
+    # Direct boolean conversions with Yes/No mapping
+    'yes_no_booleans': ['IsPrimaryRIAFirm', 'KnownNonAdvisor'],
+    
+    # Type conversions
+    'to_boolean': ['IsConverted'],
+    
+    # Numeric conversions with renaming
+    'numeric_renames': [
+        ('NumberClients_HNWIndividuals_merge1', 'NumberClients_HNWIndividuals'),
+        ('NumberClients_Individuals_merge1', 'NumberClients_Individuals'),
+    ],
+    
+    # Datetime conversions
+    'to_datetime': [
+        'ConvertedDate',
+        'CreatedDate',
+        'Stage_Entered_Call_Scheduled__c'
+    ]
+}
+
+
 class FeatureEngineer:
-    """Modern feature engineering pipeline for model data."""
+    """
+    Modern feature engineering pipeline for model data.
+    
+    fit() learns everything that depends on the data (top metro areas,
+    prior-firm columns, output column order and dtypes) once; transform()
+    replays it as vectorized column operations and only reads the columns
+    it needs. Persist a fitted engineer with save()/load() so new
+    Salesforce pulls are scored with the training vocabulary:
+    
+        engineer = FeatureEngineer().fit(model_data, feature_columns)
+        engineer.save("data/feature_engineer.json")
+        ...
+        X = FeatureEngineer.load("data/feature_engineer.json").transform(new_pull)
+    """
     
     def __init__(self, config: Optional[FeatureConfig] = None):
         self.config = config or FeatureConfig()
         self.feature_columns = []
+        self.metro_vocabulary: List[str] = []
+        self.prior_firm_columns: List[str] = []
+        self.plan: List[Tuple[str, str, str, Any]] = []
         
-    def clean_numeric_column(self, series: pd.Series) -> pd.Series:
-        """Remove currency and formatting characters from numeric columns."""
-        replacements = {'<': '', '$': '', ',': '', ' ': ''}
-        return series.replace(replacements, regex=True)
-    
     def to_numeric(self, series: pd.Series, dtype: type = float) -> pd.Series:
         """Convert series to numeric type with error handling."""
-        cleaned = self.clean_numeric_column(series)
+        if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+            return series.astype(dtype)
+        cleaned = series.astype('string').str.replace(r'[<$, ]', '', regex=True)
         return pd.to_numeric(cleaned, errors='coerce').astype(dtype)
     
     def to_boolean(self, series: pd.Series, true_values: List[str] = ["Yes"]) -> pd.Series:
@@ -42,159 +86,195 @@ class FeatureEngineer:
         """Convert series to timezone-naive datetime."""
         return pd.to_datetime(series, errors='coerce').dt.tz_localize(None)
     
-    def create_dummy_features(self, df: pd.DataFrame, column: str, 
-                            top_n: Optional[int] = None, 
-                            other_label: str = "Other") -> pd.DataFrame:
-        """Create dummy variables for categorical column with optional top-N filtering."""
-        if top_n:
-            top_values = df[column].value_counts().head(top_n).index
-            df[column] = df[column].apply(lambda x: x if x in top_values else other_label)
-        
-        df = pd.get_dummies(df, columns=[column], drop_first=False)
-        
-        # Drop the "Other" category if it exists
-        other_col = f"{column}_{other_label}"
-        if other_col in df.columns:
-            df = df.drop(columns=[other_col])
-            
-        return df
-    
-    def engineer_features(self, df: pd.DataFrame, feature_columns: List[str]) -> tuple[pd.DataFrame, List[str]]:
+    def fit(self, df: pd.DataFrame, feature_columns: List[str]) -> "FeatureEngineer":
         """
-        Main feature engineering pipeline.
+        Learn vocabularies, column order and dtypes from training data.
         
         Args:
             df: Input dataframe with raw features
-            feature_columns: List of feature column names
+            feature_columns: List of raw feature column names
             
         Returns:
-            Tuple of (transformed dataframe, updated feature columns list)
+            self
         """
-        # Create a copy to avoid modifying the original
-        model_data = df.copy()
         self.feature_columns = feature_columns.copy()
+        plan = {}
         
-        # Define transformations in a clean, declarative way
-        transformations = {
-            # Boolean conversions
-            'boolean_mappings': [
-                ('DuallyRegisteredBDRIARep', 'IsDuallyRegistered', lambda x: x == "Yes"),
-                ('OwnershipType', 'IsIndependent', lambda x: x == "Independent"),
-            ],
-            
-            # Direct boolean conversions with Yes/No mapping
-            'yes_no_booleans': ['IsPrimaryRIAFirm', 'KnownNonAdvisor'],
-            
-            # Type conversions
-            'to_boolean': ['IsConverted'],
-            
-            # Numeric conversions with renaming
-            'numeric_renames': [
-                ('NumberClients_HNWIndividuals_merge1', 'NumberClients_HNWIndividuals'),
-                ('NumberClients_Individuals_merge1', 'NumberClients_Individuals'),
-            ],
-            
-            # Direct numeric conversions
-            'to_numeric': [
-                'Number_InvestmentAdvisoryClients',
-                'Number_Employees', 
-                'Percent_ClientsUS'
-            ],
-            
-            # Datetime conversions
-            'to_datetime': [
-                'ConvertedDate',
-                'CreatedDate',
-                'Stage_Entered_Call_Scheduled__c'
-            ]
-        }
-        
-        # Apply boolean mappings
-        for old_col, new_col, transform_func in transformations['boolean_mappings']:
-            if old_col in model_data.columns:
-                model_data[new_col] = model_data[old_col].apply(transform_func).astype('boolean')
-                model_data = model_data.drop(columns=[old_col])
+        # Boolean mappings replace their source column
+        for old_col, new_col, true_value in TRANSFORMATIONS['boolean_mappings']:
+            if old_col in df.columns:
+                plan[new_col] = (old_col, 'equals', true_value)
                 self._update_feature_columns(old_col, new_col)
-                logger.info(f"Transformed {old_col} -> {new_col}")
-        
-        # Apply Yes/No boolean conversions
-        for col in transformations['yes_no_booleans']:
-            if col in model_data.columns:
-                model_data[col] = model_data[col].map({"Yes": True, "No": False}).fillna(False).astype('boolean')
-                logger.info(f"Converted {col} to boolean")
-        
-        # Apply direct boolean conversions
-        for col in transformations['to_boolean']:
-            if col in model_data.columns:
-                model_data[col] = model_data[col].astype('boolean')
-                logger.info(f"Converted {col} to boolean type")
-        
-        # Apply numeric conversions with renaming
-        for old_col, new_col in transformations['numeric_renames']:
-            if old_col in model_data.columns:
-                model_data[new_col] = self.to_numeric(model_data[old_col])
-                model_data = model_data.drop(columns=[old_col])
+        
+        for col in TRANSFORMATIONS['yes_no_booleans']:
+            if col in df.columns:
+                plan[col] = (col, 'yes_no', None)
+        
+        for old_col, new_col in TRANSFORMATIONS['numeric_renames']:
+            if old_col in df.columns:
+                plan[new_col] = (old_col, 'numeric', None)
                 self._update_feature_columns(old_col, new_col)
-                logger.info(f"Converted {old_col} -> {new_col} (numeric)")
-        
-        # Apply direct numeric conversions
-        for col in transformations['to_numeric']:
-            if col in model_data.columns:
-                model_data[col] = self.to_numeric(model_data[col])
-                logger.info(f"Converted {col} to numeric")
-        
-        # Apply datetime conversions
-        for col in transformations['to_datetime']:
-            if col in model_data.columns:
-                model_data[col] = self.to_datetime(model_data[col])
-                logger.info(f"Converted {col} to datetime")
-        
-        # Handle metropolitan area encoding
-        if 'Home_MetropolitanArea' in model_data.columns:
-            model_data = self.create_dummy_features(
-                model_data, 
-                'Home_MetropolitanArea',
-                top_n=self.config.top_metro_areas
-            )
+        
+        # Metro area vocabulary (top N by frequency, dummy columns in sorted order)
+        if 'Home_MetropolitanArea' in df.columns:
+            top_values = df['Home_MetropolitanArea'].value_counts().head(self.config.top_metro_areas).index
+            self.metro_vocabulary = sorted(str(value) for value in top_values)
             self._update_feature_columns('Home_MetropolitanArea')
+            for value in self.metro_vocabulary:
+                dummy_col = f"{self.config.metro_area_prefix}{value}"
+                plan[dummy_col] = ('Home_MetropolitanArea', 'one_hot', value)
+                self.feature_columns.append(dummy_col)
+            logger.info(f"Learned {len(self.metro_vocabulary)} metropolitan area categories")
+        
+        # Tenure aggregates over the prior firm columns seen at fit time
+        self.prior_firm_columns = [col for col in df.columns 
+                                   if col.startswith(self.config.prior_firm_prefix)]
+        if self.prior_firm_columns:
+            plan['AverageTenureAtPriorFirms'] = (None, 'tenure_mean', None)
+            plan['NumberOfPriorFirms'] = (None, 'tenure_count', None)
+            self.feature_columns.extend(['AverageTenureAtPriorFirms', 'NumberOfPriorFirms'])
+        
+        # Everything else is coerced to float32 (bool stays bool)
+        for col in self.feature_columns:
+            if col not in plan:
+                is_bool = col in df.columns and pd.api.types.is_bool_dtype(df[col])
+                plan[col] = (col, 'bool' if is_bool else 'numeric', None)
+        
+        self.plan = [(col, *plan[col]) for col in self.feature_columns]
+        logger.info(f"Fitted feature pipeline: {len(self.feature_columns)} output features")
+        return self
+    
+    def transform(self, df: pd.DataFrame, passthrough: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Apply the fitted pipeline.
+        
+        Args:
+            df: Input dataframe with raw features
+            passthrough: Extra columns to carry over (descriptive columns,
+                dates and target are converted as in engineer_features)
             
-            # Add new dummy columns to feature list
-            new_dummy_cols = [col for col in model_data.columns 
-                            if col.startswith(self.config.metro_area_prefix)]
-            self.feature_columns.extend(new_dummy_cols)
-            logger.info(f"Created {len(new_dummy_cols)} metropolitan area dummy variables")
+        Returns:
+            Dataframe with passthrough columns followed by the feature
+            columns in fitted order (float32 / bool)
+        """
+        if not self.plan:
+            raise ValueError("FeatureEngineer is not fitted; call fit() first")
         
-        # Engineer tenure-related features
-        model_data = self._engineer_tenure_features(model_data)
+        columns = {}
+        for col in passthrough or []:
+            if col in TRANSFORMATIONS['to_datetime']:
+                columns[col] = self.to_datetime(df[col])
+            elif col in TRANSFORMATIONS['to_boolean']:
+                columns[col] = df[col].astype('boolean')
+            else:
+                columns[col] = df[col]
+        
+        missing = sorted({source for _, source, kind, _ in self.plan
+                          if source is not None and source not in df.columns})
+        if missing:
+            logger.warning(f"Missing input columns filled as null/False: {missing}")
+        
+        tenure = self._tenure_arrays(df) if self.prior_firm_columns else None
+        metro = None
+        n_rows = len(df)
+        
+        for out_col, source, kind, arg in self.plan:
+            if source is not None and source not in df.columns:
+                columns[out_col] = (np.zeros(n_rows, dtype=bool) if kind in ('equals', 'yes_no', 'bool', 'one_hot')
+                                    else np.full(n_rows, np.nan, dtype=np.float32))
+            elif kind == 'equals':
+                columns[out_col] = (df[source] == arg).to_numpy(dtype=bool, na_value=False)
+            elif kind == 'yes_no':
+                columns[out_col] = (df[source] == "Yes").to_numpy(dtype=bool, na_value=False)
+            elif kind == 'bool':
+                columns[out_col] = df[source].fillna(False).to_numpy(dtype=bool)
+            elif kind == 'numeric':
+                columns[out_col] = self.to_numeric(df[source], np.float32).to_numpy()
+            elif kind == 'one_hot':
+                if metro is None:
+                    metro = pd.Categorical(df[source].astype('string'), categories=self.metro_vocabulary).codes
+                columns[out_col] = metro == self.metro_vocabulary.index(arg)
+            elif kind == 'tenure_mean':
+                columns[out_col] = tenure[0]
+            elif kind == 'tenure_count':
+                columns[out_col] = tenure[1]
         
         # Create target variable
-        if 'Stage_Entered_Call_Scheduled__c' in model_data.columns:
-            model_data['EverCalled'] = model_data['Stage_Entered_Call_Scheduled__c'].notna().astype(bool)
-            logger.info("Created target variable: EverCalled")
+        if passthrough is not None and 'Stage_Entered_Call_Scheduled__c' in df.columns:
+            columns['EverCalled'] = df['Stage_Entered_Call_Scheduled__c'].notna().to_numpy()
         
-        return model_data, self.feature_columns
+        return pd.DataFrame(columns, index=df.index)
     
-    def _engineer_tenure_features(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Create tenure-related engineered features."""
-        prior_firm_cols = [col for col in df.columns 
-                          if col.startswith(self.config.prior_firm_prefix)]
+    def fit_transform(self, df: pd.DataFrame, feature_columns: List[str],
+                      passthrough: Optional[List[str]] = None) -> pd.DataFrame:
+        """Fit on df and transform it."""
+        return self.fit(df, feature_columns).transform(df, passthrough)
+    
+    def engineer_features(self, df: pd.DataFrame, feature_columns: List[str]) -> tuple[pd.DataFrame, List[str]]:
+        """
+        Main feature engineering pipeline.
         
-        if prior_firm_cols:
-            # Average tenure at prior firms
-            df['AverageTenureAtPriorFirms'] = df[prior_firm_cols].mean(axis=1)
-            self.feature_columns.append('AverageTenureAtPriorFirms')
-            
-            # Number of prior firms
-            df['NumberOfPriorFirms'] = df[prior_firm_cols].count(axis=1)
-            self.feature_columns.append('NumberOfPriorFirms')
+        Fits on df and transforms it, keeping every non-feature column
+        (descriptive columns, dates, target) alongside the features.
+        
+        Args:
+            df: Input dataframe with raw features
+            feature_columns: List of feature column names
             
-            logger.info(f"Created tenure features from {len(prior_firm_cols)} prior firm columns")
+        Returns:
+            Tuple of (transformed dataframe, updated feature columns list)
+        """
+        self.fit(df, feature_columns)
+        consumed = {source for _, source, _, _ in self.plan} | set(self.feature_columns)
+        passthrough = [col for col in df.columns if col not in consumed]
+        model_data = self.transform(df, passthrough)
         
-        return df
+        logger.info(f"Engineered {len(self.feature_columns)} features "
+                    f"({len(self.metro_vocabulary)} metropolitan area dummies)")
+        return model_data, self.feature_columns
+    
+    def save(self, path: str) -> None:
+        """Persist the fitted pipeline as JSON."""
+        state = {
+            'config': asdict(self.config),
+            'feature_columns': self.feature_columns,
+            'metro_vocabulary': self.metro_vocabulary,
+            'prior_firm_columns': self.prior_firm_columns,
+            'plan': [list(step) for step in self.plan],
+        }
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(state, f, indent=2)
+        logger.info(f"Saved feature pipeline to {path}")
+    
+    @classmethod
+    def load(cls, path: str) -> "FeatureEngineer":
+        """Load a pipeline saved with save()."""
+        with open(path, 'r') as f:
+            state = json.load(f)
+        engineer = cls(FeatureConfig(**state['config']))
+        engineer.feature_columns = state['feature_columns']
+        engineer.metro_vocabulary = state['metro_vocabulary']
+        engineer.prior_firm_columns = state['prior_firm_columns']
+        engineer.plan = [tuple(step) for step in state['plan']]
+        return engineer
+    
+    def _tenure_arrays(self, df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+        """Average tenure and number of prior firms (float32)."""
+        values = np.column_stack([
+            self.to_numeric(df[col], np.float32).to_numpy() if col in df.columns
+            else np.full(len(df), np.nan, dtype=np.float32)
+            for col in self.prior_firm_columns
+        ])
+        present = ~np.isnan(values)
+        count = present.sum(axis=1).astype(np.float32)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(present, values, 0).sum(axis=1) / count
+        return mean.astype(np.float32), count
     
     def _update_feature_columns(self, old_col: str, new_col: Optional[str] = None):
         """Update feature columns list when renaming or removing columns."""
         if old_col in self.feature_columns:
             self.feature_columns.remove(old_col)
             if new_col:
-                self.feature_columns.append(new_col)
\ No newline at end of file
+                self.feature_columns.append(new_col)
@@ -2,6 +2,16 @@ import numpy as np
 import plotly.graph_objects as go
 from sklearn.metrics import precision_recall_curve
 
+def count_at_or_above(y_probs, thresholds):
+    """
+    Number of predictions >= each threshold, from one sort.
+
+    Replaces [(y_probs >= t).sum() for t in thresholds], which is O(n*T).
+    """
+    sorted_probs = np.sort(np.asarray(y_probs))
+    return len(sorted_probs) - np.searchsorted(sorted_probs, thresholds, side='left')
+
+
 class ModelEvaluationVisualizer:
     """
     A class for creating interactive visualizations of model evaluation metrics.
@@ -52,7 +62,7 @@ class ModelEvaluationVisualizer:
         # Calculate hover text for positive predictions if requested
         hover_text = None
         if show_positive_predictions:
-            positive_predictions = [(y_probs >= t).sum() for t in thresholds]
+            positive_predictions = count_at_or_above(y_probs, thresholds)
             hover_text = [f"Positive predictions: {pred}" for pred in positive_predictions]
         
         # Add traces for precision and recall
@@ -121,8 +131,8 @@ class ModelEvaluationVisualizer:
         precision, _, thresholds = precision_recall_curve(self.y, y_probs_test)
         
         # Calculate positive predictions and estimated true positives
-        positive_predictions = [(y_probs_new >= t).sum() for t in thresholds]
-        estimated_true_positives = [p * prec for p, prec in zip(positive_predictions, precision)]
+        positive_predictions = count_at_or_above(y_probs_new, thresholds)
+        estimated_true_positives = positive_predictions * precision[:-1]
         
         # Create plotly figure
         fig = go.Figure()
@@ -0,0 +1,381 @@
+import os
+import re
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SF_API_VERSION = "59.0"
+SF_CACHE_DIR = "data/sf_cache"
+SF_WATERMARK_FIELD = "SystemModstamp"
+
+
+class SalesforceConnection:
+    """
+    Thin REST client over an authenticated Salesforce session.
+
+    One requests.Session with a pooled adapter is shared by every call,
+    so concurrent slice pulls reuse connections instead of logging in or
+    opening sockets per query.
+    """
+
+    def __init__(self, instance_url: str, session_id: str,
+                 api_version: str = SF_API_VERSION, pool_size: int = 8):
+        if not instance_url.startswith("http"):
+            instance_url = f"https://{instance_url}"
+        self.instance_url = instance_url.rstrip("/")
+        self.api_version = api_version
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=3)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "Authorization": f"Bearer {session_id}",
+            "Accept": "application/json",
+        })
+
+    def get(self, path: str, params: Optional[Dict] = None) -> Dict:
+        """GET an API path (or a nextRecordsUrl) and return the JSON body."""
+        if not path.startswith("/services/"):
+            path = f"/services/data/v{self.api_version}/{path.lstrip('/')}"
+        response = self.session.get(f"{self.instance_url}{path}", params=params, timeout=120)
+        response.raise_for_status()
+        return response.json()
+
+
+def connect_salesforce(pool_size: int = 8) -> SalesforceConnection:
+    """Log in with the .env credentials and return a pooled connection."""
+    from simple_salesforce import SalesforceLogin
+
+    session_id, instance = SalesforceLogin(
+        username=os.getenv('USERNAME'),
+        password=os.getenv('PASSWORD'),
+        security_token=os.getenv('SECURITY_TOKEN'),
+        sf_version=SF_API_VERSION
+    )
+    return SalesforceConnection(os.getenv('INSTANCE_URL') or instance, session_id, pool_size=pool_size)
+
+
+_connection = None
+_connection_lock = threading.Lock()
+
+
+def get_sf_connection() -> SalesforceConnection:
+    """Module-wide connection, created on first use (no login at import)."""
+    global _connection
+    with _connection_lock:
+        if _connection is None:
+            _connection = connect_salesforce()
+        return _connection
+
+
+def flatten_records(records: List[Dict], prefix: str = "") -> Dict[str, list]:
+    """
+    Flatten SOQL records column-wise.
+
+    'attributes' entries are dropped and relationship fields become dotted
+    columns (Owner -> Owner.Name). Each field is gathered as one list, so
+    nested relationships are flattened per column rather than per record.
+
+    Args:
+        records: Records from a query page (None for a null relationship)
+        prefix: Column prefix for nested relationships
+
+    Returns:
+        Dict of column name -> list of values
+    """
+    fields = []
+    for record in records:
+        if record:
+            fields.extend(key for key in record if key != 'attributes' and key not in fields)
+
+    columns = {}
+    for field in fields:
+        values = [record.get(field) if record else None for record in records]
+        if any(isinstance(value, dict) for value in values):
+            nested = [value if isinstance(value, dict) else None for value in values]
+            if any('records' in value for value in nested if value):
+                # Child subquery: keep the child records list as is
+                columns[f"{prefix}{field}"] = [value['records'] if value else None for value in nested]
+            else:
+                columns.update(flatten_records(nested, prefix=f"{prefix}{field}."))
+        else:
+            columns[f"{prefix}{field}"] = values
+    return columns
+
+
+def iter_query_pages(query: str, connection: Optional[SalesforceConnection] = None,
+                     include_deleted: bool = False) -> Iterator[pd.DataFrame]:
+    """
+    Run a SOQL query and yield one flattened DataFrame per result page.
+
+    Only one page (up to 2,000 records) is held in memory at a time.
+
+    Args:
+        query: The SOQL query string
+        connection: Salesforce connection (defaults to the lazy module connection)
+        include_deleted: Use queryAll (includes deleted/archived records)
+
+    Yields:
+        DataFrame per page
+    """
+    connection = connection or get_sf_connection()
+    page = connection.get("queryAll" if include_deleted else "query", params={"q": query})
+    while True:
+        if page['records']:
+            yield pd.DataFrame(flatten_records(page['records']))
+        if page.get('done', True) or not page.get('nextRecordsUrl'):
+            break
+        page = connection.get(page['nextRecordsUrl'])
+
+
+def query_salesforce_pages(query: str, connection: Optional[SalesforceConnection] = None) -> pd.DataFrame:
+    """Run a SOQL query page by page and concatenate the flattened pages."""
+    pages = list(iter_query_pages(query, connection))
+    return pd.concat(pages, ignore_index=True) if pages else pd.DataFrame()
+
+
+def _utc(value) -> pd.Timestamp:
+    """Timestamp in UTC (naive values are taken as UTC)."""
+    ts = pd.Timestamp(value)
+    return ts.tz_localize('UTC') if ts.tzinfo is None else ts.tz_convert('UTC')
+
+
+def soql_datetime(value) -> str:
+    """Format a timestamp as a SOQL datetime literal (UTC)."""
+    ts = _utc(value)
+    return ts.strftime('%Y-%m-%dT%H:%M:%S.') + f"{ts.microsecond // 1000:03d}Z"
+
+
+def date_slices(start, end, freq: Optional[str] = 'MS') -> List[tuple]:
+    """Split [start, end) into consecutive (lower, upper) slices on a calendar frequency (None: one slice)."""
+    start, end = _utc(start), _utc(end)
+    inner = [] if freq is None else [edge for edge in pd.date_range(start, end, freq=freq) if start < edge < end]
+    edges = [start] + inner + [end]
+    return list(zip(edges[:-1], edges[1:]))
+
+
+def _slice_query(fields: List[str], sobject: str, date_field: str, lower, upper,
+                 where: Optional[str] = None) -> str:
+    """SOQL for one half-open date slice, ordered by the slice field."""
+    conditions = [f"{date_field} >= {soql_datetime(lower)}", f"{date_field} < {soql_datetime(upper)}"]
+    if where:
+        conditions.append(f"({where})")
+    return (f"SELECT {', '.join(fields)} FROM {sobject} "
+            f"WHERE {' AND '.join(conditions)} ORDER BY {date_field}")
+
+
+def extract_date_slices(fields: List[str], sobject: str, start, end,
+                        date_field: str = 'CreatedDate', freq: Optional[str] = 'MS',
+                        where: Optional[str] = None, max_workers: int = 4,
+                        connection: Optional[SalesforceConnection] = None) -> Iterator[pd.DataFrame]:
+    """
+    Pull date-partitioned slices of an object concurrently.
+
+    Each slice is its own SOQL query paged on a worker thread; slices are
+    yielded in date order as they finish.
+
+    Args:
+        fields: SOQL field list (relationship fields allowed, e.g. Owner.Name)
+        sobject: Salesforce object name (e.g. Lead)
+        start, end: Date range [start, end)
+        date_field: Field to partition on
+        freq: Slice frequency (pandas offset alias, default month start; None for one slice)
+        where: Extra SOQL condition
+        max_workers: Concurrent slice queries
+        connection: Salesforce connection (defaults to the lazy module connection)
+
+    Yields:
+        One DataFrame per slice (empty slices are skipped)
+    """
+    connection = connection or get_sf_connection()
+    queries = [_slice_query(fields, sobject, date_field, lower, upper, where)
+               for lower, upper in date_slices(start, end, freq)]
+
+    def pull(query):
+        pages = list(iter_query_pages(query, connection))
+        return pd.concat(pages, ignore_index=True) if pages else None
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for frame in executor.map(pull, queries):
+            if frame is not None:
+                yield frame
+
+
+class SalesforceParquetCache:
+    """
+    Local Parquet cache of one Salesforce object, refreshed incrementally.
+
+    The first refresh pulls [start, now) in concurrent monthly slices of
+    SystemModstamp (start is required: there is no watermark yet); later
+    refreshes only pull records modified since the stored watermark and
+    append them as a new part file. Records deleted since the watermark
+    (queryAll, IsDeleted = TRUE) are appended as tombstones. load() keeps
+    the latest version of each Id and drops Ids whose latest version is a
+    tombstone, so an undeleted record comes back with its newer version.
+
+    Layout:
+        <cache_dir>/<sobject>/part-<timestamp>-<n>.parquet
+        <cache_dir>/<sobject>/deleted-<timestamp>.parquet
+        <cache_dir>/<sobject>/_watermark.json
+    """
+
+    def __init__(self, sobject: str, fields: List[str], cache_dir: str = SF_CACHE_DIR,
+                 where: Optional[str] = None,
+                 connection: Optional[SalesforceConnection] = None):
+        self.sobject = sobject
+        self.fields = list(dict.fromkeys(['Id', SF_WATERMARK_FIELD] + list(fields)))
+        self.where = where
+        self.directory = Path(cache_dir) / sobject
+        self.connection = connection
+
+    @property
+    def watermark_path(self) -> Path:
+        return self.directory / "_watermark.json"
+
+    def watermark(self) -> Optional[pd.Timestamp]:
+        """Latest SystemModstamp stored in the cache (None if empty)."""
+        if not self.watermark_path.exists():
+            return None
+        with open(self.watermark_path, 'r') as f:
+            return pd.Timestamp(json.load(f)[SF_WATERMARK_FIELD])
+
+    def refresh(self, start=None, end=None, max_workers: int = 4, debug: bool = False) -> int:
+        """
+        Append records modified since the watermark and tombstones for records deleted since it.
+
+        Args:
+            start: Lower bound for the first (full) pull, e.g. '2015-01-01'.
+                Required when the cache is empty; ignored afterwards.
+            end: Upper bound (default: now)
+            max_workers: Concurrent slice queries for the first pull
+            debug: Print progress
+
+        Returns:
+            Number of records written (tombstones not included)
+        """
+        connection = self.connection or get_sf_connection()
+        end = pd.Timestamp(end) if end is not None else pd.Timestamp(datetime.now(timezone.utc))
+        watermark = self.watermark()
+
+        if watermark is None:
+            if start is None:
+                raise ValueError(f"{self.sobject} cache is empty: pass start= for the first full pull")
+            frames = extract_date_slices(self.fields, self.sobject, start, end,
+                                         date_field=SF_WATERMARK_FIELD, where=self.where,
+                                         max_workers=max_workers, connection=connection)
+        else:
+            # >= so records sharing the watermark timestamp are not missed; load() dedups
+            frames = extract_date_slices(self.fields, self.sobject, watermark, end,
+                                         date_field=SF_WATERMARK_FIELD, freq=None,
+                                         where=self.where, max_workers=1, connection=connection)
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        run_id = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%f')
+        n_written = 0
+        latest = watermark
+        for i, frame in enumerate(frames):
+            pq.write_table(pa.Table.from_pandas(frame, preserve_index=False),
+                           self.directory / f"part-{run_id}-{i:04d}.parquet", compression='zstd')
+            n_written += len(frame)
+            frame_max = pd.to_datetime(frame[SF_WATERMARK_FIELD], utc=True).max()
+            latest = frame_max if latest is None else max(latest, frame_max)
+            if debug:
+                print(f"  {self.sobject}: wrote {len(frame):,} records (slice {i + 1})")
+
+        if watermark is not None:
+            deleted_max = self._write_deleted(watermark, end, run_id, connection, debug)
+            if deleted_max is not None:
+                latest = max(latest, deleted_max)
+
+        if latest is not None:
+            with open(self.watermark_path, 'w') as f:
+                json.dump({SF_WATERMARK_FIELD: latest.isoformat()}, f)
+
+        if debug:
+            print(f"  {self.sobject}: {n_written:,} records written, watermark {latest}")
+        return n_written
+
+    def _write_deleted(self, watermark, end, run_id: str, connection: SalesforceConnection,
+                       debug: bool = False) -> Optional[pd.Timestamp]:
+        """Write tombstones (Id, SystemModstamp) for records deleted in [watermark, end); return their max stamp."""
+        query = (f"SELECT Id, {SF_WATERMARK_FIELD} FROM {self.sobject} "
+                 f"WHERE IsDeleted = TRUE AND {SF_WATERMARK_FIELD} >= {soql_datetime(watermark)} "
+                 f"AND {SF_WATERMARK_FIELD} < {soql_datetime(end)}")
+        pages = list(iter_query_pages(query, connection, include_deleted=True))
+        if not pages:
+            return None
+        deleted = pd.concat(pages, ignore_index=True)[['Id', SF_WATERMARK_FIELD]]
+        pq.write_table(pa.Table.from_pandas(deleted, preserve_index=False),
+                       self.directory / f"deleted-{run_id}.parquet", compression='zstd')
+        if debug:
+            print(f"  {self.sobject}: {len(deleted):,} deleted records")
+        return pd.to_datetime(deleted[SF_WATERMARK_FIELD], utc=True).max()
+
+    def load(self, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """Load the cache, keeping the latest version of each record and dropping deleted ones."""
+        parts = sorted(self.directory.glob("part-*.parquet"))
+        if not parts:
+            return pd.DataFrame(columns=columns or self.fields)
+
+        read_columns = None if columns is None else list(dict.fromkeys(['Id', SF_WATERMARK_FIELD] + columns))
+        tables = [pq.read_table(part, columns=read_columns) for part in parts]
+        df = pa.concat_tables(tables, promote_options='permissive').to_pandas()
+        df['_deleted'] = False
+
+        # Tombstones go last so a deletion wins over a version with the same stamp
+        tombstones = [pq.read_table(part).to_pandas() for part in sorted(self.directory.glob("deleted-*.parquet"))]
+        if tombstones:
+            deleted = pd.concat(tombstones, ignore_index=True)
+            deleted['_deleted'] = True
+            df = pd.concat([df, deleted], ignore_index=True)
+
+        df[SF_WATERMARK_FIELD] = pd.to_datetime(df[SF_WATERMARK_FIELD], utc=True)
+        df = (df.sort_values(SF_WATERMARK_FIELD, kind='stable')
+                .drop_duplicates(subset='Id', keep='last'))
+        df = df[~df.pop('_deleted')].reset_index(drop=True)
+        return df if columns is None else df[columns]
+
+
+def parse_soql_fields(query: str) -> tuple:
+    """Split a simple 'SELECT ... FROM obj [WHERE ...]' query into (fields, sobject, where)."""
+    match = re.match(r"\s*SELECT\s+(.*?)\s+FROM\s+(\w+)(?:\s+WHERE\s+(.*?))?\s*$", query,
+                     flags=re.IGNORECASE | re.DOTALL)
+    if not match:
+        raise ValueError("Only simple SELECT ... FROM ... [WHERE ...] queries can be cached")
+    fields = [field.strip() for field in match.group(1).split(',') if field.strip()]
+    return fields, match.group(2), match.group(3)
+
+
+def cached_query(query: str, cache_dir: str = SF_CACHE_DIR, refresh: bool = True,
+                 debug: bool = False, **refresh_kwargs) -> pd.DataFrame:
+    """
+    Serve a simple SOQL query from the local Parquet cache.
+
+    Args:
+        query: 'SELECT ... FROM obj [WHERE ...]' (no ORDER BY / LIMIT)
+        cache_dir: Cache root
+        refresh: Pull records modified (and deleted) since the watermark first
+        debug: Print progress
+        **refresh_kwargs: Passed to SalesforceParquetCache.refresh
+            (start= is required on the first call for an object)
+
+    Returns:
+        Latest version of every cached record, columns in query order
+    """
+    fields, sobject, where = parse_soql_fields(query)
+    cache = SalesforceParquetCache(sobject, fields, cache_dir=cache_dir, where=where)
+    if refresh:
+        cache.refresh(debug=debug, **refresh_kwargs)
+    return cache.load(columns=fields)
@@ -0,0 +1,206 @@
+"""
+Tests for the Salesforce extraction layer against a local mock REST endpoint.
+"""
+
+import json
+import re
+import sys
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs
+
+import pandas as pd
+import pytest
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from salesforce_functions import (
+    SalesforceConnection,
+    SalesforceParquetCache,
+    cached_query,
+    date_slices,
+    extract_date_slices,
+    flatten_records,
+    iter_query_pages,
+)
+
+PAGE_SIZE = 3
+CONDITION = re.compile(r"(\w+)\s*(>=|<|>)\s*(\S+Z)")
+
+
+class MockSalesforce:
+    """In-memory Lead table served like the Salesforce query/queryAll REST API."""
+
+    def __init__(self):
+        self.leads = {}
+        self.cursors = {}
+        self.queries = []
+
+    def upsert(self, lead_id, modstamp, name, owner=None):
+        self.leads[lead_id] = {
+            'Id': lead_id, 'SystemModstamp': modstamp, 'CreatedDate': modstamp,
+            'Name': name, 'Owner': None if owner is None else {'Name': owner}, 'IsDeleted': False,
+        }
+
+    def delete(self, lead_id, modstamp):
+        self.leads[lead_id].update(SystemModstamp=modstamp, IsDeleted=True)
+
+    def _record(self, lead, fields):
+        record = {'attributes': {'type': 'Lead', 'url': f"/services/data/v59.0/sobjects/Lead/{lead['Id']}"}}
+        for field in fields:
+            if '.' in field:
+                parent, child = field.split('.')
+                if lead[parent] is None:
+                    record[parent] = None
+                else:
+                    record.setdefault(parent, {'attributes': {'type': 'User'}})[child] = lead[parent][child]
+            else:
+                record[field] = lead[field]
+        return record
+
+    def query(self, soql, include_deleted=False):
+        self.queries.append(soql)
+        fields = [f.strip() for f in re.search(r"SELECT (.*?) FROM", soql).group(1).split(',')]
+        # query never returns deleted records; queryAll returns both unless IsDeleted is filtered
+        rows = [row for row in self.leads.values() if include_deleted or not row['IsDeleted']]
+        if re.search(r"IsDeleted\s*=\s*TRUE", soql, re.IGNORECASE):
+            rows = [row for row in rows if row['IsDeleted']]
+        for field, op, value in CONDITION.findall(soql):
+            bound = pd.Timestamp(value)
+            compare = {'>=': lambda a: a >= bound, '>': lambda a: a > bound, '<': lambda a: a < bound}[op]
+            rows = [row for row in rows if compare(pd.Timestamp(row[field]))]
+        rows.sort(key=lambda row: row['SystemModstamp'])
+        return self._page([self._record(row, fields) for row in rows])
+
+    def more(self, cursor):
+        return self._page(self.cursors.pop(cursor))
+
+    def _page(self, records):
+        page = {'totalSize': len(records), 'done': len(records) <= PAGE_SIZE, 'records': records[:PAGE_SIZE]}
+        if not page['done']:
+            cursor = uuid.uuid4().hex
+            self.cursors[cursor] = records[PAGE_SIZE:]
+            page['nextRecordsUrl'] = f"/services/data/v59.0/query/{cursor}"
+        return page
+
+
+@pytest.fixture
+def mock_sf():
+    state = MockSalesforce()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            if self.headers.get('Authorization') != 'Bearer test-session':
+                self.send_response(401)
+                self.end_headers()
+                return
+            if url.path.endswith(('/query', '/queryAll')):
+                body = state.query(parse_qs(url.query)['q'][0], include_deleted=url.path.endswith('/queryAll'))
+            else:
+                body = state.more(url.path.rsplit('/', 1)[-1])
+            payload = json.dumps(body).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    state.connection = SalesforceConnection(f"http://127.0.0.1:{server.server_port}", 'test-session')
+    yield state
+    server.shutdown()
+
+
+def _seed(state, n=10):
+    for i in range(n):
+        state.upsert(f"00Q{i:03d}", f"2024-{1 + i % 4:02d}-15T10:00:00.000Z", f"Lead {i}",
+                     owner=None if i == 4 else f"Owner {i % 2}")
+
+
+class TestFlatten:
+    """Column-wise record flattening."""
+
+    def test_relationships_become_dotted_columns(self):
+        records = [
+            {'attributes': {'type': 'Lead'}, 'Id': 'a', 'Owner': {'attributes': {}, 'Name': 'X'}},
+            {'attributes': {'type': 'Lead'}, 'Id': 'b', 'Owner': None},
+        ]
+        assert flatten_records(records) == {'Id': ['a', 'b'], 'Owner.Name': ['X', None]}
+
+
+class TestExtraction:
+    """Paging and concurrent date slices."""
+
+    def test_pages_are_streamed_and_flattened(self, mock_sf):
+        _seed(mock_sf)
+        pages = list(iter_query_pages("SELECT Id, Name, Owner.Name FROM Lead", mock_sf.connection))
+
+        assert [len(page) for page in pages] == [3, 3, 3, 1]
+        df = pd.concat(pages, ignore_index=True)
+        assert list(df.columns) == ['Id', 'Name', 'Owner.Name']
+        assert df['Owner.Name'].isna().sum() == 1
+
+    def test_date_slices_cover_range_once(self, mock_sf):
+        _seed(mock_sf)
+        frames = list(extract_date_slices(['Id', 'Name'], 'Lead', '2024-01-01', '2024-06-01',
+                                          freq='MS', max_workers=4, connection=mock_sf.connection))
+
+        assert len(mock_sf.queries) == len(date_slices('2024-01-01', '2024-06-01')) == 5
+        assert sorted(pd.concat(frames)['Id']) == sorted(mock_sf.leads)
+
+
+class TestParquetCache:
+    """Incremental refresh keyed by SystemModstamp."""
+
+    def test_refresh_appends_only_changes(self, mock_sf, tmp_path):
+        _seed(mock_sf)
+        cache = SalesforceParquetCache('Lead', ['Name', 'Owner.Name'], cache_dir=tmp_path,
+                                       connection=mock_sf.connection)
+
+        assert cache.refresh(start='2024-01-01', end='2024-06-01') == 10
+        assert cache.watermark() == pd.Timestamp('2024-04-15T10:00:00Z')
+
+        mock_sf.upsert('00Q001', '2024-05-02T00:00:00.000Z', 'Lead 1 (renamed)', owner='Owner 1')
+        mock_sf.upsert('00Q100', '2024-05-03T00:00:00.000Z', 'New lead', owner='Owner 0')
+        written = cache.refresh(end='2024-06-01')
+
+        # Records at the old watermark are re-read (>=) plus the two changes
+        assert written == 2 + sum(lead['SystemModstamp'].startswith('2024-04-15') for lead in mock_sf.leads.values())
+
+        df = cache.load()
+        assert len(df) == 11
+        assert df.set_index('Id').loc['00Q001', 'Name'] == 'Lead 1 (renamed)'
+        assert cache.watermark() == pd.Timestamp('2024-05-03T00:00:00Z')
+
+    def test_deleted_records_are_dropped_from_load(self, mock_sf, tmp_path):
+        _seed(mock_sf)
+        cache = SalesforceParquetCache('Lead', ['Name'], cache_dir=tmp_path, connection=mock_sf.connection)
+        cache.refresh(start='2024-01-01', end='2024-06-01')
+
+        mock_sf.delete('00Q002', '2024-05-04T00:00:00.000Z')
+        cache.refresh(end='2024-06-01')
+
+        df = cache.load()
+        assert '00Q002' not in set(df['Id'])
+        assert len(df) == 9
+        assert any('IsDeleted = TRUE' in q for q in mock_sf.queries)
+        assert cache.watermark() == pd.Timestamp('2024-05-04T00:00:00Z')
+
+    def test_cached_query_returns_query_columns(self, mock_sf, tmp_path, monkeypatch):
+        _seed(mock_sf)
+        monkeypatch.setattr('salesforce_functions.get_sf_connection', lambda: mock_sf.connection)
+
+        df = cached_query("SELECT Name, Owner.Name FROM Lead", cache_dir=tmp_path,
+                          start='2024-01-01', end='2024-06-01')
+
+        assert list(df.columns) == ['Name', 'Owner.Name']
+        assert len(df) == 10
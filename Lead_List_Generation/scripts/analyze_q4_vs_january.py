@@ -14,6 +14,9 @@ from google.cloud import bigquery
 from datetime import datetime
 import sys
 
+from conversion_cube import (ConversionCube, CUBE_DIR, PROVIDED_LIST_SOURCES_BROAD,
+                             V4_BUCKETS, update_cube)
+
 # ============================================================================
 # PATH CONFIGURATION
 # ============================================================================
@@ -38,50 +41,21 @@ Q4_START = "2024-10-01"
 Q4_END = "2025-01-01"
 JANUARY_2026_TABLE = "january_2026_lead_list_v4"
 
-def get_q4_tier_distribution(client):
-    """TASK 1: Get Q4 2025 Lead List Composition by Tier."""
+def get_q4_tier_distribution(cube):
+    """TASK 1: Get Q4 2025 Lead List Composition by Tier (from the conversion cube)."""
     print("\n" + "=" * 70)
     print("TASK 1: Q4 2025 Lead List Composition")
     print("=" * 70)
     
-    # Note: Lead_Score_Tier__c may not exist, so we'll get contacted leads and their conversion status
-    query = f"""
-    WITH q4_contacted AS (
-        SELECT DISTINCT
-            l.Id as lead_id,
-            SAFE_CAST(REGEXP_REPLACE(CAST(l.FA_CRD__c AS STRING), r'[^0-9]', '') AS INT64) as crd,
-            l.CreatedDate,
-            l.Status,
-            l.Company as firm_name,
-            l.stage_entered_contacting__c,
-            CASE 
-                WHEN l.Status IN ('MQL', 'Qualified', 'Converted') 
-                OR l.Stage_Entered_Call_Scheduled__c IS NOT NULL
-                THEN 1 
-                ELSE 0 
-            END as converted
-        FROM `{PROJECT_ID}.{DATASET_SALESFORCE}.Lead` l
-        WHERE l.stage_entered_contacting__c >= '{Q4_START}' 
-          AND l.stage_entered_contacting__c < '{Q4_END}'
-          AND l.FA_CRD__c IS NOT NULL
-          AND l.IsDeleted = false
-          -- CRITICAL: Filter to Provided Lead List only (same as training data)
-          AND (
-              l.LeadSource LIKE '%Provided Lead List%' 
-              OR l.LeadSource LIKE '%Provided Lead%'
-              OR l.LeadSource LIKE '%Lead List%'
-          )
-    )
-    SELECT 
-        'Q4_CONTACTED_PROVIDED_LIST' as category,
-        COUNT(*) as leads,
-        SUM(converted) as conversions,
-        ROUND(SUM(converted) * 100.0 / COUNT(*), 2) as conversion_rate
-    FROM q4_contacted
-    """
-    
-    print("[INFO] Querying Q4 2025 tier distribution...")
-    df = client.query(query).to_dataframe()
+    # Contacted Q4 leads - CRITICAL: Provided Lead List only (same as training data)
+    q4 = cube.slice(start=Q4_START, end=Q4_END, lead_source=PROVIDED_LIST_SOURCES_BROAD)
+    totals = q4.rollup(measure='converted')
+    df = pd.DataFrame({
+        'category': ['Q4_CONTACTED_PROVIDED_LIST'],
+        'leads': totals['leads'].to_numpy(),
+        'conversions': totals['conversions'].to_numpy(),
+        'conversion_rate': (totals['conversion_rate'] * 100).round(2).fillna(0).to_numpy(),
+    })
     
     total_leads = df['leads'].sum()
     total_conversions = df['conversions'].sum()
@@ -91,77 +65,37 @@ def get_q4_tier_distribution(client):
     print("-" * 70)
     print(f"{'Category':<25} {'Leads':>10} {'Conversions':>12} {'Rate':>10}")
     print("-" * 70)
-    for _, row in df.iterrows():
-        print(f"{row['category']:<25} {row['leads']:>10,} {row['conversions']:>12,} {row['conversion_rate']:>9.2f}%")
+    for row in df.itertuples(index=False):
+        print(f"{row.category:<25} {row.leads:>10,} {row.conversions:>12,} {row.conversion_rate:>9.2f}%")
     print("-" * 70)
     
     return df, total_leads, total_conversions, overall_rate
 
 
-def get_q4_v4_scores(client):
-    """TASK 2: Score Q4 2025 Leads with V4 Model."""
+def get_q4_v4_scores(cube):
+    """TASK 2: Q4 2025 Leads by the V4 score they had when contacted (from the conversion cube)."""
     print("\n" + "=" * 70)
     print("TASK 2: Q4 2025 Leads Scored with V4 Model")
     print("=" * 70)
     
-    query = f"""
-    WITH q4_leads AS (
-        SELECT DISTINCT
-            SAFE_CAST(REGEXP_REPLACE(CAST(l.FA_CRD__c AS STRING), r'[^0-9]', '') AS INT64) as crd,
-            l.Status,
-            CASE 
-                WHEN l.Status IN ('MQL', 'Qualified', 'Converted') 
-                OR l.Stage_Entered_Call_Scheduled__c IS NOT NULL
-                THEN 1 
-                ELSE 0 
-            END as converted
-        FROM `{PROJECT_ID}.{DATASET_SALESFORCE}.Lead` l
-        WHERE l.stage_entered_contacting__c >= '{Q4_START}' 
-          AND l.stage_entered_contacting__c < '{Q4_END}'
-          AND l.FA_CRD__c IS NOT NULL
-          AND l.IsDeleted = false
-          -- CRITICAL: Filter to Provided Lead List only (same as training data)
-          AND (
-              l.LeadSource LIKE '%Provided Lead List%' 
-              OR l.LeadSource LIKE '%Provided Lead%'
-              OR l.LeadSource LIKE '%Lead List%'
-          )
-    )
-    SELECT 
-        CASE 
-            WHEN v4.v4_percentile >= 80 THEN 'V4 Top 20% (>=80%)'
-            WHEN v4.v4_percentile >= 50 THEN 'V4 50-80%'
-            WHEN v4.v4_percentile >= 20 THEN 'V4 20-50%'
-            WHEN v4.v4_percentile IS NOT NULL THEN 'V4 Bottom 20% (<20%)'
-            ELSE 'No V4 Score'
-        END as v4_bucket,
-        COUNT(*) as leads,
-        SUM(q4.converted) as conversions,
-        ROUND(SUM(q4.converted) * 100.0 / COUNT(*), 2) as conversion_rate,
-        ROUND(AVG(v4.v4_score), 4) as avg_v4_score,
-        ROUND(AVG(v4.v4_percentile), 1) as avg_v4_percentile
-    FROM q4_leads q4
-    LEFT JOIN `{PROJECT_ID}.{DATASET_ML}.v4_prospect_scores` v4 ON q4.crd = v4.crd
-    GROUP BY 1
-    ORDER BY 
-        CASE 
-            WHEN v4_bucket = 'V4 Top 20% (>=80%)' THEN 1
-            WHEN v4_bucket = 'V4 50-80%' THEN 2
-            WHEN v4_bucket = 'V4 20-50%' THEN 3
-            WHEN v4_bucket = 'V4 Bottom 20% (<20%)' THEN 4
-            ELSE 5
-        END
-    """
-    
-    print("[INFO] Querying Q4 2025 leads with V4 scores...")
-    df = client.query(query).to_dataframe()
+    q4 = cube.slice(start=Q4_START, end=Q4_END, lead_source=PROVIDED_LIST_SOURCES_BROAD)
+    buckets = q4.rollup('v4_bucket', measure='converted')
+    buckets = buckets.reindex([b for b in V4_BUCKETS if b in buckets.index])
+    df = pd.DataFrame({
+        'v4_bucket': buckets.index,
+        'leads': buckets['leads'].to_numpy(),
+        'conversions': buckets['conversions'].to_numpy(),
+        'conversion_rate': (buckets['conversion_rate'] * 100).round(2).to_numpy(),
+        'avg_v4_score': buckets['avg_v4_score'].round(4).to_numpy(),
+        'avg_v4_percentile': buckets['avg_v4_percentile'].round(1).to_numpy(),
+    })
     
     print(f"\nQ4 2025 Leads by V4 Bucket:")
     print("-" * 70)
     print(f"{'V4 Bucket':<25} {'Leads':>10} {'Conversions':>12} {'Rate':>10} {'Avg Score':>12} {'Avg %ile':>12}")
     print("-" * 70)
-    for _, row in df.iterrows():
-        print(f"{row['v4_bucket']:<25} {row['leads']:>10,} {row['conversions']:>12,} {row['conversion_rate']:>9.2f}% {row['avg_v4_score']:>11.4f} {row['avg_v4_percentile']:>11.1f}")
+    for row in df.itertuples(index=False):
+        print(f"{row.v4_bucket:<25} {row.leads:>10,} {row.conversions:>12,} {row.conversion_rate:>9.2f}% {row.avg_v4_score:>11.4f} {row.avg_v4_percentile:>11.1f}")
     
     # Calculate key metrics
     total_with_v4 = df[df['v4_bucket'] != 'No V4 Score']['leads'].sum()
@@ -595,11 +529,15 @@ def main():
     
     client = bigquery.Client(project=PROJECT_ID)
     
+    # Q4 history comes from the conversion cube (queries only months that are missing or changed)
+    update_cube(client, CUBE_DIR)
+    cube = ConversionCube.load(CUBE_DIR)
+    
     # TASK 1: Q4 Tier Distribution
-    q4_tier_df, q4_total, q4_conversions, q4_conv_rate = get_q4_tier_distribution(client)
+    q4_tier_df, q4_total, q4_conversions, q4_conv_rate = get_q4_tier_distribution(cube)
     
     # TASK 2: Q4 V4 Scores
-    q4_v4_df = get_q4_v4_scores(client)
+    q4_v4_df = get_q4_v4_scores(cube)
     
     # TASK 3: January Composition
     jan_tier_df, jan_total, jan_v4_upgrades, jan_avg_percentile, jan_v4_bucket_df = get_january_composition(client)
@@ -0,0 +1,474 @@
+"""
+Prospect Conversion Analytics Cube
+
+Pre-aggregated conversion counts for contacted Salesforce leads, keyed by
+(contact_month, score_tier, v4_bucket, tier_source, lead_source, sga). Report scripts read
+the cube instead of re-aggregating raw Lead history in BigQuery:
+  - analyze_q4_vs_january.py (get_q4_tier_distribution, get_q4_v4_scores)
+  - optimization/run_sga_optimization_analysis.py (phase2_conversion_rates)
+  - V3+V4_testing/scripts/analyze_tier_performance.py
+
+Storage: one Parquet file per contact month in CUBE_DIR. Its metadata holds
+the lead state it was built from (month_state): as_of, the latest
+LastModifiedDate of the month's leads, and an order-independent hash of
+every lead's (Id, LastModifiedDate, IsDeleted). update_cube() re-queries a
+month when its file is missing, when that state has changed (a late
+conversion, status change or deletion, however long after contact, and
+edits that reach the BigQuery replica out of order), or when it is one of
+the last REFRESH_MONTHS months. Roll-ups, Wilson intervals and Fisher tests
+then run locally over a few thousand rows.
+
+Measures (conversion definitions used by the report scripts):
+  - leads:          contacted leads
+  - converted:      Status MQL/Qualified/Converted or call scheduled (Q4 analysis)
+  - call_scheduled: Stage_Entered_Call_Scheduled__c set (SGA optimization)
+  - mql:            historical_leads_with_outcomes definition (tier performance)
+  - v4_scored, v4_score_sum, v4_percentile_sum: for V4 averages after roll-up
+
+score_tier and v4_bucket are the tier and V4 score the lead had when it was
+contacted; tier_source says where they come from:
+  - historical_leads: historical_leads_with_outcomes (tier at first contact)
+    and historical_leads_v4_scores, the V3/V4 backtest of 2025 contacts
+  - lead_list: lead_list_tier_snapshots, the latest monthly lead list on or
+    before the contact month that carried the advisor
+  - none: neither covers the lead (score_tier UNKNOWN, No V4 Score)
+
+Usage:
+    python scripts/conversion_cube.py                  # incremental monthly update
+    python scripts/conversion_cube.py --rebuild        # re-query every month
+
+    from conversion_cube import ConversionCube
+    cube = ConversionCube.load().slice(start='2024-10-01', end='2025-01-01')
+    cube.rollup('score_tier', measure='call_scheduled', min_leads=50)
+    cube.compare('score_tier', 'TIER_1_PRIME_MOVER', 'TIER_2_PROVEN_MOVER')
+"""
+
+import argparse
+import json
+from datetime import date
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from scipy import stats
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+WORKING_DIR = Path(__file__).parent.parent
+CUBE_DIR = WORKING_DIR / "data" / "conversion_cube"
+
+PROJECT_ID = "savvy-gtm-analytics"
+DATASET_SALESFORCE = "SavvyGTMData"
+DATASET_ML = "ml_features"
+SNAPSHOT_TABLE = "lead_list_tier_snapshots"  # sql/lead_list_tier_snapshot.sql
+
+CUBE_START = "2024-01-01"
+REFRESH_MONTHS = 1  # The month in progress; older months refresh when their leads change
+
+CUBE_DIMENSIONS = ['contact_month', 'score_tier', 'v4_bucket', 'tier_source', 'lead_source', 'sga']
+CUBE_MEASURES = ['leads', 'converted', 'call_scheduled', 'mql',
+                 'v4_scored', 'v4_score_sum', 'v4_percentile_sum']
+
+V4_BUCKETS = ['V4 Top 20% (>=80%)', 'V4 50-80%', 'V4 20-50%', 'V4 Bottom 20% (<20%)', 'No V4 Score']
+
+# LeadSource patterns (regex) for the Provided Lead List filters in the report queries
+PROVIDED_LIST_SOURCES = 'Provided Lead List'
+PROVIDED_LIST_SOURCES_BROAD = 'Provided Lead|Lead List'
+
+STATE_KEY = b'conversion_cube_lead_state'  # Parquet metadata key: lead state the month was built from
+EMPTY_STATE = {'as_of': None, 'lead_hash': 0}  # A month without contacted leads
+
+MONTH_QUERY = """
+WITH month_leads AS (
+    SELECT
+        l.Id as lead_id,
+        SAFE_CAST(REGEXP_REPLACE(CAST(l.FA_CRD__c AS STRING), r'[^0-9]', '') AS INT64) as crd,
+        COALESCE(l.LeadSource, 'Unknown') as lead_source,
+        COALESCE(u.Name, 'Unassigned') as sga,
+        CASE
+            WHEN l.Status IN ('MQL', 'Qualified', 'Converted')
+            OR l.Stage_Entered_Call_Scheduled__c IS NOT NULL
+            THEN 1 ELSE 0
+        END as converted,
+        CASE WHEN l.Stage_Entered_Call_Scheduled__c IS NOT NULL THEN 1 ELSE 0 END as call_scheduled,
+        CASE
+            WHEN l.Status IN ('MQL', 'Marketing Qualified', 'Qualified', 'Sales Qualified',
+                              'Working', 'Contacted - Interested', 'Meeting Scheduled',
+                              'Opportunity', 'Converted')
+            OR l.IsConverted = true
+            OR l.Stage_Entered_Call_Scheduled__c IS NOT NULL
+            THEN 1 ELSE 0
+        END as mql
+    FROM `{project}.{salesforce}.Lead` l
+    LEFT JOIN `{project}.{salesforce}.User` u ON l.OwnerId = u.Id
+    WHERE DATE(l.stage_entered_contacting__c) >= '{month_start}'
+      AND DATE(l.stage_entered_contacting__c) < '{month_end}'
+      AND l.FA_CRD__c IS NOT NULL
+      AND l.IsDeleted = false
+),
+
+-- Latest monthly lead list on or before the contact month that carried the advisor
+list_tiers AS (
+    SELECT ml.lead_id, s.score_tier, s.v4_score, s.v4_percentile
+    FROM month_leads ml
+    JOIN `{project}.{ml}.{snapshots}` s
+        ON s.advisor_crd = ml.crd AND s.list_month <= DATE('{month_start}')
+    QUALIFY ROW_NUMBER() OVER (PARTITION BY ml.lead_id ORDER BY s.list_month DESC) = 1
+),
+
+-- Tier and V4 score at contact: the 2025 backtest where it covers the lead,
+-- otherwise the lead list snapshot
+as_contacted AS (
+    SELECT
+        ml.*,
+        CASE
+            WHEN h.lead_id IS NOT NULL THEN 'historical_leads'
+            WHEN lt.lead_id IS NOT NULL THEN 'lead_list'
+            ELSE 'none'
+        END as tier_source,
+        IF(h.lead_id IS NOT NULL, h.score_tier, lt.score_tier) as score_tier,
+        IF(h.lead_id IS NOT NULL, hv.v4_score, lt.v4_score) as v4_score,
+        IF(h.lead_id IS NOT NULL, hv.v4_percentile, lt.v4_percentile) as v4_percentile
+    FROM month_leads ml
+    LEFT JOIN `{project}.{ml}.historical_leads_with_outcomes` h ON ml.lead_id = h.lead_id
+    LEFT JOIN `{project}.{ml}.historical_leads_v4_scores` hv ON ml.lead_id = hv.lead_id
+    LEFT JOIN list_tiers lt ON ml.lead_id = lt.lead_id
+)
+SELECT
+    DATE('{month_start}') as contact_month,
+    COALESCE(score_tier, 'UNKNOWN') as score_tier,
+    CASE
+        WHEN v4_percentile >= 80 THEN 'V4 Top 20% (>=80%)'
+        WHEN v4_percentile >= 50 THEN 'V4 50-80%'
+        WHEN v4_percentile >= 20 THEN 'V4 20-50%'
+        WHEN v4_percentile IS NOT NULL THEN 'V4 Bottom 20% (<20%)'
+        ELSE 'No V4 Score'
+    END as v4_bucket,
+    tier_source,
+    lead_source,
+    sga,
+    COUNT(*) as leads,
+    SUM(converted) as converted,
+    SUM(call_scheduled) as call_scheduled,
+    SUM(mql) as mql,
+    COUNT(v4_percentile) as v4_scored,
+    COALESCE(SUM(v4_score), 0) as v4_score_sum,
+    COALESCE(SUM(v4_percentile), 0) as v4_percentile_sum
+FROM as_contacted
+GROUP BY 1, 2, 3, 4, 5, 6
+"""
+
+# Lead state per contact month, compared with the state each file was built
+# from. Deleted leads are included, so a deletion also refreshes its month; the
+# XOR of per-lead fingerprints changes when any lead changes, even one whose
+# LastModifiedDate is older than the latest already replicated
+STATE_QUERY = """
+SELECT
+    DATE_TRUNC(DATE(l.stage_entered_contacting__c), MONTH) as contact_month,
+    MAX(l.LastModifiedDate) as last_modified,
+    BIT_XOR(FARM_FINGERPRINT(CONCAT(l.Id, '|', CAST(l.LastModifiedDate AS STRING), '|',
+                                    CAST(l.IsDeleted AS STRING)))) as lead_hash
+FROM `{project}.{salesforce}.Lead` l
+WHERE DATE(l.stage_entered_contacting__c) >= '{start}'
+  AND l.FA_CRD__c IS NOT NULL
+GROUP BY 1
+"""
+
+
+# ============================================================================
+# STATISTICS
+# ============================================================================
+def wilson_interval(successes, n, z: float = 1.96):
+    """
+    Wilson score confidence interval for conversion rates (vectorized).
+
+    Returns:
+        (lower, upper) arrays; NaN where n == 0
+    """
+    successes = np.asarray(successes, dtype=float)
+    n = np.asarray(n, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        p = successes / n
+        denom = 1 + z * z / n
+        center = (p + z * z / (2 * n)) / denom
+        half = z * np.sqrt((p * (1 - p) + z * z / (4 * n)) / n) / denom
+    return center - half, center + half
+
+
+def fisher_compare(successes_a: int, n_a: int, successes_b: int, n_b: int,
+                   alpha: float = 0.05) -> Dict:
+    """
+    Fisher's exact test on two conversion counts.
+
+    Returns:
+        Dict of rate_a, rate_b, odds_ratio, p_value and significant; the test
+        fields are None when either side has no leads
+    """
+    result = {
+        'rate_a': successes_a / n_a if n_a else 0,
+        'rate_b': successes_b / n_b if n_b else 0,
+        'odds_ratio': None,
+        'p_value': None,
+        'significant': False,
+    }
+    if n_a == 0 or n_b == 0:
+        return result
+    table = [[successes_a, n_a - successes_a], [successes_b, n_b - successes_b]]
+    odds_ratio, p_value = stats.fisher_exact(table)
+    result.update(odds_ratio=float(odds_ratio), p_value=float(p_value),
+                  significant=bool(p_value < alpha))
+    return result
+
+
+# ============================================================================
+# CUBE
+# ============================================================================
+def _month(value) -> pd.Timestamp:
+    """First day of the month containing value."""
+    return pd.Timestamp(value).to_period('M').to_timestamp()
+
+
+def _month_file(cube_dir: Path, month: pd.Timestamp) -> Path:
+    return Path(cube_dir) / f"conversion_cube_{month.year}_{month.month:02d}.parquet"
+
+
+class ConversionCube:
+    """Conversion counts by contact month, tier, V4 bucket, lead source and SGA."""
+
+    def __init__(self, data: pd.DataFrame):
+        missing = [c for c in CUBE_DIMENSIONS + CUBE_MEASURES if c not in data.columns]
+        if missing:
+            raise ValueError(f"Cube data is missing columns: {missing}")
+        self.data = data
+
+    @classmethod
+    def load(cls, cube_dir: Union[str, Path] = CUBE_DIR, start=None, end=None) -> 'ConversionCube':
+        """
+        Read the monthly Parquet files, optionally only months in [start, end).
+        """
+        files = sorted(Path(cube_dir).glob("conversion_cube_*.parquet"))
+        if not files:
+            raise FileNotFoundError(f"No conversion cube in {cube_dir} - run conversion_cube.py first")
+        # Dimensions as categoricals keep the roll-up group-bys cheap
+        data = pq.read_table([str(f) for f in files]).to_pandas(strings_to_categorical=True)
+        data['contact_month'] = pd.to_datetime(data['contact_month'])
+        return cls(data).slice(start=start, end=end)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    @property
+    def months(self) -> List[pd.Timestamp]:
+        return sorted(self.data['contact_month'].unique())
+
+    def slice(self, start=None, end=None, lead_source: Optional[str] = None,
+              **dimensions) -> 'ConversionCube':
+        """
+        Restrict the cube.
+
+        Args:
+            start, end: contact months in [start, end); dates are truncated to the month
+            lead_source: regex matched against LeadSource (e.g. PROVIDED_LIST_SOURCES)
+            **dimensions: dimension=value or dimension=[values] filters
+
+        Returns:
+            A new ConversionCube over the matching cells
+        """
+        data = self.data
+        mask = np.ones(len(data), dtype=bool)
+        if start is not None:
+            mask &= (data['contact_month'] >= _month(start)).to_numpy()
+        if end is not None:
+            mask &= (data['contact_month'] < pd.Timestamp(end)).to_numpy()
+        if lead_source is not None:
+            mask &= data['lead_source'].str.contains(lead_source, regex=True).to_numpy()
+        for name, value in dimensions.items():
+            if name not in CUBE_DIMENSIONS:
+                raise ValueError(f"Unknown cube dimension: {name}")
+            values = value if isinstance(value, (list, tuple, set)) else [value]
+            mask &= data[name].isin(values).to_numpy()
+        return ConversionCube(data[mask])
+
+    def rollup(self, by: Union[str, List[str], None] = None, measure: str = 'converted',
+               min_leads: int = 0, z: float = 1.96) -> pd.DataFrame:
+        """
+        Aggregate to the given dimensions.
+
+        Args:
+            by: dimension(s) to keep; None rolls everything up to one row
+            measure: conversion measure ('converted', 'call_scheduled' or 'mql')
+            min_leads: drop groups with fewer leads (like HAVING COUNT(*) >= n)
+
+        Returns:
+            DataFrame with leads, conversions, conversion_rate, ci_lower, ci_upper
+            (rates as fractions), avg_v4_score and avg_v4_percentile
+        """
+        if measure not in ('converted', 'call_scheduled', 'mql'):
+            raise ValueError(f"Unknown conversion measure: {measure}")
+        columns = ['leads', measure, 'v4_scored', 'v4_score_sum', 'v4_percentile_sum']
+        if by is None:
+            totals = self.data[columns].sum()
+            grouped = pd.DataFrame([totals.to_numpy()], columns=columns, index=pd.Index(['ALL']))
+        else:
+            grouped = self.data.groupby(by, observed=True, sort=True)[columns].sum()
+        grouped = grouped[grouped['leads'] >= max(min_leads, 1)]
+
+        leads = grouped['leads'].to_numpy(dtype=float)
+        conversions = grouped[measure].to_numpy(dtype=float)
+        scored = grouped['v4_scored'].to_numpy(dtype=float)
+        lower, upper = wilson_interval(conversions, leads, z)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return pd.DataFrame({
+                'leads': leads.astype(np.int64),
+                'conversions': conversions.astype(np.int64),
+                'conversion_rate': conversions / leads,
+                'ci_lower': lower,
+                'ci_upper': upper,
+                'avg_v4_score': np.where(scored > 0, grouped['v4_score_sum'].to_numpy() / scored, np.nan),
+                'avg_v4_percentile': np.where(scored > 0, grouped['v4_percentile_sum'].to_numpy() / scored, np.nan),
+            }, index=grouped.index)
+
+    def compare(self, dimension: str, a, b, measure: str = 'converted', alpha: float = 0.05) -> Dict:
+        """
+        Fisher's exact test between two values of one dimension (e.g. two tiers).
+
+        Returns:
+            fisher_compare() result plus a, b and each side's leads
+        """
+        counts = self.data.groupby(dimension, observed=True)[['leads', measure]].sum()
+        n_a, s_a = (int(v) for v in counts.loc[a]) if a in counts.index else (0, 0)
+        n_b, s_b = (int(v) for v in counts.loc[b]) if b in counts.index else (0, 0)
+        result = fisher_compare(s_a, n_a, s_b, n_b, alpha)
+        return {'a': a, 'b': b, 'leads_a': n_a, 'leads_b': n_b, **result}
+
+
+# ============================================================================
+# MATERIALIZATION
+# ============================================================================
+def query_month(client, month) -> pd.DataFrame:
+    """Aggregate one contact month of Lead history in BigQuery."""
+    month = _month(month)
+    query = MONTH_QUERY.format(
+        project=PROJECT_ID, salesforce=DATASET_SALESFORCE, ml=DATASET_ML,
+        snapshots=SNAPSHOT_TABLE, month_start=month.date(),
+        month_end=(month + pd.offsets.MonthBegin(1)).date())
+    df = client.query(query).to_dataframe()
+    df['contact_month'] = pd.to_datetime(df['contact_month'])
+    for col in CUBE_MEASURES:
+        df[col] = pd.to_numeric(df[col]).fillna(0)
+    return df[CUBE_DIMENSIONS + CUBE_MEASURES]
+
+
+def query_lead_state(client, start=CUBE_START) -> Dict[pd.Timestamp, dict]:
+    """Lead state per contact month: {'as_of': max LastModifiedDate (ISO, UTC), 'lead_hash': int}."""
+    query = STATE_QUERY.format(project=PROJECT_ID, salesforce=DATASET_SALESFORCE,
+                               start=_month(start).date())
+    df = client.query(query).to_dataframe()
+    modified = pd.to_datetime(df['last_modified'], utc=True)
+    return {pd.Timestamp(m): {'as_of': t.isoformat(), 'lead_hash': int(h)}
+            for m, t, h in zip(pd.to_datetime(df['contact_month']), modified, df['lead_hash'])}
+
+
+def _write_month(path: Path, df: pd.DataFrame, state: dict) -> None:
+    """Write a month file with its lead state in the Parquet metadata (kept for empty months too)."""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}),
+                                           STATE_KEY: json.dumps(state).encode()})
+    tmp = path.with_suffix('.tmp')
+    pq.write_table(table, tmp)
+    tmp.replace(path)
+
+
+def month_state(cube_dir: Union[str, Path], month) -> Optional[dict]:
+    """Lead state a month file was built from; None if it is missing or predates state stamps."""
+    path = _month_file(cube_dir, _month(month))
+    if not path.exists():
+        return None
+    value = (pq.read_schema(path).metadata or {}).get(STATE_KEY)
+    return json.loads(value) if value else None
+
+
+def month_as_of(cube_dir: Union[str, Path], month) -> Optional[pd.Timestamp]:
+    """Latest Lead modification a month file includes (None if unknown or the month had no leads)."""
+    state = month_state(cube_dir, month)
+    return pd.Timestamp(state['as_of']) if state and state['as_of'] else None
+
+
+def pending_months(cube_dir: Union[str, Path] = CUBE_DIR, start=CUBE_START, through=None,
+                   refresh_months: int = REFRESH_MONTHS, rebuild: bool = False,
+                   lead_state: Optional[Dict[pd.Timestamp, dict]] = None) -> List[pd.Timestamp]:
+    """
+    Months update_cube() would query: those without a file (or without a
+    state stamp), those whose lead state (query_lead_state) differs from the
+    one the file was built from, and the latest refresh_months months.
+    """
+    through = _month(through if through is not None else date.today())
+    months = pd.date_range(_month(start), through, freq='MS')
+    refresh_from = through - pd.offsets.MonthBegin(refresh_months - 1) if refresh_months > 0 else None
+
+    pending = []
+    for m in months:
+        saved = month_state(cube_dir, m)
+        changed = lead_state is not None and saved != lead_state.get(m, EMPTY_STATE)
+        if rebuild or saved is None or changed or (refresh_from is not None and m >= refresh_from):
+            pending.append(m)
+    return pending
+
+
+def update_cube(client, cube_dir: Union[str, Path] = CUBE_DIR, start=CUBE_START, through=None,
+                refresh_months: int = REFRESH_MONTHS, rebuild: bool = False) -> List[pd.Timestamp]:
+    """
+    Incrementally materialize the cube: query each pending month and write its file.
+
+    The lead state is read before the month queries, so a change that lands
+    in between leaves the file stamped with the older state and the month is
+    re-queried on the next run.
+
+    Returns:
+        Months written
+    """
+    cube_dir = Path(cube_dir)
+    cube_dir.mkdir(parents=True, exist_ok=True)
+    lead_state = query_lead_state(client, start)
+    months = pending_months(cube_dir, start, through, refresh_months, rebuild, lead_state)
+    for month in months:
+        state = lead_state.get(month, EMPTY_STATE)
+        df = query_month(client, month)
+        path = _month_file(cube_dir, month)
+        _write_month(path, df, state)
+        print(f"[INFO] {month:%Y-%m}: {int(df['leads'].sum()):,} leads in {len(df):,} cells -> {path.name} "
+              f"(leads modified through {state['as_of'] or 'n/a'})")
+    return months
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Materialize the prospect conversion cube')
+    parser.add_argument('--cube-dir', default=str(CUBE_DIR), help=f'Output directory (default: {CUBE_DIR})')
+    parser.add_argument('--start', default=CUBE_START, help=f'First contact month (default: {CUBE_START})')
+    parser.add_argument('--through', default=None, help='Last contact month (default: current month)')
+    parser.add_argument('--refresh-months', type=int, default=REFRESH_MONTHS,
+                        help=f'Recent months always re-queried, on top of months whose leads '
+                             f'changed (default: {REFRESH_MONTHS})')
+    parser.add_argument('--rebuild', action='store_true', help='Re-query every month')
+    args = parser.parse_args()
+
+    from google.cloud import bigquery
+    client = bigquery.Client(project=PROJECT_ID)
+
+    months = update_cube(client, args.cube_dir, args.start, args.through, args.refresh_months, args.rebuild)
+    cube = ConversionCube.load(args.cube_dir)
+    print(f"\n[INFO] Updated {len(months)} month(s); cube has {len(cube.months)} months, "
+          f"{len(cube):,} cells")
+    stamps = [month_as_of(args.cube_dir, m) for m in cube.months]
+    stamps = [t for t in stamps if t is not None]
+    if stamps:
+        print(f"[INFO] Latest lead modification in the cube: {max(stamps):%Y-%m-%d %H:%M} UTC")
+    print(cube.rollup('score_tier').to_string())
+
+
+if __name__ == "__main__":
+    main()
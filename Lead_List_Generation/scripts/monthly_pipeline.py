@@ -0,0 +1,491 @@
+"""
+Monthly Lead List Pipeline Runner (dependency graph with checkpoints)
+
+Runs the monthly steps from Monthly_Lead_List_Generation_V3_V4_Hybrid.md as a
+dependency graph instead of by hand:
+
+    v4_features -> v4_scoring -> hybrid_lead_list -> export_lead_list
+                             |                  \-> tier_snapshot
+                             \-> recyclable_list
+
+- Stages whose dependencies are complete run concurrently. The recyclable pool
+  query reads v4_prospect_scores, so it runs alongside the hybrid query and
+  export rather than alongside scoring.
+- Each completed stage is checkpointed with a key hashed from its SQL/script,
+  its arguments, the contents of its declared inputs (model artifacts,
+  imported utils modules) and the output fingerprints of its dependencies. Outputs are
+  fingerprinted by content (files: SHA-256) or by BigQuery table metadata
+  (row count + last modified).
+- A rerun skips every stage whose key and outputs still match, so a failed
+  export no longer re-scores the whole prospect universe.
+- Per-stage wall time and peak memory (child process RSS, sampled with psutil
+  or /proc) go to the checkpoint file and to logs/EXECUTION_LOG.md.
+- A SQL stage fails before it is sent to BigQuery if one of its
+  pattern_registry blocks differs from Version-4/config/constants.py or one
+  of its tier_rules blocks differs from V3_TIER_SPEC.
+
+Working Directory: Lead_List_Generation
+Usage:
+    python scripts/monthly_pipeline.py --month january --year 2026
+    python scripts/monthly_pipeline.py --month january --year 2026 --dry-run
+    python scripts/monthly_pipeline.py --month january --year 2026 --force v4_scoring
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import importlib.util
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from google.cloud import bigquery
+from google.api_core.exceptions import NotFound
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent / "Version-4"))
+from utils.pattern_registry import PatternRegistry
+
+
+def _load_v3_tier_rules():
+    """Version-3/utils/tier_rules.py (its utils package name clashes with Version-4's)."""
+    path = Path(__file__).resolve().parent.parent.parent / "Version-3" / "utils" / "tier_rules.py"
+    spec = importlib.util.spec_from_file_location("v3_tier_rules", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+V3_TIER_SPEC = _load_v3_tier_rules().V3_TIER_SPEC
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+WORKING_DIR = Path(__file__).resolve().parent.parent
+REPO_DIR = WORKING_DIR.parent
+SCRIPTS_DIR = WORKING_DIR / "scripts"
+SQL_DIR = WORKING_DIR / "sql"
+LOGS_DIR = WORKING_DIR / "logs"
+PIPELINE_DIR = LOGS_DIR / "pipeline"
+
+PROJECT_ID = "savvy-gtm-analytics"
+DATASET = "ml_features"
+
+# The hybrid SQL and export script still target the January 2026 list by name
+LEAD_LIST_SQL = SQL_DIR / "January_2026_Lead_List_V3_V4_Hybrid.sql"
+LEAD_LIST_TABLE = "january_2026_lead_list_v4"
+LEAD_LIST_EXPORT = "exports/january_2026_lead_list_*.csv"
+
+# Files the stages read besides their own SQL/script (globs under REPO_DIR)
+V4_SCORING_INPUTS = [
+    "Version-4/models/v4.0.0/*",                       # model.pkl, model.json, drift_profile.json
+    "Version-4/data/processed/final_features.json",
+    "Version-4/utils/*.py",
+    "Version-4/config/constants.py",
+]
+V3_TIER_INPUTS = ["Version-3/utils/tier_rules.py", "Version-4/config/constants.py"]
+RECYCLING_INPUTS = ["Lead_List_Generation/scripts/recycling/recycle_postprocess.py"]
+
+DEFAULT_JOBS = 3
+MEMORY_POLL_SECONDS = 0.2
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+HASH_CHUNK_BYTES = 1 << 20
+
+
+@dataclass
+class Stage:
+    """One pipeline step: a SQL file run in BigQuery or a Python script run as a subprocess."""
+    name: str
+    kind: str                                         # 'sql' or 'python'
+    path: Path
+    args: List[str] = field(default_factory=list)
+    deps: List[str] = field(default_factory=list)
+    tables: List[str] = field(default_factory=list)   # BigQuery outputs (dataset.table)
+    files: List[str] = field(default_factory=list)    # File outputs (globs under WORKING_DIR)
+    inputs: List[str] = field(default_factory=list)   # Files read (globs under REPO_DIR), hashed into the key
+
+
+def monthly_stages(month: str, year: int, allow_drift: bool = False) -> List[Stage]:
+    """The monthly lead list pipeline."""
+    return [
+        Stage('v4_features', 'sql', SQL_DIR / "v4_prospect_features.sql",
+              tables=[f"{DATASET}.v4_prospect_features"]),
+        Stage('v4_scoring', 'python', SCRIPTS_DIR / "score_prospects_monthly.py",
+              args=['--allow-drift'] if allow_drift else [],
+              deps=['v4_features'], tables=[f"{DATASET}.v4_prospect_scores"],
+              inputs=V4_SCORING_INPUTS),
+        Stage('hybrid_lead_list', 'sql', LEAD_LIST_SQL,
+              deps=['v4_scoring'], tables=[f"{DATASET}.{LEAD_LIST_TABLE}"],
+              inputs=V3_TIER_INPUTS),
+        Stage('recyclable_list', 'python', SCRIPTS_DIR / "recycling" / "generate_recyclable_list_v2.1.py",
+              args=['--month', month, '--year', str(year)], deps=['v4_scoring'],
+              files=[f"exports/{month}_{year}_recyclable_leads.csv"], inputs=RECYCLING_INPUTS),
+        Stage('export_lead_list', 'python', SCRIPTS_DIR / "export_lead_list.py",
+              deps=['hybrid_lead_list'], files=[LEAD_LIST_EXPORT]),
+        Stage('tier_snapshot', 'sql', SQL_DIR / "lead_list_tier_snapshot.sql",
+              deps=['hybrid_lead_list'], tables=[f"{DATASET}.lead_list_tier_snapshots"]),
+    ]
+
+
+# ============================================================================
+# FINGERPRINTS
+# ============================================================================
+def _hash_file(path: Path, digest) -> None:
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b''):
+            digest.update(chunk)
+
+
+def file_fingerprint(pattern: str) -> Optional[str]:
+    """SHA-256 of the newest file matching pattern, or None if there is none."""
+    matches = sorted(WORKING_DIR.glob(pattern), key=lambda p: p.stat().st_mtime)
+    if not matches:
+        return None
+    digest = hashlib.sha256()
+    _hash_file(matches[-1], digest)
+    return f"{matches[-1].name}:{digest.hexdigest()}"
+
+
+def inputs_fingerprint(patterns: List[str]) -> str:
+    """SHA-256 over the path and contents of every file matching the input globs."""
+    digest = hashlib.sha256()
+    for pattern in patterns:
+        digest.update(pattern.encode())
+        matches = sorted(p for p in REPO_DIR.glob(pattern) if p.is_file())
+        if not matches:
+            digest.update(b'\0missing')  # The file appearing later changes the key
+        for path in matches:
+            digest.update(path.relative_to(REPO_DIR).as_posix().encode())
+            _hash_file(path, digest)
+    return digest.hexdigest()
+
+
+def table_fingerprint(client, table: str) -> Optional[str]:
+    """Row count and last-modified time of a BigQuery table, or None if it does not exist."""
+    try:
+        t = client.get_table(f"{PROJECT_ID}.{table}")
+    except NotFound:
+        return None
+    return f"{t.num_rows}:{t.modified.isoformat()}"
+
+
+def stage_key(stage: Stage, dep_outputs: Dict[str, Dict[str, str]]) -> str:
+    """Hash of what a stage computes from: its code, arguments, declared inputs and upstream outputs."""
+    digest = hashlib.sha256()
+    digest.update(stage.kind.encode())
+    digest.update(Path(stage.path).read_bytes())
+    digest.update('\0'.join(stage.args).encode())
+    digest.update(inputs_fingerprint(stage.inputs).encode())
+    for dep in sorted(stage.deps):
+        digest.update(json.dumps(dep_outputs[dep], sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+# ============================================================================
+# STAGE EXECUTION
+# ============================================================================
+def process_rss(pid: int) -> Optional[int]:
+    """
+    Current RSS in bytes of a process plus its children: psutil if installed,
+    else /proc/<pid>/statm (Linux); None if neither can read it.
+    """
+    if psutil is not None:
+        try:
+            process = psutil.Process(pid)
+            rss = process.memory_info().rss
+            for child in process.children(recursive=True):
+                try:
+                    rss += child.memory_info().rss
+                except psutil.Error:
+                    pass
+            return rss
+        except psutil.Error:
+            return None
+    try:
+        with open(f"/proc/{pid}/statm", 'rb') as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def run_process(argv: List[str], log_path: Path) -> Tuple[int, Optional[float]]:
+    """
+    Run argv from WORKING_DIR with output to log_path; returns (exit code, peak RSS MB).
+
+    The child's RSS is sampled every MEMORY_POLL_SECONDS. wait4() rusage is not
+    used: its ru_maxrss starts from the runner's own RSS at fork, so every stage
+    would report at least the runner's footprint.
+    """
+    with open(log_path, 'w', encoding='utf-8') as log:
+        proc = subprocess.Popen(argv, cwd=WORKING_DIR, stdout=log, stderr=subprocess.STDOUT)
+        peak = None
+        while True:
+            rss = process_rss(proc.pid)
+            if rss is not None:
+                peak = max(peak or 0, rss)
+            try:
+                code = proc.wait(timeout=MEMORY_POLL_SECONDS)
+                return code, peak / 2**20 if peak is not None else None
+            except subprocess.TimeoutExpired:
+                pass
+
+
+class PipelineRunner:
+    """
+    Dependency-ordered, concurrent, checkpointed stage runner.
+
+    Usage:
+        runner = PipelineRunner(monthly_stages('january', 2026), checkpoint_path, client)
+        success = runner.run()
+        runner.results  # {stage: {'status', 'wall_s', 'peak_mb', 'detail'}}
+    """
+
+    def __init__(self, stages: List[Stage], checkpoint_path: Path, client, jobs: int = DEFAULT_JOBS,
+                 log_prefix: str = "pipeline"):
+        self.stages = {s.name: s for s in stages}
+        self.order = self._topological_order(stages)
+        self.checkpoint_path = Path(checkpoint_path)
+        self.client = client
+        self.jobs = max(1, jobs)
+        self.log_prefix = log_prefix
+        self.checkpoints = self._load_checkpoints()
+        self.results = {}
+
+    @staticmethod
+    def _topological_order(stages: List[Stage]) -> List[str]:
+        names = [s.name for s in stages]
+        deps = {s.name: list(s.deps) for s in stages}
+        unknown = {d for s in stages for d in s.deps if d not in deps}
+        if unknown:
+            raise ValueError(f"Unknown stage dependencies: {sorted(unknown)}")
+
+        order = []
+        remaining = list(names)
+        while remaining:
+            ready = [n for n in remaining if all(d in order for d in deps[n])]
+            if not ready:
+                raise ValueError(f"Dependency cycle between stages: {remaining}")
+            order.extend(ready)
+            remaining = [n for n in remaining if n not in ready]
+        return order
+
+    def _load_checkpoints(self) -> Dict[str, dict]:
+        if not self.checkpoint_path.exists():
+            return {}
+        with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _save_checkpoints(self):
+        self.checkpoint_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.checkpoint_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.checkpoints, f, indent=2)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def outputs(self, stage: Stage) -> Dict[str, Optional[str]]:
+        """Current fingerprints of a stage's declared outputs."""
+        fingerprints = {t: table_fingerprint(self.client, t) for t in stage.tables}
+        fingerprints.update({f: file_fingerprint(f) for f in stage.files})
+        return fingerprints
+
+    def is_current(self, stage: Stage, key: str) -> bool:
+        """True if the checkpoint has this key and the outputs are unchanged since."""
+        saved = self.checkpoints.get(stage.name)
+        return bool(saved) and saved['key'] == key and self.outputs(stage) == saved['outputs']
+
+    def execute(self, stage: Stage) -> Tuple[Optional[float], str]:
+        """Run one stage (in a worker thread); returns (peak MB, detail) or raises."""
+        if stage.kind == 'sql':
+            sql = Path(stage.path).read_text(encoding='utf-8')
+            stale = PatternRegistry().sql_drift(sql)
+            if stale:
+                raise RuntimeError(f"pattern lists differ from Version-4/config/constants.py: {', '.join(stale)} "
+                                   f"(run Version-4/scripts/verify_sql_patterns.py --write)")
+            stale = V3_TIER_SPEC.sql_drift(sql)
+            if stale:
+                raise RuntimeError(f"tier blocks differ from Version-3/utils/tier_rules.py: {', '.join(stale)} "
+                                   f"(run Version-3/scripts/verify_tier_rules.py --write)")
+            job = self.client.query(sql)
+            job.result()
+            return None, f"{(job.total_bytes_processed or 0) / 2**30:.2f} GB processed"
+
+        log_path = PIPELINE_DIR / f"{self.log_prefix}_{stage.name}.log"
+        code, peak_mb = run_process([sys.executable, str(stage.path)] + stage.args, log_path)
+        if code != 0:
+            raise RuntimeError(f"exit code {code} (see {log_path})")
+        return peak_mb, f"log: {log_path.name}"
+
+    def _finish(self, stage: Stage, key: str, started: float, future) -> Optional[Dict[str, str]]:
+        wall_s = time.perf_counter() - started
+        try:
+            peak_mb, detail = future.result()
+        except Exception as e:
+            self.checkpoints.pop(stage.name, None)
+            self._save_checkpoints()
+            self.results[stage.name] = {'status': 'FAILED', 'wall_s': wall_s, 'peak_mb': None, 'detail': str(e)}
+            print(f"[ERROR] {stage.name} failed after {wall_s:.1f}s: {e}")
+            return None
+
+        outputs = self.outputs(stage)
+        missing = [name for name, fingerprint in outputs.items() if fingerprint is None]
+        if missing:
+            self.results[stage.name] = {'status': 'FAILED', 'wall_s': wall_s, 'peak_mb': peak_mb,
+                                        'detail': f"outputs not created: {', '.join(missing)}"}
+            print(f"[ERROR] {stage.name} finished but did not create: {', '.join(missing)}")
+            return None
+
+        self.checkpoints[stage.name] = {
+            'key': key,
+            'outputs': outputs,
+            'completed_at': datetime.now().isoformat(timespec='seconds'),
+            'wall_s': round(wall_s, 2),
+            'peak_mb': round(peak_mb, 1) if peak_mb is not None else None,
+        }
+        self._save_checkpoints()
+        self.results[stage.name] = {'status': 'DONE', 'wall_s': wall_s, 'peak_mb': peak_mb, 'detail': detail}
+        memory = f", peak {peak_mb:,.0f} MB" if peak_mb is not None else ""
+        print(f"[INFO] {stage.name} done in {wall_s:.1f}s{memory}")
+        return outputs
+
+    def run(self, force: List[str] = (), dry_run: bool = False) -> bool:
+        """
+        Run every stage that is not already checkpointed with the same key.
+
+        Args:
+            force: Stage names to rerun regardless of checkpoints (their
+                dependents rerun too if the outputs change)
+            dry_run: Only report which stages would run
+
+        Returns:
+            True if no stage failed
+        """
+        unknown = set(force) - set(self.stages)
+        if unknown:
+            raise ValueError(f"Unknown stages: {sorted(unknown)}")
+
+        pending = list(self.order)
+        done_outputs = {}
+        failed = set()
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            while pending or running:
+                for name in list(pending):
+                    stage = self.stages[name]
+                    if any(d in failed for d in stage.deps):
+                        pending.remove(name)
+                        failed.add(name)
+                        self.results[name] = {'status': 'SKIPPED', 'wall_s': 0.0, 'peak_mb': None,
+                                              'detail': 'upstream stage failed'}
+                        print(f"[WARNING] {name} skipped - upstream stage failed")
+                        continue
+                    if not all(d in done_outputs for d in stage.deps) or len(running) >= self.jobs:
+                        continue
+
+                    pending.remove(name)
+                    key = stage_key(stage, done_outputs)
+                    if name not in force and self.is_current(stage, key):
+                        done_outputs[name] = self.checkpoints[name]['outputs']
+                        self.results[name] = {'status': 'CACHED', 'wall_s': 0.0, 'peak_mb': None,
+                                              'detail': f"checkpoint {self.checkpoints[name]['completed_at']}"}
+                        print(f"[INFO] {name} up to date - skipped")
+                    elif dry_run:
+                        done_outputs[name] = {'pending': key}
+                        self.results[name] = {'status': 'WOULD RUN', 'wall_s': 0.0, 'peak_mb': None, 'detail': ''}
+                        print(f"[INFO] {name} would run")
+                    else:
+                        print(f"[INFO] Starting {name} ({stage.path.name})")
+                        running[pool.submit(self.execute, stage)] = (stage, key, time.perf_counter())
+
+                if not running:
+                    continue
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    stage, key, started = running.pop(future)
+                    outputs = self._finish(stage, key, started, future)
+                    if outputs is None:
+                        failed.add(stage.name)
+                    else:
+                        done_outputs[stage.name] = outputs
+
+        return not failed
+
+    def summary_rows(self) -> List[Tuple[str, str, str, str, str]]:
+        """(stage, status, wall, peak memory, detail) in pipeline order."""
+        rows = []
+        for name in self.order:
+            r = self.results.get(name, {'status': 'NOT RUN', 'wall_s': 0.0, 'peak_mb': None, 'detail': ''})
+            peak = f"{r['peak_mb']:,.0f}" if r['peak_mb'] is not None else "n/a"
+            rows.append((name, r['status'], f"{r['wall_s']:.1f}", peak, r['detail']))
+        return rows
+
+
+def log_run(runner: PipelineRunner, month: str, year: int, success: bool, wall_s: float):
+    """Append the per-stage summary to logs/EXECUTION_LOG.md."""
+    with open(LOGS_DIR / "EXECUTION_LOG.md", 'a', encoding='utf-8') as f:
+        f.write(f"\n## Monthly Pipeline ({month.title()} {year}) - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
+        f.write(f"**Status**: {'✅ SUCCESS' if success else '❌ FAILED'}\n\n")
+        f.write(f"**Total Wall Time**: {wall_s:.1f}s\n\n")
+        f.write("| Stage | Status | Wall (s) | Peak Memory (MB) | Detail |\n")
+        f.write("|-------|--------|----------|------------------|--------|\n")
+        for row in runner.summary_rows():
+            f.write("| " + " | ".join(row) + " |\n")
+        f.write("\n---\n\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the monthly lead list pipeline')
+    parser.add_argument('--month', type=str, default='january', help='Month name')
+    parser.add_argument('--year', type=int, default=2026, help='Year')
+    parser.add_argument('--jobs', type=int, default=DEFAULT_JOBS, help='Stages to run concurrently')
+    parser.add_argument('--force', nargs='+', default=[], metavar='STAGE',
+                        help='Rerun these stages even if checkpointed')
+    parser.add_argument('--from-scratch', action='store_true', help='Ignore all checkpoints')
+    parser.add_argument('--allow-drift', action='store_true',
+                        help='Pass --allow-drift to the scoring stage')
+    parser.add_argument('--dry-run', action='store_true', help='Show which stages would run')
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print(f"MONTHLY LEAD LIST PIPELINE - {args.month.upper()} {args.year}")
+    print(f"Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print(f"Working Directory: {WORKING_DIR}")
+    print("=" * 70)
+
+    PIPELINE_DIR.mkdir(parents=True, exist_ok=True)
+    stages = monthly_stages(args.month.lower(), args.year, args.allow_drift)
+    run_id = f"{args.month.lower()}_{args.year}"
+    client = bigquery.Client(project=PROJECT_ID)
+    runner = PipelineRunner(stages, PIPELINE_DIR / f"{run_id}_checkpoints.json", client,
+                            jobs=args.jobs, log_prefix=run_id)
+
+    force = list(runner.order) if args.from_scratch else args.force
+    start = time.perf_counter()
+    success = runner.run(force=force, dry_run=args.dry_run)
+    wall_s = time.perf_counter() - start
+
+    print("\n" + "=" * 70)
+    print("PIPELINE SUMMARY")
+    print("=" * 70)
+    for name, status, wall, peak, detail in runner.summary_rows():
+        print(f"  {name:<20} {status:<10} {wall:>8}s  {peak:>8} MB  {detail}")
+    print(f"Total wall time: {wall_s:.1f}s")
+    print("=" * 70)
+
+    if not args.dry_run:
+        log_run(runner, args.month, args.year, success, wall_s)
+    sys.exit(0 if success else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,10 +2,13 @@
 SGA Lead Distribution Optimization Analysis - Master Script
 Executes all phases of the optimization analysis as outlined in the guide.
 
-Usage: python scripts/optimization/run_sga_optimization_analysis.py
+Usage:
+    python scripts/optimization/run_sga_optimization_analysis.py
+    python scripts/optimization/run_sga_optimization_analysis.py --roster sga_roster.csv --lead-list exports/january_2026_lead_list.csv
 """
 
 import sys
+import argparse
 from pathlib import Path
 from datetime import datetime
 import pandas as pd
@@ -15,10 +18,17 @@ from google.cloud import bigquery
 WORKING_DIR = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(WORKING_DIR))
 
+sys.path.insert(0, str(WORKING_DIR / "scripts"))
+
+from sga_allocation import (default_roster, allocate_leads, plan_depletion,
+                            TIER_MIX_TOLERANCE, SUSTAINABILITY_HORIZON_MONTHS)
+from conversion_cube import ConversionCube, CUBE_DIR, PROVIDED_LIST_SOURCES, update_cube
+
 # Configuration
 PROJECT_ID = "savvy-gtm-analytics"
 DATASET_SALESFORCE = "SavvyGTMData"
 DATASET_ML = "ml_features"
+LEAD_LIST_TABLE = "january_2026_lead_list_v4"
 
 REPORTS_DIR = WORKING_DIR / "reports" / "sga_optimization"
 DATA_DIR = REPORTS_DIR / "data"
@@ -38,7 +48,7 @@ def log_to_analysis_log(message: str):
         f.write(f"\n### {timestamp} - {message}\n")
     print(f"[LOG] {message}")
 
-def phase1_prospect_pool(client):
+def phase1_prospect_pool(client, monthly_usage: int):
     """Phase 1: Prospect Pool Inventory Analysis"""
     print("\n" + "=" * 70)
     print("PHASE 1: PROSPECT POOL INVENTORY ANALYSIS")
@@ -66,7 +76,6 @@ def phase1_prospect_pool(client):
     
     # Calculate sustainability metrics
     total_pool = df['prospect_count'].sum()
-    monthly_usage = 3000  # 3,000 leads/month
     
     print(f"\nProspect Pool Summary:")
     print("-" * 70)
@@ -89,114 +98,175 @@ def phase1_prospect_pool(client):
     
     return df
 
-def phase2_conversion_rates(client):
-    """Phase 2: Historical Conversion Rate Analysis"""
+def phase2_conversion_rates(cube: ConversionCube):
+    """Phase 2: Historical Conversion Rate Analysis (from the conversion cube)"""
     print("\n" + "=" * 70)
     print("PHASE 2: HISTORICAL CONVERSION RATE ANALYSIS")
     print("=" * 70)
     
     log_to_analysis_log("Starting Phase 2: Conversion Rate Analysis")
     
-    # Query conversion rates with confidence intervals
-    query = f"""
-    WITH historical_leads AS (
-        SELECT 
-            l.Id as lead_id,
-            l.stage_entered_contacting__c as contacted_date,
-            l.MQL_Date__c,
-            CASE WHEN l.Stage_Entered_Call_Scheduled__c IS NOT NULL THEN 1 ELSE 0 END as converted,
-            -- Get tier from January 2026 list (most recent)
-            COALESCE(ll.score_tier, 'UNKNOWN') as score_tier
-        FROM `{PROJECT_ID}.{DATASET_SALESFORCE}.Lead` l
-        LEFT JOIN `{PROJECT_ID}.{DATASET_ML}.january_2026_lead_list_v4` ll
-            ON CAST(REGEXP_REPLACE(CAST(l.FA_CRD__c AS STRING), r'[^0-9]', '') AS INT64) = ll.advisor_crd
-        WHERE l.LeadSource LIKE '%Provided Lead List%'
-          AND DATE(l.stage_entered_contacting__c) >= '2024-01-01'
-          AND DATE(l.stage_entered_contacting__c) <= DATE_SUB(CURRENT_DATE(), INTERVAL 30 DAY)
-          AND l.FA_CRD__c IS NOT NULL
-    ),
-    
-    tier_stats AS (
-        SELECT 
-            score_tier,
-            COUNT(*) as n,
-            SUM(converted) as successes,
-            AVG(converted) as conversion_rate
-        FROM historical_leads
-        WHERE score_tier != 'UNKNOWN'
-        GROUP BY score_tier
-        HAVING COUNT(*) >= 50  -- Minimum sample size
-    )
-    
-    SELECT 
-        score_tier,
-        n,
-        successes,
-        ROUND(conversion_rate * 100, 2) as conversion_rate_pct,
-        
-        -- Wilson score 95% confidence interval (lower)
-        ROUND((
-            (conversion_rate + 1.96*1.96/(2*n) - 1.96 * SQRT((conversion_rate*(1-conversion_rate) + 1.96*1.96/(4*n))/n))
-            / (1 + 1.96*1.96/n)
-        ) * 100, 2) as ci_lower_pct,
-        
-        -- Wilson score 95% confidence interval (upper)
-        ROUND((
-            (conversion_rate + 1.96*1.96/(2*n) + 1.96 * SQRT((conversion_rate*(1-conversion_rate) + 1.96*1.96/(4*n))/n))
-            / (1 + 1.96*1.96/n)
-        ) * 100, 2) as ci_upper_pct,
-        
-        -- Lift vs baseline (3.24% from historical)
-        ROUND(conversion_rate / 0.0324, 2) as lift_vs_baseline
-        
-    FROM tier_stats
-    ORDER BY conversion_rate DESC
-    """
-    
-    print("[INFO] Querying historical conversion rates...")
-    df = client.query(query).to_dataframe()
+    # Provided Lead List contacts since 2024, in months that ended at least 30 days ago
+    mature_end = (pd.Timestamp.today() - pd.Timedelta(days=30)).to_period('M').to_timestamp()
+    history = cube.slice(start='2024-01-01', end=mature_end, lead_source=PROVIDED_LIST_SOURCES)
+    
+    # Minimum sample size 50, Wilson score 95% confidence interval; score_tier is
+    # the tier at contact (UNKNOWN: no backtest or lead list snapshot covers the lead)
+    rates = history.rollup('score_tier', measure='call_scheduled', min_leads=50)
+    rates = rates.drop(index='UNKNOWN', errors='ignore')
+    df = pd.DataFrame({
+        'score_tier': rates.index,
+        'n': rates['leads'].to_numpy(),
+        'successes': rates['conversions'].to_numpy(),
+        'conversion_rate_pct': (rates['conversion_rate'] * 100).round(2).to_numpy(),
+        'ci_lower_pct': (rates['ci_lower'] * 100).round(2).to_numpy(),
+        'ci_upper_pct': (rates['ci_upper'] * 100).round(2).to_numpy(),
+        # Lift vs baseline (3.24% from historical)
+        'lift_vs_baseline': (rates['conversion_rate'] / 0.0324).round(2).to_numpy(),
+    }).sort_values('conversion_rate_pct', ascending=False, ignore_index=True)
     
     # Save results
     output_file = DATA_DIR / "tier_conversion_rates.csv"
     df.to_csv(output_file, index=False)
     print(f"[INFO] Saved to {output_file}")
     
-    print(f"\nConversion Rates by Tier:")
+    print(f"\nConversion Rates by Tier (contacted before {mature_end:%Y-%m-%d}):")
     print("-" * 70)
     print(f"{'Tier':<30} {'Leads':>10} {'Conv':>8} {'Rate':>8} {'CI (95%)':>20} {'Lift':>8}")
     print("-" * 70)
-    for _, row in df.iterrows():
-        print(f"{row['score_tier']:<30} {row['n']:>10,} {row['successes']:>8,} {row['conversion_rate_pct']:>7.2f}% "
-              f"[{row['ci_lower_pct']:.2f}-{row['ci_upper_pct']:.2f}%] {row['lift_vs_baseline']:>7.2f}x")
+    for row in df.itertuples(index=False):
+        print(f"{row.score_tier:<30} {row.n:>10,} {row.successes:>8,} {row.conversion_rate_pct:>7.2f}% "
+              f"[{row.ci_lower_pct:.2f}-{row.ci_upper_pct:.2f}%] {row.lift_vs_baseline:>7.2f}x")
     
     log_to_analysis_log(f"Phase 2 complete. Analyzed {len(df)} tiers")
     
     return df
 
+def phase3_sga_allocation(client, roster: pd.DataFrame, lead_list_file: str = None,
+                          tolerance: float = TIER_MIX_TOLERANCE):
+    """Phase 3: Assign the monthly lead list across SGAs"""
+    print("\n" + "=" * 70)
+    print("PHASE 3: SGA LEAD ALLOCATION")
+    print("=" * 70)
+
+    log_to_analysis_log("Starting Phase 3: SGA Allocation")
+
+    if lead_list_file:
+        print(f"[INFO] Loading lead list from {lead_list_file}...")
+        leads = pd.read_csv(lead_list_file)
+    else:
+        print(f"[INFO] Querying {LEAD_LIST_TABLE}...")
+        leads = client.query(
+            f"SELECT * FROM `{PROJECT_ID}.{DATASET_ML}.{LEAD_LIST_TABLE}`").to_dataframe()
+
+    allocation = allocate_leads(leads, roster, tolerance=tolerance)
+
+    assignments_file = DATA_DIR / "sga_assignments.csv"
+    allocation.leads.to_csv(assignments_file, index=False)
+    allocation.summary.to_csv(DATA_DIR / "sga_allocation_summary.csv")
+    print(f"[INFO] Saved to {assignments_file}")
+
+    assigned = allocation.leads['sga_id'].notna().sum()
+    print(f"\nAllocation Summary ({assigned:,} of {len(leads):,} leads assigned):")
+    print("-" * 70)
+    print(f"{'SGA':<12} {'Leads':>8} {'Capacity':>10} {'Firms':>8} {'Exp Conv':>10} {'Exp Rate':>10}")
+    print("-" * 70)
+    for sga_id, row in allocation.summary.iterrows():
+        rate = row['expected_rate'] * 100 if row['leads'] else 0.0
+        print(f"{sga_id:<12} {row['leads']:>8,} {row['capacity']:>10,} {row['firms']:>8,} "
+              f"{row['expected_conversions']:>10.2f} {rate:>9.2f}%")
+    print("-" * 70)
+    print(f"{'TOTAL':<12} {assigned:>8,} {'':>10} {'':>8} {allocation.expected_conversions:>10.2f}")
+    print(f"Max tier-mix deviation from proportional share: {allocation.max_tier_deviation:.1f} leads")
+
+    log_to_analysis_log(f"Phase 3 complete. {assigned:,} leads, "
+                        f"{allocation.expected_conversions:.1f} expected conversions")
+
+    return allocation
+
+
+def phase4_depletion_plan(pool_df, conversion_df, monthly_usage: int,
+                          months: int = SUSTAINABILITY_HORIZON_MONTHS):
+    """Phase 4: Multi-month tier usage plan against the prospect pool"""
+    print("\n" + "=" * 70)
+    print("PHASE 4: POOL DEPLETION PLAN")
+    print("=" * 70)
+
+    log_to_analysis_log("Starting Phase 4: Depletion Plan")
+
+    pool = pool_df.set_index('estimated_tier')['prospect_count']
+    rates = conversion_df.set_index('score_tier')['conversion_rate_pct'] / 100
+    plan = plan_depletion(pool, rates, monthly_usage, months=months)
+
+    output_file = DATA_DIR / "pool_depletion_plan.csv"
+    plan.to_csv(output_file, index=False)
+    print(f"[INFO] Saved to {output_file}")
+
+    allocated = plan.pivot(index='month', columns='tier', values='allocated')
+    print(f"\nPlanned Leads per Month ({monthly_usage:,}/month):")
+    print(allocated.round(0).astype(int).to_string())
+
+    short = plan.groupby('month')['shortfall'].first()
+    short = short[short > 0]
+    if len(short):
+        print(f"\n[WARN] Pool cannot supply {monthly_usage:,}/month from month {short.index[0]} "
+              f"(shortfall {short.iloc[0]:,.0f})")
+
+    log_to_analysis_log(f"Phase 4 complete. {plan['expected_conversions'].sum():.1f} "
+                        f"expected conversions over {months} months")
+
+    return plan
+
+
 def main():
     """Main execution function"""
+    parser = argparse.ArgumentParser(description='SGA lead distribution optimization analysis')
+    parser.add_argument('--roster', default=None,
+                        help='SGA roster CSV (sga_id, capacity[, rate_multiplier]); default 15 x 200')
+    parser.add_argument('--lead-list', default=None,
+                        help=f'Lead list CSV (default: read {LEAD_LIST_TABLE} from BigQuery)')
+    parser.add_argument('--tolerance', type=float, default=TIER_MIX_TOLERANCE,
+                        help='Allowed tier-mix deviation per SGA (default: 0.10)')
+    parser.add_argument('--months', type=int, default=SUSTAINABILITY_HORIZON_MONTHS,
+                        help='Depletion planning horizon (default: 12)')
+    parser.add_argument('--cube-dir', default=str(CUBE_DIR),
+                        help='Conversion cube directory (default: data/conversion_cube)')
+    parser.add_argument('--skip-cube-update', action='store_true',
+                        help='Use the conversion cube as is, without querying new months')
+    args = parser.parse_args()
+
     print("=" * 70)
     print("SGA LEAD DISTRIBUTION OPTIMIZATION ANALYSIS")
     print(f"Started: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print("=" * 70)
-    
+
     client = bigquery.Client(project=PROJECT_ID)
-    
+    roster = pd.read_csv(args.roster) if args.roster else default_roster()
+    monthly_usage = int(roster['capacity'].sum())
+
     # Phase 1: Prospect Pool
-    pool_df = phase1_prospect_pool(client)
-    
+    pool_df = phase1_prospect_pool(client, monthly_usage)
+
     # Phase 2: Conversion Rates
-    conversion_df = phase2_conversion_rates(client)
-    
+    if not args.skip_cube_update:
+        update_cube(client, args.cube_dir)
+    conversion_df = phase2_conversion_rates(ConversionCube.load(args.cube_dir))
+
+    # Phase 3: SGA Allocation
+    phase3_sga_allocation(client, roster, args.lead_list, args.tolerance)
+
+    # Phase 4: Depletion Plan
+    if pool_df is not None:
+        phase4_depletion_plan(pool_df, conversion_df, monthly_usage, args.months)
+
     print("\n" + "=" * 70)
-    print("ANALYSIS IN PROGRESS")
+    print("ANALYSIS COMPLETE")
     print("=" * 70)
     print("\nNext steps:")
-    print("1. Review Phase 1 & 2 results in reports/sga_optimization/data/")
-    print("2. Continue with Phase 3-7 using the guide")
+    print("1. Review sga_assignments.csv and sga_allocation_summary.csv in reports/sga_optimization/data/")
+    print("2. Review pool_depletion_plan.csv for months with a shortfall")
     print("3. See ANALYSIS_LOG.md for detailed progress")
     print("\n" + "=" * 70)
 
 if __name__ == "__main__":
     main()
-
@@ -0,0 +1,410 @@
+"""
+SGA Lead Allocation Engine
+Assigns the monthly lead list across SGAs and plans tier usage against the
+prospect pool over several months.
+
+1. allocate_leads(): maximizes expected conversions subject to
+   - SGA capacity (and a balanced minimum load when the list is short)
+   - firm exclusivity: every lead from a firm goes to the same SGA
+   - tier-mix fairness: each SGA's count per tier stays within
+   TIER_MIX_TOLERANCE of its proportional share of the list
+   The highest-rate leads that fit the roster are kept, a transportation LP
+   (scipy / HiGHS) sets each SGA's tier targets, and firm blocks are packed
+   largest first into the SGA whose remaining targets they fill best, then
+   one-lead firms are moved from SGAs over a tier target to SGAs under it.
+   Firms are then moved or swapped between SGAs while any SGA is outside
+   the tier-mix band; a breach that is left raises. Leads without a firm are
+   one-lead firms of their own.
+   An exact firm x SGA integer program does not solve in minutes at list size.
+
+2. plan_depletion(): linear program over months x tiers that maximizes
+   (lightly discounted) expected conversions while keeping every tier's
+   pool non-negative and above a terminal reserve, with monthly
+   replenishment.
+
+Usage:
+    from sga_allocation import default_roster, allocate_leads, plan_depletion
+
+    allocation = allocate_leads(lead_list, default_roster())
+    allocation.leads        # lead list + sga_id (NaN = not assigned)
+    allocation.summary      # per-SGA leads, expected conversions, tier mix
+
+    plan = plan_depletion({'TIER_2_PROVEN_MOVER': 50000, ...}, tier_rates, monthly_volume=3000)
+"""
+
+from dataclasses import dataclass
+from typing import Dict, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.optimize import linprog
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+NUM_SGAS = 15
+LEADS_PER_SGA = 200
+TIER_MIX_TOLERANCE = 0.10  # +/- share of an SGA's proportional tier count
+REPLENISHMENT_RATE = 0.02  # ~2% of each tier's pool refreshes monthly
+SUSTAINABILITY_HORIZON_MONTHS = 12
+MONTHLY_DISCOUNT = 0.01  # A conversion next month is worth 1% less
+
+
+@dataclass
+class Allocation:
+    """Result of allocate_leads()."""
+    leads: pd.DataFrame
+    summary: pd.DataFrame
+    expected_conversions: float
+    max_tier_deviation: float  # Largest |leads - proportional share| over (SGA, tier)
+
+
+def default_roster(num_sgas: int = NUM_SGAS, capacity: int = LEADS_PER_SGA) -> pd.DataFrame:
+    """Uniform roster: sga_id, capacity, rate_multiplier (1.0 = average SGA)."""
+    return pd.DataFrame({
+        'sga_id': [f'SGA_{i:02d}' for i in range(1, num_sgas + 1)],
+        'capacity': capacity,
+        'rate_multiplier': 1.0,
+    })
+
+
+def _rate_column(leads: pd.DataFrame, rate_col: Optional[str]) -> str:
+    if rate_col:
+        return rate_col
+    for name in ['final_expected_rate', 'expected_conversion_rate']:
+        if name in leads.columns:
+            return name
+    if 'expected_rate_pct' in leads.columns:
+        return 'expected_rate_pct'
+    raise ValueError("Lead list has no expected rate column "
+                     "(final_expected_rate / expected_conversion_rate / expected_rate_pct)")
+
+
+def _tier_slack(counts: np.ndarray, capacity: np.ndarray, tolerance: float) -> np.ndarray:
+    """Allowed |leads - proportional share| per (tier, SGA): tolerance of the share, at least 1."""
+    fill = min(1.0, counts.sum() / capacity.sum())
+    return np.maximum(1.0, tolerance * np.outer(counts / counts.sum(), capacity * fill))
+
+
+def _band_excess(counts: np.ndarray, shares: np.ndarray, slack: np.ndarray) -> np.ndarray:
+    """Leads outside the tier-mix band, summed over tiers (last axis of counts)."""
+    load = counts.sum(axis=-1, keepdims=True)
+    return np.maximum(np.abs(counts - shares * load) - slack, 0).sum(axis=-1)
+
+
+def _tier_targets(counts: np.ndarray, capacity: np.ndarray, multiplier: np.ndarray,
+                  rates: np.ndarray, tolerance: float) -> np.ndarray:
+    """
+    Transportation LP: leads of each tier per SGA (tiers x SGAs, fractional).
+
+    Maximizes sum(multiplier_s * rate_t * y_ts) with every selected lead
+    placed, SGA load within tolerance of its capacity share, and
+    |y_ts - share_t * load_s| within the fairness slack. A tiny L1 pull
+    towards the proportional split picks the central solution when SGAs
+    are interchangeable (otherwise the LP returns an arbitrary vertex).
+    """
+    n_tiers, n_sgas = len(counts), len(capacity)
+    n_cells = n_tiers * n_sgas
+    total = counts.sum()
+    fill = min(1.0, total / capacity.sum())
+    shares = counts / total
+    proportional = np.outer(shares, capacity * fill).ravel()
+
+    # y[t, s] at t * n_sgas + s, then d[t, s] >= |y - proportional|
+    tier_rows = sparse.kron(sparse.eye(n_tiers), np.ones((1, n_sgas)))
+    load_rows = sparse.kron(np.ones((1, n_tiers)), sparse.eye(n_sgas))
+    # y_ts - share_t * sum_u y_us
+    mix_rows = sparse.eye(n_cells) - sparse.kron(shares[:, None], load_rows)
+    slack = _tier_slack(counts, capacity, tolerance).ravel()
+    min_load = np.floor(capacity * fill * (1 - tolerance))
+    max_load = np.minimum(capacity, np.ceil(capacity * fill * (1 + tolerance)))
+
+    eye, zero_load = sparse.eye(n_cells), sparse.csr_matrix((n_sgas, n_cells))
+    zero_cells = sparse.csr_matrix((n_cells, n_cells))
+    A_ub = sparse.bmat([
+        [load_rows, zero_load],
+        [-load_rows, zero_load],
+        [mix_rows, zero_cells],
+        [-mix_rows, zero_cells],
+        [eye, -eye],
+        [-eye, -eye],
+    ]).tocsr()
+    b_ub = np.concatenate([max_load, -min_load, slack, slack, proportional, -proportional])
+
+    result = linprog(
+        np.concatenate([-np.outer(rates, multiplier).ravel(), np.full(n_cells, 1e-7)]),
+        A_ub=A_ub,
+        b_ub=b_ub,
+        A_eq=sparse.hstack([tier_rows, sparse.csr_matrix((n_tiers, n_cells))]).tocsr(),
+        b_eq=counts,
+        bounds=(0, None),
+        method='highs',
+    )
+    if result.status != 0:
+        raise RuntimeError(f"SGA tier targets infeasible ({result.message}); "
+                           f"try a larger tolerance than {tolerance}")
+    return result.x[:n_cells].reshape(n_tiers, n_sgas)
+
+
+def allocate_leads(
+    leads: pd.DataFrame,
+    roster: pd.DataFrame,
+    tier_col: str = 'score_tier',
+    firm_col: str = 'firm_crd',
+    rate_col: Optional[str] = None,
+    tolerance: float = TIER_MIX_TOLERANCE
+) -> Allocation:
+    """
+    Assign leads to SGAs, maximizing expected conversions.
+
+    Args:
+        leads: Assembled lead list (one row per lead)
+        roster: sga_id, capacity and optional rate_multiplier per SGA
+        tier_col / firm_col: Tier and firm columns of the lead list
+        rate_col: Expected conversion rate column (default: final_expected_rate,
+            then expected_conversion_rate, then expected_rate_pct / 100)
+        tolerance: Allowed deviation from each SGA's proportional tier share
+
+    Returns:
+        Allocation with the lead list (plus sga_id) and a per-SGA summary
+
+    Raises:
+        RuntimeError: An SGA's tier mix cannot be brought within tolerance
+            (e.g. a firm block larger than the band)
+    """
+    rate_col = _rate_column(leads, rate_col)
+    rates = leads[rate_col].astype(float).fillna(0).to_numpy()
+    if rate_col == 'expected_rate_pct':
+        rates = rates / 100
+
+    sga_ids = np.array(roster['sga_id'].tolist(), dtype=object)
+    capacity = roster['capacity'].to_numpy(dtype=float)
+    multiplier = (roster['rate_multiplier'].to_numpy(dtype=float)
+                  if 'rate_multiplier' in roster.columns else np.ones(len(roster)))
+
+    # 1. Keep the highest-rate leads that fit the roster (list_rank breaks ties)
+    rank = leads['list_rank'].to_numpy() if 'list_rank' in leads.columns else np.arange(len(leads))
+    order = np.lexsort((rank, -rates))
+    selected = np.sort(order[:int(min(len(leads), capacity.sum()))])
+
+    out = leads.copy()
+    out['allocated_rate'] = rates
+    if not len(selected):
+        out['sga_id'] = None
+        return Allocation(leads=out, summary=summarize_allocation(out, roster, tier_col, firm_col),
+                          expected_conversions=0.0, max_tier_deviation=0.0)
+
+    tier_codes, tier_names = pd.factorize(leads[tier_col].to_numpy()[selected], use_na_sentinel=False)
+    n_tiers = len(tier_names)
+    tier_counts = np.bincount(tier_codes, minlength=n_tiers).astype(float)
+    tier_rates = np.bincount(tier_codes, weights=rates[selected], minlength=n_tiers) / tier_counts
+
+    # 2. Tier mix per SGA
+    residual = _tier_targets(tier_counts, capacity, multiplier, tier_rates, tolerance).T.copy()
+    room = capacity.copy()
+
+    # 3. Pack firm blocks, largest first, into the SGA whose remaining targets they fill best
+    # A lead without a firm is a firm of its own
+    firm_codes, _ = pd.factorize(leads[firm_col].to_numpy()[selected])
+    no_firm = firm_codes < 0
+    firm_codes[no_firm] = firm_codes.max() + 1 + np.arange(no_firm.sum())
+    blocks = np.zeros((firm_codes.max() + 1, n_tiers))
+    np.add.at(blocks, (firm_codes, tier_codes), 1)
+    sizes = blocks.sum(axis=1)
+
+    assigned = np.full(len(leads), -1)
+    members_of = pd.Series(selected).groupby(firm_codes).apply(list)
+    for f in np.argsort(-sizes, kind='stable'):
+        block = blocks[f]
+        open_load = residual.sum(axis=1)
+        fit = np.minimum(block, np.maximum(residual, 0)).sum(axis=1)
+        # Tier fit, minus load overflow; ties go to the SGA with the most open load
+        score = 2 * fit - sizes[f] - 2 * np.maximum(sizes[f] - open_load, 0) + 1e-3 * open_load
+        fits = room >= sizes[f]
+        s = int(np.argmax(np.where(fits, score, -np.inf))) if fits.any() else int(np.argmax(room))
+        members = members_of[f]
+        if not fits[s]:
+            # No SGA can take the whole firm: keep its best leads, leave the rest unassigned
+            members = sorted(members, key=lambda i: (-rates[i], rank[i]))[:int(room[s])]
+            block = np.bincount(tier_codes[np.searchsorted(selected, members)], minlength=n_tiers)
+        assigned[members] = s
+        residual[s] -= block
+        room[s] -= len(members)
+
+    # 4. Repair: move one-lead firms from SGAs over a tier target to SGAs under it
+    single = selected[sizes[firm_codes] == 1]
+    single_tier = tier_codes[np.searchsorted(selected, single)]
+    for t in range(n_tiers):
+        pool = {s: list(single[(single_tier == t) & (assigned[single] == s)]) for s in range(len(sga_ids))}
+        while True:
+            over, under = int(np.argmin(residual[:, t])), int(np.argmax(residual[:, t]))
+            if residual[over, t] > -0.5 or residual[under, t] < 0.5 or not pool[over] or room[under] < 1:
+                break
+            lead = pool[over].pop()
+            assigned[lead] = under
+            pool[under].append(lead)
+            residual[over, t] += 1
+            residual[under, t] -= 1
+            room[over] += 1
+            room[under] -= 1
+
+    # 5. Tier-mix band: apply the firm move or swap that most reduces the leads
+    #    outside |leads - share * load| <= slack until none is left
+    shares = tier_counts / tier_counts.sum()
+    slack = _tier_slack(tier_counts, capacity, tolerance).T
+    placed = assigned[selected] >= 0
+    lead_sga, lead_tier = assigned[selected][placed], tier_codes[placed]
+    counts = np.zeros((len(sga_ids), n_tiers))
+    np.add.at(counts, (lead_sga, lead_tier), 1)
+    firm_sga = np.full(len(blocks), -1)
+    firm_sga[firm_codes[placed]] = lead_sga
+    blocks = np.zeros_like(blocks)
+    np.add.at(blocks, (firm_codes[placed], lead_tier), 1)
+
+    excess = _band_excess(counts, shares, slack)
+    while excess.sum() > 1e-9:
+        best_gain, best_move = 1e-9, None
+        for v in np.flatnonzero(excess > 1e-9):
+            firms = np.flatnonzero(firm_sga == v)
+            # Firm f leaves v for another SGA, alone (empty row) or in exchange for firm g
+            others = np.flatnonzero((firm_sga >= 0) & (firm_sga != v))
+            u = np.concatenate([np.arange(len(sga_ids)), firm_sga[others]])
+            incoming = np.vstack([np.zeros((len(sga_ids), n_tiers)), blocks[others]])
+            delta = incoming[None] - blocks[firms, None]  # change at v per (f, g)
+            gain = (excess[v] + excess[u] - _band_excess(counts[v] + delta, shares, slack[v])
+                    - _band_excess(counts[u] - delta, shares, slack[u]))
+            load_change = delta.sum(axis=2)
+            gain[(room[v] < load_change) | (room[u] < -load_change) | (u == v)] = -np.inf
+            # ...or a firm g comes to v from elsewhere
+            arriving = _band_excess(counts[v] + blocks[others], shares, slack[v])
+            leaving = _band_excess(counts[firm_sga[others]] - blocks[others], shares, slack[firm_sga[others]])
+            gain_in = excess[v] + excess[firm_sga[others]] - arriving - leaving
+            gain_in[room[v] < blocks[others].sum(axis=1)] = -np.inf
+
+            i, j = np.unravel_index(np.argmax(gain), gain.shape)
+            if gain[i, j] > best_gain:
+                best_gain = gain[i, j]
+                best_move = (v, u[j], [firms[i]], [others[j - len(sga_ids)]] if j >= len(sga_ids) else [])
+            if len(others) and gain_in.max() > best_gain:
+                j = int(np.argmax(gain_in))
+                best_gain, best_move = gain_in[j], (v, firm_sga[others[j]], [], [others[j]])
+        if best_move is None:
+            break
+
+        v, u, out_of_v, into_v = best_move
+        for f, to in [(f, u) for f in out_of_v] + [(g, v) for g in into_v]:
+            frm = firm_sga[f]
+            counts[frm] -= blocks[f]
+            counts[to] += blocks[f]
+            room[frm] += blocks[f].sum()
+            room[to] -= blocks[f].sum()
+            firm_sga[f] = to
+        excess = _band_excess(counts, shares, slack)
+
+    assigned[selected[placed]] = firm_sga[firm_codes[placed]]
+    deviation = np.abs(counts - shares * counts.sum(axis=1, keepdims=True))
+    if excess.sum() > 1e-9:
+        s, t = np.unravel_index(np.argmax(deviation - slack), deviation.shape)
+        raise RuntimeError(
+            f"SGA tier mix outside tolerance {tolerance} for {int((deviation - slack > 1e-9).sum())} "
+            f"(SGA, tier) pairs; worst: {sga_ids[s]} has {counts[s, t]:.0f} {tier_names[t]} leads, "
+            f"allowed {shares[t] * counts[s].sum():.1f} +/- {slack[s, t]:.1f}; try a larger tolerance")
+
+    out['sga_id'] = np.where(assigned >= 0, sga_ids[assigned], None)
+
+    summary = summarize_allocation(out, roster, tier_col, firm_col)
+    return Allocation(
+        leads=out,
+        summary=summary,
+        expected_conversions=float(summary['expected_conversions'].sum()),
+        max_tier_deviation=float(deviation.max()),
+    )
+
+
+def summarize_allocation(leads: pd.DataFrame, roster: pd.DataFrame, tier_col: str = 'score_tier',
+                         firm_col: str = 'firm_crd') -> pd.DataFrame:
+    """Per-SGA leads, capacity, expected conversions, firms and tier counts."""
+    assigned = leads[leads['sga_id'].notna()]
+    roster = roster.set_index('sga_id')
+    summary = assigned.groupby('sga_id').agg(
+        leads=('allocated_rate', 'size'),
+        expected_conversions=('allocated_rate', 'sum'),
+        firms=(firm_col, 'nunique'),
+    ).reindex(roster.index, fill_value=0)
+    if 'rate_multiplier' in roster.columns:
+        summary['expected_conversions'] *= roster['rate_multiplier'].to_numpy()
+    summary['capacity'] = roster['capacity'].to_numpy()
+    summary['expected_rate'] = summary['expected_conversions'] / summary['leads'].where(summary['leads'] > 0)
+    tiers = pd.crosstab(assigned['sga_id'], assigned[tier_col]).reindex(summary.index, fill_value=0)
+    return summary.join(tiers)
+
+
+def plan_depletion(
+    pool: Union[Dict[str, float], pd.Series],
+    tier_rates: Union[Dict[str, float], pd.Series],
+    monthly_volume: Union[float, Sequence[float]],
+    months: int = SUSTAINABILITY_HORIZON_MONTHS,
+    replenishment_rate: float = REPLENISHMENT_RATE,
+    terminal_reserve: float = 0.0,
+    tier_caps: Optional[Dict[str, float]] = None,
+    discount: float = MONTHLY_DISCOUNT
+) -> pd.DataFrame:
+    """
+    Plan monthly tier usage against the prospect pool.
+
+    Args:
+        pool: Current prospects per tier (e.g. prospect_pool_inventory.sql)
+        tier_rates: Expected conversion rate per tier
+        monthly_volume: Leads per month (scalar, or one value per month)
+        months: Planning horizon
+        replenishment_rate: Share of the starting pool added back each month
+        terminal_reserve: Share of each tier's starting pool left at the horizon
+        tier_caps: Optional max leads per tier per month (e.g. TIER_QUOTAS)
+        discount: Monthly discount on conversions (orders equal-value plans)
+
+    Returns:
+        One row per (month, tier): allocated, remaining, expected_conversions,
+        plus a 'shortfall' column when the pool cannot supply monthly_volume
+    """
+    pool = pd.Series(pool, dtype=float)
+    rates = pd.Series(tier_rates, dtype=float).reindex(pool.index).fillna(0.0)
+    volume = np.broadcast_to(np.asarray(monthly_volume, dtype=float), (months,))
+    tiers = list(pool.index)
+    n_tiers = len(tiers)
+    n_vars = months * n_tiers  # a[m, t] at m * n_tiers + t
+
+    weights = (1 - discount) ** np.arange(months)
+    objective = -np.outer(weights, rates.to_numpy()).ravel()
+
+    # Monthly volume: sum_t a[m, t] <= volume[m]
+    volume_rows = sparse.kron(sparse.eye(months), np.ones((1, n_tiers)))
+    # Usage through month m <= pool + m months of replenishment (reserve at the horizon)
+    cumulative_rows = sparse.kron(np.tril(np.ones((months, months))), sparse.eye(n_tiers))
+    replenish = pool.to_numpy() * replenishment_rate
+    supply = pool.to_numpy() + np.arange(months)[:, None] * replenish
+    supply[-1] -= terminal_reserve * pool.to_numpy()
+
+    caps = np.array([tier_caps.get(t, np.inf) if tier_caps else np.inf for t in tiers])
+    result = linprog(
+        objective,
+        A_ub=sparse.vstack([volume_rows, cumulative_rows]).tocsr(),
+        b_ub=np.concatenate([volume, np.maximum(supply, 0).ravel()]),
+        bounds=np.column_stack([np.zeros(n_vars), np.tile(caps, months)]),
+        method='highs',
+    )
+    if result.status != 0:
+        raise RuntimeError(f"Depletion plan unsolved: {result.message}")
+
+    allocated = result.x.reshape(months, n_tiers)
+    remaining = pool.to_numpy() + np.arange(months)[:, None] * replenish - np.cumsum(allocated, axis=0)
+
+    plan = pd.DataFrame({
+        'month': np.repeat(np.arange(1, months + 1), n_tiers),
+        'tier': np.tile(tiers, months),
+        'allocated': allocated.ravel().round(1),
+        'remaining': remaining.ravel().round(1),
+        'expected_conversions': (allocated * rates.to_numpy()).ravel(),
+    })
+    plan['shortfall'] = np.repeat(volume - allocated.sum(axis=1), n_tiers).round(1)
+    return plan
@@ -27,6 +27,8 @@ import json
 import sys
 import os
 
+from recycle_postprocess import expected_conversion_pct, recycle_narratives, recycle_priority, PRIORITY_ORDER
+
 # ============================================================================
 # CONFIGURATION
 # ============================================================================
@@ -40,28 +42,7 @@ EXPORTS_DIR.mkdir(parents=True, exist_ok=True)
 REPORTS_DIR.mkdir(parents=True, exist_ok=True)
 
 TARGET_RECYCLABLE = 600
-
-
-def estimate_conversion_rate(score: float) -> float:
-    """
-    Estimate conversion rate from unified recyclable score.
-    
-    Calibration based on historical data:
-    - Score 50 (baseline) → 3.2% conversion
-    - Score 100 → 6.0% conversion  
-    - Score 135+ → 10.0%+ conversion
-    """
-    if pd.isna(score) or score <= 50:
-        return 3.2
-    elif score <= 100:
-        # Linear: 50→3.2%, 100→6%
-        return 3.2 + (score - 50) * (6.0 - 3.2) / 50
-    elif score <= 135:
-        # Linear: 100→6%, 135→10%
-        return 6.0 + (score - 100) * (10.0 - 6.0) / 35
-    else:
-        # Cap at ~12% for very high scores
-        return min(12.0, 10.0 + (score - 135) * 0.05)
+FULL_POOL_TARGET = 2**31 - 1  # target_count large enough to return every ranked record
 
 
 def check_credentials():
@@ -103,66 +84,6 @@ def check_credentials():
         return False
 
 
-def generate_narrative(row: pd.Series) -> str:
-    """Generate clear narrative explaining why this lead is being recycled."""
-    
-    parts = []
-    
-    # 1. Record type and firm
-    if row.get('record_type') == 'OPPORTUNITY':
-        parts.append(f"**Previously engaged opportunity** at {row.get('current_firm', 'Unknown')}.")
-    else:
-        parts.append(f"**Previously contacted lead** at {row.get('current_firm', 'Unknown')}.")
-    
-    # 2. Score breakdown - why they're ranked high
-    score_factors = []
-    
-    v3_tier = row.get('v3_tier', 'STANDARD')
-    if v3_tier and v3_tier != 'STANDARD':
-        tier_display = v3_tier.replace('_', ' ').replace('TIER ', 'T')
-        score_factors.append(f"V3: {tier_display}")
-    
-    v4_pct = row.get('v4_percentile')
-    if v4_pct and not pd.isna(v4_pct) and float(v4_pct) >= 70:
-        score_factors.append(f"V4: {int(v4_pct)}th pct")
-    
-    timing_reasons = ['Timing', 'Candidate Declined - Timing', 'Candidate Declined - Fear of Change']
-    if row.get('close_reason') in timing_reasons:
-        score_factors.append("Said 'timing was bad'")
-    
-    if row.get('at_bleeding_firm'):
-        score_factors.append("At bleeding firm")
-    
-    days = row.get('days_since_last_contact', 0)
-    if days and not pd.isna(days) and 180 <= float(days) <= 365:
-        score_factors.append(f"Optimal window ({int(days)}d)")
-    
-    if score_factors:
-        parts.append(f"**Signals**: {'; '.join(score_factors)}.")
-    
-    # 3. Previous contact
-    close_reason = row.get('close_reason', 'Unknown')
-    close_date = row.get('close_date')
-    if pd.notna(close_date):
-        try:
-            close_str = pd.to_datetime(close_date).strftime('%b %Y')
-            parts.append(f"Closed {close_str}: '{close_reason}'.")
-        except:
-            pass
-    
-    last_by = row.get('last_contacted_by')
-    if last_by and last_by != 'Unknown' and pd.notna(last_by):
-        parts.append(f"Last contact: {last_by}.")
-    
-    # 4. Score and expected conversion
-    score = row.get('recyclable_score', 0)
-    if score and not pd.isna(score):
-        expected_conv = estimate_conversion_rate(float(score))
-        parts.append(f"**Score: {float(score):.0f}** | Expected: {expected_conv:.1f}%")
-    
-    return " ".join(parts)
-
-
 def query_recyclable_pool(client: bigquery.Client, target_count: int = TARGET_RECYCLABLE) -> pd.DataFrame:
     """Execute the recyclable pool query."""
     
@@ -178,7 +99,8 @@ def query_recyclable_pool(client: bigquery.Client, target_count: int = TARGET_RE
     query = query.replace('DECLARE target_count INT64 DEFAULT 600;', 
                          f'DECLARE target_count INT64 DEFAULT {target_count};')
     
-    print(f"[INFO] Querying recyclable pool (target: {target_count})...")
+    target_label = 'full pool' if target_count >= FULL_POOL_TARGET else f'{target_count:,}'
+    print(f"[INFO] Querying recyclable pool (target: {target_label})...")
     try:
         df = client.query(query).to_dataframe()
         print(f"[INFO] Retrieved {len(df):,} recyclable records")
@@ -194,7 +116,7 @@ def generate_summary_report(df: pd.DataFrame, month: str, year: int) -> str:
     """Generate summary report for recyclable list."""
     
     # Calculate expected conversions
-    df['expected_conv_pct'] = df['recyclable_score'].apply(estimate_conversion_rate)
+    df['expected_conv_pct'] = expected_conversion_pct(df['recyclable_score'])
     total_expected = (df['expected_conv_pct'] / 100).sum()
     avg_rate = df['expected_conv_pct'].mean()
     
@@ -216,7 +138,7 @@ Each lead scored using:
 - **Optimal Window** (+10 pts) - 180-365 days since contact
 - **Bleeding Firm** (+8 pts) - Currently at unstable firm
 
-Top 600 by score selected.
+Top {len(df):,} by score selected.
 
 ---
 
@@ -279,10 +201,27 @@ Top 600 by score selected.
             expected = (subset['expected_conv_pct'] / 100).sum()
             report += f"| {label} | {len(subset):,} | {avg_conv:.1f}% | {expected:.1f} |\n"
     
+    if 'priority' in df.columns:
+        report += """
+---
+
+## Priority Tiers (P1-P6)
+
+| Priority | Count | Opportunities | Avg Score | Expected Conv |
+|----------|-------|---------------|-----------|---------------|
+"""
+        for priority in PRIORITY_ORDER:
+            subset = df[df['priority'] == priority]
+            if len(subset) > 0:
+                opps = (subset['record_type'] == 'OPPORTUNITY').sum()
+                expected = subset['priority_expected_rate'].sum()
+                report += (f"| {priority} | {len(subset):,} | {opps:,} | "
+                           f"{subset['recyclable_score'].mean():.1f} | {expected:.1f} |\n")
+
     report += f"""
 ---
 
-**Summary**: Top 600 recyclable leads by unified score. Expected {total_expected:.0f} conversions.
+**Summary**: Top {len(df):,} recyclable leads by unified score. Expected {total_expected:.0f} conversions.
 """
     
     return report
@@ -293,7 +232,10 @@ def main():
     parser.add_argument('--month', type=str, default='january', help='Month name')
     parser.add_argument('--year', type=int, default=2026, help='Year')
     parser.add_argument('--target', type=int, default=TARGET_RECYCLABLE, help='Target count')
+    parser.add_argument('--full-pool', action='store_true', help='Export every ranked recyclable record (ignores --target)')
+    parser.add_argument('--priorities', action='store_true', help='Add P1-P6 priority tiers to the export and report')
     args = parser.parse_args()
+    target = FULL_POOL_TARGET if args.full_pool else args.target
     
     print("=" * 70)
     print(f"RECYCLABLE LEAD LIST GENERATOR V2.2 - {args.month.upper()} {args.year}")
@@ -314,18 +256,22 @@ def main():
         sys.exit(1)
     
     # Query
-    df = query_recyclable_pool(client, args.target)
+    df = query_recyclable_pool(client, target)
     
     if len(df) == 0:
         print("[ERROR] No recyclable records found")
         sys.exit(1)
     
     # Calculate expected conversion from score
-    df['expected_conv_pct'] = df['recyclable_score'].apply(estimate_conversion_rate)
+    df['expected_conv_pct'] = expected_conversion_pct(df['recyclable_score'])
     
     # Generate narratives
     print("[INFO] Generating recycling narratives...")
-    df['recycle_narrative'] = df.apply(generate_narrative, axis=1)
+    df['recycle_narrative'] = recycle_narratives(df)
+    
+    if args.priorities:
+        print("[INFO] Assigning P1-P6 priority tiers...")
+        df = df.join(recycle_priority(df))
     
     # Export
     export_file = EXPORTS_DIR / f"{args.month}_{args.year}_recyclable_leads.csv"
@@ -0,0 +1,191 @@
+"""
+Vectorized post-processing for the recyclable lead list.
+
+Column-wise versions of the per-row steps in generate_recyclable_list_v2.1.py,
+so the full recyclable pool can be processed in one pass:
+  - expected_conversion_pct(): score -> expected conversion % (np.piecewise)
+  - recycle_narratives(): every narrative clause built as a masked string column
+  - recycle_priority(): P1-P6 priority tiers from the V2 guide, computed locally
+
+Usage:
+    from recycle_postprocess import expected_conversion_pct, recycle_narratives
+
+    df['expected_conv_pct'] = expected_conversion_pct(df['recyclable_score'])
+    df['recycle_narrative'] = recycle_narratives(df)
+"""
+
+import numpy as np
+import pandas as pd
+
+# Close reasons / dispositions (recyclable_pool_master_v2.1.sql PART A)
+TIMING_REASONS = ['Timing', 'Candidate Declined - Timing', 'Candidate Declined - Fear of Change']
+NO_RESPONSE_OPP_REASONS = ['No Response', 'No Longer Responsive', 'No Show – Intro Call', 'No Show / Ghosted']
+NO_RESPONSE_LEAD_REASONS = ['No Response', 'Auto-Closed by Operations', 'No Show / Ghosted']
+NO_RESPONSE_RATE_REASONS = ['No Response', 'No Longer Responsive', 'No Show – Intro Call']
+
+# Narrative close dates
+MONTH_ABBR = np.array(['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
+                       'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'], dtype=object)
+
+# Priority tiers (Monthly_Recyclable_Lead_List_Generation_Guide_V2.md)
+PRIORITY_ORDER = ['P1', 'P2', 'P3', 'P4', 'P5', 'P6']
+
+
+def _column(df: pd.DataFrame, name: str, default=np.nan) -> pd.Series:
+    return df[name] if name in df.columns else pd.Series(default, index=df.index)
+
+
+def _numeric(df: pd.DataFrame, name: str) -> np.ndarray:
+    return pd.to_numeric(_column(df, name), errors='coerce').to_numpy(dtype=float)
+
+
+def _flag(df: pd.DataFrame, name: str) -> np.ndarray:
+    return _column(df, name, False).fillna(False).astype(bool).to_numpy()
+
+
+def _text(df: pd.DataFrame, name: str, missing: str = 'Unknown') -> pd.Series:
+    return _column(df, name).astype(object).where(lambda s: s.notna(), missing).astype(str)
+
+
+def expected_conversion_pct(scores) -> np.ndarray:
+    """
+    Expected conversion % from the unified recyclable score.
+
+    Calibration based on historical data:
+    - Score 50 (baseline) -> 3.2% conversion
+    - Score 100 -> 6.0% conversion
+    - Score 135+ -> 10.0%+ conversion, capped at 12%
+    NULL scores map to the 3.2% baseline.
+    """
+    s = np.asarray(pd.to_numeric(pd.Series(scores), errors='coerce'), dtype=float)
+    s = np.where(np.isnan(s), 0.0, s)
+    return np.piecewise(
+        s,
+        [s <= 50, (s > 50) & (s <= 100), (s > 100) & (s <= 135), s > 135],
+        [3.2,
+         lambda x: 3.2 + (x - 50) * (6.0 - 3.2) / 50,
+         lambda x: 6.0 + (x - 100) * (10.0 - 6.0) / 35,
+         lambda x: np.minimum(12.0, 10.0 + (x - 135) * 0.05)],
+    )
+
+
+def _join(clauses, sep: str) -> pd.Series:
+    """Join string columns row-wise with sep, skipping empty clauses."""
+    joined = None
+    for clause in clauses:
+        if joined is None:
+            joined = clause
+        else:
+            joined = joined + np.where((joined != '') & (clause != ''), sep, '') + clause
+    return joined
+
+
+def _masked(mask: np.ndarray, values: pd.Series, index) -> pd.Series:
+    return pd.Series(np.where(mask, values, ''), index=index, dtype=object)
+
+
+def recycle_narratives(df: pd.DataFrame) -> pd.Series:
+    """
+    Narrative explaining why each lead is being recycled.
+
+    Clauses, in order: record type and firm; signals (V3 tier, V4 >= 70th pct,
+    timing disposition, bleeding firm, 180-365 day window); close date and
+    reason; last contact; score and expected conversion.
+    """
+    idx = df.index
+    empty = pd.Series('', index=idx, dtype=object)
+
+    firm = _text(df, 'current_firm')
+    is_opp = (_column(df, 'record_type') == 'OPPORTUNITY').to_numpy()
+    intro = (pd.Series(np.where(is_opp, '**Previously engaged opportunity** at ',
+                                '**Previously contacted lead** at '), index=idx) + firm + '.')
+
+    # Signals
+    v3_tier = _column(df, 'v3_tier', 'STANDARD')
+    has_tier = (v3_tier.notna() & (v3_tier != 'STANDARD')).to_numpy()
+    tier_display = v3_tier.astype(str).str.replace('_', ' ').str.replace('TIER ', 'T')
+    v4 = _numeric(df, 'v4_percentile')
+    high_v4 = v4 >= 70
+    v4_text = pd.Series(np.where(high_v4, np.nan_to_num(v4), 0).astype(int), index=idx).astype(str)
+    close_reason = _column(df, 'close_reason')
+    days = _numeric(df, 'days_since_last_contact')
+    in_window = (days >= 180) & (days <= 365)
+    days_text = pd.Series(np.where(in_window, days, 0).astype(int), index=idx).astype(str)
+
+    signals = _join([
+        _masked(has_tier, 'V3: ' + tier_display, idx),
+        _masked(high_v4, 'V4: ' + v4_text + 'th pct', idx),
+        _masked(close_reason.isin(TIMING_REASONS).to_numpy(), "Said 'timing was bad'", idx),
+        _masked(_flag(df, 'at_bleeding_firm'), 'At bleeding firm', idx),
+        _masked(in_window, 'Optimal window (' + days_text + 'd)', idx),
+    ], '; ')
+    signals = _masked((signals != '').to_numpy(), '**Signals**: ' + signals + '.', idx)
+
+    # Previous contact
+    # '%b %Y' from month/year lookups - strftime is the slowest step on a full pool
+    close_date = pd.to_datetime(_column(df, 'close_date'), errors='coerce')
+    has_close = close_date.notna().to_numpy()
+    month = pd.Series(MONTH_ABBR[close_date.dt.month.fillna(1).astype(int).to_numpy() - 1], index=idx)
+    year = close_date.dt.year.fillna(0).astype(int).astype(str)
+    closed = _masked(has_close, 'Closed ' + month + ' ' + year + ": '"
+                     + _text(df, 'close_reason') + "'.", idx)
+    last_by = _column(df, 'last_contacted_by')
+    contacted = _masked((last_by.notna() & (last_by != 'Unknown') & (last_by != '')).to_numpy(),
+                        'Last contact: ' + last_by.astype(str) + '.', idx)
+
+    # Score and expected conversion
+    score = _numeric(df, 'recyclable_score')
+    has_score = ~np.isnan(score) & (score != 0)
+    score_text = pd.Series(np.char.mod('%.0f', np.nan_to_num(score)), index=idx)
+    expected_text = pd.Series(np.char.mod('%.1f', expected_conversion_pct(score)), index=idx)
+    scored = _masked(has_score, '**Score: ' + score_text + '** | Expected: ' + expected_text + '%', idx)
+
+    return _join([intro, signals, closed, contacted, scored, empty], ' ')
+
+
+def recycle_priority(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    P1-P6 priority tiers and their expected conversion rates.
+
+    Follows the with_priority CASE in Monthly_Recyclable_Lead_List_Generation_Guide_V2.md.
+    On the exported list, years_at_current_firm is already rounded to 0.1,
+    which can move rows sitting exactly on the 2 / 3 year boundaries.
+
+    Returns:
+        DataFrame with recycle_priority (e.g. 'P2_HIGH_V4_LONG_TENURE_OPP'),
+        priority (P1-P6) and priority_expected_rate
+    """
+    is_opp = (_column(df, 'record_type') == 'OPPORTUNITY').to_numpy()
+    timing = _flag(df, 'is_timing_reason')
+    changed = _flag(df, 'changed_firms_since_close')
+    days = _numeric(df, 'days_since_last_contact')
+    v4 = _numeric(df, 'v4_percentile')
+    years_now = _numeric(df, 'years_at_current_firm_now')
+    years = _numeric(df, 'years_at_current_firm')
+    reason = _column(df, 'close_reason')
+
+    p1 = timing & (days >= 180) & (days <= 365)
+    p2 = (v4 >= 80) & (_column(df, 'changed_firms_since_close') == False).to_numpy() & (years_now >= 3)
+    p3 = (v4 >= 70) & np.where(is_opp, reason.isin(NO_RESPONSE_OPP_REASONS).to_numpy(),
+                               reason.isin(NO_RESPONSE_LEAD_REASONS).to_numpy())
+    p4 = changed & (years >= 2) & (years <= 3)
+    p5 = changed & (years > 3) & (v4 >= 60)
+    labels = ['P1_TIMING', 'P2_HIGH_V4_LONG_TENURE', 'P3_NO_RESPONSE_HIGH_V4',
+              'P4_CHANGED_2_3_YRS', 'P5_CHANGED_3_PLUS_YRS']
+    label = np.select([p1, p2, p3, p4, p5], labels, 'P6_STANDARD')
+    label = pd.Series(label, index=df.index) + np.where(is_opp, '_OPP', '_LEAD')
+
+    # The guide's rate CASE uses the opportunity reason list and no V4 cut on P5
+    rate = np.select([
+        p1,
+        p2,
+        reason.isin(NO_RESPONSE_RATE_REASONS).to_numpy() & (v4 >= 70),
+        p4,
+        changed & (years > 3),
+    ], [0.07, 0.06, 0.05, 0.045, 0.04], 0.03)
+
+    return pd.DataFrame({
+        'recycle_priority': label,
+        'priority': label.str[:2],
+        'priority_expected_rate': rate,
+    }, index=df.index)
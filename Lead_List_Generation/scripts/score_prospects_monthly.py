@@ -5,11 +5,17 @@ Run monthly BEFORE lead list generation.
 UPDATED: 
 - Includes SHAP narrative generation for V4 upgraded leads
 - Extracts top 3 SHAP features per prospect
+- Compares features and scores with the training distribution (drift_profile.json)
+  while scoring; PSI/KS alerts block the upload unless --allow-drift is given
+- Writes a span trace of the run (fetch, per-batch predict/drift update,
+  narratives, upload) to logs/traces/ (see Version-4/utils/tracing.py)
 
 Working Directory: Lead_List_Generation
-Usage: python scripts/score_prospects_monthly.py
+Usage: python scripts/score_prospects_monthly.py [--allow-drift]
 """
 
+import sys
+import argparse
 import pandas as pd
 import numpy as np
 from pathlib import Path
@@ -20,6 +26,12 @@ from datetime import datetime
 import xgboost as xgb
 import shap
 
+sys.path.insert(0, str(Path(r"C:\Users\russe\Documents\Lead Scoring\Version-4")))
+from utils.drift_monitor import DriftProfile, DriftMonitor, DRIFT_PROFILE_FILENAME, format_drift_report
+from utils.feature_dtypes import FeatureDtypePlan, bytes_per_row
+from utils.tracing import Tracer
+from config.constants import LeadListConfig
+
 # ============================================================================
 # PATH CONFIGURATION
 # ============================================================================
@@ -29,6 +41,7 @@ V4_FEATURES_FILE = Path(r"C:\Users\russe\Documents\Lead Scoring\Version-4\data\p
 
 EXPORTS_DIR = WORKING_DIR / "exports"
 LOGS_DIR = WORKING_DIR / "logs"
+TRACE_DIR = LOGS_DIR / "traces"
 
 EXPORTS_DIR.mkdir(parents=True, exist_ok=True)
 LOGS_DIR.mkdir(parents=True, exist_ok=True)
@@ -41,9 +54,16 @@ DATASET = "ml_features"
 FEATURES_TABLE = "v4_prospect_features"
 SCORES_TABLE = "v4_prospect_scores"
 
-# Thresholds
-DEPRIORITIZE_PERCENTILE = 20
-V4_UPGRADE_PERCENTILE = 80
+# Thresholds: one definition in Version-4/config/constants.py (LeadListConfig),
+# shared with Version-4/scripts/run_threshold_sweep.py
+DEPRIORITIZE_PERCENTILE = LeadListConfig.DEPRIORITIZE_PERCENTILE
+V4_UPGRADE_PERCENTILE = LeadListConfig.V4_UPGRADE_PERCENTILE
+
+# Rows per predict call; each batch also updates the drift histograms
+SCORING_BATCH_SIZE = 100_000
+
+# Span timings for this run, written to TRACE_DIR at the end
+TRACER = Tracer()
 
 # ============================================================================
 # SHAP FEATURE DESCRIPTIONS (Human-readable explanations)
@@ -146,61 +166,79 @@ def load_features_list():
     return features
 
 
-def fetch_prospect_features(client):
-    """Fetch prospect features from BigQuery."""
+def fetch_prospect_features(client, plan):
+    """Fetch prospect features from BigQuery, converted to the compact dtype plan."""
     query = f"""
     SELECT *
     FROM `{PROJECT_ID}.{DATASET}.{FEATURES_TABLE}`
     """
     print(f"[INFO] Fetching features from {FEATURES_TABLE}...")
     df = client.query(query).to_dataframe()
-    print(f"[INFO] Loaded {len(df):,} prospects")
+    before = bytes_per_row(df, plan.features)
+    plan.apply(df)
+    print(f"[INFO] Loaded {len(df):,} prospects "
+          f"(model features {before:.0f} -> {bytes_per_row(df, plan.features):.0f} bytes/prospect)")
     return df
 
 
-def prepare_features(df, feature_list):
-    """Prepare features for model inference."""
-    X = df.copy()
-    
-    # Select only required features
-    missing = set(feature_list) - set(X.columns)
+def prepare_features(df, plan):
+    """
+    Encode the model features into a float32 matrix (DataFrame) for inference.
+
+    NULL categories encode as -1, as in the training matrices (this script
+    used 0 before the dtype plan).
+    """
+    missing = set(plan.features) - set(df.columns)
     if missing:
         print(f"[WARNING] Missing features (will be filled with 0): {missing}")
-        for m in missing:
-            X[m] = 0
-    
-    X = X[feature_list].copy()
-    
-    # Encode categoricals
-    categorical_cols = ['tenure_bucket', 'experience_bucket', 'mobility_tier', 'firm_stability_tier']
-    for col in categorical_cols:
-        if col in X.columns:
-            X[col] = X[col].astype('category').cat.codes
-            X[col] = X[col].replace(-1, 0)
-    
-    # Fill NaN
-    X = X.fillna(0)
-    
-    # Ensure numeric types
-    for col in X.columns:
-        if X[col].dtype == 'object':
-            try:
-                X[col] = pd.to_numeric(X[col], errors='coerce').fillna(0)
-            except:
-                pass
-    
-    return X
-
-
-def score_prospects(model, X):
-    """Generate V4 scores."""
-    dmatrix = xgb.DMatrix(X)
-    scores = model.predict(dmatrix)
+    return plan.encode_frame(df)
+
+
+def score_prospects(model, X, df_raw=None, monitor=None):
+    """Generate V4 scores, feeding each scored batch to the drift monitor."""
+    scores = np.empty(len(X), dtype=np.float32)
+    for start in range(0, len(X), SCORING_BATCH_SIZE):
+        end = min(start + SCORING_BATCH_SIZE, len(X))
+        with TRACER.span("Predict batch", rows=end - start):
+            scores[start:end] = model.predict(xgb.DMatrix(X.iloc[start:end]))
+        if monitor is not None:
+            with TRACER.span("Drift update", rows=end - start):
+                monitor.update(df_raw.iloc[start:end], scores[start:end])
     print(f"[INFO] Scored {len(scores):,} prospects")
     print(f"[INFO] Score range: {scores.min():.4f} - {scores.max():.4f}")
     return scores
 
 
+def load_drift_monitor():
+    """Drift monitor against the training profile, or None if the model has no profile."""
+    profile_path = V4_MODEL_DIR / DRIFT_PROFILE_FILENAME
+    if not profile_path.exists():
+        print(f"[WARNING] No drift profile at {profile_path} - drift check skipped (re-run Phase 6)")
+        return None
+    profile = DriftProfile.load(profile_path)
+    print(f"[INFO] Loaded drift profile ({len(profile.histograms)} histograms, "
+          f"{profile.metadata.get('rows', 0):,} training rows)")
+    return DriftMonitor(profile)
+
+
+def write_drift_report(monitor):
+    """Save the drift report and return (report, blocked)."""
+    report = monitor.report()
+    blocked = monitor.blocked(report)
+    report_file = LOGS_DIR / f"drift_report_{datetime.now().strftime('%Y%m%d')}.md"
+    with open(report_file, 'w', encoding='utf-8') as f:
+        f.write(format_drift_report(report, f"V4 Feature Drift - {monitor.rows:,} prospects"))
+    
+    flagged = report[report['status'] != 'OK']
+    print(f"[INFO] Drift report saved to {report_file}")
+    for row in flagged.itertuples(index=False):
+        print(f"[{'ERROR' if row.status in ('ABSENT', 'ALERT') else 'WARNING'}] Drift {row.status}: "
+              f"{row.feature} (PSI {row.psi:.3f}, KS {row.ks:.3f}, unseen {row.unseen_pct:.2f}%)")
+    if flagged.empty:
+        print("[INFO] No feature drift against training distribution")
+    return report, blocked
+
+
 def calculate_percentiles(scores):
     """Calculate percentile ranks (0-99)."""
     percentiles = pd.Series(scores).rank(pct=True, method='min') * 100
@@ -389,27 +427,66 @@ def upload_scores(client, df_scores):
     print(f"[INFO] Uploaded {len(df_scores):,} scores to {table_id}")
 
 
+def write_trace(run_span, status: str) -> str:
+    """Close the run span, write the Chrome trace and span metrics to TRACE_DIR; returns the span table."""
+    TRACER.end_span(run_span)
+    try:
+        paths = TRACER.write(TRACE_DIR, f"v4_scoring_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
+                             extra={'status': status})
+        print(f"[INFO] Trace written to {paths['trace']}")
+    except OSError as e:
+        print(f"[WARNING] Trace files not written: {e}")
+    return TRACER.markdown_table()
+
+
 def main():
+    parser = argparse.ArgumentParser(description='Score prospects with the V4 model')
+    parser.add_argument('--allow-drift', action='store_true',
+                        help='Upload scores even if the drift check raises alerts')
+    args = parser.parse_args()
+    
     print("=" * 70)
     print("V4 MONTHLY PROSPECT SCORING WITH SHAP NARRATIVES")
     print(f"Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print(f"Working Directory: {WORKING_DIR}")
     print("=" * 70)
     
+    run_span = TRACER.start_span("V4 monthly scoring")
+    
     # Initialize
     client = bigquery.Client(project=PROJECT_ID)
     model = load_model()
     feature_list = load_features_list()
+    plan = FeatureDtypePlan(feature_list)
     
     # Fetch features
-    df_raw = fetch_prospect_features(client)
+    with TRACER.span("Fetch prospect features") as span:
+        df_raw = fetch_prospect_features(client, plan)
+        span.rows = len(df_raw)
     
     # Prepare features
-    X = prepare_features(df_raw, feature_list)
-    
-    # Score
-    scores = score_prospects(model, X)
-    percentiles = calculate_percentiles(scores)
+    with TRACER.span("Prepare features", rows=len(df_raw)):
+        X = prepare_features(df_raw, plan)
+    
+    # Score (drift histograms are filled batch by batch in the same pass)
+    monitor = load_drift_monitor()
+    with TRACER.span("Score prospects", rows=len(X)):
+        scores = score_prospects(model, X, df_raw, monitor)
+        percentiles = calculate_percentiles(scores)
+    
+    if monitor is not None:
+        drift_report, drift_blocked = write_drift_report(monitor)
+        if drift_blocked and not args.allow_drift:
+            flagged = drift_report.loc[drift_report['status'].isin(['ABSENT', 'ALERT']), 'feature']
+            print("[ERROR] Feature drift check failed - scores NOT uploaded "
+                  "(review the drift report, or re-run with --allow-drift)")
+            trace_table = write_trace(run_span, status="BLOCKED")
+            with open(LOGS_DIR / "EXECUTION_LOG.md", 'a', encoding='utf-8') as f:
+                f.write(f"\n## Step 2: V4 Scoring with SHAP Narratives - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
+                f.write(f"**Status**: ❌ BLOCKED (feature drift)\n\n")
+                f.write(f"- Features in alert: {', '.join(flagged)}\n\n")
+                f.write(f"**Trace:**\n\n{trace_table}\n---\n\n")
+            sys.exit(1)
     
     # Calculate feature importance (using XGBoost native importance as fallback)
     # This is faster and more reliable than SHAP for large datasets
@@ -449,7 +526,8 @@ def main():
             shap_values[:, i] = feat_normalized * importance_dict.get(feat, 0.0)
     
     # Extract top features and generate narratives
-    shap_results = extract_top_shap_features(shap_values, feature_list, scores, percentiles)
+    with TRACER.span("Narratives", rows=len(scores)):
+        shap_results = extract_top_shap_features(shap_values, feature_list, scores, percentiles)
     
     # Build output DataFrame
     df_scores = pd.DataFrame({
@@ -469,7 +547,9 @@ def main():
     })
     
     # Upload to BigQuery
-    upload_scores(client, df_scores)
+    with TRACER.span("Upload scores", rows=len(df_scores)):
+        upload_scores(client, df_scores)
+    trace_table = write_trace(run_span, status="SUCCESS")
     
     # Summary
     print("\n" + "=" * 70)
@@ -505,6 +585,7 @@ def main():
         f.write(f"- `shap_top1/2/3_value`: SHAP values for those features\n")
         f.write(f"- `v4_narrative`: Human-readable narrative for V4 upgrades\n")
         f.write(f"\n**Table Updated**: `{PROJECT_ID}.{DATASET}.{SCORES_TABLE}`\n\n")
+        f.write(f"**Trace:**\n\n{trace_table}\n")
         f.write("---\n\n")
     
     print(f"[INFO] Logged to {log_file}")
@@ -13,29 +13,37 @@
 -- - Ritholtz Wealth Management (CRD 168652) - Partner firm
 -- ============================================================================
 
+-- Firm departures/arrivals (F, G) read last month's firm_month_flows row;
+-- stop instead of silently using an older month when the refresh is late
+ASSERT EXISTS (
+    SELECT 1 FROM `savvy-gtm-analytics.ml_features.firm_month_flows`
+    WHERE flow_month = DATE_SUB(DATE_TRUNC(CURRENT_DATE(), MONTH), INTERVAL 1 MONTH)
+)
+AS 'firm_month_flows has no row for last month: run firm_stability_engineering/04_monthly_refresh.sql first';
+
 CREATE OR REPLACE TABLE `savvy-gtm-analytics.ml_features.january_2026_lead_list_v4` AS
 
 WITH 
 -- ============================================================================
 -- A. EXCLUSIONS (Wirehouses + Insurance + Specific Firms)
 -- ============================================================================
+-- Pattern blocks (BEGIN/END pattern_registry) are generated from
+-- Version-4/config/constants.py (EXCLUDED_FIRM_PATTERNS, EXCLUDED_TITLE_PATTERNS,
+-- HV_WEALTH_TITLE_PATTERNS): edit the lists there, then run
+-- Version-4/scripts/verify_sql_patterns.py --write. monthly_pipeline.py refuses
+-- to run this file while a block differs from the registry.
 excluded_firms AS (
     SELECT firm_pattern FROM UNNEST([
-        -- Wirehouses
-        '%J.P. MORGAN%', '%MORGAN STANLEY%', '%MERRILL%', '%WELLS FARGO%', 
-        '%UBS %', '%UBS,%', '%EDWARD JONES%', '%AMERIPRISE%', 
-        '%NORTHWESTERN MUTUAL%', '%PRUDENTIAL%', '%RAYMOND JAMES%',
-        '%FIDELITY%', '%SCHWAB%', '%VANGUARD%', '%GOLDMAN SACHS%', '%CITIGROUP%',
-        '%LPL FINANCIAL%', '%COMMONWEALTH%', '%CETERA%', '%CAMBRIDGE%',
-        '%OSAIC%', '%PRIMERICA%',
-        -- Insurance
-        '%STATE FARM%', '%ALLSTATE%', '%NEW YORK LIFE%', '%NYLIFE%',
-        '%TRANSAMERICA%', '%FARM BUREAU%', '%NATIONWIDE%',
-        '%LINCOLN FINANCIAL%', '%MASS MUTUAL%', '%MASSMUTUAL%',
-        '%INSURANCE%',
-        -- Specific firm name exclusions (backup for CRD exclusion)
-        '%SAVVY WEALTH%', '%SAVVY ADVISORS%',
-        '%RITHOLTZ%'
+        -- BEGIN pattern_registry: is_excluded_firm
+        '%J.P. MORGAN%', '%MORGAN STANLEY%', '%MERRILL%', '%WELLS FARGO%', '%UBS %',
+        '%UBS,%', '%EDWARD JONES%', '%AMERIPRISE%', '%NORTHWESTERN MUTUAL%',
+        '%PRUDENTIAL%', '%RAYMOND JAMES%', '%FIDELITY%', '%SCHWAB%', '%VANGUARD%',
+        '%GOLDMAN SACHS%', '%CITIGROUP%', '%LPL FINANCIAL%', '%COMMONWEALTH%',
+        '%CETERA%', '%CAMBRIDGE%', '%OSAIC%', '%PRIMERICA%', '%STATE FARM%',
+        '%ALLSTATE%', '%NEW YORK LIFE%', '%NYLIFE%', '%TRANSAMERICA%', '%FARM BUREAU%',
+        '%NATIONWIDE%', '%LINCOLN FINANCIAL%', '%MASS MUTUAL%', '%MASSMUTUAL%',
+        '%INSURANCE%', '%SAVVY WEALTH%', '%SAVVY ADVISORS%', '%RITHOLTZ%'
+        -- END pattern_registry
     ]) as firm_pattern
 ),
 
@@ -118,29 +126,31 @@ firm_headcount AS (
 ),
 
 -- ============================================================================
--- F. FIRM DEPARTURES
+-- F. FIRM DEPARTURES (12 completed months, firm_month_flows prefix sums)
 -- ============================================================================
 firm_departures AS (
     SELECT
-        SAFE_CAST(PREVIOUS_REGISTRATION_COMPANY_CRD_ID AS INT64) as firm_crd,
-        COUNT(DISTINCT RIA_CONTACT_CRD_ID) as departures_12mo
-    FROM `savvy-gtm-analytics.FinTrx_data_CA.contact_registered_employment_history`
-    WHERE PREVIOUS_REGISTRATION_COMPANY_END_DATE IS NOT NULL
-      AND PREVIOUS_REGISTRATION_COMPANY_END_DATE >= DATE_SUB(CURRENT_DATE(), INTERVAL 12 MONTH)
-    GROUP BY 1
+        f.firm_crd,
+        f.cum_departures - COALESCE(f_12.cum_departures, 0) as departures_12mo
+    FROM `savvy-gtm-analytics.ml_features.firm_month_flows` f
+    LEFT JOIN `savvy-gtm-analytics.ml_features.firm_month_flows` f_12
+        ON f_12.firm_crd = f.firm_crd
+        AND f_12.flow_month = DATE_SUB(f.flow_month, INTERVAL 12 MONTH)
+    WHERE f.flow_month = DATE_SUB(DATE_TRUNC(CURRENT_DATE(), MONTH), INTERVAL 1 MONTH)
 ),
 
 -- ============================================================================
--- G. FIRM ARRIVALS
+-- G. FIRM ARRIVALS (12 completed months, firm_month_flows prefix sums)
 -- ============================================================================
 firm_arrivals AS (
     SELECT
-        SAFE_CAST(PRIMARY_FIRM AS INT64) as firm_crd,
-        COUNT(DISTINCT RIA_CONTACT_CRD_ID) as arrivals_12mo
-    FROM `savvy-gtm-analytics.FinTrx_data_CA.ria_contacts_current`
-    WHERE PRIMARY_FIRM_START_DATE >= DATE_SUB(CURRENT_DATE(), INTERVAL 12 MONTH)
-      AND PRIMARY_FIRM IS NOT NULL
-    GROUP BY 1
+        f.firm_crd,
+        f.cum_arrivals - COALESCE(f_12.cum_arrivals, 0) as arrivals_12mo
+    FROM `savvy-gtm-analytics.ml_features.firm_month_flows` f
+    LEFT JOIN `savvy-gtm-analytics.ml_features.firm_month_flows` f_12
+        ON f_12.firm_crd = f.firm_crd
+        AND f_12.flow_month = DATE_SUB(f.flow_month, INTERVAL 12 MONTH)
+    WHERE f.flow_month = DATE_SUB(DATE_TRUNC(CURRENT_DATE(), MONTH), INTERVAL 1 MONTH)
 ),
 
 -- ============================================================================
@@ -194,6 +204,7 @@ base_prospects AS (
       AND SAFE_CAST(c.PRIMARY_FIRM AS INT64) NOT IN (SELECT firm_crd FROM excluded_firm_crds)
       -- Title exclusions
       AND NOT (
+          -- BEGIN pattern_registry: is_excluded_title title=c.TITLE_NAME
           UPPER(c.TITLE_NAME) LIKE '%FINANCIAL SOLUTIONS ADVISOR%'
           OR UPPER(c.TITLE_NAME) LIKE '%PARAPLANNER%'
           OR UPPER(c.TITLE_NAME) LIKE '%ASSOCIATE ADVISOR%'
@@ -203,6 +214,7 @@ base_prospects AS (
           OR UPPER(c.TITLE_NAME) LIKE '%ASSISTANT%'
           OR UPPER(c.TITLE_NAME) LIKE '%INSURANCE AGENT%'
           OR UPPER(c.TITLE_NAME) LIKE '%INSURANCE%'
+          -- END pattern_registry
       )
 ),
 
@@ -225,16 +237,28 @@ enriched_prospects AS (
         CASE WHEN EXISTS (SELECT 1 FROM excluded_firms ef WHERE UPPER(bp.firm_name) LIKE ef.firm_pattern) THEN 1 ELSE 0 END as is_wirehouse,
         
         -- Certifications
-        CASE WHEN c.CONTACT_BIO LIKE '%CFP%' OR c.TITLE_NAME LIKE '%CFP%' THEN 1 ELSE 0 END as has_cfp,
+        CASE WHEN (
+            -- BEGIN pattern_registry: has_cfp bio=c.CONTACT_BIO title=c.TITLE_NAME
+            c.CONTACT_BIO LIKE '%CFP%'
+            OR c.TITLE_NAME LIKE '%CFP%'
+            -- END pattern_registry
+        ) THEN 1 ELSE 0 END as has_cfp,
         CASE WHEN c.REP_LICENSES LIKE '%Series 65%' AND c.REP_LICENSES NOT LIKE '%Series 7%' THEN 1 ELSE 0 END as has_series_65_only,
         CASE WHEN c.REP_LICENSES LIKE '%Series 7%' THEN 1 ELSE 0 END as has_series_7,
-        CASE WHEN c.CONTACT_BIO LIKE '%CFA%' OR c.TITLE_NAME LIKE '%CFA%' THEN 1 ELSE 0 END as has_cfa,
+        CASE WHEN (
+            -- BEGIN pattern_registry: has_cfa bio=c.CONTACT_BIO title=c.TITLE_NAME
+            c.CONTACT_BIO LIKE '%CFA%'
+            OR c.TITLE_NAME LIKE '%CFA%'
+            -- END pattern_registry
+        ) THEN 1 ELSE 0 END as has_cfa,
         
         -- High-value wealth title
         CASE WHEN (
+            -- BEGIN pattern_registry: is_hv_wealth_title title=c.TITLE_NAME
             UPPER(c.TITLE_NAME) LIKE '%WEALTH MANAGER%'
             OR UPPER(c.TITLE_NAME) LIKE '%DIRECTOR%WEALTH%'
             OR UPPER(c.TITLE_NAME) LIKE '%SENIOR WEALTH ADVISOR%'
+            -- END pattern_registry
         ) THEN 1 ELSE 0 END as is_hv_wealth_title,
         
         -- LinkedIn
@@ -279,16 +303,16 @@ scored_prospects AS (
     SELECT 
         ep.*,
         
+        -- Tier blocks (BEGIN/END tier_rules) are generated from V3_TIER_SPEC in
+        -- Version-3/utils/tier_rules.py: edit the spec there, then run
+        -- Version-3/scripts/verify_tier_rules.py --write. monthly_pipeline.py
+        -- refuses to run this file while a block differs from the spec.
         -- Score tier
-        CASE 
+        -- BEGIN tier_rules: score_tier
+        CASE
             WHEN (tenure_years BETWEEN 1 AND 4 AND industry_tenure_years >= 5 AND firm_net_change_12mo < 0 AND has_cfp = 1 AND is_wirehouse = 0) THEN 'TIER_1A_PRIME_MOVER_CFP'
-            WHEN (((tenure_years BETWEEN 1 AND 3 AND industry_tenure_years BETWEEN 5 AND 15 AND firm_net_change_12mo < 0 AND firm_rep_count <= 50 AND is_wirehouse = 0)
-                  OR (tenure_years BETWEEN 1 AND 3 AND firm_rep_count <= 10 AND is_wirehouse = 0)
-                  OR (tenure_years BETWEEN 1 AND 4 AND industry_tenure_years BETWEEN 5 AND 15 AND firm_net_change_12mo < 0 AND is_wirehouse = 0))
-                  AND has_series_65_only = 1) THEN 'TIER_1B_PRIME_MOVER_SERIES65'
-            WHEN ((tenure_years BETWEEN 1 AND 3 AND industry_tenure_years BETWEEN 5 AND 15 AND firm_net_change_12mo < 0 AND firm_rep_count <= 50 AND is_wirehouse = 0)
-                  OR (tenure_years BETWEEN 1 AND 3 AND firm_rep_count <= 10 AND is_wirehouse = 0)
-                  OR (tenure_years BETWEEN 1 AND 4 AND industry_tenure_years BETWEEN 5 AND 15 AND firm_net_change_12mo < 0 AND is_wirehouse = 0)) THEN 'TIER_1_PRIME_MOVER'
+            WHEN (((tenure_years BETWEEN 1 AND 3 AND industry_tenure_years BETWEEN 5 AND 15 AND firm_net_change_12mo < 0 AND firm_rep_count <= 50 AND is_wirehouse = 0) OR (tenure_years BETWEEN 1 AND 3 AND firm_rep_count <= 10 AND is_wirehouse = 0) OR (tenure_years BETWEEN 1 AND 4 AND industry_tenure_years BETWEEN 5 AND 15 AND firm_net_change_12mo < 0 AND is_wirehouse = 0)) AND has_series_65_only = 1) THEN 'TIER_1B_PRIME_MOVER_SERIES65'
+            WHEN ((tenure_years BETWEEN 1 AND 3 AND industry_tenure_years BETWEEN 5 AND 15 AND firm_net_change_12mo < 0 AND firm_rep_count <= 50 AND is_wirehouse = 0) OR (tenure_years BETWEEN 1 AND 3 AND firm_rep_count <= 10 AND is_wirehouse = 0) OR (tenure_years BETWEEN 1 AND 4 AND industry_tenure_years BETWEEN 5 AND 15 AND firm_net_change_12mo < 0 AND is_wirehouse = 0)) THEN 'TIER_1_PRIME_MOVER'
             WHEN (is_hv_wealth_title = 1 AND firm_net_change_12mo < 0 AND is_wirehouse = 0) THEN 'TIER_1F_HV_WEALTH_BLEEDER'
             WHEN (num_prior_firms >= 3 AND industry_tenure_years >= 5) THEN 'TIER_2_PROVEN_MOVER'
             WHEN (firm_net_change_12mo BETWEEN -10 AND -1 AND industry_tenure_years >= 5) THEN 'TIER_3_MODERATE_BLEEDER'
@@ -296,17 +320,14 @@ scored_prospects AS (
             WHEN (firm_net_change_12mo <= -10 AND industry_tenure_years >= 5) THEN 'TIER_5_HEAVY_BLEEDER'
             ELSE 'STANDARD'
         END as score_tier,
+        -- END tier_rules
         
         -- Priority rank
-        CASE 
+        -- BEGIN tier_rules: priority_rank
+        CASE
             WHEN (tenure_years BETWEEN 1 AND 4 AND industry_tenure_years >= 5 AND firm_net_change_12mo < 0 AND has_cfp = 1 AND is_wirehouse = 0) THEN 1
-            WHEN (((tenure_years BETWEEN 1 AND 3 AND industry_tenure_years BETWEEN 5 AND 15 AND firm_net_change_12mo < 0 AND firm_rep_count <= 50 AND is_wirehouse = 0)
-                  OR (tenure_years BETWEEN 1 AND 3 AND firm_rep_count <= 10 AND is_wirehouse = 0)
-                  OR (tenure_years BETWEEN 1 AND 4 AND industry_tenure_years BETWEEN 5 AND 15 AND firm_net_change_12mo < 0 AND is_wirehouse = 0))
-                  AND has_series_65_only = 1) THEN 2
-            WHEN ((tenure_years BETWEEN 1 AND 3 AND industry_tenure_years BETWEEN 5 AND 15 AND firm_net_change_12mo < 0 AND firm_rep_count <= 50 AND is_wirehouse = 0)
-                  OR (tenure_years BETWEEN 1 AND 3 AND firm_rep_count <= 10 AND is_wirehouse = 0)
-                  OR (tenure_years BETWEEN 1 AND 4 AND industry_tenure_years BETWEEN 5 AND 15 AND firm_net_change_12mo < 0 AND is_wirehouse = 0)) THEN 3
+            WHEN (((tenure_years BETWEEN 1 AND 3 AND industry_tenure_years BETWEEN 5 AND 15 AND firm_net_change_12mo < 0 AND firm_rep_count <= 50 AND is_wirehouse = 0) OR (tenure_years BETWEEN 1 AND 3 AND firm_rep_count <= 10 AND is_wirehouse = 0) OR (tenure_years BETWEEN 1 AND 4 AND industry_tenure_years BETWEEN 5 AND 15 AND firm_net_change_12mo < 0 AND is_wirehouse = 0)) AND has_series_65_only = 1) THEN 2
+            WHEN ((tenure_years BETWEEN 1 AND 3 AND industry_tenure_years BETWEEN 5 AND 15 AND firm_net_change_12mo < 0 AND firm_rep_count <= 50 AND is_wirehouse = 0) OR (tenure_years BETWEEN 1 AND 3 AND firm_rep_count <= 10 AND is_wirehouse = 0) OR (tenure_years BETWEEN 1 AND 4 AND industry_tenure_years BETWEEN 5 AND 15 AND firm_net_change_12mo < 0 AND is_wirehouse = 0)) THEN 3
             WHEN (is_hv_wealth_title = 1 AND firm_net_change_12mo < 0 AND is_wirehouse = 0) THEN 4
             WHEN (num_prior_firms >= 3 AND industry_tenure_years >= 5) THEN 5
             WHEN (firm_net_change_12mo BETWEEN -10 AND -1 AND industry_tenure_years >= 5) THEN 6
@@ -314,17 +335,14 @@ scored_prospects AS (
             WHEN (firm_net_change_12mo <= -10 AND industry_tenure_years >= 5) THEN 8
             ELSE 99
         END as priority_rank,
+        -- END tier_rules
         
         -- Expected conversion rate
-        CASE 
+        -- BEGIN tier_rules: expected_conversion_rate
+        CASE
             WHEN (tenure_years BETWEEN 1 AND 4 AND industry_tenure_years >= 5 AND firm_net_change_12mo < 0 AND has_cfp = 1 AND is_wirehouse = 0) THEN 0.087
-            WHEN (((tenure_years BETWEEN 1 AND 3 AND industry_tenure_years BETWEEN 5 AND 15 AND firm_net_change_12mo < 0 AND firm_rep_count <= 50 AND is_wirehouse = 0)
-                  OR (tenure_years BETWEEN 1 AND 3 AND firm_rep_count <= 10 AND is_wirehouse = 0)
-                  OR (tenure_years BETWEEN 1 AND 4 AND industry_tenure_years BETWEEN 5 AND 15 AND firm_net_change_12mo < 0 AND is_wirehouse = 0))
-                  AND has_series_65_only = 1) THEN 0.079
-            WHEN ((tenure_years BETWEEN 1 AND 3 AND industry_tenure_years BETWEEN 5 AND 15 AND firm_net_change_12mo < 0 AND firm_rep_count <= 50 AND is_wirehouse = 0)
-                  OR (tenure_years BETWEEN 1 AND 3 AND firm_rep_count <= 10 AND is_wirehouse = 0)
-                  OR (tenure_years BETWEEN 1 AND 4 AND industry_tenure_years BETWEEN 5 AND 15 AND firm_net_change_12mo < 0 AND is_wirehouse = 0)) THEN 0.071
+            WHEN (((tenure_years BETWEEN 1 AND 3 AND industry_tenure_years BETWEEN 5 AND 15 AND firm_net_change_12mo < 0 AND firm_rep_count <= 50 AND is_wirehouse = 0) OR (tenure_years BETWEEN 1 AND 3 AND firm_rep_count <= 10 AND is_wirehouse = 0) OR (tenure_years BETWEEN 1 AND 4 AND industry_tenure_years BETWEEN 5 AND 15 AND firm_net_change_12mo < 0 AND is_wirehouse = 0)) AND has_series_65_only = 1) THEN 0.079
+            WHEN ((tenure_years BETWEEN 1 AND 3 AND industry_tenure_years BETWEEN 5 AND 15 AND firm_net_change_12mo < 0 AND firm_rep_count <= 50 AND is_wirehouse = 0) OR (tenure_years BETWEEN 1 AND 3 AND firm_rep_count <= 10 AND is_wirehouse = 0) OR (tenure_years BETWEEN 1 AND 4 AND industry_tenure_years BETWEEN 5 AND 15 AND firm_net_change_12mo < 0 AND is_wirehouse = 0)) THEN 0.071
             WHEN (is_hv_wealth_title = 1 AND firm_net_change_12mo < 0 AND is_wirehouse = 0) THEN 0.065
             WHEN (num_prior_firms >= 3 AND industry_tenure_years >= 5) THEN 0.052
             WHEN (firm_net_change_12mo BETWEEN -10 AND -1 AND industry_tenure_years >= 5) THEN 0.044
@@ -332,6 +350,7 @@ scored_prospects AS (
             WHEN (firm_net_change_12mo <= -10 AND industry_tenure_years >= 5) THEN 0.038
             ELSE 0.025
         END as expected_conversion_rate,
+        -- END tier_rules
         
         -- V3 TIER NARRATIVES
         CASE 
@@ -0,0 +1,44 @@
+-- ============================================================================
+-- LEAD LIST TIER SNAPSHOT
+-- Records the tier and V4 score each advisor has on this month's lead list.
+-- Run after the hybrid lead list (monthly_pipeline.py stage tier_snapshot).
+--
+-- The lead list table is replaced every month, so this is the only record of
+-- the tier a lead had when it was worked. conversion_cube.py reads it for
+-- contacts that historical_leads_with_outcomes does not cover.
+-- Re-running in the same month replaces that month's rows.
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS `savvy-gtm-analytics.ml_features.lead_list_tier_snapshots`
+(
+  list_month DATE NOT NULL,
+  advisor_crd INT64 NOT NULL,
+  score_tier STRING,
+  v4_score FLOAT64,
+  v4_percentile FLOAT64,
+  snapshot_at TIMESTAMP
+)
+PARTITION BY list_month
+CLUSTER BY advisor_crd;
+
+MERGE `savvy-gtm-analytics.ml_features.lead_list_tier_snapshots` t
+USING (
+  SELECT
+    DATE_TRUNC(CURRENT_DATE(), MONTH) as list_month,
+    advisor_crd,
+    ANY_VALUE(score_tier) as score_tier,
+    ANY_VALUE(v4_score) as v4_score,
+    ANY_VALUE(v4_percentile) as v4_percentile
+  FROM `savvy-gtm-analytics.ml_features.january_2026_lead_list_v4`
+  WHERE advisor_crd IS NOT NULL
+  GROUP BY advisor_crd
+) s
+ON t.list_month = s.list_month AND t.advisor_crd = s.advisor_crd
+WHEN MATCHED THEN
+  UPDATE SET score_tier = s.score_tier, v4_score = s.v4_score,
+             v4_percentile = s.v4_percentile, snapshot_at = CURRENT_TIMESTAMP()
+WHEN NOT MATCHED BY TARGET THEN
+  INSERT (list_month, advisor_crd, score_tier, v4_score, v4_percentile, snapshot_at)
+  VALUES (s.list_month, s.advisor_crd, s.score_tier, s.v4_score, s.v4_percentile, CURRENT_TIMESTAMP())
+WHEN NOT MATCHED BY SOURCE AND t.list_month = DATE_TRUNC(CURRENT_DATE(), MONTH) THEN
+  DELETE;
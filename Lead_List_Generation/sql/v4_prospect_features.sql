@@ -133,6 +133,12 @@ mobility AS (
 -- ============================================================================
 -- FEATURE GROUP 3: FIRM STABILITY (OPTIMIZED - pre-aggregated, no correlated subqueries)
 -- ============================================================================
+-- v4.0.0 definitions (trailing 12 months of days before the date), which the
+-- deployed model was trained on. phase_2_feature_engineering.sql,
+-- production_scoring.sql and v4_prospect_features.sql must stay on the same
+-- definitions: the month-grain firm_month_flows reads
+-- (utils/firm_flows.FirmMonthFlows.as_of_features) replace them in all three
+-- together, with a retrained model version.
 
 -- Pre-aggregate departures by firm (runs once, not per row)
 firm_departures_agg AS (
@@ -191,19 +197,20 @@ firm_stability AS (
 wirehouse AS (
     SELECT
         cf.crd,
-        CASE
-            WHEN UPPER(cf.firm_name) LIKE '%MERRILL%' THEN 1
-            WHEN UPPER(cf.firm_name) LIKE '%MORGAN STANLEY%' THEN 1
-            WHEN UPPER(cf.firm_name) LIKE '%UBS%' THEN 1
-            WHEN UPPER(cf.firm_name) LIKE '%WELLS FARGO%' THEN 1
-            WHEN UPPER(cf.firm_name) LIKE '%EDWARD JONES%' THEN 1
-            WHEN UPPER(cf.firm_name) LIKE '%RAYMOND JAMES%' THEN 1
-            WHEN UPPER(cf.firm_name) LIKE '%AMERIPRISE%' THEN 1
-            WHEN UPPER(cf.firm_name) LIKE '%LPL%' THEN 1
-            WHEN UPPER(cf.firm_name) LIKE '%NORTHWESTERN MUTUAL%' THEN 1
-            WHEN UPPER(cf.firm_name) LIKE '%STIFEL%' THEN 1
-            ELSE 0
-        END as is_wirehouse
+        CASE WHEN (
+            -- BEGIN pattern_registry: is_wirehouse firm_name=cf.firm_name
+            UPPER(cf.firm_name) LIKE '%MERRILL%'
+            OR UPPER(cf.firm_name) LIKE '%MORGAN STANLEY%'
+            OR UPPER(cf.firm_name) LIKE '%UBS%'
+            OR UPPER(cf.firm_name) LIKE '%WELLS FARGO%'
+            OR UPPER(cf.firm_name) LIKE '%EDWARD JONES%'
+            OR UPPER(cf.firm_name) LIKE '%RAYMOND JAMES%'
+            OR UPPER(cf.firm_name) LIKE '%AMERIPRISE%'
+            OR UPPER(cf.firm_name) LIKE '%LPL%'
+            OR UPPER(cf.firm_name) LIKE '%NORTHWESTERN MUTUAL%'
+            OR UPPER(cf.firm_name) LIKE '%STIFEL%'
+            -- END pattern_registry
+        ) THEN 1 ELSE 0 END as is_wirehouse
     FROM current_firm cf
 ),
 
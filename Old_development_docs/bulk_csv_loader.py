@@ -0,0 +1,428 @@
+"""
+Bulk CSV Loader for Discovery / RIA Rep Uploads
+Streams large CSV files in chunks, applies an explicit versioned schema,
+writes compressed Parquet and loads each file with a single load job.
+
+Schemas are JSON contracts in config/ (same column format as
+v6_feature_contract.json), named <source>_schema_v<N>.json:
+
+    {"source": "discovery_territory", "version": 1,
+     "columns": [{"name": "RepCRD", "bq_type": "STRING", "nullable": false}, ...]}
+
+A schema is pinned once (infer_schema() scans every chunk of every file and
+keeps the widest type seen), reviewed, and then enforced on every load: a value
+that does not fit its column, a NULL in a required column, or a column missing
+from / added to the CSV fails that file instead of silently changing types.
+
+Files are converted in parallel worker processes; each Parquet file is then
+loaded by the sink: BigQuerySink (one load job per table), DuckDBSink or
+LocalSink (Parquet copies) for local runs and tests.
+
+Usage:
+    jobs = [LoadJob('discovery_data/discovery_t1_2025_10.csv', 'staging_discovery_t1', schema)]
+    results = load_all(jobs, BigQuerySink("savvy-gtm-analytics", "LeadScoring"), workers=3)
+"""
+
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+NA_VALUES = ['', 'NA', 'N/A', 'null', 'NULL', 'None']
+CHUNK_ROWS = 200_000
+PARQUET_COMPRESSION = "snappy"
+SCHEMA_DIR = Path(__file__).resolve().parent.parent / "config"  # repo-level config/, any working directory
+
+# Widening order used when inferring a schema across chunks and files
+TYPE_ORDER = ['BOOLEAN', 'INT64', 'FLOAT64', 'STRING']
+PANDAS_DTYPES = {'STRING': 'string', 'INT64': 'Int64', 'FLOAT64': 'float64', 'BOOLEAN': 'boolean'}
+ARROW_TYPES = {'STRING': pa.string(), 'INT64': pa.int64(), 'FLOAT64': pa.float64(), 'BOOLEAN': pa.bool_()}
+
+_HEADER_CHARS = str.maketrans({'/': '_', ' ': '_', '-': '_', '.': '_', '(': None, ')': None})
+# Plain integers only - numbers with leading zeros are identifiers and stay STRING
+_INT_PATTERN = r'[+-]?(?:0|[1-9]\d{0,17})'
+_LEADING_ZERO = r'[+-]?0\d'
+_BOOL_VALUES = {'true': True, 'false': False}
+_BOOL_STRINGS = list(_BOOL_VALUES)
+
+
+def normalize_header(name: str) -> str:
+    """BigQuery-safe column name: '/', ' ', '-', '.' -> '_', drop parentheses, collapse '__'."""
+    return name.translate(_HEADER_CHARS).replace('__', '_')
+
+
+@dataclass
+class LoadSchema:
+    """Explicit, versioned column contract for one CSV source."""
+    source: str
+    version: int
+    columns: List[Dict]
+
+    @property
+    def names(self) -> List[str]:
+        return [c['name'] for c in self.columns]
+
+    @classmethod
+    def load(cls, path) -> "LoadSchema":
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(data['source'], int(data['version']), data['columns'])
+
+    @classmethod
+    def latest(cls, source: str, schema_dir=SCHEMA_DIR) -> "LoadSchema":
+        """Highest-versioned schema file for a source."""
+        paths = sorted(Path(schema_dir).glob(f"{source}_schema_v*.json"),
+                       key=lambda p: int(re.search(r'_v(\d+)\.json$', p.name).group(1)))
+        if not paths:
+            raise FileNotFoundError(
+                f"No schema for '{source}' in {schema_dir} - run the upload script with --write-schema "
+                f"to pin one, review it, then load")
+        return cls.load(paths[-1])
+
+    def save(self, schema_dir=SCHEMA_DIR) -> Path:
+        path = Path(schema_dir) / f"{self.source}_schema_v{self.version}.json"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'source': self.source, 'version': self.version, 'columns': self.columns}, f, indent=2)
+        return path
+
+    def arrow_schema(self) -> pa.Schema:
+        return pa.schema([pa.field(c['name'], ARROW_TYPES[c['bq_type']], nullable=c['nullable'])
+                          for c in self.columns])
+
+    def bigquery_schema(self):
+        from google.cloud import bigquery
+        return [bigquery.SchemaField(c['name'], c['bq_type'], mode='NULLABLE' if c['nullable'] else 'REQUIRED')
+                for c in self.columns]
+
+
+@dataclass
+class LoadJob:
+    """One CSV file loaded into one table."""
+    csv_path: str
+    table: str
+    schema: LoadSchema
+    normalize_headers: bool = True
+    strict: bool = True
+
+    @property
+    def target_schema(self) -> LoadSchema:
+        """Lenient loads relax REQUIRED columns to NULLABLE so unfit values can load as NULL."""
+        if self.strict:
+            return self.schema
+        return LoadSchema(self.schema.source, self.schema.version,
+                          [{**c, 'nullable': True} for c in self.schema.columns])
+
+
+@dataclass
+class LoadResult:
+    table: str
+    csv_path: str
+    rows: int = 0
+    chunks: int = 0
+    parquet_bytes: int = 0
+    convert_seconds: float = 0.0
+    load_seconds: float = 0.0
+    cast_failures: Dict[str, int] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def _read_chunks(csv_path: str, chunk_rows: int, normalize_headers: bool,
+                 schema: Optional[LoadSchema] = None) -> Iterable[pd.DataFrame]:
+    """
+    Stream a CSV in chunks. Types are never inferred per chunk: without a schema
+    every column is read as a string; with one, the C parser reads each column
+    straight into its schema type (and raises ValueError on a value that does not fit).
+    """
+    dtype = str
+    if schema is not None:
+        header = pd.read_csv(csv_path, nrows=0, encoding='utf-8').columns
+        types = {c['name']: PANDAS_DTYPES[c['bq_type']] for c in schema.columns}
+        dtype = {raw: types.get(normalize_header(raw) if normalize_headers else raw, 'string') for raw in header}
+    reader = pd.read_csv(csv_path, dtype=dtype, na_values=NA_VALUES, keep_default_na=True,
+                         encoding='utf-8', chunksize=chunk_rows)
+    for chunk in reader:
+        if normalize_headers:
+            chunk.columns = [normalize_header(c) for c in chunk.columns]
+        yield chunk
+
+
+def _value_type(values: pd.Series) -> Optional[str]:
+    """Narrowest type that fits every non-null value of a string column (None if all NULL)."""
+    values = values.dropna().str.strip()
+    if values.empty:
+        return None
+    if values.str.lower().isin(_BOOL_STRINGS).all():
+        return 'BOOLEAN'
+    if values.str.match(_LEADING_ZERO).any():
+        return 'STRING'
+    if values.str.fullmatch(_INT_PATTERN).all():
+        return 'INT64'
+    if pd.to_numeric(values, errors='coerce').notna().all():
+        return 'FLOAT64'
+    return 'STRING'
+
+
+def _widen(left: Optional[str], right: Optional[str]) -> Optional[str]:
+    if left is None or right is None:
+        return left or right
+    if 'BOOLEAN' in (left, right) and left != right:
+        return 'STRING'
+    return max(left, right, key=TYPE_ORDER.index)
+
+
+def infer_schema(csv_paths: List[str], source: str, version: int = 1, chunk_rows: int = CHUNK_ROWS,
+                 normalize_headers: bool = True) -> LoadSchema:
+    """
+    Scan every chunk of every file and keep the widest type per column, so a
+    type that only appears late in a file (or in one territory) is captured.
+    Columns that are entirely NULL become nullable STRING.
+    """
+    types: Dict[str, Optional[str]] = {}
+    nullable: Dict[str, bool] = {}
+    chunks_seen = 0
+    for csv_path in csv_paths:
+        for chunk in _read_chunks(csv_path, chunk_rows, normalize_headers):
+            for name in chunk.columns:
+                column = chunk[name]
+                # A column absent from earlier files is NULL there
+                missing_before = name not in types and chunks_seen > 0
+                types[name] = _widen(types.get(name), _value_type(column))
+                nullable[name] = nullable.get(name, missing_before) or bool(column.isna().any())
+            for name in set(types) - set(chunk.columns):
+                nullable[name] = True
+            chunks_seen += 1
+    columns = [{'name': name,
+                'bq_type': types[name] or 'STRING',
+                'nullable': bool(nullable[name])} for name in types]
+    return LoadSchema(source, version, columns)
+
+
+def apply_schema(chunk: pd.DataFrame, schema: LoadSchema, strict: bool = True) -> Tuple[pd.DataFrame, Dict[str, int]]:
+    """
+    Cast a string chunk to the schema types.
+
+    Returns:
+        (typed chunk, {column: values that did not fit}); with strict=True any
+        mismatch raises ValueError instead
+    """
+    extra = [c for c in chunk.columns if c not in schema.names]
+    missing = [c['name'] for c in schema.columns if c['name'] not in chunk.columns and not c['nullable']]
+    if extra or missing:
+        raise ValueError(f"CSV columns differ from {schema.source} schema v{schema.version}: "
+                         f"unexpected {extra}, missing required {missing}")
+
+    typed = {}
+    failures = {}
+    for column in schema.columns:
+        name, bq_type = column['name'], column['bq_type']
+        values = chunk[name] if name in chunk.columns else pd.Series(pd.NA, index=chunk.index, dtype='string')
+        present = values.notna()
+        if str(values.dtype) == PANDAS_DTYPES[bq_type]:
+            cast = values
+        elif bq_type == 'STRING':
+            cast = values.astype('string')
+        elif bq_type == 'BOOLEAN':
+            cast = values.str.strip().str.lower().map(_BOOL_VALUES).astype('boolean')
+        else:
+            numbers = pd.to_numeric(values, errors='coerce')
+            if bq_type == 'INT64':
+                numbers = numbers.where(numbers % 1 == 0)
+            cast = numbers.astype(PANDAS_DTYPES[bq_type])
+        bad = int((present & cast.isna()).sum())
+        if not column['nullable']:
+            bad += int((~present).sum())
+        if bad:
+            failures[name] = bad
+        typed[name] = cast
+
+    if failures and strict:
+        raise ValueError(f"Values do not fit {schema.source} schema v{schema.version}: {failures}")
+    return pd.DataFrame(typed, index=chunk.index), failures
+
+
+def _write_parquet(job: LoadJob, parquet_path: str, chunk_rows: int, compression: str,
+                   typed_read: bool) -> LoadResult:
+    result = LoadResult(job.table, job.csv_path)
+    schema = job.target_schema
+    arrow_schema = schema.arrow_schema()
+    with pq.ParquetWriter(parquet_path, arrow_schema, compression=compression) as writer:
+        chunks = _read_chunks(job.csv_path, chunk_rows, job.normalize_headers,
+                              job.schema if typed_read else None)
+        for chunk in chunks:
+            typed, failures = apply_schema(chunk, schema, job.strict)
+            for name, count in failures.items():
+                result.cast_failures[name] = result.cast_failures.get(name, 0) + count
+            writer.write_table(pa.Table.from_pandas(typed, schema=arrow_schema, preserve_index=False))
+            result.rows += len(typed)
+            result.chunks += 1
+    return result
+
+
+def convert_csv_to_parquet(job: LoadJob, parquet_path: str, chunk_rows: int = CHUNK_ROWS,
+                           compression: str = PARQUET_COMPRESSION) -> LoadResult:
+    """
+    Stream one CSV into one compressed Parquet file under the job's schema.
+
+    The typed read is the fast path. If the parser rejects a value, the file is
+    re-read as strings and cast column by column, which names the offending
+    columns (strict) or loads those values as NULL (lenient).
+    """
+    start = time.perf_counter()
+    try:
+        try:
+            result = _write_parquet(job, parquet_path, chunk_rows, compression, typed_read=True)
+        except (ValueError, TypeError, OverflowError):
+            result = _write_parquet(job, parquet_path, chunk_rows, compression, typed_read=False)
+        result.parquet_bytes = os.path.getsize(parquet_path)
+    except Exception as e:
+        result = LoadResult(job.table, job.csv_path, error=f"{type(e).__name__}: {e}")
+    result.convert_seconds = time.perf_counter() - start
+    return result
+
+
+class BigQuerySink:
+    """Loads each Parquet file into <project>.<dataset>.<table> with one WRITE_TRUNCATE job."""
+
+    def __init__(self, project_id: str = "savvy-gtm-analytics", dataset: str = "LeadScoring"):
+        from google.cloud import bigquery
+        self.bigquery = bigquery
+        self.client = bigquery.Client(project=project_id)
+        self.prefix = f"{project_id}.{dataset}"
+
+    def load(self, parquet_path: str, table: str, schema: LoadSchema) -> int:
+        table_id = f"{self.prefix}.{table}"
+        job_config = self.bigquery.LoadJobConfig(
+            source_format=self.bigquery.SourceFormat.PARQUET,
+            schema=schema.bigquery_schema(),
+            write_disposition="WRITE_TRUNCATE",
+            create_disposition="CREATE_IF_NEEDED",
+        )
+        with open(parquet_path, 'rb') as f:
+            self.client.load_table_from_file(f, table_id, job_config=job_config).result()
+        return self.client.get_table(table_id).num_rows
+
+
+class DuckDBSink:
+    """Local stand-in for BigQuery: one table per job in a DuckDB database."""
+
+    def __init__(self, database: str = ":memory:"):
+        import duckdb
+        self.con = duckdb.connect(database)
+        self._lock = threading.Lock()
+
+    def load(self, parquet_path: str, table: str, schema: LoadSchema) -> int:
+        path = str(parquet_path).replace("'", "''")
+        with self._lock:
+            self.con.execute(f'CREATE OR REPLACE TABLE "{table}" AS SELECT * FROM read_parquet(\'{path}\')')
+            return self.con.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+
+
+class LocalSink:
+    """Keeps the converted Parquet files as <directory>/<table>.parquet."""
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def load(self, parquet_path: str, table: str, schema: LoadSchema) -> int:
+        target = self.directory / f"{table}.parquet"
+        shutil.copyfile(parquet_path, target)
+        return pq.ParquetFile(target).metadata.num_rows
+
+
+def load_all(jobs: List[LoadJob], sink, workers: int = 4, chunk_rows: int = CHUNK_ROWS,
+             compression: str = PARQUET_COMPRESSION, staging_dir: Optional[str] = None) -> List[LoadResult]:
+    """
+    Convert every job's CSV in parallel processes and hand each finished
+    Parquet file to the sink as soon as it is ready.
+
+    Returns:
+        One LoadResult per job, in job order
+    """
+    staging = Path(staging_dir or tempfile.mkdtemp(prefix="bulk_csv_loader_"))
+    staging.mkdir(parents=True, exist_ok=True)
+    results: Dict[int, LoadResult] = {}
+    print_lock = threading.Lock()
+
+    def load(index: int, result: LoadResult, parquet_path: Path) -> None:
+        job = jobs[index]
+        start = time.perf_counter()
+        try:
+            loaded = sink.load(str(parquet_path), job.table, job.target_schema)
+            if loaded != result.rows:
+                result.error = f"Loaded {loaded:,} rows, converted {result.rows:,}"
+        except Exception as e:
+            result.error = f"{type(e).__name__}: {e}"
+        result.load_seconds = time.perf_counter() - start
+        if not staging_dir:
+            parquet_path.unlink(missing_ok=True)
+        with print_lock:
+            print(f"[{'OK' if result.ok else 'ERROR'}] {Path(job.csv_path).name} -> {job.table}: "
+                  f"{result.rows:,} rows in {result.convert_seconds + result.load_seconds:.1f}s"
+                  + ("" if result.ok else f" ({result.error})"))
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as converters, \
+                ThreadPoolExecutor(max_workers=workers) as loaders:
+            pending = {}
+            for index, job in enumerate(jobs):
+                parquet_path = staging / f"{index:03d}_{job.table}.parquet"
+                future = converters.submit(convert_csv_to_parquet, job, str(parquet_path), chunk_rows, compression)
+                pending[future] = (index, parquet_path)
+            loads = []
+            for future in as_completed(pending):
+                index, parquet_path = pending[future]
+                result = future.result()
+                results[index] = result
+                if result.ok:
+                    loads.append(loaders.submit(load, index, result, parquet_path))
+                else:
+                    with print_lock:
+                        print(f"[ERROR] {Path(jobs[index].csv_path).name}: {result.error}")
+            for future in loads:
+                future.result()
+    finally:
+        if not staging_dir:
+            shutil.rmtree(staging, ignore_errors=True)
+    return [results[i] for i in range(len(jobs))]
+
+
+def print_summary(results: List[LoadResult]) -> bool:
+    """Print per-table results; True when every job succeeded."""
+    print("\n[SUMMARY] Table | Rows | Chunks | Parquet MB | Convert s | Load s")
+    for r in results:
+        status = "OK" if r.ok else "FAILED"
+        print(f"  [{status}] {r.table} | {r.rows:,} | {r.chunks} | {r.parquet_bytes / 1e6:.1f} | "
+              f"{r.convert_seconds:.1f} | {r.load_seconds:.1f}")
+        if r.cast_failures:
+            print(f"    [WARN] values set to NULL: {r.cast_failures}")
+    succeeded = sum(r.ok for r in results)
+    print(f"[SUMMARY] {succeeded}/{len(results)} files loaded")
+    return succeeded == len(results)
+
+
+def make_sink(kind: str, project_id: str = "savvy-gtm-analytics", target: Optional[str] = None):
+    """Sink from a --sink option: bigquery, duckdb (target = database file) or local (target = directory)."""
+    if kind == "bigquery":
+        return BigQuerySink(project_id)
+    if kind == "duckdb":
+        return DuckDBSink(target or ":memory:")
+    if kind == "local":
+        return LocalSink(target or "staging_parquet")
+    raise ValueError(f"Unknown sink: {kind}")
@@ -2,20 +2,42 @@
 """
 Step 1.2: Upload RIARepDataFeed CSV Files to BigQuery Raw Staging Tables
 Uploads 8 quarterly RIARepDataFeed CSV files to BigQuery with _raw suffix
+
+Files are streamed in chunks under the pinned ria_reps_raw schema
+(config/ria_reps_raw_schema_vN.json), converted to Parquet in parallel and
+loaded with one job each (see bulk_csv_loader.py). Original column names are
+preserved; transformation happens in Step 1.5.
+
+Usage:
+    python step_1_2_upload_ria_reps_raw.py --write-schema   # first run / new columns
+    python step_1_2_upload_ria_reps_raw.py --workers 4
 """
 
-import pandas as pd
-from google.cloud import bigquery
+import argparse
 import os
 import sys
 from datetime import datetime
 from pathlib import Path
 
+from bulk_csv_loader import (
+    CHUNK_ROWS,
+    SCHEMA_DIR,
+    BigQuerySink,
+    LoadJob,
+    LoadSchema,
+    infer_schema,
+    load_all,
+    make_sink,
+    print_summary,
+)
+
 # Set UTF-8 encoding for Windows console
 if sys.platform == "win32":
     import codecs
     sys.stdout = codecs.getwriter("utf-8")(sys.stdout.detach())
 
+SCHEMA_SOURCE = "ria_reps_raw"
+
 
 def get_quarter_from_date(date_str):
     """
@@ -35,13 +57,39 @@ def get_date_from_string(date_str):
     return datetime.strptime(date_str, '%Y%m%d').date()
 
 
-def upload_ria_reps_file(csv_path, project_id="savvy-gtm-analytics"):
+def parse_args():
+    parser = argparse.ArgumentParser(description="Upload RIARepDataFeed CSVs to BigQuery raw staging tables")
+    parser.add_argument("--sink", choices=["bigquery", "duckdb", "local"], default="bigquery",
+                        help="Load target; duckdb/local are for local test runs")
+    parser.add_argument("--target", default=None, help="DuckDB database file or Parquet directory for local sinks")
+    parser.add_argument("--workers", type=int, default=4, help="Files converted in parallel")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help="CSV rows per chunk")
+    parser.add_argument("--schema-dir", default=str(SCHEMA_DIR), help="Directory of versioned schema files")
+    parser.add_argument("--write-schema", action="store_true",
+                        help="Infer a schema from all RIARepDataFeed CSVs and pin it as the next version, then exit")
+    parser.add_argument("--lenient", action="store_true",
+                        help="Load values that do not fit the schema as NULL instead of failing the file")
+    return parser.parse_args()
+
+
+def ria_reps_job(csv_path, schema, strict=True):
+    """
+    LoadJob for one RIARepDataFeed_YYYYMMDD.csv -> snapshot_reps_YYYYMMDD_raw
+    (column names preserved; transformation happens in Step 1.5)
+    """
+    date_str = Path(csv_path).stem.split('_')[1]
+    return LoadJob(str(csv_path), f"snapshot_reps_{date_str}_raw", schema, normalize_headers=False, strict=strict)
+
+
+def upload_ria_reps_file(csv_path, project_id="savvy-gtm-analytics", schema=None, sink=None):
     """
     Upload a single RIARepDataFeed CSV file to BigQuery raw staging table
     
     Args:
         csv_path: Path to RIARepDataFeed_YYYYMMDD.csv file
         project_id: BigQuery project ID
+        schema: LoadSchema to enforce (default: latest ria_reps_raw schema)
+        sink: Load target (default: BigQuerySink for project_id)
     """
     csv_file = Path(csv_path)
     
@@ -59,55 +107,14 @@ def upload_ria_reps_file(csv_path, project_id="savvy-gtm-analytics"):
     date_str = parts[1]  # Should be YYYYMMDD
     snapshot_date = get_date_from_string(date_str)  # Convert to DATE object
     
-    # Use date-based table name (YYYYMMDD format)
-    table_name = f"snapshot_reps_{date_str}_raw"
-    table_id = f"{project_id}.LeadScoring.{table_name}"
-    
-    print(f"[START] Uploading {csv_file.name} to {table_name}")
+    print(f"[START] Uploading {csv_file.name} to snapshot_reps_{date_str}_raw")
     print(f"[INFO] File date: {date_str} → snapshot_at will be: {snapshot_date}")
     
     try:
-        # Read CSV with proper type inference
-        print("[READ] Reading CSV file...")
-        df = pd.read_csv(
-            csv_path,
-            low_memory=False,  # Critical for proper type inference
-            na_values=['', 'NA', 'N/A', 'null', 'NULL', 'None'],
-            keep_default_na=True,
-            encoding='utf-8'
-        )
-        
-        print(f"[SUCCESS] Successfully read {len(df):,} records with {len(df.columns)} columns")
-        
-        # Clean column names for BigQuery compatibility (if needed)
-        # Note: We'll keep original column names for now, transformation happens in Step 1.5
-        print("[INFO] Column names will be preserved (transformation in Step 1.5)")
-        
-        # Upload to BigQuery staging table
-        print("[BIGQUERY] Connecting to BigQuery...")
-        client = bigquery.Client(project=project_id)
-        
-        print(f"[TARGET] Target table: {table_id}")
-        
-        job_config = bigquery.LoadJobConfig(
-            write_disposition="WRITE_TRUNCATE",  # Replace existing data
-            autodetect=True,  # Auto-detect schema from DataFrame
-            create_disposition="CREATE_IF_NEEDED"  # Create table if doesn't exist
-        )
-        
-        print("[UPLOAD] Uploading to BigQuery...")
-        job = client.load_table_from_dataframe(df, table_id, job_config=job_config)
-        
-        # Wait for job to complete
-        print("[WAIT] Waiting for upload to complete...")
-        job.result()
-        
-        # Get table info to confirm
-        table = client.get_table(table_id)
-        print(f"[SUCCESS] Successfully uploaded {table.num_rows:,} rows to {table_id}")
-        print(f"[INFO] Table schema: {len(table.schema)} columns")
-        
-        return True
+        schema = schema or LoadSchema.latest(SCHEMA_SOURCE)
+        sink = sink or BigQuerySink(project_id)
+        result = load_all([ria_reps_job(csv_path, schema)], sink, workers=1)[0]
+        return print_summary([result])
         
     except Exception as e:
         print(f"[ERROR] Error uploading {csv_file.name}: {str(e)}")
@@ -118,6 +125,7 @@ def upload_ria_reps_file(csv_path, project_id="savvy-gtm-analytics"):
 
 def main():
     """Main upload function for all 8 RIARepDataFeed files"""
+    args = parse_args()
     
     print("=" * 70)
     print("Step 1.2: Upload RIARepDataFeed CSV Files to BigQuery Raw Staging")
@@ -161,6 +169,24 @@ def main():
         print(f"\n[ERROR] {len(missing_files)} file(s) not found. Please check file paths.")
         sys.exit(1)
     
+    if args.write_schema:
+        try:
+            version = LoadSchema.latest(SCHEMA_SOURCE, args.schema_dir).version + 1
+        except FileNotFoundError:
+            version = 1
+        print(f"\n[SCHEMA] Scanning {len(files)} file(s)...")
+        schema = infer_schema([f for f, _, _ in files], SCHEMA_SOURCE, version, chunk_rows=args.chunk_rows,
+                              normalize_headers=False)
+        path = schema.save(args.schema_dir)
+        print(f"[SCHEMA] Wrote {path} ({len(schema.columns)} columns) - review before loading")
+        return
+    
+    try:
+        schema = LoadSchema.latest(SCHEMA_SOURCE, args.schema_dir)
+    except FileNotFoundError as e:
+        print(f"[ERROR] {e}")
+        sys.exit(1)
+    print(f"\n[SCHEMA] {schema.source} v{schema.version} ({len(schema.columns)} columns)")
     print(f"\n[INFO] Found {len(files)} file(s). Starting upload...\n")
     
     # Show file mapping with snapshot dates
@@ -169,25 +195,16 @@ def main():
         print(f"  {Path(file_path).name} → snapshot_reps_{date_str}_raw (snapshot_at: {snapshot_date})")
     print()
     
-    success_count = 0
-    failed_files = []
-    
-    for file_path, date_str, snapshot_date in files:
-        print("\n" + "-" * 70)
-        
-        success = upload_ria_reps_file(file_path)
-        
-        if success:
-            success_count += 1
-            print(f"[✓] {Path(file_path).name} uploaded successfully to snapshot_reps_{date_str}_raw")
-            print(f"[INFO] Snapshot date: {snapshot_date} (will be used as snapshot_at in Step 1.5)")
-        else:
-            failed_files.append(file_path)
-            print(f"[✗] {Path(file_path).name} upload failed")
+    # Files stream to Parquet in parallel processes; each loads as one job
+    jobs = [ria_reps_job(file_path, schema, strict=not args.lenient) for file_path, _, _ in files]
+    sink = make_sink(args.sink, target=args.target)
+    results = load_all(jobs, sink, workers=args.workers, chunk_rows=args.chunk_rows)
+    success_count = sum(r.ok for r in results)
+    failed_files = [r.csv_path for r in results if not r.ok]
     
     # Summary
     print("\n" + "=" * 70)
-    print(f"[SUMMARY] Upload Summary: {success_count}/{len(files)} files successful")
+    print_summary(results)
     print("=" * 70)
     
     if success_count == len(files):
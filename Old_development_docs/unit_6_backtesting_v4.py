@@ -9,6 +9,7 @@ This script performs comprehensive backtesting and performance validation:
 5. Comprehensive performance reports
 """
 
+import sys
 import json
 import joblib
 import numpy as np
@@ -16,13 +17,15 @@ import pandas as pd
 from pathlib import Path
 from typing import Dict, List, Tuple, Any
 from datetime import datetime, timedelta
-from scipy import stats
 from sklearn.metrics import (
     average_precision_score, roc_auc_score, precision_recall_curve,
     roc_curve, precision_score, recall_score, f1_score
 )
 from google.cloud import bigquery
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "Version-4"))
+from utils.ranking_metrics import ks_statistic
+
 # Paths
 BASE_DIR = Path(__file__).parent
 MODEL_V4_CALIBRATED_PATH = BASE_DIR / "model_v4_calibrated.pkl"
@@ -246,16 +249,8 @@ def cast_categoricals_inplace(df: pd.DataFrame, columns: List[str]) -> None:
 
 def calculate_ks_statistic(y_true: np.ndarray, y_pred: np.ndarray) -> float:
     """Calculate Kolmogorov-Smirnov statistic for score distribution drift"""
-    # Get scores for positive and negative classes
-    pos_scores = y_pred[y_true == 1]
-    neg_scores = y_pred[y_true == 0]
-    
-    if len(pos_scores) == 0 or len(neg_scores) == 0:
-        return 0.0
-    
-    # Calculate KS statistic
-    ks_stat, _ = stats.ks_2samp(pos_scores, neg_scores)
-    return float(ks_stat)
+    # Max |TPR - FPR| over one sort (same value as ks_2samp on pos vs neg scores)
+    return ks_statistic(y_true, y_pred)
 
 
 def calculate_performance_metrics(y_true: np.ndarray, y_pred: np.ndarray, y_proba: np.ndarray) -> Dict[str, float]:
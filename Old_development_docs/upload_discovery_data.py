@@ -2,13 +2,32 @@
 """
 Discovery Data Upload Script for Lead Scoring Pipeline
 Uploads T1, T2, T3 MarketPro CSV files to BigQuery staging tables
+
+Territories are streamed in chunks under the pinned discovery_territory schema
+(config/discovery_territory_schema_vN.json), converted to Parquet in parallel
+and loaded with one job each (see bulk_csv_loader.py).
+
+Usage:
+    python upload_discovery_data.py --write-schema      # first run / new columns
+    python upload_discovery_data.py
+    python upload_discovery_data.py --sink duckdb --target discovery_test.duckdb
 """
 
-import pandas as pd
-from google.cloud import bigquery
+import argparse
 import os
 import sys
-from datetime import datetime
+
+from bulk_csv_loader import (
+    CHUNK_ROWS,
+    SCHEMA_DIR,
+    BigQuerySink,
+    LoadJob,
+    LoadSchema,
+    infer_schema,
+    load_all,
+    make_sink,
+    print_summary,
+)
 
 # Set UTF-8 encoding for Windows console
 if sys.platform == "win32":
@@ -16,7 +35,36 @@ if sys.platform == "win32":
     sys.stdout = codecs.getwriter("utf-8")(sys.stdout.detach())
     sys.stderr = codecs.getwriter("utf-8")(sys.stderr.detach())
 
-def upload_discovery_territory(territory, csv_path, project_id="savvy-gtm-analytics"):
+SCHEMA_SOURCE = "discovery_territory"
+
+TERRITORIES = {
+    't1': 'discovery_data/discovery_t1_2025_10.csv',
+    't2': 'discovery_data/discovery_t2_2025_10.csv',
+    't3': 'discovery_data/discovery_t3_2025_10.csv'
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Upload MarketPro discovery CSVs to BigQuery staging tables")
+    parser.add_argument("--sink", choices=["bigquery", "duckdb", "local"], default="bigquery",
+                        help="Load target; duckdb/local are for local test runs")
+    parser.add_argument("--target", default=None, help="DuckDB database file or Parquet directory for local sinks")
+    parser.add_argument("--workers", type=int, default=len(TERRITORIES), help="Territories converted in parallel")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help="CSV rows per chunk")
+    parser.add_argument("--schema-dir", default=str(SCHEMA_DIR), help="Directory of versioned schema files")
+    parser.add_argument("--write-schema", action="store_true",
+                        help="Infer a schema from all territory CSVs and pin it as the next version, then exit")
+    parser.add_argument("--lenient", action="store_true",
+                        help="Load values that do not fit the schema as NULL instead of failing the territory")
+    return parser.parse_args()
+
+
+def territory_job(territory, csv_path, schema, strict=True):
+    """LoadJob for one territory CSV -> staging_discovery_<territory>"""
+    return LoadJob(csv_path, f"staging_discovery_{territory}", schema, normalize_headers=True, strict=strict)
+
+
+def upload_discovery_territory(territory, csv_path, project_id="savvy-gtm-analytics", schema=None, sink=None):
     """ONE-TIME helper: Upload MarketPro CSV to BigQuery staging table"""
     
     print(f"[START] Starting upload for {territory.upper()} territory...")
@@ -28,87 +76,60 @@ def upload_discovery_territory(territory, csv_path, project_id="savvy-gtm-analyt
         return False
     
     try:
-        # Read CSV with proper type inference (matching your plan's requirements)
-        print("[READ] Reading CSV file...")
-        df = pd.read_csv(
-            csv_path,
-            low_memory=False,  # Critical for proper type inference
-            na_values=['', 'NA', 'N/A', 'null', 'NULL', 'None'],
-            keep_default_na=True
-        )
-        
-        print(f"[SUCCESS] Successfully read {len(df):,} records with {len(df.columns)} columns")
-        
-        # Clean column names for BigQuery compatibility
-        print("[CLEAN] Cleaning column names for BigQuery...")
-        df.columns = df.columns.str.replace('/', '_').str.replace(' ', '_').str.replace('-', '_')
-        df.columns = df.columns.str.replace('(', '').str.replace(')', '').str.replace('.', '_')
-        df.columns = df.columns.str.replace('__', '_')  # Remove double underscores
-        
-        print(f"[CLEAN] Cleaned {len(df.columns)} column names")
-        
-        # Upload to BigQuery staging table
-        print("[BIGQUERY] Connecting to BigQuery...")
-        client = bigquery.Client(project=project_id)
-        table_id = f"{project_id}.LeadScoring.staging_discovery_{territory}"
-        
-        print(f"[TARGET] Target table: {table_id}")
-        
-        job_config = bigquery.LoadJobConfig(
-            write_disposition="WRITE_TRUNCATE",  # Replace existing data
-            autodetect=True,  # Auto-detect schema
-            create_disposition="CREATE_IF_NEEDED"  # Create table if doesn't exist
-        )
-        
-        print("[UPLOAD] Uploading to BigQuery...")
-        job = client.load_table_from_dataframe(df, table_id, job_config=job_config)
-        
-        # Wait for job to complete
-        print("[WAIT] Waiting for upload to complete...")
-        job.result()
-        
-        print(f"[SUCCESS] Successfully uploaded {len(df):,} rows to {table_id}")
-        
-        # Get table info to confirm
-        table = client.get_table(table_id)
-        print(f"[INFO] Table info: {table.num_rows:,} rows, {len(table.schema)} columns")
-        
-        return True
+        schema = schema or LoadSchema.latest(SCHEMA_SOURCE)
+        sink = sink or BigQuerySink(project_id)
+        print(f"[SCHEMA] {schema.source} v{schema.version} ({len(schema.columns)} columns)")
+        result = load_all([territory_job(territory, csv_path, schema)], sink, workers=1)[0]
+        return print_summary([result])
         
     except Exception as e:
         print(f"[ERROR] Error uploading {territory}: {str(e)}")
         return False
 
+def write_schema(schema_dir, chunk_rows=CHUNK_ROWS):
+    """Infer the territory schema from every CSV and save it as the next version"""
+    try:
+        version = LoadSchema.latest(SCHEMA_SOURCE, schema_dir).version + 1
+    except FileNotFoundError:
+        version = 1
+    print(f"[SCHEMA] Scanning {len(TERRITORIES)} territory files...")
+    schema = infer_schema(list(TERRITORIES.values()), SCHEMA_SOURCE, version, chunk_rows=chunk_rows)
+    path = schema.save(schema_dir)
+    print(f"[SCHEMA] Wrote {path} ({len(schema.columns)} columns) - review before loading")
+
 def main():
     """Main upload function for all territories"""
+    args = parse_args()
     
     print("Discovery Data Upload to BigQuery")
     print("=" * 50)
     
-    # Define territories and their file paths
-    territories = {
-        't1': 'discovery_data/discovery_t1_2025_10.csv',
-        't2': 'discovery_data/discovery_t2_2025_10.csv', 
-        't3': 'discovery_data/discovery_t3_2025_10.csv'
-    }
+    missing = [path for path in TERRITORIES.values() if not os.path.exists(path)]
+    if missing:
+        print(f"[ERROR] Files not found: {missing}")
+        sys.exit(1)
     
-    success_count = 0
-    total_count = len(territories)
+    if args.write_schema:
+        write_schema(args.schema_dir, args.chunk_rows)
+        return
     
-    for territory, csv_path in territories.items():
-        print(f"\nProcessing {territory.upper()} Territory")
-        print("-" * 30)
-        
-        success = upload_discovery_territory(territory, csv_path)
-        
-        if success:
-            success_count += 1
-            print(f"[SUCCESS] {territory.upper()} upload completed successfully!")
-        else:
-            print(f"[FAILED] {territory.upper()} upload failed!")
+    try:
+        schema = LoadSchema.latest(SCHEMA_SOURCE, args.schema_dir)
+    except FileNotFoundError as e:
+        print(f"[ERROR] {e}")
+        sys.exit(1)
+    print(f"[SCHEMA] {schema.source} v{schema.version} ({len(schema.columns)} columns)")
+    
+    # Each territory streams to Parquet in its own process and loads as one job
+    jobs = [territory_job(territory, csv_path, schema, strict=not args.lenient)
+            for territory, csv_path in TERRITORIES.items()]
+    sink = make_sink(args.sink, target=args.target)
+    results = load_all(jobs, sink, workers=args.workers, chunk_rows=args.chunk_rows)
+    success_count = sum(r.ok for r in results)
+    total_count = len(results)
     
     print("\n" + "=" * 50)
-    print(f"[SUMMARY] Upload Summary: {success_count}/{total_count} territories successful")
+    print_summary(results)
     
     if success_count == total_count:
         print("[COMPLETE] All discovery data uploaded successfully!")
@@ -6,6 +6,8 @@ This script:
   2. Assigns each lead to a percentile bucket (Top 10%, Top 25%, Top 50%, Lower 50%).
   3. Extracts top positive/negative SHAP contributors and translates them into readable phrases.
   4. Calls Gemini to produce a short narrative justification for the lead's bucket placement.
+     Leads sharing a driver signature share one narrative; only uncached signatures are sent,
+     in concurrent rate-limited batches (see v12_narrative_service.py).
   5. Writes the enriched dataset (including the narrative) back to CSV and optionally BigQuery.
 
 Usage example:
@@ -16,13 +18,16 @@ python v12_generate_narratives.py \
     --output-csv C:/Users/russe/Documents/Lead Scoring/impact_attendees_v12_scores_with_narratives.csv \
     --project savvy-gtm-analytics \
     --output-bq-table savvy-gtm-analytics.LeadScoring.Impact_Attendees_V12_Scores_Explained \
-    --model gemini-1.5-pro
+    --model gemini-1.5-pro \
+    --cache-file C:/Users/russe/Documents/Lead Scoring/v12_narrative_cache.json
+
+Dry run without Gemini (deterministic template narratives):
+python v12_generate_narratives.py --backend template
 """
 
 from __future__ import annotations
 
 import argparse
-import json
 import os
 from collections import defaultdict
 from pathlib import Path
@@ -30,10 +35,16 @@ from typing import Dict, Iterable, List, Tuple
 
 import numpy as np
 import pandas as pd
-import google.generativeai as genai
 from google.cloud import bigquery
 from tqdm import tqdm
 
+from v12_narrative_service import (
+    GeminiBackend,
+    NarrativeCache,
+    NarrativeService,
+    TemplateBackend,
+)
+
 try:
     from dotenv import load_dotenv
     load_dotenv()
@@ -46,28 +57,6 @@ DEFAULT_SCORES_CSV = Path("C:/Users/russe/Documents/Lead Scoring/impact_attendee
 DEFAULT_OUTPUT_CSV = Path("C:/Users/russe/Documents/Lead Scoring/impact_attendees_v12_scores_with_narratives.csv")
 
 
-FEATURE_DESCRIPTIONS: Dict[str, str] = {
-    "Firm_Stability_Score_v12_binned_Low_Under_30": "Low firm stability (frequent moves recently)",
-    "Firm_Stability_Score_v12_binned_Moderate_30_to_60": "Moderate firm stability (some movement)",
-    "Firm_Stability_Score_v12_binned_High_60_to_90": "High firm stability (tends to stay put)",
-    "Firm_Stability_Score_v12_binned_Very_High_90_Plus": "Very high firm stability (long tenure at current firm)",
-    "Firm_Stability_Score_v12_binned_Missing_Zero": "Firm stability information missing",
-    "AverageTenureAtPriorFirms_binned_Short_Under_2": "Short average tenure at prior firms (<2 years)",
-    "AverageTenureAtPriorFirms_binned_Moderate_2_to_5": "Moderate average tenure (2-5 years) at prior firms",
-    "AverageTenureAtPriorFirms_binned_Long_5_to_10": "Longer average tenure (5-10 years) at prior firms",
-    "AverageTenureAtPriorFirms_binned_Very_Long_10_Plus": "Very long tenure (10+ years) at prior firms",
-    "AverageTenureAtPriorFirms_binned_No_Prior_Firms": "No prior firm history",
-    "Number_YearsPriorFirm1_binned_Short_Under_3": "Stayed less than 3 years at most recent prior firm",
-    "Number_YearsPriorFirm1_binned_Moderate_3_to_7": "Stayed 3-7 years at most recent prior firm",
-    "Number_YearsPriorFirm1_binned_Long_7_Plus": "Stayed 7+ years at most recent prior firm",
-    "Number_YearsPriorFirm1_binned_No_Prior_Firm_1": "No prior firm 1 history",
-    "Gender_Male": "Gender recorded as male",
-    "Gender_Missing": "Gender information missing or not specified",
-    "RegulatoryDisclosures_Yes": "Regulatory disclosures on file",
-    "RegulatoryDisclosures_Unknown": "Regulatory disclosures missing",
-}
-
-
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Generate narrative explanations for V12 scores using Gemini.")
     parser.add_argument("--shap-detail", default=str(DEFAULT_SHAP_DETAIL), help="Path to SHAP detail CSV.")
@@ -77,7 +66,13 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("--output-bq-table", default=None, help="Destination BigQuery table for enriched dataset.")
     parser.add_argument("--model", default="models/gemini-2.5-flash", help="Gemini model name to use.")
     parser.add_argument("--top-shap-count", type=int, default=3, help="Number of top positive/negative SHAP drivers to include.")
-    parser.add_argument("--batch-size", type=int, default=20, help="Number of leads to send per Gemini request.")
+    parser.add_argument("--batch-size", type=int, default=20, help="Number of driver signatures to send per Gemini request.")
+    parser.add_argument("--concurrency", type=int, default=8, help="Maximum Gemini requests in flight.")
+    parser.add_argument("--requests-per-minute", type=float, default=60, help="Gemini request rate limit (0 = unlimited).")
+    parser.add_argument("--max-retries", type=int, default=3, help="Retries per request on backend errors.")
+    parser.add_argument("--cache-file", default=None, help="JSON narrative cache reused across runs.")
+    parser.add_argument("--backend", choices=["gemini", "template"], default="gemini",
+                        help="Narrative backend; 'template' is a local deterministic stand-in.")
     parser.add_argument("--max-leads", type=int, default=None, help="Optional cap on number of leads to process.")
     parser.add_argument("--bucket-percentiles", nargs=3, type=float, default=[0.9, 0.75, 0.5],
                         help="Percentiles to define top10/top25/top50 buckets (values between 0 and 1).")
@@ -105,6 +100,8 @@ def configure_gemini(api_key: str, model_name: str):
     resolved_name = MODEL_ALIASES.get(model_name, model_name)
     if not resolved_name.startswith("models/"):
         resolved_name = f"models/{resolved_name}"
+    import google.generativeai as genai  # only needed for the Gemini backend
+
     genai.configure(api_key=api_key)
     return genai.GenerativeModel(resolved_name)
 
@@ -129,97 +126,6 @@ def assign_buckets(scores: pd.Series, percentiles: Iterable[float]) -> Tuple[pd.
     return scores.apply(label), thresholds
 
 
-def extract_shap_drivers(row: pd.Series, shap_cols: List[str], top_n: int) -> Tuple[List[Tuple[str, float]], List[Tuple[str, float]]]:
-    shap_vals = {col[len("shap_"):]: row[col] for col in shap_cols}
-    positives = sorted([(feat, val) for feat, val in shap_vals.items() if val > 0], key=lambda x: x[1], reverse=True)[:top_n]
-    negatives = sorted([(feat, val) for feat, val in shap_vals.items() if val < 0], key=lambda x: x[1])[:top_n]
-    return positives, negatives
-
-
-def describe_feature(feature: str) -> str:
-    return FEATURE_DESCRIPTIONS.get(feature, feature.replace("_", " "))
-
-
-def format_drivers(drivers: List[Tuple[str, float]]) -> List[str]:
-    formatted = []
-    for feat, val in drivers:
-        description = describe_feature(feat)
-        formatted.append(f"{description} (SHAP {val:+.3f})")
-    return formatted
-
-
-def build_prompt(
-    row: pd.Series,
-    bucket: str,
-    positives: List[str],
-    negatives: List[str],
-) -> str:
-    lead_name = f"{row.get('Impact_FirstName', '').strip()} {row.get('Impact_LastName', '').strip()}".strip()
-    if not lead_name:
-        lead_name = f"Rep {row.get('RepCRD', 'Unknown')}"
-
-    v12_score = row.get("v12_score", np.nan)
-
-    prompt = [
-        "You are a sales strategist generating a short, plain-language justification for why a financial advisor lead is prioritized at a certain tier.",
-        "Keep the tone professional but conversational, and limit the explanation to 2-3 sentences.",
-        "Highlight the most important positive drivers when the lead is in a top bucket; mention cautionary factors for lower buckets.",
-        "If the recent_move_flag is true, explicitly explain that the rep recently moved firms (include the provided hire date if present) and that their score was suppressed because they are unlikely to change firms again soon.",
-        "",
-        f"Lead: {lead_name}",
-        f"RepCRD: {row.get('RepCRD', 'N/A')}",
-        f"Percentile bucket: {bucket}",
-        f"V12 score: {v12_score:.3f}" if not pd.isna(v12_score) else "V12 score: N/A",
-        f"Recent move flag: {row.get('recent_move_flag', False)}",
-    ]
-
-    recent_move_date = row.get("recent_move_hire_date")
-    if recent_move_date:
-        prompt.append(f"Recent move hire date: {recent_move_date}")
-
-    if positives:
-        prompt.append("\nPositive drivers:")
-        prompt.extend(f"- {driver}" for driver in positives)
-    if negatives:
-        prompt.append("\nLower-weight drivers or caution flags:")
-        prompt.extend(f"- {driver}" for driver in negatives)
-
-    prompt.append(
-        "\nWrite an explanation tailored to the bucket. For Top 10/25/50 buckets, emphasize why the lead is attractive. For the lower 50%, explain why they are deprioritized."
-    )
-
-    return "\n".join(prompt)
-
-
-def parse_gemini_json(text: str, expected: int) -> List[Dict[str, str]]:
-    cleaned = text.strip()
-    if cleaned.startswith("```"):
-        parts = cleaned.split("```")
-        cleaned = ""
-        for part in parts:
-            part = part.strip()
-            if not part:
-                continue
-            if part.lower().startswith("json"):
-                part = part[4:].strip()
-            if part:
-                cleaned = part
-                break
-    try:
-        data = json.loads(cleaned)
-        if isinstance(data, dict) and "items" in data:
-            data = data["items"]
-        if isinstance(data, dict) and "results" in data:
-            data = data["results"]
-        if not isinstance(data, list):
-            raise ValueError("Response is not a list")
-        if len(data) != expected:
-            raise ValueError(f"Expected {expected} items, got {len(data)}")
-        return data
-    except Exception as exc:
-        raise ValueError(f"Failed to parse Gemini response: {exc}\nRaw response: {text}") from exc
-
-
 def generate_narratives(
     model,
     df: pd.DataFrame,
@@ -227,51 +133,30 @@ def generate_narratives(
     shap_cols: List[str],
     top_n: int,
     batch_size: int,
+    backend=None,
+    cache: NarrativeCache | None = None,
+    concurrency: int = 8,
+    requests_per_minute: float | None = 60,
+    max_retries: int = 3,
 ) -> List[str]:
-    narratives: List[str] = []
-    total = len(df)
-    iterator = range(0, total, batch_size)
-    for start in tqdm(iterator, desc="Generating narratives", total=(total + batch_size - 1) // batch_size):
-        end = min(start + batch_size, total)
-        batch_df = df.iloc[start:end]
-        prompt_lines = [
-            "You are a sales strategist. For each lead below, write a concise 2-3 sentence narrative explaining why they fall into the specified priority bucket.",
-            "Use the provided positive drivers as the main reasons. Mention cautionary factors only if negative drivers are present.",
-            "Return ONLY a JSON array. Each element must have keys 'rep_crd' and 'narrative'. The order must match the inputs.",
-        ]
-
-        for idx, (_, row) in enumerate(batch_df.iterrows(), start=1):
-            bucket = bucket_labels.loc[row.name]
-            positives_raw, negatives_raw = extract_shap_drivers(row, shap_cols, top_n)
-            positives = format_drivers(positives_raw)
-            negatives = format_drivers(negatives_raw)
-            entry = {
-                "rep_crd": str(row.get("RepCRD", "")),
-                "bucket": bucket,
-                "score": float(row.get("v12_score", 0)),
-                "positives": positives,
-                "negatives": negatives,
-                "recent_move": bool(row.get("recent_move_flag", False)),
-                "recent_move_hire_date": row.get("recent_move_hire_date"),
-            }
-            prompt_lines.append(f"{idx}. {json.dumps(entry)}")
-
-        prompt_lines.append(
-            "Respond with a JSON array matching the order of the inputs. Each element must include keys 'rep_crd' and 'narrative'. If recent_move is true, mention the recent move and the lowered likelihood of another move soon."
-        )
-        prompt = "\n".join(prompt_lines)
-
-        try:
-            response = model.generate_content(prompt)
-            batch_results = parse_gemini_json(response.text, len(batch_df))
-            rep_to_text = {str(item.get("rep_crd", "")): item.get("narrative", "").strip() for item in batch_results}
-            for _, row in batch_df.iterrows():
-                rep_key = str(row.get("RepCRD", ""))
-                narratives.append(rep_to_text.get(rep_key, "[ERROR] Narrative missing from Gemini response"))
-        except Exception as exc:
-            for _ in batch_df.iterrows():
-                narratives.append(f"[ERROR] Unable to generate narrative: {exc}")
-
+    service = NarrativeService(
+        backend or GeminiBackend(model),
+        cache=cache,
+        batch_size=batch_size,
+        requests_per_minute=requests_per_minute or None,
+        max_concurrency=concurrency,
+        max_retries=max_retries,
+    )
+    with tqdm(desc="Generating narratives", unit="signature") as progress:
+        narratives = service.narrate(df, bucket_labels, shap_cols, top_n, on_batch=progress.update)
+
+    stats = service.stats
+    print(f"[INFO] {stats.leads:,} leads -> {stats.signatures:,} driver signatures "
+          f"({stats.cache_hits:,} cached); {stats.requests:,} requests, "
+          f"~{stats.approx_prompt_tokens:,} prompt tokens, {stats.seconds:.1f}s")
+    if stats.split_retries or stats.failed_signatures:
+        print(f"[WARN] {stats.split_retries:,} batches re-sent as sub-batches; "
+              f"{stats.failed_signatures:,} signatures failed")
     return narratives
 
 
@@ -329,9 +214,13 @@ def main() -> None:
 
     shap_cols = [col for col in merged_df.columns if col.startswith("shap_")]
 
-    api_key = os.getenv(args.api_key_env)
-    model = configure_gemini(api_key, args.model)
+    if args.backend == "template":
+        model, backend = None, TemplateBackend()
+    else:
+        api_key = os.getenv(args.api_key_env)
+        model, backend = configure_gemini(api_key, args.model), None
 
+    cache = NarrativeCache(args.cache_file)
     narratives = generate_narratives(
         model,
         merged_df,
@@ -339,8 +228,14 @@ def main() -> None:
         shap_cols,
         args.top_shap_count,
         args.batch_size,
+        backend=backend,
+        cache=cache,
+        concurrency=args.concurrency,
+        requests_per_minute=args.requests_per_minute,
+        max_retries=args.max_retries,
     )
     merged_df["v12_narrative"] = narratives
+    cache.save()
 
     base_columns = [col for col in scores_df.columns if not col.startswith("v12_")]
     final_df = pd.DataFrame(index=merged_df.index)
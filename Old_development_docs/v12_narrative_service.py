@@ -0,0 +1,377 @@
+"""
+Concurrent, cached narrative generation for V12 scores.
+
+Most leads share a driver signature - the same bucket, the same top positive
+and negative SHAP drivers and the same recent-move flag - and therefore the
+same narrative. The service:
+  1. Reduces every lead to a canonical signature key.
+  2. Looks each key up in the narrative cache (optionally persisted as JSON).
+  3. Sends only the missing keys, in batches dispatched concurrently through
+     asyncio behind a requests-per-minute limiter.
+  4. On an unparseable response, re-sends the batch as two halves (down to
+     single items); transient backend errors are retried with backoff.
+
+The backend is pluggable: GeminiBackend wraps a google.generativeai model,
+TemplateBackend is a deterministic local stand-in for dry runs and tests.
+
+Usage example:
+--------------
+service = NarrativeService(TemplateBackend(), cache=NarrativeCache("narratives.json"))
+narratives = service.narrate(df, bucket_labels, shap_cols, top_n=3)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import re
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+
+FEATURE_DESCRIPTIONS: Dict[str, str] = {
+    "Firm_Stability_Score_v12_binned_Low_Under_30": "Low firm stability (frequent moves recently)",
+    "Firm_Stability_Score_v12_binned_Moderate_30_to_60": "Moderate firm stability (some movement)",
+    "Firm_Stability_Score_v12_binned_High_60_to_90": "High firm stability (tends to stay put)",
+    "Firm_Stability_Score_v12_binned_Very_High_90_Plus": "Very high firm stability (long tenure at current firm)",
+    "Firm_Stability_Score_v12_binned_Missing_Zero": "Firm stability information missing",
+    "AverageTenureAtPriorFirms_binned_Short_Under_2": "Short average tenure at prior firms (<2 years)",
+    "AverageTenureAtPriorFirms_binned_Moderate_2_to_5": "Moderate average tenure (2-5 years) at prior firms",
+    "AverageTenureAtPriorFirms_binned_Long_5_to_10": "Longer average tenure (5-10 years) at prior firms",
+    "AverageTenureAtPriorFirms_binned_Very_Long_10_Plus": "Very long tenure (10+ years) at prior firms",
+    "AverageTenureAtPriorFirms_binned_No_Prior_Firms": "No prior firm history",
+    "Number_YearsPriorFirm1_binned_Short_Under_3": "Stayed less than 3 years at most recent prior firm",
+    "Number_YearsPriorFirm1_binned_Moderate_3_to_7": "Stayed 3-7 years at most recent prior firm",
+    "Number_YearsPriorFirm1_binned_Long_7_Plus": "Stayed 7+ years at most recent prior firm",
+    "Number_YearsPriorFirm1_binned_No_Prior_Firm_1": "No prior firm 1 history",
+    "Gender_Male": "Gender recorded as male",
+    "Gender_Missing": "Gender information missing or not specified",
+    "RegulatoryDisclosures_Yes": "Regulatory disclosures on file",
+    "RegulatoryDisclosures_Unknown": "Regulatory disclosures missing",
+}
+
+HIRE_DATE_PLACEHOLDER = "{hire_date}"
+
+BATCH_INSTRUCTIONS = [
+    "You are a sales strategist. For each driver profile below, write a concise 2-3 sentence narrative explaining why a financial advisor lead with that profile falls into the specified priority bucket.",
+    "Use the provided positive drivers as the main reasons. Mention cautionary factors only if negative drivers are present.",
+    f"If recent_move is true, explain that the rep recently moved firms and that their score was suppressed because they are unlikely to change firms again soon; refer to the hire date only with the literal placeholder {HIRE_DATE_PLACEHOLDER}.",
+    "Return ONLY a JSON array. Each element must have keys 'id' and 'narrative'. The order must match the inputs.",
+]
+
+ITEM_LINE = re.compile(r"^\d+\. (\{.*\})$")
+
+SignatureKey = str
+
+
+class NarrativeParseError(ValueError):
+    """The model response could not be parsed into one narrative per input."""
+
+
+def describe_feature(feature: str) -> str:
+    return FEATURE_DESCRIPTIONS.get(feature, feature.replace("_", " "))
+
+
+def parse_gemini_json(text: str, expected: int) -> List[Dict[str, str]]:
+    cleaned = text.strip()
+    if cleaned.startswith("```"):
+        parts = cleaned.split("```")
+        cleaned = ""
+        for part in parts:
+            part = part.strip()
+            if not part:
+                continue
+            if part.lower().startswith("json"):
+                part = part[4:].strip()
+            if part:
+                cleaned = part
+                break
+    try:
+        data = json.loads(cleaned)
+        if isinstance(data, dict) and "items" in data:
+            data = data["items"]
+        if isinstance(data, dict) and "results" in data:
+            data = data["results"]
+        if not isinstance(data, list):
+            raise ValueError("Response is not a list")
+        if len(data) != expected:
+            raise ValueError(f"Expected {expected} items, got {len(data)}")
+        return data
+    except Exception as exc:
+        raise NarrativeParseError(f"Failed to parse Gemini response: {exc}\nRaw response: {text}") from exc
+
+
+def driver_signatures(
+    df: pd.DataFrame,
+    bucket_labels: pd.Series,
+    shap_cols: List[str],
+    top_n: int,
+) -> pd.Series:
+    """
+    Canonical signature key per lead: JSON of [bucket, top positive drivers,
+    top negative drivers, recent_move]. Drivers are ranked by SHAP value
+    (ties keep column order).
+    """
+    names = np.array([col[len("shap_"):] for col in shap_cols], dtype=object)
+    values = df[shap_cols].to_numpy(dtype=float)
+
+    positive = np.where(values > 0, values, -np.inf)
+    pos_order = np.argsort(-positive, axis=1, kind="stable")[:, :top_n]
+    pos_valid = np.take_along_axis(positive, pos_order, axis=1) > -np.inf
+
+    negative = np.where(values < 0, values, np.inf)
+    neg_order = np.argsort(negative, axis=1, kind="stable")[:, :top_n]
+    neg_valid = np.take_along_axis(negative, neg_order, axis=1) < np.inf
+
+    recent = df.get("recent_move_flag", pd.Series(False, index=df.index)).fillna(False).astype(bool).to_numpy()
+    buckets = bucket_labels.reindex(df.index).astype(str).to_numpy()
+    keys = [
+        json.dumps([bucket, names[p[pv]].tolist(), names[n[nv]].tolist(), bool(r)])
+        for bucket, p, pv, n, nv, r in zip(buckets, pos_order, pos_valid, neg_order, neg_valid, recent)
+    ]
+    return pd.Series(keys, index=df.index)
+
+
+def signature_payload(key: SignatureKey, item_id: int) -> Dict[str, object]:
+    bucket, positives, negatives, recent = json.loads(key)
+    return {
+        "id": item_id,
+        "bucket": bucket,
+        "positives": [describe_feature(f) for f in positives],
+        "negatives": [describe_feature(f) for f in negatives],
+        "recent_move": recent,
+    }
+
+
+def build_batch_prompt(keys: Sequence[SignatureKey]) -> str:
+    lines = list(BATCH_INSTRUCTIONS)
+    lines.extend(f"{idx}. {json.dumps(signature_payload(key, idx))}" for idx, key in enumerate(keys, start=1))
+    return "\n".join(lines)
+
+
+class NarrativeCache:
+    """Signature key -> narrative, optionally loaded from and saved to a JSON file."""
+
+    def __init__(self, path: Optional[str | Path] = None):
+        self.path = Path(path) if path else None
+        self.entries: Dict[SignatureKey, str] = {}
+        if self.path and self.path.exists():
+            self.entries = json.loads(self.path.read_text(encoding="utf-8"))
+
+    def __contains__(self, key: SignatureKey) -> bool:
+        return key in self.entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key: SignatureKey) -> Optional[str]:
+        return self.entries.get(key)
+
+    def put(self, key: SignatureKey, narrative: str) -> None:
+        self.entries[key] = narrative
+
+    def save(self) -> None:
+        if self.path:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.path.write_text(json.dumps(self.entries, indent=1), encoding="utf-8")
+
+
+class GeminiBackend:
+    """Sends prompts to a google.generativeai GenerativeModel."""
+
+    def __init__(self, model):
+        self.model = model
+
+    async def generate(self, prompt: str) -> str:
+        if hasattr(self.model, "generate_content_async"):
+            response = await self.model.generate_content_async(prompt)
+        else:
+            response = await asyncio.to_thread(self.model.generate_content, prompt)
+        return response.text
+
+
+class TemplateBackend:
+    """
+    Deterministic local stand-in for the LLM: answers a batch prompt from the
+    item payloads with a fixed template. Batches larger than max_items get a
+    truncated JSON reply, which exercises the sub-batch retry path.
+    """
+
+    def __init__(self, max_items: Optional[int] = None, latency: float = 0.0):
+        self.max_items = max_items
+        self.latency = latency
+        self.calls = 0
+
+    @staticmethod
+    def narrative(item: Dict[str, object]) -> str:
+        bucket = item["bucket"]
+        positives = item["positives"] or ["no strong positive drivers"]
+        text = f"This lead is in the {bucket} bucket, driven mainly by {'; '.join(positives).lower()}."
+        if item["negatives"]:
+            text += f" Cautionary factors: {'; '.join(item['negatives']).lower()}."
+        if item["recent_move"]:
+            text += f" The rep moved firms on {HIRE_DATE_PLACEHOLDER}, so the score is suppressed."
+        return text
+
+    async def generate(self, prompt: str) -> str:
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        items = [json.loads(m.group(1)) for m in map(ITEM_LINE.match, prompt.splitlines()) if m]
+        reply = json.dumps([{"id": item["id"], "narrative": self.narrative(item)} for item in items])
+        if self.max_items is not None and len(items) > self.max_items:
+            return reply[: len(reply) // 2]
+        return reply
+
+
+class RateLimiter:
+    """Caps in-flight requests and spaces request starts to requests_per_minute (one per event loop)."""
+
+    def __init__(self, requests_per_minute: Optional[float], max_concurrency: int):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute else 0.0
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._lock = asyncio.Lock()
+        self._next_start = 0.0
+
+    async def __aenter__(self):
+        await self._semaphore.acquire()
+        async with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start)
+            self._next_start = start + self.interval
+        if start > now:
+            await asyncio.sleep(start - now)
+        return self
+
+    async def __aexit__(self, *exc):
+        self._semaphore.release()
+
+
+@dataclass
+class NarrativeStats:
+    leads: int = 0
+    signatures: int = 0
+    cache_hits: int = 0
+    requests: int = 0
+    split_retries: int = 0
+    failed_signatures: int = 0
+    prompt_chars: int = 0
+    seconds: float = 0.0
+
+    @property
+    def approx_prompt_tokens(self) -> int:
+        return self.prompt_chars // 4
+
+
+class NarrativeService:
+    """Generate one narrative per lead, calling the backend once per uncached signature."""
+
+    def __init__(
+        self,
+        backend,
+        cache: Optional[NarrativeCache] = None,
+        batch_size: int = 20,
+        requests_per_minute: Optional[float] = 60,
+        max_concurrency: int = 8,
+        max_retries: int = 3,
+        retry_backoff: float = 2.0,
+    ):
+        self.backend = backend
+        self.cache = cache if cache is not None else NarrativeCache()
+        self.batch_size = batch_size
+        self.requests_per_minute = requests_per_minute
+        self.max_concurrency = max_concurrency
+        self.limiter: Optional[RateLimiter] = None
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.stats = NarrativeStats()
+
+    def narrate(
+        self,
+        df: pd.DataFrame,
+        bucket_labels: pd.Series,
+        shap_cols: List[str],
+        top_n: int,
+        on_batch: Optional[Callable[[int], None]] = None,
+    ) -> List[str]:
+        return asyncio.run(self.narrate_async(df, bucket_labels, shap_cols, top_n, on_batch))
+
+    async def narrate_async(
+        self,
+        df: pd.DataFrame,
+        bucket_labels: pd.Series,
+        shap_cols: List[str],
+        top_n: int,
+        on_batch: Optional[Callable[[int], None]] = None,
+    ) -> List[str]:
+        started = time.perf_counter()
+        self.limiter = RateLimiter(self.requests_per_minute, self.max_concurrency)
+        keys = driver_signatures(df, bucket_labels, shap_cols, top_n)
+        unique_keys = list(dict.fromkeys(keys))
+        missing = [key for key in unique_keys if key not in self.cache]
+        self.stats.leads += len(df)
+        self.stats.signatures += len(unique_keys)
+        self.stats.cache_hits += len(unique_keys) - len(missing)
+
+        async def run(batch: List[SignatureKey]) -> Dict[SignatureKey, str]:
+            result = await self._run_batch(batch)
+            if on_batch:
+                on_batch(len(batch))
+            return result
+
+        batches = [missing[i:i + self.batch_size] for i in range(0, len(missing), self.batch_size)]
+        generated: Dict[SignatureKey, str] = {}
+        for result in await asyncio.gather(*(run(batch) for batch in batches)):
+            generated.update(result)
+        for key, text in generated.items():
+            if not text.startswith("[ERROR]"):
+                self.cache.put(key, text)
+
+        hire_dates = df.get("recent_move_hire_date", pd.Series("", index=df.index))
+        narratives = []
+        for key, hire_date in zip(keys, hire_dates):
+            text = self.cache.get(key) or generated[key]
+            if HIRE_DATE_PLACEHOLDER in text:
+                text = text.replace(HIRE_DATE_PLACEHOLDER, str(hire_date) if pd.notna(hire_date) and hire_date else "a recent date")
+            narratives.append(text)
+        self.stats.seconds += time.perf_counter() - started
+        return narratives
+
+    async def _call(self, prompt: str) -> str:
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with self.limiter:
+                    self.stats.requests += 1
+                    self.stats.prompt_chars += len(prompt)
+                    return await self.backend.generate(prompt)
+            except Exception:
+                if attempt == self.max_retries:
+                    raise
+                await asyncio.sleep(self.retry_backoff * 2 ** attempt)
+
+    async def _run_batch(self, keys: List[SignatureKey]) -> Dict[SignatureKey, str]:
+        try:
+            text = await self._call(build_batch_prompt(keys))
+            items = parse_gemini_json(text, len(keys))
+        except NarrativeParseError as exc:
+            if len(keys) == 1:
+                self.stats.failed_signatures += 1
+                return {keys[0]: f"[ERROR] Unable to generate narrative: {exc}"}
+            self.stats.split_retries += 1
+            middle = len(keys) // 2
+            halves = await asyncio.gather(self._run_batch(keys[:middle]), self._run_batch(keys[middle:]))
+            return {**halves[0], **halves[1]}
+        except Exception as exc:
+            self.stats.failed_signatures += len(keys)
+            return {key: f"[ERROR] Unable to generate narrative: {exc}" for key in keys}
+
+        by_id = {str(item.get("id", "")): str(item.get("narrative", "")).strip() for item in items}
+        return {
+            key: by_id.get(str(idx)) or "[ERROR] Narrative missing from Gemini response"
+            for idx, key in enumerate(keys, start=1)
+        }
@@ -5,10 +5,8 @@ Working Directory: C:/Users/russe/Documents/Lead Scoring/V3+V4_testing
 Output: data/tier_performance.csv, reports/tier_analysis.md
 """
 
+import sys
 import pandas as pd
-import numpy as np
-from scipy import stats
-from google.cloud import bigquery
 from pathlib import Path
 from datetime import datetime
 
@@ -25,7 +23,12 @@ DATA_DIR.mkdir(parents=True, exist_ok=True)
 REPORTS_DIR.mkdir(parents=True, exist_ok=True)
 LOGS_DIR.mkdir(parents=True, exist_ok=True)
 
-PROJECT_ID = "savvy-gtm-analytics"
+# Conversion cube (materialized by Lead_List_Generation/scripts/conversion_cube.py)
+sys.path.insert(0, str(Path("C:/Users/russe/Documents/Lead Scoring/Lead_List_Generation/scripts")))
+from conversion_cube import ConversionCube, CUBE_DIR
+
+DATA_START = "2025-01-01"
+DATA_END = "2025-10-01"
 
 # V3 Expected Conversion Rates (from SQL query - these are what's actually in the data)
 V3_EXPECTED_RATES = {
@@ -41,30 +44,28 @@ V3_EXPECTED_RATES = {
 }
 
 def load_historical_data():
-    """Load historical leads with outcomes from BigQuery."""
-    client = bigquery.Client(project=PROJECT_ID)
-    query = """
-    SELECT *
-    FROM `savvy-gtm-analytics.ml_features.historical_leads_with_outcomes`
-    """
-    df = client.query(query).to_dataframe()
-    print(f"[INFO] Loaded {len(df):,} historical leads")
-    return df
+    """Load historical lead outcomes (Q1-Q3 2025 contacts) from the conversion cube."""
+    # Tiers at first contact from historical_leads_with_outcomes, not later lead lists
+    cube = ConversionCube.load(CUBE_DIR, start=DATA_START, end=DATA_END).slice(
+        tier_source='historical_leads')
+    print(f"[INFO] Loaded {int(cube.data['leads'].sum()):,} historical leads "
+          f"({len(cube):,} cube cells)")
+    return cube
 
-def calculate_tier_performance(df):
+def calculate_tier_performance(cube):
     """Calculate actual conversion rates by tier."""
     
     # Overall baseline
-    baseline_rate = df['converted_to_mql'].mean()
+    baseline_rate = cube.rollup(measure='mql')['conversion_rate'].iloc[0]
     print(f"\n[INFO] Overall conversion rate: {baseline_rate*100:.2f}%")
     
     # By tier
-    tier_stats = df.groupby('score_tier').agg({
-        'lead_id': 'count',
-        'converted_to_mql': ['sum', 'mean']
-    }).round(4)
-    
-    tier_stats.columns = ['total_leads', 'conversions', 'actual_rate']
+    rates = cube.rollup('score_tier', measure='mql')
+    tier_stats = pd.DataFrame({
+        'total_leads': rates['leads'],
+        'conversions': rates['conversions'],
+        'actual_rate': rates['conversion_rate'].round(4),
+    })
     tier_stats['expected_rate'] = tier_stats.index.map(V3_EXPECTED_RATES)
     tier_stats['actual_lift'] = tier_stats['actual_rate'] / baseline_rate if baseline_rate > 0 else 0
     tier_stats['expected_lift'] = tier_stats['expected_rate'] / baseline_rate if baseline_rate > 0 else 0
@@ -79,44 +80,21 @@ def calculate_tier_performance(df):
     
     return tier_stats, baseline_rate
 
-def statistical_significance(df, tier1, tier2):
-    """Test if two tiers have significantly different conversion rates."""
-    t1_data = df[df['score_tier'] == tier1]
-    t2_data = df[df['score_tier'] == tier2]
-    
-    if len(t1_data) == 0 or len(t2_data) == 0:
-        return {
-            'tier1': tier1,
-            'tier2': tier2,
-            'tier1_rate': 0 if len(t1_data) == 0 else t1_data['converted_to_mql'].mean(),
-            'tier2_rate': 0 if len(t2_data) == 0 else t2_data['converted_to_mql'].mean(),
-            'odds_ratio': None,
-            'p_value': None,
-            'significant': False,
-            'note': 'Insufficient data for comparison'
-        }
-    
-    # Create contingency table
-    table = [
-        [t1_data['converted_to_mql'].sum(), len(t1_data) - t1_data['converted_to_mql'].sum()],
-        [t2_data['converted_to_mql'].sum(), len(t2_data) - t2_data['converted_to_mql'].sum()]
-    ]
-    
-    # Fisher's exact test (better for small samples)
-    try:
-        odds_ratio, p_value = stats.fisher_exact(table)
-    except:
-        odds_ratio, p_value = None, None
-    
-    return {
+def statistical_significance(cube, tier1, tier2):
+    """Test if two tiers have significantly different conversion rates (Fisher's exact)."""
+    comp = cube.compare('score_tier', tier1, tier2, measure='mql')
+    result = {
         'tier1': tier1,
         'tier2': tier2,
-        'tier1_rate': t1_data['converted_to_mql'].mean(),
-        'tier2_rate': t2_data['converted_to_mql'].mean(),
-        'odds_ratio': odds_ratio,
-        'p_value': p_value,
-        'significant': p_value < 0.05 if p_value is not None else False
+        'tier1_rate': comp['rate_a'],
+        'tier2_rate': comp['rate_b'],
+        'odds_ratio': comp['odds_ratio'],
+        'p_value': comp['p_value'],
+        'significant': comp['significant']
     }
+    if comp['leads_a'] == 0 or comp['leads_b'] == 0:
+        result['note'] = 'Insufficient data for comparison'
+    return result
 
 def generate_report(tier_stats, baseline_rate, comparisons):
     """Generate markdown report."""
@@ -249,10 +227,10 @@ def main():
     print("=" * 70)
     
     # Load data
-    df = load_historical_data()
+    cube = load_historical_data()
     
     # Calculate tier performance
-    tier_stats, baseline_rate = calculate_tier_performance(df)
+    tier_stats, baseline_rate = calculate_tier_performance(cube)
     
     print("\n" + "=" * 70)
     print("TIER PERFORMANCE SUMMARY")
@@ -263,8 +241,8 @@ def main():
     comparisons = []
     
     # T1A vs T2 (if both exist)
-    if 'TIER_1A_PRIME_MOVER_CFP' in df['score_tier'].values and 'TIER_2_PROVEN_MOVER' in df['score_tier'].values:
-        comp = statistical_significance(df, 'TIER_1A_PRIME_MOVER_CFP', 'TIER_2_PROVEN_MOVER')
+    if 'TIER_1A_PRIME_MOVER_CFP' in tier_stats.index and 'TIER_2_PROVEN_MOVER' in tier_stats.index:
+        comp = statistical_significance(cube, 'TIER_1A_PRIME_MOVER_CFP', 'TIER_2_PROVEN_MOVER')
         comparisons.append(comp)
         if comp.get('p_value') is not None:
             print(f"\n[INFO] T1A vs T2: p-value = {comp['p_value']:.4f}")
@@ -272,8 +250,8 @@ def main():
             print(f"\n[INFO] T1A vs T2: {comp.get('note', 'Cannot calculate')}")
     
     # T1 vs T2 (larger samples)
-    if 'TIER_1_PRIME_MOVER' in df['score_tier'].values and 'TIER_2_PROVEN_MOVER' in df['score_tier'].values:
-        comp = statistical_significance(df, 'TIER_1_PRIME_MOVER', 'TIER_2_PROVEN_MOVER')
+    if 'TIER_1_PRIME_MOVER' in tier_stats.index and 'TIER_2_PROVEN_MOVER' in tier_stats.index:
+        comp = statistical_significance(cube, 'TIER_1_PRIME_MOVER', 'TIER_2_PROVEN_MOVER')
         comparisons.append(comp)
         if comp.get('p_value') is not None:
             print(f"[INFO] T1 vs T2: p-value = {comp['p_value']:.4f}")
@@ -294,8 +272,8 @@ def main():
     with open(log_path, 'a') as f:
         f.write(f"\n\n## Step 3: Tier Performance Analysis - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
         f.write(f"- Baseline conversion rate: {baseline_rate*100:.2f}%\n")
-        f.write(f"- Total leads analyzed: {len(df):,}\n")
-        f.write(f"- Total conversions: {df['converted_to_mql'].sum():,}\n")
+        f.write(f"- Total leads analyzed: {int(tier_stats['total_leads'].sum()):,}\n")
+        f.write(f"- Total conversions: {int(tier_stats['conversions'].sum()):,}\n")
         for tier, row in tier_stats.iterrows():
             f.write(f"- {tier}: {row['actual_rate']*100:.2f}% actual (vs {row['expected_rate']*100:.2f}% expected)\n")
     
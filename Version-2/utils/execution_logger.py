@@ -22,7 +22,13 @@ Usage:
     logger.log_learning("Conversion rate is higher in 2025 (4.37%) vs 2024 (3.96%)")
     logger.log_decision("Using 60-day test window", "Provides sufficient test samples while maximizing training data")
     
+    with logger.span("Train model", rows=len(X_train)):   # timed span (see utils/tracing.py)
+        model.fit(X_train, y_train)
+    
     logger.end_phase(status="PASSED", next_steps=["Proceed to Phase 1.2"])
+
+end_phase also writes a Chrome trace and span metrics JSON for the phase to
+logs/traces/ next to the log file.
 """
 
 import os
@@ -30,19 +36,27 @@ from datetime import datetime
 from pathlib import Path
 from typing import List, Dict, Any, Optional
 
+from utils.tracing import Tracer
+
 class ExecutionLogger:
     def __init__(self, 
                  log_path: str = r"C:\Users\russe\Documents\Lead Scoring\Version-2\EXECUTION_LOG.md",
-                 version: str = "v3"):
+                 version: str = "v3",
+                 trace: bool = True):
         """
         Initialize the execution logger.
         
         Args:
             log_path: Path to the execution log file
             version: Model version being developed
+            trace: Write per-phase trace/metrics files to logs/traces/
         """
         self.log_path = Path(log_path)
         self.version = version
+        self.trace_dir = self.log_path.parent / "logs" / "traces"
+        self.trace_enabled = trace
+        self.tracer = Tracer()
+        self._phase_span = None
         self.current_phase = None
         self.phase_start_time = None
         self.files_created = []
@@ -98,6 +112,8 @@ class ExecutionLogger:
         self.metrics = {}
         self.learnings = []
         self.decisions = []
+        self.tracer.reset()
+        self._phase_span = self.tracer.start_span(f"Phase {self.current_phase}")
         
         print(f"\n{'='*60}")
         print(f"📍 STARTING Phase {self.current_phase}")
@@ -148,8 +164,25 @@ class ExecutionLogger:
         if not hasattr(self, 'actions'):
             self.actions = []
         self.actions.append(action)
+        self.tracer.instant(action)
         print(f"   ▶️ {action}")
     
+    def span(self, name: str, rows: int = None, profile: bool = False, **attrs):
+        """
+        Context manager timing a block as a span of the current phase.
+        
+        Args:
+            name: Span name
+            rows: Row count processed (or set span.rows inside the block)
+            profile: Attach the sampling profiler to this span
+            **attrs: Extra attributes for the trace
+        """
+        return self.tracer.span(name, rows=rows, profile=profile, **attrs)
+    
+    def trace(self, name: str = None, profile: bool = False):
+        """Decorator timing each call of a function as a span."""
+        return self.tracer.trace(name, profile=profile)
+    
     def end_phase(self, 
                   status: str = "PASSED",
                   next_steps: List[str] = None,
@@ -238,6 +271,9 @@ class ExecutionLogger:
         if additional_notes:
             entry += f"\n### Additional Notes\n{additional_notes}\n"
         
+        # Add span timings
+        entry += self._write_trace(status, duration_minutes * 60)
+        
         # Add next steps
         entry += "\n### Next Steps\n"
         if next_steps:
@@ -267,6 +303,36 @@ class ExecutionLogger:
         self.phase_start_time = None
         self.actions = []
     
+    def _write_trace(self, status: str, duration_s: float) -> str:
+        """Close the phase span, write trace/metrics files and return the markdown section."""
+        self.tracer.end_span(self._phase_span)
+        section = "\n### Trace\n" + self.tracer.markdown_table()
+        if not self.trace_enabled:
+            return section
+        
+        phase_id = self.current_phase.split(':', 1)[0]
+        stem = f"phase_{phase_id}_{self.phase_start_time.strftime('%Y%m%d_%H%M%S')}"
+        try:
+            paths = self.tracer.write(self.trace_dir, stem, extra={
+                'phase': self.current_phase,
+                'version': self.version,
+                'started': self.phase_start_time.isoformat(),
+                'status': status,
+                'duration_s': round(duration_s, 3),
+                'gates': self.validation_gates,
+                'metrics': {k: v if isinstance(v, (int, float, bool)) else str(v)
+                            for k, v in self.metrics.items()},
+            })
+        except OSError as e:
+            print(f"   [WARNING] Trace files not written: {e}")
+            return section
+        
+        section += f"\n- **Chrome Trace:** `{paths.pop('trace')}`\n"
+        section += f"- **Span Metrics:** `{paths.pop('metrics')}`\n"
+        for label, path in paths.items():
+            section += f"- **Profile ({label.split(':', 1)[1]}):** `{path}`\n"
+        return section
+    
     def _update_summary_table(self, status: str, duration: float):
         """Update the summary table at the top of the log."""
         # Read current log
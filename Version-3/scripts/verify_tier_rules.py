@@ -0,0 +1,162 @@
+"""
+V3 Tier Rules: Parity Check Between the NumPy Evaluator and the Generated SQL
+
+Builds a boundary grid over every input of V3_TIER_SPEC (threshold values,
+values either side of them, and NULLs), then scores it twice:
+1. utils.tier_rules NumPy evaluator
+2. The spec's SQL CASE expressions, executed in DuckDB (default) or in
+   BigQuery (--bigquery, grid loaded to a scratch table)
+
+Gates on zero differences in score_tier, priority_rank and
+expected_conversion_rate, and on every tier_rules block in the lead list SQL
+being identical to the spec (--write regenerates stale blocks in place).
+
+Usage:
+    python scripts/verify_tier_rules.py
+    python scripts/verify_tier_rules.py --rows 2000000 --bigquery
+    python scripts/verify_tier_rules.py --write
+    python scripts/verify_tier_rules.py --print-sql
+"""
+
+import sys
+import argparse
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+# Add Version-3 to path
+BASE_DIR = Path(r"C:\Users\russe\Documents\Lead Scoring\Version-3")
+sys.path.insert(0, str(BASE_DIR))
+
+from utils.execution_logger import ExecutionLogger
+from utils.tier_rules import V3_TIER_SPEC, Between, Compare
+
+OUTPUTS = ['score_tier', 'priority_rank', 'expected_conversion_rate']
+SCRATCH_TABLE = "savvy-gtm-analytics.ml_features.v3_tier_rules_parity_grid"
+TIER_SQL_FILES = [
+    BASE_DIR.parent / "Lead_List_Generation" / "sql" / "January_2026_Lead_List_V3_V4_Hybrid.sql",
+]
+
+
+def boundary_grid(spec, n_rows: int, seed: int = 42) -> pd.DataFrame:
+    """Random rows drawn from each column's thresholds, +/- offsets and NULL."""
+    thresholds = {name: set() for name in spec.input_columns}
+
+    def collect(condition):
+        if isinstance(condition, Between):
+            thresholds[condition.column].update([condition.low, condition.high])
+        elif isinstance(condition, Compare):
+            thresholds[condition.column].add(condition.value)
+        else:
+            for child in condition.conditions:
+                collect(child)
+
+    for tier in spec.tiers:
+        collect(tier.condition)
+
+    rng = np.random.default_rng(seed)
+    grid = {}
+    for name, values in thresholds.items():
+        candidates = sorted({v + d for v in values for d in (-1, -0.5, -0.01, 0, 0.01, 0.5, 1)})
+        column = rng.choice(np.array(candidates, dtype=float), n_rows)
+        column[rng.random(n_rows) < 0.05] = np.nan
+        grid[name] = column
+    return pd.DataFrame(grid)
+
+
+def score_sql(spec, grid: pd.DataFrame, use_bigquery: bool) -> pd.DataFrame:
+    select = ',\n    '.join(spec.sql_case(output) for output in OUTPUTS)
+    if not use_bigquery:
+        import duckdb
+        return duckdb.sql(f"SELECT row_id,\n    {select}\nFROM grid ORDER BY row_id").df()
+
+    from google.cloud import bigquery
+    client = bigquery.Client(project="savvy-gtm-analytics", location="northamerica-northeast2")
+    job_config = bigquery.LoadJobConfig(write_disposition='WRITE_TRUNCATE')
+    client.load_table_from_dataframe(grid, SCRATCH_TABLE, job_config=job_config).result()
+    return client.query(f"SELECT row_id,\n    {select}\nFROM `{SCRATCH_TABLE}` ORDER BY row_id",
+                        location="northamerica-northeast2").to_dataframe()
+
+
+def check_sql_blocks(logger, spec, write: bool = False) -> bool:
+    """Gate on the tier_rules blocks in TIER_SQL_FILES matching the spec (or rewrite them)."""
+    passed = True
+    for path in TIER_SQL_FILES:
+        text = path.read_text(encoding='utf-8')
+        drift = spec.sql_drift(text)
+        if drift and write:
+            path.write_text(spec.render_sql(text), encoding='utf-8')
+            logger.log_action(f"Regenerated tier_rules blocks in {path.name}: {', '.join(drift)}")
+            drift = spec.sql_drift(path.read_text(encoding='utf-8'))
+        logger.log_validation_gate("GTR.2", f"{path.name} Tier Blocks Match Spec", not drift,
+                                   f"Stale: {', '.join(drift)} (run with --write)" if drift
+                                   else f"All current (spec {spec.version})")
+        passed = passed and not drift
+    return passed
+
+
+def run_tier_parity(n_rows: int = 1_000_000, use_bigquery: bool = False, seed: int = 42,
+                    write: bool = False) -> bool:
+    """Execute the tier rules parity check and the SQL block check."""
+    logger = ExecutionLogger()
+    logger.start_phase("TR", "V3 Tier Rules Parity (NumPy vs SQL)")
+
+    spec = V3_TIER_SPEC
+    engine = "BigQuery" if use_bigquery else "DuckDB"
+    logger.log_action(f"Building {n_rows:,}-row boundary grid over {len(spec.input_columns)} inputs")
+    grid = boundary_grid(spec, n_rows, seed)
+    grid.insert(0, 'row_id', np.arange(n_rows))
+
+    logger.log_action("Scoring with the NumPy evaluator")
+    local = spec.evaluate(grid)
+
+    logger.log_action(f"Scoring with the generated SQL ({engine})")
+    try:
+        remote = score_sql(spec, grid, use_bigquery).set_index('row_id').sort_index()
+    except Exception as e:
+        logger.log_validation_gate("GTR.1", "NumPy/SQL Tier Parity", False, f"SQL scoring failed: {e}")
+        logger.end_phase(status="FAILED")
+        return False
+
+    total = 0
+    for output in OUTPUTS:
+        left, right = local[output].to_numpy(), remote[output].to_numpy()
+        if output == 'expected_conversion_rate':
+            diff = int((~np.isclose(left.astype(float), right.astype(float))).sum())
+        else:
+            diff = int((left.astype(str) != right.astype(str)).sum())
+        logger.log_metric(f"{output} mismatches", diff)
+        total += diff
+
+    for tier, count in local['score_tier'].value_counts().reindex(spec.tier_names, fill_value=0).items():
+        logger.log_metric(f"Grid rows - {tier}", f"{count:,}")
+
+    passed = total == 0
+    logger.log_validation_gate("GTR.1", "NumPy/SQL Tier Parity", passed,
+                               f"{total} mismatches over {n_rows:,} rows ({engine}, spec {spec.version})")
+    passed = check_sql_blocks(logger, spec, write) and passed
+    logger.end_phase(status="PASSED" if passed else "FAILED")
+    return passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check the V3 tier NumPy evaluator against its SQL')
+    parser.add_argument('--rows', type=int, default=1_000_000, help='Grid rows (default: 1,000,000)')
+    parser.add_argument('--bigquery', action='store_true', help='Execute the SQL in BigQuery instead of DuckDB')
+    parser.add_argument('--seed', type=int, default=42, help='Grid seed')
+    parser.add_argument('--write', action='store_true', help='Rewrite stale tier_rules blocks from the spec')
+    parser.add_argument('--print-sql', action='store_true', help='Print the CASE expressions and exit')
+
+    args = parser.parse_args()
+    if args.print_sql:
+        for output in OUTPUTS:
+            print(V3_TIER_SPEC.sql_case(output, indent='        '))
+            print()
+        sys.exit(0)
+
+    success = run_tier_parity(args.rows, args.bigquery, args.seed, args.write)
+    sys.exit(0 if success else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,361 @@
+# =============================================================================
+# V3 TIER RULES MODULE
+# =============================================================================
+# Location: C:\Users\russe\Documents\Lead Scoring\Version-3\utils\tier_rules.py
+"""
+Declarative V3 Tier Rule Specification
+
+The V3.2 tiers (TIER_1A ... TIER_5, then STANDARD) are written once as data:
+each tier has a condition built from column comparisons plus its priority
+rank and expected conversion rate. The same spec compiles to:
+- a NumPy evaluator (one boolean mask per tier, np.select in priority order)
+  for local scoring, backtests and what-if variants over millions of rows
+- SQL CASE expressions for the warehouse
+
+SQL files hold the generated CASE expressions between marker comments, one
+block per output (a select-list item, trailing comma included; spec=column
+mappings rename inputs):
+
+    -- BEGIN tier_rules: score_tier
+    CASE
+        WHEN (...) THEN 'TIER_1A_PRIME_MOVER_CFP'
+        ...
+    END as score_tier,
+    -- END tier_rules
+
+render_sql() rewrites every block from V3_TIER_SPEC and sql_drift() lists
+the blocks that differ (scripts/verify_tier_rules.py).
+
+NULL handling matches SQL: a comparison on a missing value is never true,
+so a lead with missing inputs falls through to later tiers / STANDARD.
+
+Usage:
+    from utils.tier_rules import V3_TIER_SPEC, C
+
+    tiers = V3_TIER_SPEC.evaluate(df)              # score_tier, priority_rank, expected_conversion_rate
+    V3_TIER_SPEC.summary(df, target='converted')   # per-tier volume, conversion, lift
+
+    # What-if: loosen Tier 3 and re-score locally
+    variant = V3_TIER_SPEC.replace('TIER_3_MODERATE_BLEEDER',
+                                   condition=C('firm_net_change_12mo').between(-15, -1)
+                                             & (C('industry_tenure_years') >= 5))
+
+    V3_TIER_SPEC.sql_case('score_tier', indent='        ')
+    V3_TIER_SPEC.sql_case('priority_rank', columns={'industry_tenure_years': 'experience_years'})
+"""
+
+import operator
+import re
+from typing import Any, Dict, List, Optional
+import numpy as np
+import pandas as pd
+
+
+# =============================================================================
+# CONDITIONS
+# =============================================================================
+class Condition:
+    """Boolean rule over lead columns; combine with & and |."""
+
+    def __and__(self, other: 'Condition') -> 'Condition':
+        return All(self, other)
+
+    def __or__(self, other: 'Condition') -> 'Condition':
+        return AnyOf(self, other)
+
+    def mask(self, values: Dict[str, np.ndarray]) -> np.ndarray:
+        raise NotImplementedError
+
+    def sql(self, columns: Dict[str, str]) -> str:
+        raise NotImplementedError
+
+    def column_names(self) -> List[str]:
+        raise NotImplementedError
+
+
+_OPS = {'<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge,
+        '=': operator.eq, '!=': operator.ne}
+
+
+def _sql_literal(value: Any) -> str:
+    return repr(value) if isinstance(value, str) else str(value)
+
+
+class Compare(Condition):
+    def __init__(self, column: str, op: str, value: Any):
+        if op not in _OPS:
+            raise ValueError(f"Unsupported operator '{op}'")
+        self.column, self.op, self.value = column, op, value
+
+    def mask(self, values):
+        v = values[self.column]
+        with np.errstate(invalid='ignore'):
+            return ~np.isnan(v) & _OPS[self.op](v, self.value)
+
+    def sql(self, columns):
+        return f"{columns.get(self.column, self.column)} {self.op} {_sql_literal(self.value)}"
+
+    def column_names(self):
+        return [self.column]
+
+
+class Between(Condition):
+    def __init__(self, column: str, low: Any, high: Any):
+        self.column, self.low, self.high = column, low, high
+
+    def mask(self, values):
+        v = values[self.column]
+        with np.errstate(invalid='ignore'):
+            return (v >= self.low) & (v <= self.high)
+
+    def sql(self, columns):
+        return f"{columns.get(self.column, self.column)} BETWEEN {self.low} AND {self.high}"
+
+    def column_names(self):
+        return [self.column]
+
+
+class All(Condition):
+    def __init__(self, *conditions: Condition):
+        self.conditions = [c for cond in conditions
+                           for c in (cond.conditions if isinstance(cond, All) else [cond])]
+
+    def mask(self, values):
+        result = self.conditions[0].mask(values)
+        for cond in self.conditions[1:]:
+            result = result & cond.mask(values)
+        return result
+
+    def sql(self, columns):
+        return ' AND '.join(f"({c.sql(columns)})" if isinstance(c, AnyOf) else c.sql(columns)
+                            for c in self.conditions)
+
+    def column_names(self):
+        return [name for c in self.conditions for name in c.column_names()]
+
+
+class AnyOf(Condition):
+    def __init__(self, *conditions: Condition):
+        self.conditions = [c for cond in conditions
+                           for c in (cond.conditions if isinstance(cond, AnyOf) else [cond])]
+
+    def mask(self, values):
+        result = self.conditions[0].mask(values)
+        for cond in self.conditions[1:]:
+            result = result | cond.mask(values)
+        return result
+
+    def sql(self, columns):
+        return ' OR '.join(f"({c.sql(columns)})" for c in self.conditions)
+
+    def column_names(self):
+        return [name for c in self.conditions for name in c.column_names()]
+
+
+class C:
+    """Column reference for writing rules: C('tenure_years').between(1, 4) & (C('has_cfp') == 1)."""
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def between(self, low, high) -> Condition:
+        return Between(self.name, low, high)
+
+    def __lt__(self, value): return Compare(self.name, '<', value)
+    def __le__(self, value): return Compare(self.name, '<=', value)
+    def __gt__(self, value): return Compare(self.name, '>', value)
+    def __ge__(self, value): return Compare(self.name, '>=', value)
+    def __eq__(self, value): return Compare(self.name, '=', value)
+    def __ne__(self, value): return Compare(self.name, '!=', value)
+
+    __hash__ = None
+
+
+# Generated SQL block: marker line (output + spec=column mappings), body, end marker
+_SQL_BLOCK = re.compile(
+    r"(?P<header>^(?P<indent>[ \t]*)-- BEGIN tier_rules: (?P<output>\w+)"
+    r"(?P<columns>(?:[ \t]+\w+=\S+)*)[ \t]*\n)"
+    r"(?P<body>.*?)"
+    r"(?P<footer>^[ \t]*-- END tier_rules[ \t]*$)",
+    re.MULTILINE | re.DOTALL
+)
+
+
+# =============================================================================
+# TIER SPECIFICATION
+# =============================================================================
+class Tier:
+    """One tier: name, condition and its output values (priority_rank, rates, ...)."""
+
+    def __init__(self, name: str, condition: Condition, **values: Any):
+        self.name = name
+        self.condition = condition
+        self.values = values
+
+
+class TierSpec:
+    """Ordered tiers (first match wins) plus the default tier."""
+
+    def __init__(self, version: str, tiers: List[Tier], default: Tier):
+        keys = set(default.values)
+        for tier in tiers:
+            if set(tier.values) != keys:
+                raise ValueError(f"Tier '{tier.name}' values {sorted(tier.values)} != default {sorted(keys)}")
+        self.version = version
+        self.tiers = list(tiers)
+        self.default = default
+
+    @property
+    def tier_names(self) -> List[str]:
+        return [t.name for t in self.tiers] + [self.default.name]
+
+    @property
+    def input_columns(self) -> List[str]:
+        return list(dict.fromkeys(name for t in self.tiers for name in t.condition.column_names()))
+
+    def replace(self, name: str, condition: Optional[Condition] = None, version: Optional[str] = None,
+                **values: Any) -> 'TierSpec':
+        """Copy of the spec with one tier's condition and/or values changed (for what-if runs)."""
+        if name not in self.tier_names[:-1]:
+            raise KeyError(f"Unknown tier '{name}'")
+        tiers = [Tier(t.name, condition or t.condition, **{**t.values, **values}) if t.name == name else t
+                 for t in self.tiers]
+        return TierSpec(version or f"{self.version}+{name}", tiers, self.default)
+
+    # -------------------------------------------------------------------------
+    # NumPy evaluator
+    # -------------------------------------------------------------------------
+    def masks(self, df: pd.DataFrame, columns: Optional[Dict[str, str]] = None) -> List[np.ndarray]:
+        """One boolean mask per tier (before first-match resolution)."""
+        columns = columns or {}
+        values = {}
+        for name in self.input_columns:
+            series = pd.to_numeric(df[columns.get(name, name)], errors='coerce')
+            values[name] = series.to_numpy(dtype=np.float64, na_value=np.nan)
+        return [tier.condition.mask(values) for tier in self.tiers]
+
+    def evaluate(self, df: pd.DataFrame, columns: Optional[Dict[str, str]] = None) -> pd.DataFrame:
+        """
+        Assign tiers to every row.
+
+        Args:
+            df: Lead features
+            columns: Spec column -> df column, when df uses other names
+
+        Returns:
+            DataFrame aligned with df.index: score_tier plus one column per tier value
+        """
+        conditions = self.masks(df, columns)
+        result = pd.DataFrame(index=df.index)
+        result['score_tier'] = np.select(conditions, [t.name for t in self.tiers], default=self.default.name)
+        for key, default in self.default.values.items():
+            choices = [np.asarray(t.values[key]) for t in self.tiers]
+            result[key] = np.select(conditions, choices, default=default)
+        return result
+
+    def summary(self, df: pd.DataFrame, target: str = 'converted',
+                columns: Optional[Dict[str, str]] = None) -> pd.DataFrame:
+        """Per-tier volume, conversions, conversion rate and lift vs the whole pool."""
+        tiers = self.evaluate(df, columns)['score_tier']
+        y = pd.to_numeric(df[target], errors='coerce').fillna(0).to_numpy()
+        grouped = pd.DataFrame({'score_tier': tiers.to_numpy(), 'converted': y}).groupby('score_tier')['converted']
+        out = pd.DataFrame({'n_leads': grouped.size(), 'n_converted': grouped.sum()}).reindex(self.tier_names)
+        out = out.fillna(0).astype({'n_leads': int})
+        out['conversion_rate'] = out['n_converted'] / out['n_leads'].where(out['n_leads'] > 0)
+        out['lift'] = out['conversion_rate'] / (y.mean() if len(y) else np.nan)
+        return out.reset_index().rename(columns={'index': 'score_tier'})
+
+    # -------------------------------------------------------------------------
+    # SQL compiler
+    # -------------------------------------------------------------------------
+    def sql_conditions(self, columns: Optional[Dict[str, str]] = None) -> List[str]:
+        return [tier.condition.sql(columns or {}) for tier in self.tiers]
+
+    def sql_case(self, output: str = 'score_tier', columns: Optional[Dict[str, str]] = None,
+                 alias: Optional[str] = None, indent: str = '') -> str:
+        """
+        CASE expression for one output ('score_tier' or a tier value key).
+
+        Args:
+            output: 'score_tier', 'priority_rank', 'expected_conversion_rate', ...
+            columns: Spec column -> SQL expression (e.g. experience_years for V3 tables)
+            alias: Output alias (default: output)
+            indent: Prefix for the WHEN/ELSE/END lines
+        """
+        if output == 'score_tier':
+            results = [_sql_literal(t.name) for t in self.tiers]
+            default = _sql_literal(self.default.name)
+        elif output in self.default.values:
+            results = [_sql_literal(t.values[output]) for t in self.tiers]
+            default = _sql_literal(self.default.values[output])
+        else:
+            raise KeyError(f"Unknown output '{output}'")
+
+        lines = ["CASE"]
+        for condition, result in zip(self.sql_conditions(columns), results):
+            lines.append(f"{indent}    WHEN ({condition}) THEN {result}")
+        lines.append(f"{indent}    ELSE {default}")
+        lines.append(f"{indent}END as {alias or output}")
+        return '\n'.join(lines)
+
+    def sql_block(self, output: str, columns: Optional[Dict[str, str]] = None, indent: str = '') -> str:
+        """Body of a generated SQL block: the CASE expression as a select-list item."""
+        return f"{indent}{self.sql_case(output, columns, indent=indent)},\n"
+
+    def _render_match(self, match) -> str:
+        columns = dict(item.split('=', 1) for item in match.group('columns').split())
+        body = self.sql_block(match.group('output'), columns, match.group('indent'))
+        return match.group('header') + body + match.group('footer')
+
+    def render_sql(self, text: str) -> str:
+        """SQL text with every tier_rules block regenerated."""
+        return _SQL_BLOCK.sub(self._render_match, text)
+
+    def sql_drift(self, text: str) -> List[str]:
+        """Outputs whose generated block in text differs from the spec."""
+        return [m.group('output') for m in _SQL_BLOCK.finditer(text)
+                if m.group(0) != self._render_match(m)]
+
+
+# =============================================================================
+# V3.2 SPEC (V3.2.2: certification tiers 1A/1B and HV wealth tier 1F)
+# =============================================================================
+_PRIME_MOVER = (
+    (C('tenure_years').between(1, 3) & C('industry_tenure_years').between(5, 15)
+     & (C('firm_net_change_12mo') < 0) & (C('firm_rep_count') <= 50) & (C('is_wirehouse') == 0))
+    | (C('tenure_years').between(1, 3) & (C('firm_rep_count') <= 10) & (C('is_wirehouse') == 0))
+    | (C('tenure_years').between(1, 4) & C('industry_tenure_years').between(5, 15)
+       & (C('firm_net_change_12mo') < 0) & (C('is_wirehouse') == 0))
+)
+
+V3_TIER_SPEC = TierSpec(
+    version='v3.2.2',
+    tiers=[
+        Tier('TIER_1A_PRIME_MOVER_CFP',
+             C('tenure_years').between(1, 4) & (C('industry_tenure_years') >= 5)
+             & (C('firm_net_change_12mo') < 0) & (C('has_cfp') == 1) & (C('is_wirehouse') == 0),
+             priority_rank=1, expected_conversion_rate=0.087),
+        Tier('TIER_1B_PRIME_MOVER_SERIES65',
+             _PRIME_MOVER & (C('has_series_65_only') == 1),
+             priority_rank=2, expected_conversion_rate=0.079),
+        Tier('TIER_1_PRIME_MOVER',
+             _PRIME_MOVER,
+             priority_rank=3, expected_conversion_rate=0.071),
+        Tier('TIER_1F_HV_WEALTH_BLEEDER',
+             (C('is_hv_wealth_title') == 1) & (C('firm_net_change_12mo') < 0) & (C('is_wirehouse') == 0),
+             priority_rank=4, expected_conversion_rate=0.065),
+        Tier('TIER_2_PROVEN_MOVER',
+             (C('num_prior_firms') >= 3) & (C('industry_tenure_years') >= 5),
+             priority_rank=5, expected_conversion_rate=0.052),
+        Tier('TIER_3_MODERATE_BLEEDER',
+             C('firm_net_change_12mo').between(-10, -1) & (C('industry_tenure_years') >= 5),
+             priority_rank=6, expected_conversion_rate=0.044),
+        Tier('TIER_4_EXPERIENCED_MOVER',
+             (C('industry_tenure_years') >= 20) & C('tenure_years').between(1, 4),
+             priority_rank=7, expected_conversion_rate=0.041),
+        Tier('TIER_5_HEAVY_BLEEDER',
+             (C('firm_net_change_12mo') <= -10) & (C('industry_tenure_years') >= 5),
+             priority_rank=8, expected_conversion_rate=0.038),
+    ],
+    default=Tier('STANDARD', None, priority_rank=99, expected_conversion_rate=0.025),
+)
@@ -0,0 +1,378 @@
+"""
+Span Tracing for Execution Logging
+
+Low-overhead nested timing spans used by ExecutionLogger:
+- Spans nest per thread and record monotonic start/duration
+  (perf_counter_ns), resident memory before/after and an optional row count
+- Context manager (tracer.span) and decorator (tracer.trace) APIs
+- Export to Chrome trace JSON (chrome://tracing, Perfetto, speedscope) and a
+  flat metrics JSON
+- Optional sampling profiler on a single span: a background thread samples
+  that thread's stack and writes folded stacks (flamegraph.pl / speedscope)
+
+Opening a span costs a clock read and an RSS read (psutil if installed,
+/proc/self/statm on Linux, otherwise RSS is not recorded), so spans can wrap
+every step of a phase.
+
+Usage:
+    from utils.tracing import Tracer
+
+    tracer = Tracer()
+    with tracer.span("Load splits") as span:
+        df = load_split_frame(...)
+        span.rows = len(df)
+
+    @tracer.trace()
+    def prepare_features(df, plan): ...
+
+    tracer.write(trace_dir, "phase_6")
+"""
+
+import os
+import sys
+import json
+import threading
+import functools
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from time import perf_counter_ns
+from typing import Any, Dict, List, Optional
+
+try:
+    import psutil
+    _PROCESS = psutil.Process(os.getpid())
+except ImportError:
+    psutil = None
+    _PROCESS = None
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+try:
+    # Kept open: pread on /proc/self/statm is ~1us, reopening it is ~10us
+    _STATM_FD = os.open("/proc/self/statm", os.O_RDONLY) if _PROCESS is None else None
+except (OSError, AttributeError):
+    _STATM_FD = None
+
+PROFILE_INTERVAL_SECONDS = 0.005
+PROFILE_TOP_FUNCTIONS = 10
+
+
+def current_rss() -> Optional[int]:
+    """Resident set size of this process in bytes, or None if unavailable."""
+    if _PROCESS is not None:
+        return _PROCESS.memory_info().rss
+    if _STATM_FD is not None:
+        return int(os.pread(_STATM_FD, 64, 0).split()[1]) * _PAGE_SIZE
+    return None
+
+
+class Span:
+    """One timed region. Set span.rows (or span.attrs[...]) inside the block."""
+
+    __slots__ = ('name', 'span_id', 'parent_id', 'depth', 'thread_id', 'start_ns', 'end_ns',
+                 'rss_start', 'rss_end', 'rows', 'attrs', 'profile')
+
+    def __init__(self, name: str, span_id: int, parent_id: Optional[int], depth: int,
+                 rows: Optional[int] = None, attrs: Dict[str, Any] = None):
+        self.name = name
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.depth = depth
+        self.thread_id = threading.get_ident()
+        self.rows = rows
+        self.attrs = attrs or {}
+        self.profile = None
+        self.rss_start = current_rss()
+        self.rss_end = None
+        self.end_ns = None
+        self.start_ns = perf_counter_ns()
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_ns if self.end_ns is not None else perf_counter_ns()
+        return (end - self.start_ns) / 1e6
+
+    @property
+    def rss_delta_mb(self) -> Optional[float]:
+        if self.rss_start is None or self.rss_end is None:
+            return None
+        return (self.rss_end - self.rss_start) / 2**20
+
+
+class SamplingProfiler:
+    """Samples one thread's Python stack at a fixed interval from a daemon thread."""
+
+    def __init__(self, thread_id: int, interval: float = PROFILE_INTERVAL_SECONDS):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="span-profiler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def start(self) -> 'SamplingProfiler':
+        self._thread.start()
+        return self
+
+    def stop(self) -> 'SamplingProfiler':
+        self._stop.set()
+        self._thread.join()
+        return self
+
+    @property
+    def samples(self) -> int:
+        return sum(self.stacks.values())
+
+    def top_functions(self, n: int = PROFILE_TOP_FUNCTIONS) -> List[Dict[str, Any]]:
+        """Leaf (self-time) functions by sample share."""
+        leaves = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(';', 1)[-1]] += count
+        total = max(self.samples, 1)
+        return [{'function': fn, 'samples': c, 'pct': round(100 * c / total, 1)}
+                for fn, c in leaves.most_common(n)]
+
+    def write_folded(self, path: Path) -> Path:
+        """Write folded stacks ("a;b;c count" per line)."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
+
+
+class Tracer:
+    """
+    Collects spans and instant events for one phase or run.
+
+    Usage:
+        tracer = Tracer()
+        with tracer.span("Train model", rows=len(X_train)):
+            model = xgb.train(...)
+        with tracer.span("SHAP", profile=True):
+            shap_values = explainer.shap_values(X)
+        tracer.write(trace_dir, "phase_6")
+    """
+
+    def __init__(self):
+        self.origin_ns = perf_counter_ns()
+        self.spans: List[Span] = []
+        self.events: List[Dict[str, Any]] = []
+        self.profiles: Dict[int, SamplingProfiler] = {}
+        self._local = threading.local()
+        self._root = None
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def reset(self):
+        """Drop all recorded spans, events and profiles and restart the clock."""
+        self.origin_ns = perf_counter_ns()
+        self.spans = []
+        self.events = []
+        self.profiles = {}
+        self._local = threading.local()
+        self._root = None
+
+    def _stack(self) -> List[Span]:
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def start_span(self, name: str, rows: Optional[int] = None, profile: bool = False, **attrs) -> Span:
+        """
+        Open a span as a child of this thread's current span (close it with end_span).
+
+        Spans opened on a worker thread with no open span of its own are
+        children of the first (root) span, e.g. the phase.
+        """
+        stack = self._stack()
+        with self._lock:
+            span_id = self._next_id
+            self._next_id += 1
+        if stack:
+            parent = stack[-1]
+        else:
+            parent = self._root if self._root is not None and self._root.end_ns is None else None
+        span = Span(name, span_id, parent.span_id if parent else None,
+                    parent.depth + 1 if parent else 0, rows, attrs)
+        if parent is None and self._root is None:
+            self._root = span
+        if profile:
+            span.profile = SamplingProfiler(span.thread_id).start()
+        stack.append(span)
+        self.spans.append(span)
+        return span
+
+    def end_span(self, span: Span) -> Span:
+        """Close span (and any children left open on this thread)."""
+        span.end_ns = perf_counter_ns()
+        span.rss_end = current_rss()
+        if span.profile is not None:
+            self.profiles[span.span_id] = span.profile.stop()
+            span.profile = None
+        stack = self._stack()
+        if span in stack:
+            del stack[stack.index(span):]
+        return span
+
+    @contextmanager
+    def span(self, name: str, rows: Optional[int] = None, profile: bool = False, **attrs):
+        """Time a block; yields the Span so rows/attrs can be set inside it."""
+        span = self.start_span(name, rows, profile, **attrs)
+        try:
+            yield span
+        except BaseException as e:
+            span.attrs['error'] = type(e).__name__
+            raise
+        finally:
+            self.end_span(span)
+
+    def trace(self, name: str = None, profile: bool = False):
+        """Decorator form of span(); rows come from the result's len() when it has a shape."""
+        def decorator(fn):
+            label = name or fn.__qualname__
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.span(label, profile=profile) as span:
+                    result = fn(*args, **kwargs)
+                    if span.rows is None and hasattr(result, 'shape'):
+                        span.rows = len(result)
+                    return result
+            return wrapper
+        return decorator
+
+    def instant(self, name: str, **args):
+        """Record a point event (e.g. a logged action) at the current time."""
+        self.events.append({'name': name, 'ts_ns': perf_counter_ns(),
+                            'thread_id': threading.get_ident(), 'args': args})
+
+    # =========================================================================
+    # EXPORT
+    # =========================================================================
+    def _span_paths(self) -> Dict[int, str]:
+        by_id = {s.span_id: s for s in self.spans}
+        paths = {}
+        for s in self.spans:
+            parent = by_id.get(s.parent_id)
+            paths[s.span_id] = f"{paths[parent.span_id]}/{s.name}" if parent else s.name
+        return paths
+
+    def metrics(self) -> List[Dict[str, Any]]:
+        """One record per closed span: path, timing, RSS delta, rows and throughput."""
+        paths = self._span_paths()
+        records = []
+        for s in self.spans:
+            if s.end_ns is None:
+                continue
+            record = {
+                'span': paths[s.span_id],
+                'depth': s.depth,
+                'start_ms': round((s.start_ns - self.origin_ns) / 1e6, 3),
+                'duration_ms': round(s.duration_ms, 3),
+                'rss_start_mb': round(s.rss_start / 2**20, 1) if s.rss_start is not None else None,
+                'rss_delta_mb': round(s.rss_delta_mb, 1) if s.rss_delta_mb is not None else None,
+                'rows': s.rows,
+                'rows_per_sec': round(s.rows / (s.duration_ms / 1000)) if s.rows and s.duration_ms > 0 else None,
+            }
+            if s.attrs:
+                record['attrs'] = {k: str(v) for k, v in s.attrs.items()}
+            if s.span_id in self.profiles:
+                profiler = self.profiles[s.span_id]
+                record['profile'] = {'samples': profiler.samples, 'top_functions': profiler.top_functions()}
+            records.append(record)
+        return records
+
+    def chrome_trace(self) -> Dict[str, Any]:
+        """Trace Event Format dict: complete ('X') spans and instant ('i') events."""
+        pid = os.getpid()
+        threads = {}
+
+        def tid(ident):
+            return threads.setdefault(ident, len(threads) + 1)
+
+        events = []
+        for s in self.spans:
+            if s.end_ns is None:
+                continue
+            args = {'rows': s.rows, 'rss_delta_mb': s.rss_delta_mb}
+            args.update({k: str(v) for k, v in s.attrs.items()})
+            events.append({
+                'name': s.name, 'cat': 'span', 'ph': 'X', 'pid': pid, 'tid': tid(s.thread_id),
+                'ts': (s.start_ns - self.origin_ns) / 1e3, 'dur': (s.end_ns - s.start_ns) / 1e3,
+                'args': {k: v for k, v in args.items() if v is not None},
+            })
+        for e in self.events:
+            events.append({
+                'name': e['name'], 'cat': 'event', 'ph': 'i', 's': 't', 'pid': pid,
+                'tid': tid(e['thread_id']), 'ts': (e['ts_ns'] - self.origin_ns) / 1e3,
+                'args': {k: str(v) for k, v in e['args'].items()},
+            })
+        for ident, n in threads.items():
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': n,
+                           'args': {'name': 'main' if ident == threading.main_thread().ident else f'thread-{n}'}})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def write(self, trace_dir: Path, stem: str, extra: Dict[str, Any] = None) -> Dict[str, Path]:
+        """
+        Write {stem}.trace.json, {stem}.metrics.json and one {stem}.{span}.folded per profiled span.
+
+        Args:
+            trace_dir: Output directory (created if needed)
+            stem: File name stem, e.g. "phase_6_20260115_093000"
+            extra: Additional top-level fields for the metrics file
+
+        Returns:
+            Dict of written paths keyed by 'trace', 'metrics' and 'profile:<span>'
+        """
+        trace_dir = Path(trace_dir)
+        trace_dir.mkdir(parents=True, exist_ok=True)
+        paths = {'trace': trace_dir / f"{stem}.trace.json", 'metrics': trace_dir / f"{stem}.metrics.json"}
+
+        with open(paths['trace'], 'w', encoding='utf-8') as f:
+            json.dump(self.chrome_trace(), f)
+        with open(paths['metrics'], 'w', encoding='utf-8') as f:
+            json.dump({**(extra or {}), 'spans': self.metrics()}, f, indent=2, default=str)
+
+        by_id = {s.span_id: s for s in self.spans}
+        for span_id, profiler in self.profiles.items():
+            label = ''.join(c if c.isalnum() else '_' for c in by_id[span_id].name).strip('_').lower()
+            paths[f"profile:{by_id[span_id].name}"] = profiler.write_folded(
+                trace_dir / f"{stem}.{label}.folded")
+        return paths
+
+    def markdown_table(self, max_depth: int = 2) -> str:
+        """Markdown table of closed spans down to max_depth, repeated spans aggregated by path."""
+        totals = {}
+        for record in self.metrics():
+            if record['depth'] > max_depth:
+                continue
+            total = totals.setdefault(record['span'], {'depth': record['depth'], 'calls': 0, 'ms': 0.0,
+                                                      'rows': None, 'rss': None})
+            total['calls'] += 1
+            total['ms'] += record['duration_ms']
+            if record['rows'] is not None:
+                total['rows'] = (total['rows'] or 0) + record['rows']
+            if record['rss_delta_mb'] is not None:
+                total['rss'] = (total['rss'] or 0.0) + record['rss_delta_mb']
+
+        lines = ["| Span | Calls | Duration | Rows | RSS Delta |",
+                 "|------|-------|----------|------|-----------|"]
+        for path, total in totals.items():
+            name = "&nbsp;&nbsp;" * total['depth'] + path.rsplit('/', 1)[-1]
+            rows = f"{total['rows']:,}" if total['rows'] is not None else ""
+            rss = f"{total['rss']:+.1f} MB" if total['rss'] is not None else "n/a"
+            lines.append(f"| {name} | {total['calls']:,} | {total['ms'] / 1000:.2f}s | {rows} | {rss} |")
+        return "\n".join(lines) + "\n"
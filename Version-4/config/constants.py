@@ -94,13 +94,81 @@ FIRM_STABILITY_TIERS = {
     "Unknown": None
 }
 
-# Wirehouse patterns for detection
+# Feature contract for the V4 model matrix (utils/feature_dtypes.py).
+# kind: 'flag' (0/1 -> uint8), 'category' (-> categorical, int8 codes) or
+# 'continuous' (-> float32). Category lists are in the lexical order that
+# astype('category') gives in training, so list position == model code.
+FEATURE_CONTRACT = {
+    "tenure_bucket": {
+        "kind": "category",
+        "categories": ["0-12", "12-24", "120+", "24-48", "48-120", "Unknown"],
+    },
+    "experience_bucket": {
+        "kind": "category",
+        "categories": ["0-5", "10-15", "15-20", "20+", "5-10", "Unknown"],
+    },
+    "mobility_tier": {
+        "kind": "category",
+        "categories": ["High_Mobility", "Low_Mobility", "Stable"],
+    },
+    "firm_stability_tier": {
+        "kind": "category",
+        "categories": ["Growing", "Heavy_Bleeding", "Light_Bleeding", "Stable", "Unknown"],
+    },
+    "is_experience_missing": {"kind": "flag"},
+    "has_firm_data": {"kind": "flag"},
+    "is_wirehouse": {"kind": "flag"},
+    "is_broker_protocol": {"kind": "flag"},
+    "has_email": {"kind": "flag"},
+    "has_linkedin": {"kind": "flag"},
+    "mobility_x_heavy_bleeding": {"kind": "flag"},
+    "short_tenure_x_high_mobility": {"kind": "flag"},
+    "firm_rep_count_at_contact": {"kind": "continuous"},
+    "firm_net_change_12mo": {"kind": "continuous"},
+}
+
+# Substring patterns compiled by utils/pattern_registry.py. Each entry is the
+# body of an UPPER(column) LIKE '%...%' clause: '%' inside a pattern matches any
+# run of characters and leading/trailing spaces are significant.
+
+# Wirehouse patterns for detection (V4 is_wirehouse feature)
 WIREHOUSE_PATTERNS = [
     "MERRILL", "MORGAN STANLEY", "UBS", "WELLS FARGO", "EDWARD JONES",
-    "RAYMOND JAMES", "AMERIPRISE", "LPL", "NORTHWESTERN MUTUAL",
-    "STIFEL", "RBC", "JANNEY", "BAIRD", "OPPENHEIMER"
+    "RAYMOND JAMES", "AMERIPRISE", "LPL", "NORTHWESTERN MUTUAL", "STIFEL"
+]
+
+# V3 tier wirehouse exclusion (create_v3_final_tiers.py, v3_final_tier_scoring.sql)
+WIREHOUSE_PATTERNS_V3 = [
+    "MERRILL", "MORGAN STANLEY", "UBS ", "WELLS FARGO", "EDWARD JONES",
+    "RAYMOND JAMES", "AMERIPRISE", " LPL ", "LPL FINANCIAL", "NORTHWESTERN MUTUAL",
+    "STIFEL", "RBC ", "JANNEY", "BAIRD", "OPPENHEIMER"
+]
+
+# Lead list firm exclusions (wirehouses, insurance, Savvy/Ritholtz backups)
+EXCLUDED_FIRM_PATTERNS = [
+    "J.P. MORGAN", "MORGAN STANLEY", "MERRILL", "WELLS FARGO",
+    "UBS ", "UBS,", "EDWARD JONES", "AMERIPRISE",
+    "NORTHWESTERN MUTUAL", "PRUDENTIAL", "RAYMOND JAMES",
+    "FIDELITY", "SCHWAB", "VANGUARD", "GOLDMAN SACHS", "CITIGROUP",
+    "LPL FINANCIAL", "COMMONWEALTH", "CETERA", "CAMBRIDGE",
+    "OSAIC", "PRIMERICA",
+    "STATE FARM", "ALLSTATE", "NEW YORK LIFE", "NYLIFE",
+    "TRANSAMERICA", "FARM BUREAU", "NATIONWIDE",
+    "LINCOLN FINANCIAL", "MASS MUTUAL", "MASSMUTUAL",
+    "INSURANCE",
+    "SAVVY WEALTH", "SAVVY ADVISORS",
+    "RITHOLTZ"
 ]
 
+# Lead list title exclusions (V3.2.1)
+EXCLUDED_TITLE_PATTERNS = [
+    "FINANCIAL SOLUTIONS ADVISOR", "PARAPLANNER", "ASSOCIATE ADVISOR", "OPERATIONS",
+    "WHOLESALER", "COMPLIANCE", "ASSISTANT", "INSURANCE AGENT", "INSURANCE"
+]
+
+# High-value wealth titles (V3.2.2 TIER_1F_HV_WEALTH_BLEEDER)
+HV_WEALTH_TITLE_PATTERNS = ["WEALTH MANAGER", "DIRECTOR%WEALTH", "SENIOR WEALTH ADVISOR"]
+
 # =============================================================================
 # VALIDATION GATES - LEAKAGE
 # =============================================================================
@@ -185,6 +253,26 @@ class PerformanceGates:
     # G8.5: Statistical significance (p-value for lift)
     MAX_P_VALUE = 0.05
 
+# =============================================================================
+# VALIDATION GATES - FEATURE DRIFT (monthly scoring)
+# =============================================================================
+class DriftGates:
+    """Gates comparing monthly prospect features to the training distribution."""
+
+    # Histogram bins (utils/drift_monitor.py)
+    N_BINS = 10  # Quantile bins for continuous features and the score
+    MAX_DISCRETE_VALUES = 20  # Numeric features with fewer values get one bin per value
+
+    # G11.1: Population Stability Index per feature
+    PSI_WARN = 0.10  # Moderate shift - report only
+    PSI_ALERT = 0.25  # Major shift - blocks the scoring run
+
+    # G11.2: KS statistic on binned numeric distributions
+    KS_ALERT = 0.20
+
+    # G11.3: Categories never seen in training (scored as code 0)
+    MAX_UNSEEN_CATEGORY_PCT = 1.0
+
 # =============================================================================
 # MODEL HYPERPARAMETERS
 # =============================================================================
@@ -223,10 +311,67 @@ class CVConfig:
     N_SPLITS = 5
     SHUFFLE = False  # Time-based CV, no shuffle
     STRATEGY = "TimeSeriesSplit"  # Respect temporal ordering
+    GAP_DAYS = TRAIN_TEST_GAP_DAYS  # Embargo before each validation fold
     
     # Stratification
     STRATIFY_BY = ["lead_source_grouped"]  # Account for source drift
 
+# =============================================================================
+# WALK-FORWARD BACKTEST CONFIGURATION
+# =============================================================================
+class BacktestConfig:
+    """Rolling-origin (walk-forward) backtest configuration."""
+    
+    TRAIN_WINDOW_MONTHS = 12  # Trailing training window per origin
+    MIN_TRAIN_ROWS = 5000  # Skip origins with less history (see G7.4)
+    NUM_BOOST_ROUND = 70  # v4.0.0 early-stopped at 70; no holdout inside a window
+    CACHE_DIR = MODELS_DIR / "walk_forward_cache"
+    
+# V3 tier priority (1 = highest), used to compare V3 tiers against V4 scores
+V3_TIER_PRIORITY = {
+    'TIER_1A_PRIME_MOVER_CFP': 1,
+    'TIER_1B_PRIME_MOVER_SERIES65': 2,
+    'TIER_1_PRIME_MOVER': 3,
+    'TIER_1F_HV_WEALTH_BLEEDER': 4,
+    'TIER_2_PROVEN_MOVER': 5,
+    'TIER_3_MODERATE_BLEEDER': 6,
+    'TIER_4_EXPERIENCED_MOVER': 7,
+    'TIER_5_HEAVY_BLEEDER': 8,
+    'STANDARD': 9
+}
+
+# =============================================================================
+# LEAD LIST CONFIGURATION
+# =============================================================================
+class LeadListConfig:
+    """Monthly V3+V4 hybrid lead list (January_2026_Lead_List_V3_V4_Hybrid.sql)."""
+
+    # V4 percentile cuts (imported by Lead_List_Generation/scripts/score_prospects_monthly.py)
+    DEPRIORITIZE_PERCENTILE = 20  # Bottom 20% flagged v4_deprioritize
+    V4_UPGRADE_PERCENTILE = 80  # STANDARD leads at/above this become V4_UPGRADE
+
+    # List assembly
+    LIST_SIZE = 2400
+    FIRM_CAP = 50  # Max leads per firm
+    TIER_QUOTAS = {
+        'TIER_1A_PRIME_MOVER_CFP': 50,
+        'TIER_1B_PRIME_MOVER_SERIES65': 60,
+        'TIER_1_PRIME_MOVER': 300,
+        'TIER_1F_HV_WEALTH_BLEEDER': 50,
+        'TIER_2_PROVEN_MOVER': 1500,
+        'V4_UPGRADE': 500,
+        'TIER_3_MODERATE_BLEEDER': 300,
+        'TIER_4_EXPERIENCED_MOVER': 300,
+        'TIER_5_HEAVY_BLEEDER': 1500
+    }
+    LIST_ORDER = list(TIER_QUOTAS)  # Final list priority (V4_UPGRADE sits after TIER_2)
+    NO_LINKEDIN_CAP = 240  # Max leads without LinkedIn (10% of LIST_SIZE)
+    V4_UPGRADE_RATE = 0.046  # Expected conversion rate for V4_UPGRADE leads
+
+    # Threshold sweep
+    MAX_DEPRIORITIZE_CONVERSION_LOSS = 0.10  # Deprioritized leads may hold <= 10% of conversions
+    N_BOOTSTRAP = 200
+
 # =============================================================================
 # LOGGING CONFIGURATION
 # =============================================================================
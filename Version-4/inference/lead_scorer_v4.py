@@ -5,6 +5,7 @@ This module provides a simple interface for scoring leads with the V4 XGBoost mo
 Designed for production use in BigQuery/Salesforce integration.
 """
 
+import sys
 import pickle
 import json
 import pandas as pd
@@ -13,6 +14,9 @@ from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 import xgboost as xgb
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from utils.feature_dtypes import FeatureDtypePlan
+
 # Default paths (can be overridden)
 DEFAULT_MODEL_DIR = Path(r"C:\Users\russe\Documents\Lead Scoring\Version-4\models\v4.0.0")
 DEFAULT_FEATURES_FILE = Path(r"C:\Users\russe\Documents\Lead Scoring\Version-4\data\processed\final_features.json")
@@ -42,6 +46,7 @@ class LeadScorerV4:
         
         self.model = None
         self.feature_list = None
+        self.dtype_plan = None
         self.feature_importance = None
         
         # Load model and features
@@ -69,6 +74,7 @@ class LeadScorerV4:
             features_data = json.load(f)
         
         self.feature_list = features_data['final_features']
+        self.dtype_plan = FeatureDtypePlan(self.feature_list)
         print(f"[INFO] Loaded {len(self.feature_list)} features")
     
     def _load_feature_importance(self):
@@ -86,54 +92,25 @@ class LeadScorerV4:
         
         Ensures:
         - All required features are present
-        - Categorical features are encoded correctly
+        - Categorical features are encoded with the training codes (FEATURE_CONTRACT)
         - Feature order matches training
         - Missing values are handled
         
+        The frame is not copied: the features are written straight into one
+        float32 matrix (see utils/feature_dtypes.py).
+        
         Args:
             df: DataFrame with lead features (from BigQuery production view)
             
         Returns:
             DataFrame with prepared features ready for model
         """
-        # Create a copy to avoid modifying original
-        X = df.copy()
-        
         # Check for missing features
-        missing_features = set(self.feature_list) - set(X.columns)
+        missing_features = set(self.feature_list) - set(df.columns)
         if missing_features:
             raise ValueError(f"Missing required features: {missing_features}")
         
-        # Select only the features we need, in the correct order
-        X = X[self.feature_list].copy()
-        
-        # Handle categorical features (convert to codes)
-        categorical_features = []
-        for feat in self.feature_list:
-            if X[feat].dtype == 'object' or X[feat].dtype.name == 'category':
-                categorical_features.append(feat)
-        
-        # Convert categoricals to codes (matching training)
-        for feat in categorical_features:
-            if feat in X.columns:
-                # Convert to category and then to codes
-                X[feat] = X[feat].astype('category').cat.codes
-                # Replace -1 (missing) with 0 (or appropriate default)
-                X[feat] = X[feat].replace(-1, 0)
-        
-        # Fill NaN values (shouldn't happen after categorical encoding, but safety check)
-        X = X.fillna(0)
-        
-        # Ensure numeric types
-        for col in X.columns:
-            if X[col].dtype == 'object':
-                # If still object after encoding, try to convert
-                try:
-                    X[col] = pd.to_numeric(X[col], errors='coerce').fillna(0)
-                except:
-                    pass
-        
-        return X
+        return self.dtype_plan.encode_frame(df)
     
     def score_leads(self, df: pd.DataFrame) -> np.ndarray:
         """
@@ -8,40 +8,23 @@ import numpy as np
 from pathlib import Path
 
 BASE_DIR = Path(r"C:\Users\russe\Documents\Lead Scoring\Version-4")
+sys.path.insert(0, str(BASE_DIR))
+from utils.feature_dtypes import FeatureDtypePlan
 
-def prepare_features(df, feature_list):
-    """Prepare features for XGBoost (handle categoricals)."""
-    X = df[feature_list].copy()
-    
-    # Identify categorical features
-    categorical_features = []
-    for feat in feature_list:
-        if df[feat].dtype == 'object' or df[feat].dtype.name == 'category':
-            categorical_features.append(feat)
-    
-    # Convert categoricals to codes
-    for feat in categorical_features:
-        if feat in X.columns:
-            X[feat] = X[feat].astype('category').cat.codes
-    
-    # Fill NaN
-    X = X.fillna(0)
-    
-    return X
+# Get features
+with open(BASE_DIR / 'data' / 'processed' / 'final_features.json', 'r') as f:
+    features = json.load(f)['final_features']
+plan = FeatureDtypePlan(features)
 
-# Load test data
-test = pd.read_csv(BASE_DIR / 'data' / 'splits' / 'test.csv')
+# Load test data (compact dtypes)
+test = plan.apply(pd.read_csv(BASE_DIR / 'data' / 'splits' / 'test.csv'))
 
 # Load model
 with open(BASE_DIR / 'models' / 'v4.0.0' / 'model.pkl', 'rb') as f:
     model = pickle.load(f)
 
-# Get features
-with open(BASE_DIR / 'data' / 'processed' / 'final_features.json', 'r') as f:
-    features = json.load(f)['final_features']
-
 # Prepare features and get predictions
-X_test = prepare_features(test, features)
+X_test = plan.encode_frame(test)
 import xgboost as xgb
 dtest = xgb.DMatrix(X_test)
 test['v4_score'] = model.predict(dtest)
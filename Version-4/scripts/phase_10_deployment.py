@@ -54,7 +54,8 @@ def run_phase_10() -> bool:
         ("model.pkl", "Trained XGBoost model"),
         ("model.json", "XGBoost native format"),
         ("feature_importance.csv", "Feature importance scores"),
-        ("training_metrics.json", "Training performance metrics")
+        ("training_metrics.json", "Training performance metrics"),
+        ("drift_profile.json", "Training feature histograms for drift monitoring")
     ]
     
     missing_files = []
@@ -452,7 +453,8 @@ Top 10 features by XGBoost importance:
    - Track conversion rate of prioritized leads (should be ~3.7%)
 
 3. **Model Drift**:
-   - Compare feature distributions over time
+   - Every scoring run compares features and scores with `drift_profile.json` (PSI/KS per feature)
+   - PSI >= 0.25, unseen categories or missing features block the run
    - Retrain if feature drift > 20%
 
 4. **Business Impact**:
@@ -172,7 +172,7 @@ def run_phase_3() -> bool:
             
             # Wirehouse & Broker Protocol (PIT safe)
             'is_wirehouse': ('current_firm (firm_name)', True),
-            'is_broker_protocol': ('broker_protocol_members', True),
+            'is_broker_protocol': ('broker_protocol_membership_intervals', True),
             
             # Data quality flags (PIT safe - indicators only)
             'has_email': ('Salesforce Lead', True),
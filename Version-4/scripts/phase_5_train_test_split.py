@@ -4,8 +4,8 @@ Phase 5: Train/Test Split
 This script:
 1. Creates temporal train/test split (prevents leakage)
 2. Validates split sizes and conversion rates
-3. Creates time-based CV folds
-4. Saves splits to BigQuery and local files
+3. Creates time-based CV folds (gap-aware, vectorized)
+4. Saves splits to BigQuery, a Parquet split manifest and local files
 """
 
 import sys
@@ -30,8 +30,10 @@ from config.constants import (
     TEST_START_DATE,
     TEST_END_DATE,
     TRAIN_TEST_GAP_DAYS,
-    BASELINE_CONVERSION_RATE
+    BASELINE_CONVERSION_RATE,
+    CVConfig
 )
+from utils.split_engine import build_split_manifest, save_split_manifest
 
 from google.cloud import bigquery
 from google.cloud.bigquery import SchemaField
@@ -123,21 +125,16 @@ def run_phase_5() -> bool:
     logger.log_action("Creating temporal splits")
     
     try:
-        # Assign split labels
-        def assign_split(row):
-            contact_date = row['contacted_date']
-            if contact_date < train_start:
-                return 'EXCLUDE'  # Before training period
-            elif contact_date <= train_end:
-                return 'TRAIN'
-            elif contact_date < test_start:
-                return 'EXCLUDE'  # Gap period
-            elif contact_date <= test_end:
-                return 'TEST'
-            else:
-                return 'EXCLUDE'  # After test period
-        
-        df['split'] = df.apply(assign_split, axis=1)
+        # Assign split labels and CV folds in one vectorized pass
+        manifest = build_split_manifest(
+            df,
+            train_start, train_end, test_start, test_end,
+            n_folds=CVConfig.N_SPLITS,
+            gap_days=CVConfig.GAP_DAYS
+        )
+        df['split'] = manifest['split'].astype(str).to_numpy()
+        df['cv_fold'] = manifest['cv_fold'].to_numpy()
+        df['cv_embargo'] = manifest['cv_embargo'].to_numpy()
         
         # Count by split
         split_counts = df['split'].value_counts()
@@ -181,9 +178,8 @@ def run_phase_5() -> bool:
         
     except Exception as e:
         logger.log_error(f"Failed to create splits: {str(e)}", exception=e)
-        gate_5_1 = False
-        gate_5_2 = False
-        all_blocking_gates_passed = False
+        status = logger.end_phase()
+        return False
     
     # =========================================================================
     # STEP 5.4: Check Lead Source Distribution
@@ -289,24 +285,12 @@ def run_phase_5() -> bool:
     logger.log_action("Creating time-based CV folds")
     
     try:
-        # Only create folds for training data
-        train_df = df[df['split'] == 'TRAIN'].copy()
-        train_df = train_df.sort_values('contacted_date')
-        
-        # Create 5 time-based folds
-        n_folds = 5
-        train_df['cv_fold'] = pd.qcut(
-            train_df['contacted_date'].rank(method='first'),
-            q=n_folds,
-            labels=False,
-            duplicates='drop'
-        ) + 1  # 1-indexed
-        
-        # For test and exclude, set cv_fold to 0
-        df.loc[df['split'] != 'TRAIN', 'cv_fold'] = 0
+        # Folds were assigned with the split (gap-aware, equal-count by date)
+        n_folds = CVConfig.N_SPLITS
+        train_df = df[df['split'] == 'TRAIN']
         
-        # Update main dataframe with CV folds
-        df.loc[train_df.index, 'cv_fold'] = train_df['cv_fold']
+        logger.log_metric("CV Embargo Window", f"{CVConfig.GAP_DAYS} days before each validation fold")
+        logger.log_metric("Embargoed Leads", f"{int(train_df['cv_embargo'].sum()):,}")
         
         # Log fold statistics
         fold_stats = train_df.groupby('cv_fold').agg({
@@ -342,8 +326,7 @@ def run_phase_5() -> bool:
                 )
         
     except Exception as e:
-        logger.log_error(f"Failed to create CV folds: {str(e)}", exception=e)
-        df['cv_fold'] = 0
+        logger.log_error(f"Failed to log CV folds: {str(e)}", exception=e)
     
     # =========================================================================
     # STEP 5.7: Save Splits
@@ -381,10 +364,12 @@ def run_phase_5() -> bool:
         
         logger.log_file_created("v4_splits", f"BigQuery: {table_id}")
         
-        # Save local CSVs
+        # Save split manifest + feature snapshot (read by Phases 6-9)
         splits_dir = BASE_DIR / "data" / "splits"
-        splits_dir.mkdir(parents=True, exist_ok=True)
+        manifest_path = save_split_manifest(manifest, splits_dir, features=df)
+        logger.log_file_created(manifest_path.name, str(manifest_path), "lead_id -> split, cv_fold")
         
+        # Save local CSVs (kept for ad-hoc verification scripts)
         train_df_local = df[df['split'] == 'TRAIN'].copy()
         test_df_local = df[df['split'] == 'TEST'].copy()
         
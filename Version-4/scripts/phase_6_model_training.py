@@ -16,7 +16,6 @@ import numpy as np
 import pandas as pd
 from pathlib import Path
 from datetime import datetime
-from sklearn.metrics import roc_auc_score, average_precision_score, roc_curve, precision_recall_curve
 import xgboost as xgb
 
 # Add project root to path
@@ -24,6 +23,10 @@ sys.path.insert(0, str(Path(r"C:\Users\russe\Documents\Lead Scoring\Version-4"))
 
 # Import utilities and constants
 from utils.execution_logger import ExecutionLogger
+from utils.split_engine import load_split_frame
+from utils.feature_dtypes import FeatureDtypePlan, bytes_per_row
+from utils.ranking_metrics import RankingMetrics, top_n_lift
+from utils.drift_monitor import DriftProfile, DRIFT_PROFILE_FILENAME
 from config.constants import (
     BASE_DIR,
     ModelConfig,
@@ -34,41 +37,18 @@ from config.constants import (
 
 def calculate_top_n_lift(y_true, y_pred, n_percent=10):
     """Calculate lift in top N% of predictions."""
-    # Get top N% threshold
-    threshold = np.percentile(y_pred, 100 - n_percent)
-    
-    # Top N% predictions
-    top_n_mask = y_pred >= threshold
-    top_n_conversion = y_true[top_n_mask].mean()
-    
-    # Overall conversion
-    overall_conversion = y_true.mean()
-    
-    if overall_conversion == 0:
-        return None
-    
-    lift = top_n_conversion / overall_conversion
-    return lift
+    return top_n_lift(y_true, y_pred, n_percent)
 
-def prepare_features(df, feature_list):
-    """Prepare features for XGBoost (handle categoricals)."""
-    X = df[feature_list].copy()
-    
-    # Identify categorical features
-    categorical_features = []
-    for feat in feature_list:
-        if df[feat].dtype == 'object' or df[feat].dtype.name == 'category':
-            categorical_features.append(feat)
-    
-    # Convert categoricals to codes (XGBoost can handle them)
-    for feat in categorical_features:
-        if feat in X.columns:
-            X[feat] = X[feat].astype('category').cat.codes
-    
-    # Fill any remaining NaN with 0 (shouldn't happen after Phase 2, but safety)
-    X = X.fillna(0)
-    
-    return X, categorical_features
+def calculate_ranking_metrics(y_true, y_pred):
+    """AUC-ROC, AUC-PR, top 10% and top 5% lift from a single sort."""
+    metrics = RankingMetrics(y_true, y_pred)
+    lifts = [metrics.lift_at_percent(pct)[0] for pct in (10, 5)]
+    lifts = [None if np.isnan(lift) else float(lift) for lift in lifts]
+    return float(metrics.auc_roc()[0]), float(metrics.auc_pr()[0]), lifts[0], lifts[1]
+
+def prepare_features(df, plan):
+    """Prepare features for XGBoost (float32 matrix, categoricals as contract codes)."""
+    return plan.encode_frame(df), plan.categorical
 
 def run_phase_6() -> bool:
     """Execute Phase 6: Model Training."""
@@ -85,23 +65,28 @@ def run_phase_6() -> bool:
     logger.log_action("Loading train/test splits and final features")
     
     try:
-        # Load splits
-        train_df = pd.read_csv(BASE_DIR / "data" / "splits" / "train.csv")
-        test_df = pd.read_csv(BASE_DIR / "data" / "splits" / "test.csv")
-        
-        logger.log_metric("Train Size", f"{len(train_df):,} rows")
-        logger.log_metric("Test Size", f"{len(test_df):,} rows")
-        
         # Load final features
         with open(BASE_DIR / "data" / "processed" / "final_features.json", 'r') as f:
             final_features_data = json.load(f)
             final_features = final_features_data['final_features']
+        plan = FeatureDtypePlan(final_features)
         
         logger.log_metric("Final Features Count", f"{len(final_features)}")
         
+        # Load splits (compact dtypes applied at load)
+        with logger.span("Load splits") as span:
+            train_df = load_split_frame(BASE_DIR / "data" / "splits", "TRAIN", dtype_plan=plan)
+            test_df = load_split_frame(BASE_DIR / "data" / "splits", "TEST", dtype_plan=plan)
+            span.rows = len(train_df) + len(test_df)
+        
+        logger.log_metric("Train Size", f"{len(train_df):,} rows")
+        logger.log_metric("Test Size", f"{len(test_df):,} rows")
+        logger.log_metric("Feature Bytes per Lead", f"{bytes_per_row(train_df, final_features):.1f}")
+        
         # Prepare features
-        X_train, cat_features = prepare_features(train_df, final_features)
-        X_test, _ = prepare_features(test_df, final_features)
+        with logger.span("Prepare features", rows=len(train_df) + len(test_df)):
+            X_train, cat_features = prepare_features(train_df, plan)
+            X_test, _ = prepare_features(test_df, plan)
         
         # Extract target
         y_train = train_df['target'].values
@@ -176,21 +161,23 @@ def run_phase_6() -> bool:
     
     try:
         # Create DMatrix for XGBoost
-        dtrain = xgb.DMatrix(X_train, label=y_train)
-        dtest = xgb.DMatrix(X_test, label=y_test)
+        with logger.span("Build DMatrix", rows=len(X_train) + len(X_test)):
+            dtrain = xgb.DMatrix(X_train, label=y_train)
+            dtest = xgb.DMatrix(X_test, label=y_test)
         
         # Training with early stopping
         evals = [(dtrain, 'train'), (dtest, 'test')]
         
         logger.log_action("Training model...")
-        model = xgb.train(
-            params=model_params,
-            dtrain=dtrain,
-            num_boost_round=ModelConfig.N_ESTIMATORS,
-            evals=evals,
-            early_stopping_rounds=ModelConfig.EARLY_STOPPING_ROUNDS,
-            verbose_eval=10  # Print every 10 rounds
-        )
+        with logger.span("XGBoost fit", rows=len(X_train)):
+            model = xgb.train(
+                params=model_params,
+                dtrain=dtrain,
+                num_boost_round=ModelConfig.N_ESTIMATORS,
+                evals=evals,
+                early_stopping_rounds=ModelConfig.EARLY_STOPPING_ROUNDS,
+                verbose_eval=10  # Print every 10 rounds
+            )
         
         best_iteration = model.best_iteration
         best_score = model.best_score
@@ -225,20 +212,16 @@ def run_phase_6() -> bool:
     
     try:
         # Get predictions
-        y_train_pred = model.predict(dtrain)
-        y_test_pred = model.predict(dtest)
+        with logger.span("XGBoost predict", rows=len(y_train) + len(y_test)):
+            y_train_pred = model.predict(dtrain)
+            y_test_pred = model.predict(dtest)
         
-        # Calculate metrics for train
-        train_auc_roc = roc_auc_score(y_train, y_train_pred)
-        train_auc_pr = average_precision_score(y_train, y_train_pred)
-        train_lift_10 = calculate_top_n_lift(y_train, y_train_pred, n_percent=10)
-        train_lift_5 = calculate_top_n_lift(y_train, y_train_pred, n_percent=5)
-        
-        # Calculate metrics for test
-        test_auc_roc = roc_auc_score(y_test, y_test_pred)
-        test_auc_pr = average_precision_score(y_test, y_test_pred)
-        test_lift_10 = calculate_top_n_lift(y_test, y_test_pred, n_percent=10)
-        test_lift_5 = calculate_top_n_lift(y_test, y_test_pred, n_percent=5)
+        with logger.span("Ranking metrics", rows=len(y_train) + len(y_test)):
+            # Calculate metrics for train
+            train_auc_roc, train_auc_pr, train_lift_10, train_lift_5 = calculate_ranking_metrics(y_train, y_train_pred)
+            
+            # Calculate metrics for test
+            test_auc_roc, test_auc_pr, test_lift_10, test_lift_5 = calculate_ranking_metrics(y_test, y_test_pred)
         
         logger.log_action("Train Performance:")
         logger.log_metric("  AUC-ROC", f"{train_auc_roc:.4f}")
@@ -395,6 +378,16 @@ def run_phase_6() -> bool:
             json.dump(training_metrics, f, indent=2)
         logger.log_file_created("training_metrics.json", str(metrics_path))
         
+        # Drift reference: raw training features and held-out TEST scores (in-sample
+        # scores are overfit), compared with each monthly prospect batch by
+        # score_prospects_monthly.py
+        with logger.span("Drift profile", rows=len(train_df)):
+            drift_profile = DriftProfile.fit(train_df, final_features, scores=y_test_pred,
+                                             model_version="v4.0.0")
+        drift_path = drift_profile.save(model_dir / DRIFT_PROFILE_FILENAME)
+        logger.log_file_created(DRIFT_PROFILE_FILENAME, str(drift_path),
+                                f"Training histograms for {len(drift_profile.histograms)} features + score")
+        
     except Exception as e:
         logger.log_error(f"Failed to save artifacts: {str(e)}", exception=e)
     
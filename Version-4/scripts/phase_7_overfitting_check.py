@@ -12,13 +12,12 @@ import sys
 import json
 import pickle
 import numpy as np
-import pandas as pd
 from pathlib import Path
 from datetime import datetime
 import matplotlib
 matplotlib.use('Agg')  # Non-interactive backend
 import matplotlib.pyplot as plt
-from sklearn.metrics import roc_auc_score, average_precision_score
+from sklearn.metrics import roc_auc_score
 import xgboost as xgb
 
 # Add project root to path
@@ -26,32 +25,18 @@ sys.path.insert(0, str(Path(r"C:\Users\russe\Documents\Lead Scoring\Version-4"))
 
 # Import utilities and constants
 from utils.execution_logger import ExecutionLogger
+from utils.split_engine import load_split_frame
+from utils.feature_dtypes import FeatureDtypePlan
+from utils.overfitting_engine import OverfittingDiagnostics
 from config.constants import (
     BASE_DIR,
-    ModelConfig,
     OverfittingGates,
     PerformanceGates
 )
 
-def prepare_features(df, feature_list):
-    """Prepare features for XGBoost (handle categoricals)."""
-    X = df[feature_list].copy()
-    
-    # Identify categorical features
-    categorical_features = []
-    for feat in feature_list:
-        if df[feat].dtype == 'object' or df[feat].dtype.name == 'category':
-            categorical_features.append(feat)
-    
-    # Convert categoricals to codes
-    for feat in categorical_features:
-        if feat in X.columns:
-            X[feat] = X[feat].astype('category').cat.codes
-    
-    # Fill NaN
-    X = X.fillna(0)
-    
-    return X
+def prepare_features(df, plan):
+    """Prepare features for XGBoost (float32 matrix, categoricals as contract codes)."""
+    return plan.encode_frame(df)
 
 def run_phase_7() -> bool:
     """Execute Phase 7: Overfitting Detection."""
@@ -75,17 +60,30 @@ def run_phase_7() -> bool:
         
         logger.log_metric("Model Loaded", "Success")
         
-        # Load training data with CV folds
-        train_df = pd.read_csv(BASE_DIR / "data" / "splits" / "train.csv")
-        
         # Load final features
         with open(BASE_DIR / "data" / "processed" / "final_features.json", 'r') as f:
             final_features_data = json.load(f)
             final_features = final_features_data['final_features']
+        plan = FeatureDtypePlan(final_features)
+        
+        # Load training data with CV folds (compact dtypes applied at load)
+        with logger.span("Load train split") as span:
+            train_df = load_split_frame(BASE_DIR / "data" / "splits", "TRAIN", dtype_plan=plan)
+            span.rows = len(train_df)
         
         logger.log_metric("Training Data", f"{len(train_df):,} rows")
         logger.log_metric("CV Folds", f"{sorted(train_df['cv_fold'].unique().tolist())}")
         
+        # Test set is used for learning curves and segment analysis
+        with logger.span("Load test split") as span:
+            test_df = load_split_frame(BASE_DIR / "data" / "splits", "TEST", dtype_plan=plan)
+            span.rows = len(test_df)
+        
+        # Prepare the full feature matrix once; folds and sample sizes are slices of it
+        with logger.span("Prepare diagnostics matrix", rows=len(train_df) + len(test_df)):
+            diagnostics = OverfittingDiagnostics(train_df, final_features, test_df=test_df)
+        logger.log_metric("Parallel Jobs", f"{diagnostics.n_jobs}")
+        
     except Exception as e:
         logger.log_error(f"Failed to load model/data: {str(e)}", exception=e)
         status = logger.end_phase()
@@ -99,77 +97,19 @@ def run_phase_7() -> bool:
     cv_results = []
     
     try:
-        # Get unique CV folds (should be 1-5)
-        cv_folds = sorted([int(f) for f in train_df['cv_fold'].unique() if f > 0])
+        # Legacy CSV splits have no embargo flags
+        cv_embargo = train_df['cv_embargo'].to_numpy() if 'cv_embargo' in train_df.columns else None
         
-        logger.log_action(f"Running CV on {len(cv_folds)} folds")
+        # Train on folds before each test fold (minus embargo); folds run in parallel
+        with logger.span("Time-based CV", rows=len(train_df)):
+            cv_results = diagnostics.run_cv(train_df['cv_fold'].to_numpy(), cv_embargo)
+        logger.log_action(f"Ran CV on {len(cv_results)} folds")
         
-        for test_fold in cv_folds:
-            # Train on folds before test_fold, test on test_fold
-            train_mask = train_df['cv_fold'] < test_fold
-            test_mask = train_df['cv_fold'] == test_fold
-            
-            train_cv = train_df[train_mask]
-            test_cv = train_df[test_mask]
-            
-            if len(train_cv) == 0 or len(test_cv) == 0:
-                continue
-            
-            # Prepare features
-            X_train_cv = prepare_features(train_cv, final_features)
-            X_test_cv = prepare_features(test_cv, final_features)
-            y_train_cv = train_cv['target'].values
-            y_test_cv = test_cv['target'].values
-            
-            # Train model on CV fold
-            dtrain_cv = xgb.DMatrix(X_train_cv, label=y_train_cv)
-            dtest_cv = xgb.DMatrix(X_test_cv, label=y_test_cv)
-            
-            # Get model parameters (from loaded model or constants)
-            model_params = {
-                'objective': ModelConfig.OBJECTIVE,
-                'eval_metric': ModelConfig.EVAL_METRIC,
-                'random_state': ModelConfig.RANDOM_STATE,
-                'max_depth': ModelConfig.MAX_DEPTH,
-                'min_child_weight': ModelConfig.MIN_CHILD_WEIGHT,
-                'gamma': ModelConfig.GAMMA,
-                'subsample': ModelConfig.SUBSAMPLE,
-                'colsample_bytree': ModelConfig.COLSAMPLE_BYTREE,
-                'reg_alpha': ModelConfig.REG_ALPHA,
-                'reg_lambda': ModelConfig.REG_LAMBDA,
-                'learning_rate': ModelConfig.LEARNING_RATE,
-                'scale_pos_weight': (y_train_cv == 0).sum() / (y_train_cv == 1).sum() if (y_train_cv == 1).sum() > 0 else 1.0,
-                'tree_method': 'hist',
-                'verbosity': 0
-            }
-            
-            # Train
-            model_cv = xgb.train(
-                params=model_params,
-                dtrain=dtrain_cv,
-                num_boost_round=ModelConfig.N_ESTIMATORS,
-                evals=[(dtrain_cv, 'train'), (dtest_cv, 'test')],
-                early_stopping_rounds=ModelConfig.EARLY_STOPPING_ROUNDS,
-                verbose_eval=False
-            )
-            
-            # Evaluate
-            y_pred_cv = model_cv.predict(dtest_cv)
-            auc_roc = roc_auc_score(y_test_cv, y_pred_cv)
-            auc_pr = average_precision_score(y_test_cv, y_pred_cv)
-            
-            cv_results.append({
-                'fold': test_fold,
-                'train_size': len(train_cv),
-                'test_size': len(test_cv),
-                'auc_roc': auc_roc,
-                'auc_pr': auc_pr,
-                'best_iteration': model_cv.best_iteration
-            })
-            
+        for result in cv_results:
             logger.log_metric(
-                f"Fold {test_fold}",
-                f"AUC-ROC: {auc_roc:.4f}, AUC-PR: {auc_pr:.4f}, Train: {len(train_cv):,}, Test: {len(test_cv):,}"
+                f"Fold {result['fold']}",
+                f"AUC-ROC: {result['auc_roc']:.4f}, AUC-PR: {result['auc_pr']:.4f}, "
+                f"Train: {result['train_size']:,}, Test: {result['test_size']:,}"
             )
         
         # Calculate CV statistics
@@ -209,76 +149,27 @@ def run_phase_7() -> bool:
     learning_curve_data = []
     
     try:
-        # Prepare full training data
-        X_train_full = prepare_features(train_df, final_features)
-        y_train_full = train_df['target'].values
-        
-        # Sample sizes: 20%, 40%, 60%, 80%, 100%
+        # Sample sizes: 20%, 40%, 60%, 80%, 100% (nested subsamples, fit in parallel)
         sample_sizes = [0.2, 0.4, 0.6, 0.8, 1.0]
         
-        # Use test set for validation
-        test_df = pd.read_csv(BASE_DIR / "data" / "splits" / "test.csv")
-        X_test_full = prepare_features(test_df, final_features)
-        y_test_full = test_df['target'].values
-        dtest_full = xgb.DMatrix(X_test_full, label=y_test_full)
-        
         logger.log_action("Training models on different sample sizes...")
         
-        for pct in sample_sizes:
-            n_samples = int(len(train_df) * pct)
-            train_sample = train_df.sample(n=n_samples, random_state=42)
-            
-            X_train_sample = prepare_features(train_sample, final_features)
-            y_train_sample = train_sample['target'].values
-            
-            dtrain_sample = xgb.DMatrix(X_train_sample, label=y_train_sample)
-            
-            # Train model
-            model_params = {
-                'objective': ModelConfig.OBJECTIVE,
-                'eval_metric': ModelConfig.EVAL_METRIC,
-                'random_state': ModelConfig.RANDOM_STATE,
-                'max_depth': ModelConfig.MAX_DEPTH,
-                'min_child_weight': ModelConfig.MIN_CHILD_WEIGHT,
-                'gamma': ModelConfig.GAMMA,
-                'subsample': ModelConfig.SUBSAMPLE,
-                'colsample_bytree': ModelConfig.COLSAMPLE_BYTREE,
-                'reg_alpha': ModelConfig.REG_ALPHA,
-                'reg_lambda': ModelConfig.REG_LAMBDA,
-                'learning_rate': ModelConfig.LEARNING_RATE,
-                'scale_pos_weight': (y_train_sample == 0).sum() / (y_train_sample == 1).sum() if (y_train_sample == 1).sum() > 0 else 1.0,
-                'tree_method': 'hist',
-                'verbosity': 0
-            }
-            
-            model_lc = xgb.train(
-                params=model_params,
-                dtrain=dtrain_sample,
-                num_boost_round=ModelConfig.N_ESTIMATORS,
-                evals=[(dtrain_sample, 'train'), (dtest_full, 'test')],
-                early_stopping_rounds=ModelConfig.EARLY_STOPPING_ROUNDS,
-                verbose_eval=False
-            )
-            
-            # Evaluate on training and test
-            y_train_pred = model_lc.predict(dtrain_sample)
-            y_test_pred = model_lc.predict(dtest_full)
-            
-            train_auc = roc_auc_score(y_train_sample, y_train_pred)
-            test_auc = roc_auc_score(y_test_full, y_test_pred)
-            
-            learning_curve_data.append({
-                'sample_size': n_samples,
-                'sample_pct': pct * 100,
-                'train_auc': train_auc,
-                'test_auc': test_auc
-            })
-            
+        # Train/test AUC come from each fit's evals_result trace at the best iteration
+        with logger.span("Learning curve", rows=len(train_df), sample_sizes=len(sample_sizes)):
+            learning_curve_data = diagnostics.run_learning_curve(sample_sizes, random_state=42)
+        
+        for data in learning_curve_data:
             logger.log_metric(
-                f"{pct*100:.0f}% samples ({n_samples:,})",
-                f"Train AUC: {train_auc:.4f}, Test AUC: {test_auc:.4f}"
+                f"{data['sample_pct']:.0f}% samples ({data['sample_size']:,})",
+                f"Train AUC: {data['train_auc']:.4f}, Test AUC: {data['test_auc']:.4f}"
             )
         
+        # Save per-iteration train/test traces for every CV and learning-curve fit
+        logger.save_phase_metrics(
+            {'metric': 'auc', 'traces': diagnostics.trace_summary('auc')},
+            "phase_7_training_traces.json"
+        )
+        
         # Create learning curve plot
         plt.figure(figsize=(10, 6))
         sample_sizes_plot = [d['sample_size'] for d in learning_curve_data]
@@ -339,14 +230,14 @@ def run_phase_7() -> bool:
     segment_results = {}
     
     try:
-        # Load test data for predictions
-        test_df = pd.read_csv(BASE_DIR / "data" / "splits" / "test.csv")
-        X_test = prepare_features(test_df, final_features)
-        dtest = xgb.DMatrix(X_test)
-        y_test = test_df['target'].values
-        
-        # Get predictions
-        y_pred = model.predict(dtest)
+        # Predictions from the Phase 6 model (test_df loaded in Step 7.1)
+        with logger.span("Segment predictions", rows=len(test_df)):
+            X_test = prepare_features(test_df, plan)
+            dtest = xgb.DMatrix(X_test)
+            y_test = test_df['target'].values
+            
+            # Get predictions
+            y_pred = model.predict(dtest)
         
         # Segment 1: lead_source_grouped (if available)
         if 'lead_source_grouped' in test_df.columns:
@@ -19,7 +19,7 @@ from datetime import datetime
 import matplotlib
 matplotlib.use('Agg')  # Non-interactive backend
 import matplotlib.pyplot as plt
-from sklearn.metrics import roc_auc_score, average_precision_score, log_loss
+from sklearn.metrics import roc_auc_score, log_loss
 from scipy import stats
 import xgboost as xgb
 
@@ -28,62 +28,23 @@ sys.path.insert(0, str(Path(r"C:\Users\russe\Documents\Lead Scoring\Version-4"))
 
 # Import utilities and constants
 from utils.execution_logger import ExecutionLogger
+from utils.split_engine import load_split_frame
+from utils.feature_dtypes import FeatureDtypePlan
+from utils.ranking_metrics import RankingMetrics
 from config.constants import (
     BASE_DIR,
     PerformanceGates,
     BASELINE_CONVERSION_RATE
 )
 
-def prepare_features(df, feature_list):
-    """Prepare features for XGBoost (handle categoricals)."""
-    X = df[feature_list].copy()
-    
-    # Identify categorical features
-    categorical_features = []
-    for feat in feature_list:
-        if df[feat].dtype == 'object' or df[feat].dtype.name == 'category':
-            categorical_features.append(feat)
-    
-    # Convert categoricals to codes
-    for feat in categorical_features:
-        if feat in X.columns:
-            X[feat] = X[feat].astype('category').cat.codes
-    
-    # Fill NaN
-    X = X.fillna(0)
-    
-    return X
+def prepare_features(df, plan):
+    """Prepare features for XGBoost (float32 matrix, categoricals as contract codes)."""
+    return plan.encode_frame(df)
 
-def calculate_lift_by_decile(y_true, y_pred, n_deciles=10):
-    """Calculate lift for each decile."""
-    # Sort by predictions (descending) - highest scores first
-    df = pd.DataFrame({'y_true': y_true, 'y_pred': y_pred})
-    df = df.sort_values('y_pred', ascending=False).reset_index(drop=True)
-    
-    # Divide into deciles - assign decile numbers so decile 10 = highest scores
-    # Since we sorted descending, first rows = highest scores
-    # Reverse the assignment: first rows get decile 10, last rows get decile 1
-    n = len(df)
-    decile_size = n / n_deciles
-    df['decile'] = n_deciles - (df.index // decile_size).astype(int)
-    # Ensure decile 1 is the bottom (lowest predictions) and decile 10 is the top
-    df['decile'] = df['decile'].clip(lower=1, upper=n_deciles)
-    
-    # Calculate conversion rate and lift for each decile
-    decile_stats = df.groupby('decile').agg(
-        n_leads=('y_true', 'count'),
-        n_conversions=('y_true', 'sum'),
-        avg_score=('y_pred', 'mean')
-    ).reset_index()
-    
-    overall_conv_rate = y_true.mean()
-    decile_stats['conv_rate'] = decile_stats['n_conversions'] / decile_stats['n_leads']
-    decile_stats['lift'] = decile_stats['conv_rate'] / overall_conv_rate if overall_conv_rate > 0 else 0
-    
-    # Sort by decile to ensure correct order
-    decile_stats = decile_stats.sort_values('decile').reset_index(drop=True)
-    
-    return decile_stats
+def calculate_lift_by_decile(y_true, y_pred, n_deciles=10, metrics=None):
+    """Calculate lift for each decile (decile 10 = highest scores)."""
+    metrics = metrics if metrics is not None else RankingMetrics(y_true, y_pred)
+    return metrics.decile_table(0, n_bins=n_deciles)
 
 def bootstrap_lift(y_true, y_pred, n_bootstrap=1000, top_decile=True):
     """Calculate bootstrap confidence intervals for lift."""
@@ -135,8 +96,14 @@ def run_phase_8() -> bool:
     logger.log_action("Loading test data and model")
     
     try:
-        # Load test data
-        test_df = pd.read_csv(BASE_DIR / "data" / "splits" / "test.csv")
+        # Load final features
+        with open(BASE_DIR / "data" / "processed" / "final_features.json", 'r') as f:
+            final_features_data = json.load(f)
+            final_features = final_features_data['final_features']
+        plan = FeatureDtypePlan(final_features)
+        
+        # Load test data (compact dtypes applied at load)
+        test_df = load_split_frame(BASE_DIR / "data" / "splits", "TEST", dtype_plan=plan)
         logger.log_metric("Test Data", f"{len(test_df):,} leads")
         
         # Load model
@@ -144,11 +111,6 @@ def run_phase_8() -> bool:
         with open(model_path, 'rb') as f:
             model = pickle.load(f)
         
-        # Load final features
-        with open(BASE_DIR / "data" / "processed" / "final_features.json", 'r') as f:
-            final_features_data = json.load(f)
-            final_features = final_features_data['final_features']
-        
         logger.log_metric("Model Loaded", "Success")
         logger.log_metric("Features", f"{len(final_features)} features")
         
@@ -158,7 +120,7 @@ def run_phase_8() -> bool:
         return False
     
     # Prepare features and generate predictions
-    X_test = prepare_features(test_df, final_features)
+    X_test = prepare_features(test_df, plan)
     dtest = xgb.DMatrix(X_test)
     y_test = test_df['target'].values
     y_pred = model.predict(dtest)
@@ -170,8 +132,10 @@ def run_phase_8() -> bool:
     # =========================================================================
     logger.log_action("Calculating core metrics")
     
-    auc_roc = roc_auc_score(y_test, y_pred)
-    auc_pr = average_precision_score(y_test, y_pred)
+    # One sort of the test scores feeds AUC-ROC, AUC-PR and the decile table
+    ranking = RankingMetrics(y_test, y_pred)
+    auc_roc = float(ranking.auc_roc()[0])
+    auc_pr = float(ranking.auc_pr()[0])
     logloss = log_loss(y_test, y_pred)
     
     logger.log_metric("AUC-ROC", f"{auc_roc:.4f}")
@@ -179,7 +143,7 @@ def run_phase_8() -> bool:
     logger.log_metric("Log Loss", f"{logloss:.4f}")
     
     # Calculate top decile lift
-    decile_stats = calculate_lift_by_decile(y_test, y_pred)
+    decile_stats = calculate_lift_by_decile(y_test, y_pred, metrics=ranking)
     # Top decile (decile 10) should have highest predictions and highest lift
     # Since we sorted descending, decile 10 = highest scores
     top_decile_row = decile_stats[decile_stats['decile'] == 10]
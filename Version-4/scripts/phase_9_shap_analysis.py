@@ -22,27 +22,13 @@ sys.path.insert(0, str(Path(r"C:\Users\russe\Documents\Lead Scoring\Version-4"))
 
 # Import utilities and constants
 from utils.execution_logger import ExecutionLogger
+from utils.split_engine import load_split_frame
+from utils.feature_dtypes import FeatureDtypePlan
 from config.constants import BASE_DIR
 
-def prepare_features(df, feature_list):
-    """Prepare features for XGBoost (handle categoricals)."""
-    X = df[feature_list].copy()
-    
-    # Identify categorical features
-    categorical_features = []
-    for feat in feature_list:
-        if df[feat].dtype == 'object' or df[feat].dtype.name == 'category':
-            categorical_features.append(feat)
-    
-    # Convert categoricals to codes
-    for feat in categorical_features:
-        if feat in X.columns:
-            X[feat] = X[feat].astype('category').cat.codes
-    
-    # Fill NaN
-    X = X.fillna(0)
-    
-    return X
+def prepare_features(df, plan):
+    """Prepare features for XGBoost (float32 matrix, categoricals as contract codes)."""
+    return plan.encode_frame(df)
 
 def run_phase_9() -> bool:
     """Execute Phase 9: SHAP Analysis."""
@@ -56,8 +42,15 @@ def run_phase_9() -> bool:
     logger.log_action("Loading model and sampling test data")
     
     try:
-        # Load test data
-        test_df = pd.read_csv(BASE_DIR / "data" / "splits" / "test.csv")
+        # Load final features
+        import json
+        with open(BASE_DIR / "data" / "processed" / "final_features.json", 'r') as f:
+            final_features_data = json.load(f)
+            final_features = final_features_data['final_features']
+        plan = FeatureDtypePlan(final_features)
+        
+        # Load test data (compact dtypes applied at load)
+        test_df = load_split_frame(BASE_DIR / "data" / "splits", "TEST", dtype_plan=plan)
         logger.log_metric("Test Data", f"{len(test_df):,} leads")
         
         # Sample for SHAP (memory constraint - use 1000-2000 records)
@@ -79,12 +72,6 @@ def run_phase_9() -> bool:
             model.load_model(str(model_json_path))
             logger.log_metric("Model Type", "XGBoost Booster (from JSON)")
         
-        # Load final features
-        import json
-        with open(BASE_DIR / "data" / "processed" / "final_features.json", 'r') as f:
-            final_features_data = json.load(f)
-            final_features = final_features_data['final_features']
-        
         logger.log_metric("Model Loaded", "Success")
         logger.log_metric("Features", f"{len(final_features)} features")
         
@@ -93,16 +80,8 @@ def run_phase_9() -> bool:
         status = logger.end_phase()
         return False
     
-    # Prepare features - ensure all are numeric
-    X_sample = prepare_features(test_sample, final_features)
-    
-    # Ensure all columns are numeric (convert any remaining object types)
-    for col in X_sample.columns:
-        if X_sample[col].dtype == 'object':
-            try:
-                X_sample[col] = pd.to_numeric(X_sample[col], errors='coerce').fillna(0)
-            except:
-                X_sample[col] = 0
+    # Prepare features (float32 matrix)
+    X_sample = prepare_features(test_sample, plan)
     
     # Check for any non-numeric values
     logger.log_action("Verifying feature data types")
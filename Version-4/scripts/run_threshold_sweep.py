@@ -0,0 +1,190 @@
+"""
+Threshold Sweep: Justify V4 Deprioritize and Upgrade Percentiles
+
+This script:
+1. Loads scored leads (test split, or a point-in-time export with score_tier)
+2. Sweeps every V4 percentile cut with bootstrap bands
+3. Recommends the deprioritize cut (max conversions lost) and the V4
+   upgrade cut jointly with the V3 tier quotas of the monthly list
+4. Saves the sweep tables and a markdown report
+
+Usage:
+    python scripts/run_threshold_sweep.py
+    python scripts/run_threshold_sweep.py --source data/v4_features_pit.parquet --quota-scale 0.5
+"""
+
+import sys
+import argparse
+from pathlib import Path
+from datetime import datetime
+
+# Add project root to path
+sys.path.insert(0, str(Path(r"C:\Users\russe\Documents\Lead Scoring\Version-4")))
+
+# Import utilities and constants
+from utils.execution_logger import ExecutionLogger
+from utils.split_engine import load_split_frame
+from utils.walk_forward import load_pit_features
+from utils.threshold_sweep import ThresholdSweep, joint_upgrade_sweep, recommend_upgrade
+from inference.lead_scorer_v4 import LeadScorerV4
+from config.constants import BASE_DIR, LeadListConfig
+
+
+def run_threshold_sweep(source: str = None, quota_scale: float = 1.0,
+                        n_bootstrap: int = LeadListConfig.N_BOOTSTRAP) -> bool:
+    """Execute the threshold sweep."""
+
+    logger = ExecutionLogger(BASE_DIR)
+    logger.start_phase("TS", "V4 Threshold Sweep")
+
+    # =========================================================================
+    # STEP 1: Load and Score Leads
+    # =========================================================================
+    logger.log_action("Loading scored leads", details=str(source or "TEST split"))
+
+    try:
+        if source is None:
+            df = load_split_frame(BASE_DIR / "data" / "splits", "TEST")
+        else:
+            df = load_pit_features(source)
+
+        if 'v4_score' not in df.columns:
+            scorer = LeadScorerV4(
+                model_dir=BASE_DIR / "models" / "v4.0.0",
+                features_file=BASE_DIR / "data" / "processed" / "final_features.json"
+            )
+            df['v4_score'] = scorer.score_leads(df)
+
+        logger.log_dataframe_summary(df, "Scored Leads")
+
+    except Exception as e:
+        logger.log_error(f"Failed to load scored leads: {str(e)}", exception=e)
+        logger.end_phase()
+        return False
+
+    # =========================================================================
+    # STEP 2: Percentile Sweep
+    # =========================================================================
+    logger.log_action("Sweeping V4 percentile cuts", details=f"{n_bootstrap} bootstrap replicates")
+
+    sweep = ThresholdSweep(df['target'].to_numpy(), df['v4_score'].to_numpy(), n_bootstrap=n_bootstrap)
+    table = sweep.percentile_sweep()
+    deprioritize_cut = sweep.recommend_deprioritize(table)
+
+    current = table.set_index('percentile')
+    for label, cut, side in [("Deprioritize", LeadListConfig.DEPRIORITIZE_PERCENTILE, 'bottom'),
+                             ("Upgrade", LeadListConfig.V4_UPGRADE_PERCENTILE, 'top')]:
+        row = current.loc[cut]
+        value = (f"{row[f'{side}_pct_of_leads']:.1f}% of leads, "
+                 f"conv {row[f'{side}_conv_rate']*100:.2f}%, lift {row[f'{side}_lift']:.2f}x")
+        if n_bootstrap > 0:
+            value += f" [{row[f'{side}_lift_lo']:.2f}x, {row[f'{side}_lift_hi']:.2f}x]"
+        logger.log_metric(f"Current {label} Cut (P{cut})", value)
+
+    logger.log_decision(
+        f"Deprioritize cut: P{deprioritize_cut}",
+        rationale=(f"Largest bottom cut losing <= {LeadListConfig.MAX_DEPRIORITIZE_CONVERSION_LOSS:.0%} "
+                   f"of conversions (bootstrap upper band)"),
+        alternatives=[f"Current: P{LeadListConfig.DEPRIORITIZE_PERCENTILE}"]
+    )
+
+    # =========================================================================
+    # STEP 3: Joint Upgrade Sweep Against V3 Tier Quotas
+    # =========================================================================
+    joint = None
+    upgrade_cut = None
+    if 'score_tier' in df.columns:
+        logger.log_action("Sweeping V4 upgrade cut against V3 tier quotas",
+                          details=f"quota scale {quota_scale}")
+        joint = joint_upgrade_sweep(
+            df['target'].to_numpy(), df['v4_score'].to_numpy(), df['score_tier'],
+            quota_scale=quota_scale, n_bootstrap=n_bootstrap
+        )
+        upgrade_cut = recommend_upgrade(joint)
+        best = joint.set_index('percentile').loc[upgrade_cut] if upgrade_cut is not None else None
+        logger.log_decision(
+            f"V4 upgrade cut: P{upgrade_cut}",
+            rationale=(f"Highest list conversion rate ({best['list_conv_rate']*100:.2f}%)"
+                       if best is not None else "No cut produced a list"),
+            alternatives=[f"Current: P{LeadListConfig.V4_UPGRADE_PERCENTILE}"]
+        )
+    else:
+        logger.log_warning("score_tier column not found", action_taken="Joint upgrade sweep skipped")
+
+    # =========================================================================
+    # STEP 4: Save Results
+    # =========================================================================
+    try:
+        reports_dir = BASE_DIR / "reports"
+        reports_dir.mkdir(parents=True, exist_ok=True)
+
+        table_path = reports_dir / "threshold_sweep.csv"
+        table.to_csv(table_path, index=False)
+        logger.log_file_created("threshold_sweep.csv", str(table_path))
+
+        if joint is not None:
+            joint_path = reports_dir / "threshold_sweep_upgrade_joint.csv"
+            joint.to_csv(joint_path, index=False)
+            logger.log_file_created("threshold_sweep_upgrade_joint.csv", str(joint_path))
+
+        report_path = reports_dir / "threshold_sweep.md"
+        with open(report_path, 'w', encoding='utf-8') as f:
+            f.write("# V4 Threshold Sweep\n\n")
+            f.write(f"**Generated**: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+            f.write(f"**Leads**: {len(df):,} | **Bootstrap**: {n_bootstrap} replicates (5-95% bands)\n\n")
+            f.write("## Recommendations\n\n")
+            f.write(f"- Deprioritize: P{deprioritize_cut} (current P{LeadListConfig.DEPRIORITIZE_PERCENTILE})\n")
+            f.write(f"- V4 upgrade: {'P' + str(upgrade_cut) if upgrade_cut is not None else 'N/A'} "
+                    f"(current P{LeadListConfig.V4_UPGRADE_PERCENTILE})\n\n")
+            f.write("## Percentile Cuts\n\n")
+            f.write("| Cut | Top % Leads | Top Conv | Top Lift | Bottom Conv | Bottom Lift | Conv Lost | Efficiency |\n")
+            f.write("|-----|-------------|----------|----------|-------------|-------------|-----------|------------|\n")
+            for _, row in table[table['percentile'] % 5 == 0].iterrows():
+                f.write(
+                    f"| P{int(row['percentile'])} | {row['top_pct_of_leads']:.1f}% | "
+                    f"{row['top_conv_rate']*100:.2f}% | {row['top_lift']:.2f}x | "
+                    f"{row['bottom_conv_rate']*100:.2f}% | {row['bottom_lift']:.2f}x | "
+                    f"{row['conversions_lost_pct']:.1f}% | {row['efficiency']:.2f} |\n"
+                )
+            if joint is not None:
+                f.write("\n## V4 Upgrade Cut vs V3 Tier Quotas\n\n")
+                f.write("| Cut | Eligible | In List | Upgrade Conv | List Conv | Displaced V3 Rows |\n")
+                f.write("|-----|----------|---------|--------------|-----------|-------------------|\n")
+                for _, row in joint[joint['percentile'] % 5 == 0].iterrows():
+                    f.write(
+                        f"| P{int(row['percentile'])} | {int(row['upgrade_eligible']):,} | "
+                        f"{int(row['upgrade_in_list']):,} | {row['upgrade_conv_rate']*100:.2f}% | "
+                        f"{row['list_conv_rate']*100:.2f}% | {int(row['displaced_tier_rows']):,} |\n"
+                    )
+        logger.log_file_created("threshold_sweep.md", str(report_path))
+
+        logger.save_phase_metrics({
+            'deprioritize_percentile': deprioritize_cut,
+            'v4_upgrade_percentile': upgrade_cut,
+            'n_leads': len(df),
+            'n_bootstrap': n_bootstrap
+        }, "threshold_sweep_recommendations.json")
+
+    except Exception as e:
+        logger.log_error(f"Failed to save results: {str(e)}", exception=e)
+
+    status = logger.end_phase()
+    return status in ["PASSED", "PASSED WITH WARNINGS"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sweep V4 deprioritize/upgrade percentile cuts')
+    parser.add_argument('--source', default=None,
+                        help='Parquet export or BigQuery table with score_tier (default: TEST split)')
+    parser.add_argument('--quota-scale', type=float, default=1.0,
+                        help='Multiplier on tier quotas and list size (historical / monthly volume)')
+    parser.add_argument('--n-bootstrap', type=int, default=LeadListConfig.N_BOOTSTRAP,
+                        help=f'Bootstrap replicates (default: {LeadListConfig.N_BOOTSTRAP})')
+
+    args = parser.parse_args()
+    success = run_threshold_sweep(args.source, args.quota_scale, args.n_bootstrap)
+    sys.exit(0 if success else 1)
+
+
+if __name__ == "__main__":
+    main()
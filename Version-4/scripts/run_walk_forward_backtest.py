@@ -0,0 +1,170 @@
+"""
+Walk-Forward Backtest: V4 Retraining Cadence and Stability
+
+This script:
+1. Loads the point-in-time feature table (BigQuery or a Parquet export)
+2. For each monthly origin, trains V4 on the trailing window and scores the next month
+3. Reports V4 and V3 tier lift/AUC side by side per origin
+4. Saves the time series as CSV and a markdown report
+
+Usage:
+    python scripts/run_walk_forward_backtest.py --source data/v4_features_pit.parquet
+    python scripts/run_walk_forward_backtest.py --source v4_features_pit --start 2025-01-01
+"""
+
+import sys
+import json
+import argparse
+from pathlib import Path
+from datetime import datetime
+
+# Add project root to path
+sys.path.insert(0, str(Path(r"C:\Users\russe\Documents\Lead Scoring\Version-4")))
+
+# Import utilities and constants
+from utils.execution_logger import ExecutionLogger
+from utils.walk_forward import WalkForwardBacktest, load_pit_features
+from utils.feature_dtypes import FeatureDtypePlan
+from config.constants import BASE_DIR, BacktestConfig, PerformanceGates
+
+
+def _fmt(value, pattern: str) -> str:
+    """Format a metric that may be missing."""
+    return pattern.format(value) if value is not None and value == value else "N/A"
+
+
+def run_walk_forward(source: str, start: str = None, end: str = None,
+                     train_months: int = BacktestConfig.TRAIN_WINDOW_MONTHS,
+                     use_cache: bool = True) -> bool:
+    """Execute the walk-forward backtest."""
+
+    logger = ExecutionLogger(BASE_DIR)
+    logger.start_phase("WF", "Walk-Forward Backtest")
+
+    # =========================================================================
+    # STEP 1: Load Point-in-Time Features
+    # =========================================================================
+    logger.log_action("Loading point-in-time features", details=str(source))
+
+    try:
+        with open(BASE_DIR / "data" / "processed" / "final_features.json", 'r') as f:
+            final_features = json.load(f)['final_features']
+
+        df = load_pit_features(source, dtype_plan=FeatureDtypePlan(final_features))
+
+        logger.log_dataframe_summary(df, "PIT Features")
+        if 'score_tier' not in df.columns:
+            logger.log_warning("score_tier column not found", action_taken="V3 tier metrics skipped")
+
+    except Exception as e:
+        logger.log_error(f"Failed to load features: {str(e)}", exception=e)
+        logger.end_phase()
+        return False
+
+    # =========================================================================
+    # STEP 2: Run Rolling Origins
+    # =========================================================================
+    logger.log_action("Running rolling-origin backtest")
+
+    try:
+        backtest = WalkForwardBacktest(
+            df, final_features,
+            train_months=train_months,
+            cache_dir=BacktestConfig.CACHE_DIR if use_cache else None
+        )
+        results = backtest.run(start=start, end=end)
+        evaluated = results[~results['skipped']] if len(results) else results
+
+        logger.log_metric("Origins", f"{len(results)} ({len(evaluated)} evaluated)")
+        logger.log_metric("Training Window", f"{train_months} months, {backtest.gap_days}-day maturity gap")
+
+        for _, row in evaluated.iterrows():
+            logger.log_metric(
+                f"Origin {row['origin']}",
+                f"V4 AUC: {_fmt(row.get('v4_auc'), '{:.4f}')}, "
+                f"V4 Top 10%: {_fmt(row.get('v4_top_decile_lift'), '{:.2f}x')}, "
+                f"V3 AUC: {_fmt(row.get('v3_auc'), '{:.4f}')}, "
+                f"V3 Priority Lift: {_fmt(row.get('v3_prioritized_lift'), '{:.2f}x')}, "
+                f"N: {int(row['n_test']):,}"
+            )
+
+    except Exception as e:
+        logger.log_error(f"Backtest failed: {str(e)}", exception=e)
+        logger.end_phase()
+        return False
+
+    # =========================================================================
+    # STEP 3: Stability Gate
+    # =========================================================================
+    if len(evaluated) > 0:
+        lifts = evaluated['v4_top_decile_lift'].dropna()
+        months_passing = int((lifts >= PerformanceGates.MIN_TOP_DECILE_LIFT).sum())
+        logger.log_metric("V4 Top Decile Lift (mean)", f"{lifts.mean():.2f}x")
+        logger.log_metric("V4 Top Decile Lift (std)", f"{lifts.std():.2f}x")
+        logger.log_gate(
+            "GWF.1", "Monthly Lift Stability",
+            passed=months_passing == len(lifts),
+            expected=f"Every origin >= {PerformanceGates.MIN_TOP_DECILE_LIFT}x",
+            actual=f"{months_passing}/{len(lifts)} origins"
+        )
+
+    # =========================================================================
+    # STEP 4: Save Results
+    # =========================================================================
+    try:
+        reports_dir = BASE_DIR / "reports"
+        reports_dir.mkdir(parents=True, exist_ok=True)
+
+        csv_path = reports_dir / "walk_forward_backtest.csv"
+        results.to_csv(csv_path, index=False)
+        logger.log_file_created("walk_forward_backtest.csv", str(csv_path))
+
+        report_path = reports_dir / "walk_forward_backtest.md"
+        with open(report_path, 'w', encoding='utf-8') as f:
+            f.write("# Walk-Forward Backtest: V4 vs V3\n\n")
+            f.write(f"**Generated**: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+            f.write(f"**Training Window**: {train_months} months (trailing, {backtest.gap_days}-day maturity gap)\n\n")
+            f.write("| Origin | Train | Test | Conv Rate | V4 AUC | V4 Top 10% | V4 @ V3 Volume | V3 AUC | V3 Priority Lift |\n")
+            f.write("|--------|-------|------|-----------|--------|------------|----------------|--------|------------------|\n")
+            for _, row in evaluated.iterrows():
+                f.write(
+                    f"| {row['origin']} | {int(row['n_train']):,} | {int(row['n_test']):,} | "
+                    f"{row['conv_rate']*100:.2f}% | {_fmt(row.get('v4_auc'), '{:.4f}')} | "
+                    f"{_fmt(row.get('v4_top_decile_lift'), '{:.2f}x')} | "
+                    f"{_fmt(row.get('v4_lift_at_v3_volume'), '{:.2f}x')} | "
+                    f"{_fmt(row.get('v3_auc'), '{:.4f}')} | "
+                    f"{_fmt(row.get('v3_prioritized_lift'), '{:.2f}x')} |\n"
+                )
+        logger.log_file_created("walk_forward_backtest.md", str(report_path))
+
+    except Exception as e:
+        logger.log_error(f"Failed to save results: {str(e)}", exception=e)
+
+    status = logger.end_phase()
+    return status in ["PASSED", "PASSED WITH WARNINGS"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rolling-origin walk-forward backtest for V4')
+    parser.add_argument(
+        '--source',
+        default='v4_features_pit',
+        help='Parquet export path or BigQuery table (default: v4_features_pit)'
+    )
+    parser.add_argument('--start', default=None, help='First origin month (YYYY-MM-DD)')
+    parser.add_argument('--end', default=None, help='Last origin month (YYYY-MM-DD)')
+    parser.add_argument(
+        '--train-months',
+        type=int,
+        default=BacktestConfig.TRAIN_WINDOW_MONTHS,
+        help=f'Trailing training window (default: {BacktestConfig.TRAIN_WINDOW_MONTHS})'
+    )
+    parser.add_argument('--no-cache', action='store_true', help='Retrain every window')
+
+    args = parser.parse_args()
+    success = run_walk_forward(args.source, args.start, args.end, args.train_months, not args.no_cache)
+    sys.exit(0 if success else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Feature Dtype Plan: Encoding Parity and Memory Benchmark
+
+This script:
+1. Builds a synthetic prospect feature table in the dtypes BigQuery returns
+   (strings, nullable Int64), or loads a Parquet export with --features
+2. Encodes it with the pre-plan training prepare_features (copy, cat.codes,
+   fillna) and with utils.feature_dtypes.FeatureDtypePlan
+3. Gates on identical model matrices, on the planned storage dtypes, and on
+   NULL categories encoded as in training (-1; pre-plan scoring used 0)
+4. Reports bytes per prospect before and after, for the fetched frame and for
+   the peak allocation while building the model matrix
+
+Usage:
+    python scripts/verify_feature_dtypes.py
+    python scripts/verify_feature_dtypes.py --prospects 2000000
+    python scripts/verify_feature_dtypes.py --features data/v4_prospect_features.parquet
+"""
+
+import sys
+import time
+import argparse
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Add project root to path
+sys.path.insert(0, str(Path(r"C:\Users\russe\Documents\Lead Scoring\Version-4")))
+
+# Import utilities and constants
+from utils.execution_logger import ExecutionLogger
+from utils.feature_dtypes import FeatureDtypePlan, bytes_per_row
+from config.constants import BASE_DIR, FEATURE_CONTRACT
+
+FEATURES_FILE = BASE_DIR / "data" / "processed" / "final_features.json"
+PLANNED_DTYPES = {'flag': ('uint8', 'float32'), 'category': ('category',), 'continuous': ('float32',)}
+
+
+def synthetic_prospects(n_prospects: int, seed: int = 42) -> pd.DataFrame:
+    """Prospect features as fetched: object strings and nullable Int64 columns."""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({'crd': np.arange(1_000_000, 1_000_000 + n_prospects, dtype=np.int64)})
+    for feature, spec in FEATURE_CONTRACT.items():
+        if spec['kind'] == 'category':
+            labels = pd.Series(rng.choice(spec['categories'], n_prospects), dtype=object)
+            labels[rng.random(n_prospects) < 0.05] = None
+            df[feature] = labels
+        elif spec['kind'] == 'flag':
+            df[feature] = pd.array(rng.random(n_prospects) < 0.2, dtype='Int64')
+        else:
+            values = pd.array(rng.integers(-60, 3_000, n_prospects), dtype='Int64')
+            values[rng.random(n_prospects) < 0.1] = pd.NA
+            df[feature] = values
+    return df
+
+
+def legacy_prepare_features(df: pd.DataFrame, feature_list: list) -> pd.DataFrame:
+    """prepare_features from phase_6_model_training.py before the dtype plan (NULL category -> -1)."""
+    X = df[feature_list].copy()
+    for feat in feature_list:
+        if df[feat].dtype == 'object' or df[feat].dtype.name == 'category':
+            X[feat] = X[feat].astype('category').cat.codes
+    X = X.fillna(0)
+    return X
+
+
+def peak_bytes(fn, *args):
+    """Result of fn(*args) and the peak bytes allocated while it ran."""
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    result = fn(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, peak
+
+
+def run_dtype_check(features_source: str = None, n_prospects: int = 500_000, seed: int = 42) -> bool:
+    """Execute the dtype plan parity check and memory benchmark."""
+
+    logger = ExecutionLogger(BASE_DIR)
+    logger.start_phase("FD", "Feature Dtype Plan Check")
+
+    # =========================================================================
+    # STEP 1: Load Prospect Features
+    # =========================================================================
+    plan = FeatureDtypePlan.from_features_file(FEATURES_FILE)
+    if features_source:
+        logger.log_action("Loading prospect features", details=features_source)
+        raw = pd.read_parquet(features_source)
+    else:
+        logger.log_action("Building synthetic prospect features", details=f"{n_prospects:,} prospects")
+        raw = synthetic_prospects(n_prospects, seed)
+    logger.log_metric("Prospects", f"{len(raw):,}")
+    logger.log_metric("Model Features", f"{len(plan.features)}")
+
+    # =========================================================================
+    # STEP 2: Encoding Parity
+    # =========================================================================
+    before_frame = bytes_per_row(raw, plan.features)
+    legacy, legacy_peak = peak_bytes(legacy_prepare_features, raw, plan.features)
+    legacy = legacy.to_numpy(dtype=np.float32)
+
+    compact = raw.copy()
+    start = time.perf_counter()
+    plan.apply(compact)
+    apply_ms = (time.perf_counter() - start) * 1000
+    after_frame = bytes_per_row(compact, plan.features)
+    X, plan_peak = peak_bytes(plan.encode, compact)
+
+    mismatches = int((legacy != X).sum()) if legacy.shape == X.shape else -1
+    logger.log_gate(
+        "GFD.1", "Planned Encoding Matches prepare_features",
+        passed=mismatches == 0,
+        expected="0 differing cells",
+        actual=f"{mismatches} differing cells" if mismatches >= 0 else f"shape {X.shape} vs {legacy.shape}"
+    )
+
+    off_plan = [
+        f for f in plan.features
+        if f in compact.columns and compact[f].dtype.name not in PLANNED_DTYPES[plan.kinds[f]]
+    ]
+    logger.log_gate(
+        "GFD.2", "Feature Columns Stored in Planned Dtypes",
+        passed=not off_plan,
+        expected="uint8 flags, categorical buckets, float32 continuous",
+        actual=", ".join(f"{f}={compact[f].dtype}" for f in off_plan) or "All planned"
+    )
+
+    # Pre-plan scoring replaced the -1 of NULL categories with 0
+    null_cells = {f: raw[f].isna().to_numpy() for f in plan.categorical if f in raw.columns}
+    n_null = sum(int(mask.sum()) for mask in null_cells.values())
+    null_ok = all((X[mask, plan.features.index(f)] == -1).all() for f, mask in null_cells.items())
+    logger.log_metric("NULL Category Cells", f"{n_null:,}")
+    logger.log_gate(
+        "GFD.4", "NULL Categories Encoded as in Training",
+        passed=null_ok,
+        expected="-1 (phase 6 training matrices)",
+        actual=(f"{n_null:,} cells at -1; pre-plan scoring encoded them as 0" if null_ok and n_null
+                else "No NULL categories in the data" if null_ok else "Some NULL categories not -1")
+    )
+
+    # =========================================================================
+    # STEP 3: Memory Benchmark
+    # =========================================================================
+    n = max(len(raw), 1)
+    logger.log_metric("Fetched Frame Bytes/Prospect (before)", f"{before_frame:.1f}")
+    logger.log_metric("Fetched Frame Bytes/Prospect (after)", f"{after_frame:.1f}")
+    logger.log_metric("Prepare Peak Bytes/Prospect (before)", f"{legacy_peak / n:.1f}")
+    logger.log_metric("Prepare Peak Bytes/Prospect (after)", f"{plan_peak / n:.1f}")
+    logger.log_metric("Model Matrix Bytes/Prospect", f"{X.nbytes / n:.1f}")
+    logger.log_metric("Plan Apply (ms)", f"{apply_ms:.0f}")
+    logger.log_metric("Prospects per GB (before)",
+                      f"{2**30 / max(before_frame + legacy_peak / n, 1):,.0f}")
+    logger.log_metric("Prospects per GB (after)",
+                      f"{2**30 / max(after_frame + plan_peak / n, 1):,.0f}")
+
+    logger.log_gate(
+        "GFD.3", "Feature Bytes per Prospect Reduced",
+        passed=after_frame < before_frame and plan_peak <= legacy_peak,
+        expected="Smaller fetched frame and prepare peak",
+        actual=f"{before_frame:.1f} -> {after_frame:.1f} bytes, "
+               f"peak {legacy_peak / n:.1f} -> {plan_peak / n:.1f} bytes"
+    )
+
+    status = logger.end_phase()
+    return status in ["PASSED", "PASSED WITH WARNINGS"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check the V4 feature dtype plan and benchmark its memory use')
+    parser.add_argument('--features', default=None, help='Parquet export of prospect features (default: synthetic)')
+    parser.add_argument('--prospects', type=int, default=500_000, help='Synthetic prospect count')
+    parser.add_argument('--seed', type=int, default=42, help='Synthetic data seed')
+
+    args = parser.parse_args()
+    success = run_dtype_check(args.features, args.prospects, args.seed)
+    sys.exit(0 if success else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Firm-Month Flow Rollup: Local Check of Incremental Append and Prefix Sums
+
+This script:
+1. Loads the employment history once (BigQuery or a Parquet export)
+2. Builds firm_month_flows locally in DuckDB up to the month before --end,
+   then appends --end incrementally (as 04_monthly_refresh.sql does)
+3. Checks the appended rollup against a full rebuild through --end
+4. Checks 12-month prefix-sum windows against direct scans of the history
+5. Saves the rollup to Parquet for local consumers
+
+Usage:
+    python scripts/verify_firm_flows.py --history data/employment_history.parquet
+    python scripts/verify_firm_flows.py --end 2025-10-01 --check-months 24
+"""
+
+import sys
+import argparse
+from pathlib import Path
+
+import pandas as pd
+
+# Add project root to path
+sys.path.insert(0, str(Path(r"C:\Users\russe\Documents\Lead Scoring\Version-4")))
+
+# Import utilities and constants
+from utils.execution_logger import ExecutionLogger
+from utils.firm_flows import FirmMonthFlows, ROLLUP_START
+from utils.pit_features import load_employment_history
+from config.constants import BASE_DIR, FIRM_STABILITY_LOOKBACK_MONTHS
+
+
+def run_flow_check(history_source: str = None, end: str = None, check_months: int = 12,
+                   database: str = None) -> bool:
+    """Execute the firm-month flow rollup check."""
+
+    logger = ExecutionLogger(BASE_DIR)
+    logger.start_phase("FF", "Firm-Month Flow Rollup Check")
+
+    # =========================================================================
+    # STEP 1: Load History
+    # =========================================================================
+    logger.log_action("Loading employment history", details=str(history_source or "BigQuery"))
+    try:
+        history = load_employment_history(history_source)
+        logger.log_metric("History Rows", f"{len(history):,}")
+    except Exception as e:
+        logger.log_error(f"Failed to load employment history: {str(e)}", exception=e)
+        logger.end_phase()
+        return False
+
+    end_month = (pd.Period(end, 'M') if end else pd.Timestamp.today().to_period('M') - 1)
+
+    # =========================================================================
+    # STEP 2: Backfill + Incremental Append
+    # =========================================================================
+    logger.log_action("Building rollup", details=f"backfill to {end_month - 1}, append {end_month}")
+    flows = FirmMonthFlows(database or ':memory:')
+    n_rows = flows.backfill(history, end=(end_month - 1).to_timestamp())
+    n_appended = flows.append_month(history, end_month.to_timestamp())
+    logger.log_metric("Backfilled Rows", f"{n_rows:,}")
+    logger.log_metric("Appended Firms", f"{n_appended:,}")
+
+    rebuild = FirmMonthFlows()
+    rebuild.backfill(history, end=end_month.to_timestamp())
+    appended = flows.to_frame()
+    expected = rebuild.to_frame()
+    diff_rows = 0 if appended.equals(expected) else len(
+        appended.merge(expected, how='outer', indicator=True).query("_merge != 'both'"))
+
+    logger.log_gate(
+        "GFF.1", "Incremental Append Matches Rebuild",
+        passed=diff_rows == 0,
+        expected="0 differing rows",
+        actual=f"{diff_rows} differing rows"
+    )
+
+    # =========================================================================
+    # STEP 3: Prefix-Sum Windows vs Direct Scans
+    # =========================================================================
+    first = max(end_month - check_months + 1,
+                pd.Period(ROLLUP_START, 'M') + FIRM_STABILITY_LOOKBACK_MONTHS)
+    months = pd.period_range(first, end_month, freq='M')
+    logger.log_action("Checking prefix-sum windows", details=f"{len(months)} months ending {end_month}")
+
+    mismatches = 0
+    for month in months:
+        rows = appended[appended['flow_month'] == month.to_timestamp()]
+        window = flows.window(rows['firm_crd'], [month.to_timestamp()] * len(rows))
+        scan = (flows.scan_window(history, month.to_timestamp())
+                .set_index('firm_crd').reindex(rows['firm_crd'].to_numpy()).fillna(0))
+        mismatches += int(((window['arrivals'].to_numpy() != scan['arrivals'].to_numpy()) |
+                           (window['departures'].to_numpy() != scan['departures'].to_numpy())).sum())
+
+    logger.log_gate(
+        "GFF.2", "Prefix-Sum Windows Match Scans",
+        passed=mismatches == 0,
+        expected="0 mismatched firm-months",
+        actual=f"{mismatches} mismatched firm-months"
+    )
+
+    # =========================================================================
+    # STEP 4: Save Rollup
+    # =========================================================================
+    try:
+        output_path = BASE_DIR / "data" / "firm_month_flows.parquet"
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        appended.to_parquet(output_path, index=False)
+        logger.log_file_created("firm_month_flows.parquet", str(output_path))
+    except Exception as e:
+        logger.log_error(f"Failed to save rollup: {str(e)}", exception=e)
+
+    status = logger.end_phase()
+    return status in ["PASSED", "PASSED WITH WARNINGS"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check the firm-month flow rollup locally (DuckDB)')
+    parser.add_argument('--history', default=None,
+                        help='Employment history Parquet export (default: read from BigQuery)')
+    parser.add_argument('--end', default=None, help='Month to append (default: last complete month)')
+    parser.add_argument('--check-months', type=int, default=12,
+                        help='Window ends to check against direct scans (default: 12)')
+    parser.add_argument('--database', default=None, help='DuckDB file (default: in-memory)')
+
+    args = parser.parse_args()
+    success = run_flow_check(args.history, args.end, args.check_months, args.database)
+    sys.exit(0 if success else 1)
+
+
+if __name__ == "__main__":
+    main()
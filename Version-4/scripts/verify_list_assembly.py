@@ -0,0 +1,197 @@
+"""
+Lead List Assembly: Parity Check Against the Hybrid Lead List SQL
+
+This script:
+1. Builds a synthetic scored prospect pool (or loads a Parquet export of
+   scored_prospects with --pool / --recyclable)
+2. Runs sections L-P of January_2026_Lead_List_V3_V4_Hybrid.sql over it in
+   DuckDB, as written in the SQL file
+3. Runs utils.list_assembly on the same pool with LeadListConfig defaults
+4. Gates on identical advisor CRDs, tiers and list ranks
+5. Times alternative quota / cap configurations
+
+Usage:
+    python scripts/verify_list_assembly.py
+    python scripts/verify_list_assembly.py --prospects 500000 --firms 4000
+    python scripts/verify_list_assembly.py --pool data/scored_prospects.parquet --recyclable data/recyclable_lead_ids.parquet
+"""
+
+import sys
+import time
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Add project root to path
+sys.path.insert(0, str(Path(r"C:\Users\russe\Documents\Lead Scoring\Version-4")))
+
+# Import utilities and constants
+from utils.execution_logger import ExecutionLogger
+from utils.list_assembly import ListAssembler
+from config.constants import BASE_DIR, LeadListConfig
+
+LEAD_LIST_SQL = BASE_DIR.parent / "Lead_List_Generation" / "sql" / "January_2026_Lead_List_V3_V4_Hybrid.sql"
+
+TIER_MIX = {
+    'TIER_1A_PRIME_MOVER_CFP': (1, 0.087, 0.002),
+    'TIER_1B_PRIME_MOVER_SERIES65': (2, 0.079, 0.003),
+    'TIER_1_PRIME_MOVER': (3, 0.071, 0.010),
+    'TIER_1F_HV_WEALTH_BLEEDER': (4, 0.065, 0.002),
+    'TIER_2_PROVEN_MOVER': (5, 0.052, 0.040),
+    'TIER_3_MODERATE_BLEEDER': (6, 0.044, 0.010),
+    'TIER_4_EXPERIENCED_MOVER': (7, 0.041, 0.010),
+    'TIER_5_HEAVY_BLEEDER': (8, 0.038, 0.030),
+}
+
+
+def synthetic_pool(n_prospects: int, n_firms: int, seed: int = 42):
+    """Scored pool with skewed firm sizes, percentile ties and recyclable leads."""
+    rng = np.random.default_rng(seed)
+    names = list(TIER_MIX) + ['STANDARD']
+    weights = np.array([share for _, _, share in TIER_MIX.values()])
+    tier = rng.choice(names, n_prospects, p=np.append(weights, 1 - weights.sum()))
+    priority = np.array([TIER_MIX.get(t, (99,))[0] for t in tier])
+    rate = np.array([TIER_MIX.get(t, (0, 0.025))[1] for t in tier])
+
+    prospect_type = np.where(rng.random(n_prospects) < 0.7, 'NEW_PROSPECT', 'IN_SALESFORCE')
+    lead_id = np.where(prospect_type == 'IN_SALESFORCE',
+                       pd.Series(np.arange(n_prospects)).map('00Q{:07d}'.format), None)
+    v4 = rng.integers(1, 101, n_prospects).astype(float)
+    v4[rng.random(n_prospects) < 0.01] = np.nan
+    net = rng.integers(-40, 15, n_prospects).astype(float)
+    net[rng.random(n_prospects) < 0.05] = np.nan
+
+    pool = pd.DataFrame({
+        'crd': rng.permutation(n_prospects) + 1_000_000,
+        'firm_crd': (rng.zipf(1.6, n_prospects) % n_firms) + 1,
+        'prospect_type': prospect_type,
+        'existing_lead_id': lead_id,
+        'first_name': 'Pat',
+        'firm_name': 'Test Firm',
+        'score_tier': tier,
+        'priority_rank': priority,
+        'expected_conversion_rate': rate,
+        'v3_score_narrative': 'synthetic',
+        'v4_score': v4 / 100,
+        'v4_percentile': v4,
+        'shap_top1_feature': 'mobility_tier',
+        'has_linkedin': (rng.random(n_prospects) < 0.85).astype(int),
+        'firm_net_change_12mo': net,
+    })
+    recyclable = pd.DataFrame({'lead_id': pool['existing_lead_id'].dropna().sample(frac=0.5, random_state=seed)})
+    return pool, recyclable
+
+
+def sql_lead_list(pool: pd.DataFrame, recyclable: pd.DataFrame) -> pd.DataFrame:
+    """Sections L-P of the lead list SQL, run in DuckDB over the pool."""
+    import duckdb
+
+    text = LEAD_LIST_SQL.read_text(encoding='utf-8')
+    ranking = text[text.index('ranked_prospects AS ('):text.index('-- P. FINAL OUTPUT')]
+    ranking = ranking[:ranking.rindex('-- =====')]
+    final_filter = text[text.index('FROM linkedin_prioritized'):].rstrip().rstrip(';')
+
+    query = (f"WITH scored_prospects AS (SELECT * FROM pool),\n"
+             f"recyclable_lead_ids AS (SELECT lead_id FROM recyclable),\n{ranking}\n"
+             f"SELECT crd as advisor_crd, final_tier as score_tier, overall_rank as list_rank\n"
+             f"{final_filter}")
+    con = duckdb.connect()
+    con.register('pool', pool)
+    con.register('recyclable', recyclable)
+    return con.execute(query).df()
+
+
+def run_assembly_check(pool_source: str = None, recyclable_source: str = None,
+                       n_prospects: int = 200_000, n_firms: int = 3_000, seed: int = 42) -> bool:
+    """Execute the lead list assembly parity check."""
+
+    logger = ExecutionLogger(BASE_DIR)
+    logger.start_phase("LA", "Lead List Assembly Parity Check")
+
+    # =========================================================================
+    # STEP 1: Load Pool
+    # =========================================================================
+    if pool_source:
+        logger.log_action("Loading scored prospect pool", details=pool_source)
+        pool = pd.read_parquet(pool_source)
+        recyclable = (pd.read_parquet(recyclable_source) if recyclable_source
+                      else pd.DataFrame({'lead_id': pd.Series([], dtype=object)}))
+    else:
+        logger.log_action("Building synthetic pool", details=f"{n_prospects:,} prospects, {n_firms:,} firms")
+        pool, recyclable = synthetic_pool(n_prospects, n_firms, seed)
+    logger.log_metric("Pool Rows", f"{len(pool):,}")
+    logger.log_metric("Recyclable Lead Ids", f"{len(recyclable):,}")
+
+    # =========================================================================
+    # STEP 2: SQL vs Local Assembly
+    # =========================================================================
+    logger.log_action("Running sections L-P of the lead list SQL", details="DuckDB")
+    try:
+        expected = sql_lead_list(pool, recyclable)
+    except Exception as e:
+        logger.log_error(f"SQL assembly failed: {str(e)}", exception=e)
+        logger.end_phase()
+        return False
+
+    start = time.perf_counter()
+    assembler = ListAssembler(pool, recyclable['lead_id'])
+    load_ms = (time.perf_counter() - start) * 1000
+    leads = assembler.assemble()
+    logger.log_metric("Eligible Prospects", f"{len(assembler):,}")
+    logger.log_metric("Pool Load (ms)", f"{load_ms:.0f}")
+
+    actual = leads[['crd', 'score_tier', 'list_rank']].rename(columns={'crd': 'advisor_crd'})
+    same_size = len(actual) == len(expected)
+    mismatches = abs(len(actual) - len(expected))
+    if same_size:
+        for column in ['advisor_crd', 'score_tier', 'list_rank']:
+            mismatches += int((actual[column].to_numpy() != expected[column].to_numpy()).sum())
+
+    logger.log_gate(
+        "GLA.1", "Local Assembly Matches Lead List SQL",
+        passed=mismatches == 0,
+        expected=f"{len(expected):,} identical rows",
+        actual=f"{len(actual):,} rows, {mismatches} mismatches"
+    )
+    for tier, count in leads['score_tier'].value_counts().reindex(LeadListConfig.LIST_ORDER, fill_value=0).items():
+        logger.log_metric(f"Leads - {tier}", f"{count:,}")
+
+    # =========================================================================
+    # STEP 3: What-If Timing
+    # =========================================================================
+    configs = {
+        'current': {},
+        'firm_cap_25': {'firm_cap': 25},
+        'upgrade_800': {'tier_quotas': {**LeadListConfig.TIER_QUOTAS, 'V4_UPGRADE': 800}},
+        'no_tier_5': {'tier_quotas': {t: q for t, q in LeadListConfig.TIER_QUOTAS.items()
+                                      if t != 'TIER_5_HEAVY_BLEEDER'}},
+    }
+    start = time.perf_counter()
+    table = assembler.compare(configs)
+    per_config_ms = (time.perf_counter() - start) * 1000 / len(configs)
+    logger.log_metric("Assembly per Configuration (ms)", f"{per_config_ms:.1f}")
+    for name, row in table.iterrows():
+        logger.log_metric(f"What-If {name}", f"{row['leads']:,} leads, {row['firms']:,} firms, "
+                                             f"expected rate {row['expected_rate']:.4f}")
+
+    status = logger.end_phase()
+    return status in ["PASSED", "PASSED WITH WARNINGS"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check local lead list assembly against the lead list SQL')
+    parser.add_argument('--pool', default=None, help='Parquet export of scored_prospects (default: synthetic)')
+    parser.add_argument('--recyclable', default=None, help='Parquet of recyclable lead_id values')
+    parser.add_argument('--prospects', type=int, default=200_000, help='Synthetic pool size')
+    parser.add_argument('--firms', type=int, default=3_000, help='Synthetic firm count')
+    parser.add_argument('--seed', type=int, default=42, help='Synthetic pool seed')
+
+    args = parser.parse_args()
+    success = run_assembly_check(args.pool, args.recyclable, args.prospects, args.firms, args.seed)
+    sys.exit(0 if success else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+PIT Feature Engine: Parity Check Against the Phase 2 SQL
+
+This script:
+1. Loads the employment history once (BigQuery or a Parquet export)
+2. Samples leads from v4_target_variable
+3. Computes the employment-history features locally and with the SQL
+   subqueries from phase_2_feature_engineering.sql on the same sample
+4. Gates on zero mismatches (rows with start-date ties are reported only)
+
+Usage:
+    python scripts/verify_pit_features.py
+    python scripts/verify_pit_features.py --history data/employment_history.parquet --sample 2000
+"""
+
+import sys
+import argparse
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(r"C:\Users\russe\Documents\Lead Scoring\Version-4")))
+
+# Import utilities and constants
+from utils.execution_logger import ExecutionLogger
+from utils.pit_features import EmploymentHistory, load_employment_history, sql_parity_check
+from config.constants import BASE_DIR, PROJECT_ID, DATASET_ML
+
+
+def run_parity_check(history_source: str = None, sample_size: int = 1000, seed: int = 42) -> bool:
+    """Execute the PIT feature parity check."""
+
+    logger = ExecutionLogger(BASE_DIR)
+    logger.start_phase("PIT", "PIT Feature Engine Parity Check")
+
+    try:
+        from google.cloud import bigquery
+        client = bigquery.Client(project=PROJECT_ID)
+
+        logger.log_action("Loading employment history", details=str(history_source or "BigQuery"))
+        history = EmploymentHistory(load_employment_history(history_source, client=client))
+        logger.log_metric("History Rows", f"{history.n_rows:,}")
+        logger.log_metric("Reps / Firms", f"{len(history.rep_keys):,} / {len(history.firm_keys):,}")
+
+        sample = client.query(f"""
+            SELECT advisor_crd, contacted_date
+            FROM `{PROJECT_ID}.{DATASET_ML}.v4_target_variable`
+            WHERE advisor_crd IS NOT NULL
+            ORDER BY FARM_FINGERPRINT(CONCAT(CAST(advisor_crd AS STRING), CAST(contacted_date AS STRING), '{seed}'))
+            LIMIT {sample_size}
+        """).to_dataframe()
+        logger.log_metric("Sample Leads", f"{len(sample):,}")
+
+    except Exception as e:
+        logger.log_error(f"Failed to load data: {str(e)}", exception=e)
+        logger.end_phase()
+        return False
+
+    logger.log_action("Comparing engine output with SQL")
+    try:
+        report = sql_parity_check(history, sample['advisor_crd'], sample['contacted_date'], client=client)
+    except Exception as e:
+        logger.log_error(f"Parity query failed: {str(e)}", exception=e)
+        logger.end_phase()
+        return False
+
+    for _, row in report.iterrows():
+        logger.log_metric(row['feature'], f"{row['n_mismatch']:,} mismatches / {row['n_compared']:,} compared")
+
+    ties = int(report['n_firm_tie_rows'].max()) if len(report) else 0
+    if ties:
+        logger.log_warning(f"{ties} leads have start-date ties (SQL ROW_NUMBER picks arbitrarily)",
+                           action_taken="Excluded from firm-dependent comparisons")
+
+    logger.log_gate(
+        "GPIT.1", "PIT Feature Parity",
+        passed=int(report['n_mismatch'].sum()) == 0,
+        expected="0 mismatches",
+        actual=f"{int(report['n_mismatch'].sum())} mismatches"
+    )
+
+    status = logger.end_phase()
+    return status in ["PASSED", "PASSED WITH WARNINGS"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check the PIT feature engine against the Phase 2 SQL')
+    parser.add_argument('--history', default=None,
+                        help='Employment history Parquet export (default: read from BigQuery)')
+    parser.add_argument('--sample', type=int, default=1000, help='Leads to compare (default: 1000)')
+    parser.add_argument('--seed', type=int, default=42, help='Sample seed')
+
+    args = parser.parse_args()
+    success = run_parity_check(args.history, args.sample, args.seed)
+    sys.exit(0 if success else 1)
+
+
+if __name__ == "__main__":
+    main()
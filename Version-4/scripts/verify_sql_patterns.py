@@ -0,0 +1,73 @@
+"""
+Pattern Registry: Generated SQL Blocks Match config/constants.py
+
+This script:
+1. Reads every SQL file that holds pattern_registry blocks (wirehouse flag in
+   the V4 feature SQL; firm/title exclusions, CFP/CFA and HV wealth titles in
+   the hybrid lead list)
+2. Regenerates each block from the pattern lists in config/constants.py
+3. Gates on every block being identical (no hand-edited or stale lists)
+4. With --write, rewrites the stale blocks in place instead
+
+Usage:
+    python scripts/verify_sql_patterns.py
+    python scripts/verify_sql_patterns.py --write
+"""
+
+import sys
+import argparse
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(r"C:\Users\russe\Documents\Lead Scoring\Version-4")))
+
+# Import utilities and constants
+from utils.execution_logger import ExecutionLogger
+from utils.pattern_registry import PatternRegistry
+from config.constants import BASE_DIR
+
+PATTERN_SQL_FILES = [
+    BASE_DIR / "sql" / "phase_2_feature_engineering.sql",
+    BASE_DIR / "sql" / "production_scoring.sql",
+    BASE_DIR.parent / "Lead_List_Generation" / "sql" / "v4_prospect_features.sql",
+    BASE_DIR.parent / "Lead_List_Generation" / "sql" / "January_2026_Lead_List_V3_V4_Hybrid.sql",
+]
+
+
+def run_pattern_check(write: bool = False) -> bool:
+    """Execute the generated SQL block check (or rewrite the blocks)."""
+
+    logger = ExecutionLogger(BASE_DIR)
+    logger.start_phase("SP", "SQL Pattern Block Check")
+    registry = PatternRegistry()
+
+    for i, path in enumerate(PATTERN_SQL_FILES, 1):
+        text = path.read_text(encoding='utf-8')
+        drift = registry.sql_drift(text)
+        if drift and write:
+            path.write_text(registry.render_sql(text), encoding='utf-8')
+            logger.log_action(f"Regenerated {path.name}", details=", ".join(drift))
+            drift = registry.sql_drift(path.read_text(encoding='utf-8'))
+
+        logger.log_gate(
+            f"GSP.{i}", f"{path.name} Pattern Blocks Match Registry",
+            passed=not drift,
+            expected="All blocks generated from config/constants.py",
+            actual=f"Stale: {', '.join(drift)} (run with --write)" if drift else "All current"
+        )
+
+    status = logger.end_phase()
+    return status in ["PASSED", "PASSED WITH WARNINGS"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check (or regenerate) the pattern_registry blocks in the SQL files')
+    parser.add_argument('--write', action='store_true', help='Rewrite stale blocks from config/constants.py')
+
+    args = parser.parse_args()
+    success = run_pattern_check(args.write)
+    sys.exit(0 if success else 1)
+
+
+if __name__ == "__main__":
+    main()
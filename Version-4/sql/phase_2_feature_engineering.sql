@@ -167,6 +167,12 @@ mobility AS (
 -- FEATURE GROUP 3: FIRM STABILITY (from Firm_historicals)
 -- ============================================================================
 -- PIT-safe: Uses historical snapshots with YEAR/MONTH <= contact YEAR/MONTH
+-- v4.0.0 definitions (trailing 12 months of days before the date), which the
+-- deployed model was trained on. phase_2_feature_engineering.sql,
+-- production_scoring.sql and v4_prospect_features.sql must stay on the same
+-- definitions: the month-grain firm_month_flows reads
+-- (utils/firm_flows.FirmMonthFlows.as_of_features) replace them in all three
+-- together, with a retrained model version.
 -- ============================================================================
 firm_stability AS (
     SELECT 
@@ -225,33 +231,40 @@ firm_stability AS (
 -- FEATURE GROUP 4: WIREHOUSE & BROKER PROTOCOL
 -- ============================================================================
 -- PIT-safe: Wirehouse detection uses firm name at contact, Protocol is static
+-- Wirehouse patterns: generated from WIREHOUSE_PATTERNS in config/constants.py
+-- (scripts/verify_sql_patterns.py --write; utils/pattern_registry.py 'is_wirehouse')
 -- ============================================================================
 wirehouse AS (
     SELECT 
         cf.lead_id,
-        CASE 
-            WHEN UPPER(cf.firm_name) LIKE '%MERRILL%' THEN 1
-            WHEN UPPER(cf.firm_name) LIKE '%MORGAN STANLEY%' THEN 1
-            WHEN UPPER(cf.firm_name) LIKE '%UBS%' THEN 1
-            WHEN UPPER(cf.firm_name) LIKE '%WELLS FARGO%' THEN 1
-            WHEN UPPER(cf.firm_name) LIKE '%EDWARD JONES%' THEN 1
-            WHEN UPPER(cf.firm_name) LIKE '%RAYMOND JAMES%' THEN 1
-            WHEN UPPER(cf.firm_name) LIKE '%AMERIPRISE%' THEN 1
-            WHEN UPPER(cf.firm_name) LIKE '%LPL%' THEN 1
-            WHEN UPPER(cf.firm_name) LIKE '%NORTHWESTERN MUTUAL%' THEN 1
-            WHEN UPPER(cf.firm_name) LIKE '%STIFEL%' THEN 1
-            ELSE 0
-        END as is_wirehouse
+        CASE WHEN (
+            -- BEGIN pattern_registry: is_wirehouse firm_name=cf.firm_name
+            UPPER(cf.firm_name) LIKE '%MERRILL%'
+            OR UPPER(cf.firm_name) LIKE '%MORGAN STANLEY%'
+            OR UPPER(cf.firm_name) LIKE '%UBS%'
+            OR UPPER(cf.firm_name) LIKE '%WELLS FARGO%'
+            OR UPPER(cf.firm_name) LIKE '%EDWARD JONES%'
+            OR UPPER(cf.firm_name) LIKE '%RAYMOND JAMES%'
+            OR UPPER(cf.firm_name) LIKE '%AMERIPRISE%'
+            OR UPPER(cf.firm_name) LIKE '%LPL%'
+            OR UPPER(cf.firm_name) LIKE '%NORTHWESTERN MUTUAL%'
+            OR UPPER(cf.firm_name) LIKE '%STIFEL%'
+            -- END pattern_registry
+        ) THEN 1 ELSE 0 END as is_wirehouse
     FROM current_firm cf
 ),
 
+-- PIT-safe: membership intervals (Broker_protocol/membership_index.py) valid
+-- at contacted_date; intervals are disjoint per firm, so at most one matches
 broker_protocol AS (
     SELECT DISTINCT
         cf.lead_id,
         CASE WHEN bp.firm_crd_id IS NOT NULL THEN 1 ELSE 0 END as is_broker_protocol
     FROM current_firm cf
-    LEFT JOIN `savvy-gtm-analytics.SavvyGTMData.broker_protocol_members` bp
+    LEFT JOIN `savvy-gtm-analytics.SavvyGTMData.broker_protocol_membership_intervals` bp
         ON cf.firm_crd = bp.firm_crd_id
+        AND (bp.valid_from IS NULL OR bp.valid_from <= cf.contacted_date)
+        AND (bp.valid_to IS NULL OR cf.contacted_date < bp.valid_to)
 ),
 
 -- ============================================================================
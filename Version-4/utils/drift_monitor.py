@@ -0,0 +1,313 @@
+"""
+Feature Drift Monitor for V4 Prospect Scoring
+
+Compares the monthly v4_prospect_features distribution (and the V4 score)
+with the training distribution the model was fit on:
+1. Phase 6 fits a fixed-bin histogram per feature on the training split, and
+   one for the score on the test split, and saves them as drift_profile.json
+   next to model.json
+2. Scoring feeds each batch of prospects through DriftMonitor.update(); every
+   feature costs one binary search over <= N_BINS edges and a bincount, so
+   the sketch is built in the same pass as scoring and chunks can be streamed
+3. report() gives PSI and KS per feature, flags features missing from the
+   prospect data (scored as 0) and categories never seen in training (scored
+   as code 0), and marks ALERT rows that should block the run
+
+Bins:
+- Continuous features and the score: training quantiles (DriftGates.N_BINS)
+- Numeric features with <= MAX_DISCRETE_VALUES values: one bin per value
+- Categorical features: one bin per training category, plus an unseen bin
+Missing values always get their own bin, since scoring fills them with 0.
+
+KS is computed on the binned CDFs, so it is a lower bound of the exact
+two-sample statistic (exact for discrete features).
+
+Usage:
+    from utils.drift_monitor import DriftProfile, DriftMonitor, DRIFT_PROFILE_FILENAME
+
+    profile = DriftProfile.fit(train_df, final_features, scores=y_test_pred)
+    profile.save(model_dir / DRIFT_PROFILE_FILENAME)
+
+    monitor = DriftMonitor(DriftProfile.load(model_dir / DRIFT_PROFILE_FILENAME))
+    monitor.update(prospects, scores)
+    report = monitor.report()
+    if monitor.blocked(report): ...
+"""
+
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+import numpy as np
+import pandas as pd
+
+from config.constants import DriftGates
+
+DRIFT_PROFILE_FILENAME = "drift_profile.json"
+SCORE_FEATURE = "v4_score"
+PSI_EPSILON = 1e-4  # Floor for empty bins in PSI
+
+
+def _is_categorical(values: pd.Series) -> bool:
+    """Object, category and string columns are binned by label, everything else numerically."""
+    return (values.dtype == 'object' or values.dtype.name == 'category'
+            or pd.api.types.is_string_dtype(values))
+
+
+def _numeric_edges(values: np.ndarray, n_bins: int, max_discrete: int) -> np.ndarray:
+    """Interior bin edges: midpoints between values if few, else quantile cuts."""
+    values = values[~np.isnan(values)]
+    if len(values) == 0:
+        return np.zeros(0)
+    unique = np.unique(values)
+    if len(unique) <= max_discrete:
+        return (unique[:-1] + unique[1:]) / 2
+    return np.unique(np.quantile(values, np.linspace(0, 1, n_bins + 1)[1:-1]))
+
+
+class FeatureHistogram:
+    """
+    Fixed-bin histogram of one feature.
+
+    Bins are [missing, value bins..., unseen]; the unseen bin only fills for
+    categorical features. Counts accumulate over update() calls.
+    """
+
+    def __init__(self, name: str, kind: str, edges: Optional[List[float]] = None,
+                 categories: Optional[List[str]] = None, counts: Optional[List[int]] = None):
+        if kind not in ('numeric', 'categorical'):
+            raise ValueError(f"Unknown histogram kind for {name}: {kind}")
+        self.name = name
+        self.kind = kind
+        self.edges = np.asarray(edges if edges is not None else [], dtype=np.float64)
+        self.categories = list(categories) if categories is not None else []
+        n_values = len(self.categories) if kind == 'categorical' else len(self.edges) + 1
+        self.counts = (np.zeros(n_values + 2, dtype=np.int64) if counts is None
+                       else np.asarray(counts, dtype=np.int64))
+        if len(self.counts) != n_values + 2:
+            raise ValueError(f"{name}: {len(self.counts)} counts for {n_values} bins")
+
+    @classmethod
+    def fit(cls, name: str, values: pd.Series, n_bins: int = DriftGates.N_BINS,
+            max_discrete: int = DriftGates.MAX_DISCRETE_VALUES) -> 'FeatureHistogram':
+        """Choose bins from the training values and count them."""
+        values = pd.Series(values)
+        if _is_categorical(values):
+            categories = sorted(values.dropna().astype(str).unique())
+            histogram = cls(name, 'categorical', categories=categories)
+        else:
+            numeric = pd.to_numeric(values, errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+            histogram = cls(name, 'numeric', edges=_numeric_edges(numeric, n_bins, max_discrete))
+        return histogram.update(values)
+
+    def empty(self) -> 'FeatureHistogram':
+        """Same bins, no counts."""
+        return FeatureHistogram(self.name, self.kind, self.edges, self.categories)
+
+    def update(self, values) -> 'FeatureHistogram':
+        """Add a batch of values to the counts."""
+        values = pd.Series(values)
+        missing = values.isna().to_numpy()
+        if self.kind == 'categorical':
+            codes = pd.Categorical(values.astype(str).where(~missing), categories=self.categories).codes
+            bins = np.where(missing, 0, np.where(codes < 0, len(self.counts) - 1, codes + 1))
+        else:
+            numeric = pd.to_numeric(values, errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+            missing = np.isnan(numeric)
+            bins = np.where(missing, 0, np.searchsorted(self.edges, numeric, side='right') + 1)
+        self.counts += np.bincount(bins, minlength=len(self.counts))
+        return self
+
+    @property
+    def total(self) -> int:
+        return int(self.counts.sum())
+
+    @property
+    def missing(self) -> int:
+        return int(self.counts[0])
+
+    @property
+    def unseen(self) -> int:
+        return int(self.counts[-1])
+
+    def proportions(self) -> np.ndarray:
+        total = self.total
+        return self.counts / total if total else np.zeros(len(self.counts))
+
+    def to_dict(self) -> Dict:
+        return {'name': self.name, 'kind': self.kind, 'edges': self.edges.tolist(),
+                'categories': self.categories, 'counts': self.counts.tolist()}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'FeatureHistogram':
+        return cls(data['name'], data['kind'], data['edges'], data['categories'], data['counts'])
+
+
+def psi(expected: FeatureHistogram, actual: FeatureHistogram) -> float:
+    """Population Stability Index over all bins (missing and unseen included)."""
+    p = np.maximum(expected.proportions(), PSI_EPSILON)
+    q = np.maximum(actual.proportions(), PSI_EPSILON)
+    return float(np.sum((q - p) * np.log(q / p)))
+
+
+def binned_ks(expected: FeatureHistogram, actual: FeatureHistogram) -> float:
+    """Max CDF difference over the value bins (non-missing rows); NaN for categoricals."""
+    if expected.kind != 'numeric':
+        return np.nan
+    p, q = expected.counts[1:-1], actual.counts[1:-1]
+    if p.sum() == 0 or q.sum() == 0:
+        return np.nan
+    return float(np.max(np.abs(np.cumsum(p) / p.sum() - np.cumsum(q) / q.sum())))
+
+
+class DriftProfile:
+    """Histograms for every model feature and the score."""
+
+    def __init__(self, histograms: Dict[str, FeatureHistogram], metadata: Optional[Dict] = None):
+        self.histograms = histograms
+        self.metadata = metadata or {}
+
+    @classmethod
+    def fit(cls, df: pd.DataFrame, features: List[str], scores=None,
+            n_bins: int = DriftGates.N_BINS, **metadata) -> 'DriftProfile':
+        """
+        Build the reference profile from raw (un-encoded) training features.
+
+        Args:
+            df: Training rows with the feature columns
+            features: final_features list
+            scores: Model scores on held-out rows (adds a SCORE_FEATURE histogram);
+                training-split scores are overfit and would read as score drift
+            **metadata: Stored with the profile (e.g. model_version)
+        """
+        missing = [f for f in features if f not in df.columns]
+        if missing:
+            raise ValueError(f"Training data is missing features: {missing}")
+        histograms = {f: FeatureHistogram.fit(f, df[f], n_bins) for f in features}
+        if scores is not None:
+            # Scores are continuous: always quantile bins
+            histograms[SCORE_FEATURE] = FeatureHistogram.fit(SCORE_FEATURE, np.asarray(scores, dtype=np.float64),
+                                                             n_bins, max_discrete=0)
+        metadata = {'rows': len(df), 'created': datetime.now().isoformat(), **metadata}
+        if scores is not None:
+            metadata['score_rows'] = len(scores)
+        return cls(histograms, metadata)
+
+    @property
+    def features(self) -> List[str]:
+        return [f for f in self.histograms if f != SCORE_FEATURE]
+
+    def empty(self) -> 'DriftProfile':
+        """Same bins for every feature, no counts."""
+        return DriftProfile({f: h.empty() for f, h in self.histograms.items()})
+
+    def save(self, path: Union[str, Path]) -> Path:
+        path = Path(path)
+        payload = {'metadata': self.metadata,
+                   'histograms': [h.to_dict() for h in self.histograms.values()]}
+        with open(path, 'w') as f:
+            json.dump(payload, f, indent=2)
+        return path
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> 'DriftProfile':
+        with open(path, 'r') as f:
+            payload = json.load(f)
+        histograms = [FeatureHistogram.from_dict(h) for h in payload['histograms']]
+        return cls({h.name: h for h in histograms}, payload.get('metadata', {}))
+
+
+class DriftMonitor:
+    """Streams prospect batches into histograms and compares them with a reference profile."""
+
+    def __init__(self, reference: DriftProfile, psi_warn: float = DriftGates.PSI_WARN,
+                 psi_alert: float = DriftGates.PSI_ALERT, ks_alert: float = DriftGates.KS_ALERT,
+                 max_unseen_pct: float = DriftGates.MAX_UNSEEN_CATEGORY_PCT):
+        self.reference = reference
+        self.current = reference.empty()
+        self.absent = set()
+        self.psi_warn = psi_warn
+        self.psi_alert = psi_alert
+        self.ks_alert = ks_alert
+        self.max_unseen_pct = max_unseen_pct
+
+    def update(self, df: pd.DataFrame, scores=None) -> 'DriftMonitor':
+        """
+        Add one batch of raw prospect features (and their scores).
+
+        Features absent from df are recorded rather than counted: scoring fills
+        them with 0, so they are reported as ABSENT.
+        """
+        for feature in self.reference.features:
+            if feature in df.columns:
+                self.current.histograms[feature].update(df[feature])
+            else:
+                self.absent.add(feature)
+        if scores is not None and SCORE_FEATURE in self.current.histograms:
+            self.current.histograms[SCORE_FEATURE].update(np.asarray(scores, dtype=np.float64))
+        return self
+
+    def report(self) -> pd.DataFrame:
+        """
+        One row per feature (and the score), worst first.
+
+        Columns: feature, kind, psi, ks, missing_pct_train, missing_pct, unseen_pct,
+        status (ABSENT, ALERT, WARN or OK)
+        """
+        records = []
+        for feature, expected in self.reference.histograms.items():
+            actual = self.current.histograms[feature]
+            record = {
+                'feature': feature,
+                'kind': expected.kind,
+                'psi': np.nan, 'ks': np.nan,
+                'missing_pct_train': expected.missing / expected.total * 100 if expected.total else np.nan,
+                'missing_pct': np.nan, 'unseen_pct': np.nan,
+            }
+            if feature in self.absent:
+                record['status'] = 'ABSENT'
+            elif actual.total == 0:
+                record['status'] = 'OK' if feature == SCORE_FEATURE else 'ABSENT'
+            else:
+                record.update(psi=psi(expected, actual), ks=binned_ks(expected, actual),
+                              missing_pct=actual.missing / actual.total * 100,
+                              unseen_pct=actual.unseen / actual.total * 100)
+                if (record['psi'] >= self.psi_alert or record['ks'] >= self.ks_alert
+                        or record['unseen_pct'] > self.max_unseen_pct):
+                    record['status'] = 'ALERT'
+                elif record['psi'] >= self.psi_warn:
+                    record['status'] = 'WARN'
+                else:
+                    record['status'] = 'OK'
+            records.append(record)
+        report = pd.DataFrame(records)
+        severity = report['status'].map({'ABSENT': 0, 'ALERT': 1, 'WARN': 2, 'OK': 3})
+        return (report.assign(_severity=severity)
+                .sort_values(['_severity', 'psi'], ascending=[True, False])
+                .drop(columns='_severity').reset_index(drop=True))
+
+    @staticmethod
+    def blocked(report: pd.DataFrame) -> bool:
+        """True if any feature is ABSENT or in ALERT."""
+        return bool(report['status'].isin(['ABSENT', 'ALERT']).any())
+
+    @property
+    def rows(self) -> int:
+        """Prospect rows seen so far."""
+        totals = [h.total for f, h in self.current.histograms.items() if f != SCORE_FEATURE and h.total]
+        return max(totals) if totals else 0
+
+
+def format_drift_report(report: pd.DataFrame, title: str = "Feature Drift Report") -> str:
+    """Markdown table of a DriftMonitor report."""
+    def fmt(value, spec):
+        return '-' if pd.isna(value) else format(value, spec)
+
+    lines = [f"## {title}", "",
+             "| Feature | Kind | PSI | KS | Missing % (train) | Missing % | Unseen % | Status |",
+             "|---------|------|-----|----|-------------------|-----------|----------|--------|"]
+    for r in report.itertuples(index=False):
+        lines.append(f"| {r.feature} | {r.kind} | {fmt(r.psi, '.4f')} | {fmt(r.ks, '.3f')} | "
+                     f"{fmt(r.missing_pct_train, '.1f')} | {fmt(r.missing_pct, '.1f')} | "
+                     f"{fmt(r.unseen_pct, '.2f')} | {r.status} |")
+    return "\n".join(lines) + "\n"
@@ -6,14 +6,36 @@ Logs to:
 1. EXECUTION_LOG.md (human-readable markdown)
 2. Console (real-time feedback)
 3. JSON files (machine-readable metrics)
+4. logs/traces/ (Chrome trace JSON + span metrics per phase, see utils/tracing.py)
+
+Markdown entries are buffered during a phase and written at end_phase (or
+on log_error / interpreter exit), so logging adds no file I/O to hot loops.
+
+Usage:
+    logger = ExecutionLogger(BASE_DIR)
+    logger.start_phase("6", "XGBoost Model Training")
+
+    with logger.span("Train model", rows=len(X_train)):
+        model = xgb.train(...)
+
+    @logger.trace()
+    def prepare_features(df, plan): ...
+
+    with logger.span("SHAP values", profile=True):   # folded-stack profile of this span
+        ...
+
+    logger.end_phase()
 """
 
+import atexit
 from pathlib import Path
 from datetime import datetime
 from typing import Any, Dict, List, Optional
 import json
 import pandas as pd
 
+from utils.tracing import Tracer
+
 
 class ExecutionLogger:
     """
@@ -25,23 +47,33 @@ class ExecutionLogger:
     3. JSON files (machine-readable metrics)
     """
     
-    def __init__(self, base_dir: Path = None):
+    def __init__(self, base_dir: Path = None, trace: bool = True):
         if base_dir is None:
             base_dir = Path(r"C:\Users\russe\Documents\Lead Scoring\Version-4")
         
         self.base_dir = base_dir
         self.log_file = base_dir / "EXECUTION_LOG.md"
         self.metrics_dir = base_dir / "data" / "exploration"
+        self.trace_dir = base_dir / "logs" / "traces"
+        self.trace_enabled = trace
         self.current_phase = None
+        self.phase_name = None
         self.phase_start_time = None
         self.gate_results = []
         self.decisions = []
         self.warnings = []
         self.errors = []
+        self.metrics = {}
+        self.tracer = Tracer()
+        self._phase_span = None
+        self._buffer = []
         
         # Initialize log file if not exists
         if not self.log_file.exists():
             self._initialize_log_file()
+        
+        # Buffered entries of a phase that never reaches end_phase
+        atexit.register(self.flush)
     
     def _initialize_log_file(self):
         """Initialize the execution log file."""
@@ -60,17 +92,47 @@ class ExecutionLogger:
             f.write(header)
     
     def _append_to_log(self, content: str):
-        """Append content to log file."""
+        """Buffer content during a phase; write immediately otherwise."""
+        self._buffer.append(content)
+        if self.current_phase is None:
+            self.flush()
+    
+    def flush(self):
+        """Write buffered log entries to the log file."""
+        if not self._buffer:
+            return
+        content = ''.join(self._buffer)
+        self._buffer = []
         with open(self.log_file, 'a', encoding='utf-8') as f:
             f.write(content)
     
+    def span(self, name: str, rows: int = None, profile: bool = False, **attrs):
+        """
+        Context manager timing a block as a span of the current phase.
+        
+        Args:
+            name: Span name
+            rows: Row count processed (or set span.rows inside the block)
+            profile: Attach the sampling profiler to this span
+            **attrs: Extra attributes for the trace
+        """
+        return self.tracer.span(name, rows=rows, profile=profile, **attrs)
+    
+    def trace(self, name: str = None, profile: bool = False):
+        """Decorator timing each call of a function as a span."""
+        return self.tracer.trace(name, profile=profile)
+    
     def start_phase(self, phase_id: str, phase_name: str):
         """Start a new phase and log it."""
         self.current_phase = phase_id
+        self.phase_name = phase_name
         self.phase_start_time = datetime.now()
         self.gate_results = []
         self.decisions = []
         self.warnings = []
+        self.metrics = {}
+        self.tracer.reset()
+        self._phase_span = self.tracer.start_span(f"Phase {phase_id}: {phase_name}")
         
         log_entry = f"""
 ---
@@ -97,6 +159,7 @@ class ExecutionLogger:
             log_entry += f"  - Details: {details}\n"
         
         self._append_to_log(log_entry)
+        self.tracer.instant(action)
         print(f"  -> {action}")
         if details:
             print(f"    {details}")
@@ -138,6 +201,7 @@ class ExecutionLogger:
         if context:
             log_entry += f"  - Context: {context}\n"
         
+        self.metrics[metric_name] = value
         self._append_to_log(log_entry)
         print(f"  [METRIC] {metric_name}: {value}")
     
@@ -194,6 +258,7 @@ class ExecutionLogger:
         log_entry += "\n"
         
         self._append_to_log(log_entry)
+        self.flush()
         print(f"  [ERROR] {error}")
         if exception:
             print(f"     Exception: {str(exception)}")
@@ -262,7 +327,9 @@ class ExecutionLogger:
             for step in next_steps:
                 log_entry += f"- [ ] {step}\n"
         
+        log_entry += self._write_trace(status, duration.total_seconds())
         self._append_to_log(log_entry)
+        self.flush()
         
         print(f"\n{'-'*70}")
         print(f"Phase {self.current_phase} Complete: {status_emoji} {status}")
@@ -272,10 +339,42 @@ class ExecutionLogger:
         
         # Reset for next phase
         self.current_phase = None
+        self.phase_name = None
         self.phase_start_time = None
         
         return status
     
+    def _write_trace(self, status: str, duration_s: float) -> str:
+        """Close the phase span, write trace/metrics files and return the markdown section."""
+        self.tracer.end_span(self._phase_span)
+        section = "\n### Trace\n\n" + self.tracer.markdown_table()
+        if not self.trace_enabled:
+            return section
+        
+        stem = f"phase_{self.current_phase}_{self.phase_start_time.strftime('%Y%m%d_%H%M%S')}"
+        try:
+            paths = self.tracer.write(self.trace_dir, stem, extra={
+                'phase_id': self.current_phase,
+                'phase_name': self.phase_name,
+                'started': self.phase_start_time.isoformat(),
+                'status': status,
+                'duration_s': round(duration_s, 3),
+                'gates': self.gate_results,
+                'metrics': {k: v if isinstance(v, (int, float, bool)) else str(v)
+                            for k, v in self.metrics.items()},
+                'warnings': self.warnings,
+                'errors': self.errors,
+            })
+        except OSError as e:
+            print(f"  [WARNING] Trace files not written: {e}")
+            return section
+        
+        section += f"\n- **Chrome Trace**: `{paths.pop('trace')}`\n"
+        section += f"- **Span Metrics**: `{paths.pop('metrics')}`\n"
+        for label, path in paths.items():
+            section += f"- **Profile ({label.split(':', 1)[1]})**: `{path}`\n"
+        return section
+    
     def save_phase_metrics(self, metrics: Dict[str, Any], filename: str):
         """Save phase metrics to JSON file."""
         self.metrics_dir.mkdir(parents=True, exist_ok=True)
@@ -309,6 +408,7 @@ class ExecutionLogger:
             log_entry += f"**Model Version**: {model_version}\n"
         
         self._append_to_log(log_entry)
+        self.flush()
         print(f"\n{'='*70}")
         print(f"EXECUTION COMPLETE: {final_status}")
         print(f"{'='*70}\n")
@@ -0,0 +1,153 @@
+"""
+Compact Dtype Plan for Version 4 Feature Frames
+
+One storage dtype per model feature, from final_features.json and
+FEATURE_CONTRACT (config/constants.py):
+- flag:        uint8 (float32 when the column has NULLs)
+- category:    pandas categorical over the contract categories (int8 codes)
+- continuous:  float32 (rep counts and net changes are exact up to 2**24)
+
+The plan is applied once, column by column, where a frame is fetched
+(BigQuery prospect features, split Parquet). encode() then writes the
+float32 model matrix straight from those columns, so no int64/float64/object
+copy of the frame is materialized between fetch and predict.
+
+Category codes are the contract positions, which are the lexical codes
+astype('category') produced in training. Labels outside the contract are
+kept as extra categories (so the drift monitor still sees them) and encode
+as 0; missing categories encode as -1, as in the training matrices.
+
+Usage:
+    from utils.feature_dtypes import FeatureDtypePlan
+
+    plan = FeatureDtypePlan.from_features_file(FEATURES_FILE)
+    df = plan.apply(df)     # in place, compact dtypes
+    X = plan.encode(df)     # float32 (n_rows, n_features)
+"""
+
+import json
+from pathlib import Path
+from typing import Dict, List
+import numpy as np
+import pandas as pd
+
+from config.constants import FEATURE_CONTRACT
+
+FEATURE_KINDS = ('flag', 'category', 'continuous')
+UNSEEN_CATEGORY_CODE = 0
+
+
+class FeatureDtypePlan:
+    """
+    Storage dtypes and matrix encoding for the V4 model features.
+
+    Usage:
+        plan = FeatureDtypePlan(final_features)
+        plan.apply(df)
+        X = plan.encode_frame(df)  # DataFrame view over the float32 matrix
+    """
+
+    def __init__(self, features: List[str], contract: Dict[str, dict] = None):
+        contract = FEATURE_CONTRACT if contract is None else contract
+        missing = [f for f in features if f not in contract]
+        if missing:
+            raise ValueError(f"Features missing from FEATURE_CONTRACT: {missing}")
+        bad = [f for f in features if contract[f]['kind'] not in FEATURE_KINDS]
+        if bad:
+            raise ValueError(f"Unknown feature kind for: {bad}")
+
+        self.features = list(features)
+        self.kinds = {f: contract[f]['kind'] for f in self.features}
+        self.categories = {
+            f: list(contract[f]['categories'])
+            for f in self.features if self.kinds[f] == 'category'
+        }
+
+    @classmethod
+    def from_features_file(cls, path: Path, contract: Dict[str, dict] = None) -> 'FeatureDtypePlan':
+        """Build the plan for the final_features list in final_features.json."""
+        with open(path, 'r') as f:
+            features = json.load(f)['final_features']
+        return cls(features, contract)
+
+    @property
+    def categorical(self) -> List[str]:
+        """Categorical features, in model order."""
+        return [f for f in self.features if self.kinds[f] == 'category']
+
+    def _is_planned_category(self, feature: str, values: pd.Series) -> bool:
+        if not isinstance(values.dtype, pd.CategoricalDtype):
+            return False
+        cats = self.categories[feature]
+        return list(values.cat.categories[:len(cats)]) == cats
+
+    def convert(self, feature: str, values: pd.Series) -> pd.Series:
+        """Return values in the planned dtype for feature."""
+        kind = self.kinds[feature]
+
+        if kind == 'category':
+            if self._is_planned_category(feature, values):
+                return values
+            cats = self.categories[feature]
+            observed = pd.unique(values.dropna().astype(str))
+            extras = sorted(set(observed) - set(cats))
+            labels = values.astype(str).where(values.notna())
+            return pd.Series(
+                pd.Categorical(labels, categories=cats + extras),
+                index=values.index, name=values.name
+            )
+
+        numeric = pd.to_numeric(values, errors='coerce')
+        if kind == 'continuous' or numeric.isna().any():
+            return pd.Series(
+                numeric.to_numpy(dtype=np.float32, na_value=np.nan),
+                index=values.index, name=values.name
+            )
+        if len(numeric) and (numeric.min() < 0 or numeric.max() > 1):
+            raise ValueError(f"{feature}: flag values outside 0/1")
+        return numeric.astype(np.uint8)
+
+    def apply(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Convert the planned features of df in place (absent features are skipped).
+
+        Returns:
+            df, for chaining
+        """
+        for feature in self.features:
+            if feature in df.columns:
+                df[feature] = self.convert(feature, df[feature])
+        return df
+
+    def encode(self, df: pd.DataFrame) -> np.ndarray:
+        """
+        Encode the features into one float32 matrix without copying the frame.
+
+        Absent features and NaN are 0, category labels outside the contract
+        are UNSEEN_CATEGORY_CODE.
+        """
+        X = np.zeros((len(df), len(self.features)), dtype=np.float32)
+        for j, feature in enumerate(self.features):
+            if feature not in df.columns:
+                continue
+            col = df[feature]
+            if self.kinds[feature] == 'category':
+                codes = self.convert(feature, col).cat.codes.to_numpy()
+                codes = np.where(codes >= len(self.categories[feature]), UNSEEN_CATEGORY_CODE, codes)
+                X[:, j] = codes
+            else:
+                values = pd.to_numeric(col, errors='coerce').to_numpy(dtype=np.float32, na_value=np.nan)
+                X[:, j] = np.where(np.isnan(values), 0, values)
+        return X
+
+    def encode_frame(self, df: pd.DataFrame) -> pd.DataFrame:
+        """encode() wrapped as a DataFrame (no copy) with the feature names as columns."""
+        return pd.DataFrame(self.encode(df), columns=self.features, index=df.index, copy=False)
+
+
+def bytes_per_row(df: pd.DataFrame, columns: List[str] = None) -> float:
+    """Deep memory footprint of df (or a column subset) per row."""
+    if len(df) == 0:
+        return 0.0
+    frame = df if columns is None else df[[c for c in columns if c in df.columns]]
+    return float(frame.memory_usage(deep=True, index=False).sum()) / len(df)
@@ -0,0 +1,353 @@
+"""
+Firm-Month Flow Rollup for Version 4 Lead Scoring Model
+
+Local (DuckDB) implementation of ml_features.firm_month_flows, the rollup
+the hybrid lead list and firm_stability_engineering read (the V4 model
+features move to it with the next retrain, see as_of_features()).
+One row per firm and month, from the firm's first month on, holds that
+month's arrivals and departures and their running totals, so any trailing
+window is the difference of two rows:
+
+    flows over months (m - n, m] = cum_*[m] - cum_*[m - n]
+    headcount at the end of m    = cum_arrivals[m] - cum_departures[m]
+
+Overlapping stints of one rep at one firm are first merged into a single
+spell, and flows count spells, so headcount is the number of distinct reps
+employed at the end of the month.
+
+backfill() builds every month from the employment history. append_month()
+adds only the newest month: its running totals are the history's current
+totals, and its flows are the difference from the previous row, so
+late-reported stints are booked into the month they were observed and
+earlier rows never change. This mirrors
+firm_stability_engineering/02_backfill_firm_scores.sql and
+04_monthly_refresh.sql, so the warehouse jobs can be checked locally.
+
+Usage:
+    from utils.firm_flows import FirmMonthFlows
+    from utils.pit_features import load_employment_history
+
+    history = load_employment_history(BASE_DIR / "data" / "employment_history.parquet")
+    flows = FirmMonthFlows(BASE_DIR / "data" / "firm_month_flows.duckdb")
+    flows.backfill(history, end='2025-10-01')
+    flows.append_month(history)                  # 2025-11
+    features = flows.as_of_features(leads['firm_crd'], leads['contacted_date'])
+"""
+
+from datetime import date
+from pathlib import Path
+from typing import Union
+import duckdb
+import numpy as np
+import pandas as pd
+
+from config.constants import FIRM_STABILITY_LOOKBACK_MONTHS
+
+# First row of every firm; it also carries all earlier events so running
+# totals (and headcount) are complete. Windows must start on or after it.
+ROLLUP_START = date(2020, 1, 1)
+
+FLOW_COLUMNS = ['firm_crd', 'flow_month', 'arrivals', 'departures',
+                'cum_arrivals', 'cum_departures', 'headcount']
+
+_CREATE_SQL = """
+CREATE TABLE IF NOT EXISTS firm_month_flows (
+    firm_crd BIGINT NOT NULL,
+    flow_month DATE NOT NULL,
+    arrivals BIGINT,
+    departures BIGINT,
+    cum_arrivals BIGINT,
+    cum_departures BIGINT,
+    headcount BIGINT,
+    PRIMARY KEY (firm_crd, flow_month)
+)
+"""
+
+# Arrivals/departures per firm and calendar month. Overlapping (or touching)
+# stints of a rep at a firm are merged into one spell first (gaps and
+# islands; NULL end = still employed), so each rep has at most one open spell.
+_EVENTS_SQL = """
+CREATE OR REPLACE TEMP VIEW firm_events AS
+WITH stints AS (
+    SELECT DISTINCT
+        TRY_CAST(firm_crd AS BIGINT) AS firm_crd,
+        rep_crd,
+        CAST(start_date AS DATE) AS start_date,
+        CAST(end_date AS DATE) AS end_date
+    FROM history
+    WHERE TRY_CAST(firm_crd AS BIGINT) IS NOT NULL
+      AND start_date IS NOT NULL
+),
+ordered AS (
+    SELECT *,
+           MAX(COALESCE(end_date, DATE '9999-12-31')) OVER (
+               PARTITION BY firm_crd, rep_crd ORDER BY start_date, end_date
+               ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+           ) AS prev_end
+    FROM stints
+),
+islands AS (
+    SELECT *,
+           SUM(CASE WHEN prev_end IS NULL OR start_date > prev_end THEN 1 ELSE 0 END) OVER (
+               PARTITION BY firm_crd, rep_crd ORDER BY start_date, end_date
+               ROWS UNBOUNDED PRECEDING
+           ) AS spell
+    FROM ordered
+),
+spells AS (
+    SELECT firm_crd, rep_crd, MIN(start_date) AS start_date,
+           NULLIF(MAX(COALESCE(end_date, DATE '9999-12-31')), DATE '9999-12-31') AS end_date
+    FROM islands
+    GROUP BY firm_crd, rep_crd, spell
+),
+events AS (
+    SELECT firm_crd, CAST(date_trunc('month', start_date) AS DATE) AS event_month,
+           COUNT(*) AS arrivals, 0 AS departures
+    FROM spells
+    GROUP BY 1, 2
+    UNION ALL
+    SELECT firm_crd, CAST(date_trunc('month', end_date) AS DATE) AS event_month,
+           0 AS arrivals, COUNT(*) AS departures
+    FROM spells
+    WHERE end_date IS NOT NULL
+    GROUP BY 1, 2
+)
+SELECT firm_crd, event_month, SUM(arrivals) AS arrivals, SUM(departures) AS departures
+FROM events
+GROUP BY 1, 2
+"""
+
+_BACKFILL_SQL = """
+INSERT INTO firm_month_flows
+WITH flows AS (
+    SELECT firm_crd,
+           GREATEST(event_month, $start) AS flow_month,
+           SUM(arrivals) AS arrivals,
+           SUM(departures) AS departures
+    FROM firm_events
+    WHERE event_month <= $end
+    GROUP BY 1, 2
+),
+firm_spine AS (
+    SELECT firm_crd, CAST(UNNEST(generate_series(first_month, $end, INTERVAL 1 MONTH)) AS DATE) AS flow_month
+    FROM (SELECT firm_crd, MIN(flow_month) AS first_month FROM flows GROUP BY 1)
+),
+running AS (
+    SELECT
+        s.firm_crd,
+        s.flow_month,
+        COALESCE(f.arrivals, 0) AS arrivals,
+        COALESCE(f.departures, 0) AS departures,
+        SUM(COALESCE(f.arrivals, 0)) OVER w AS cum_arrivals,
+        SUM(COALESCE(f.departures, 0)) OVER w AS cum_departures
+    FROM firm_spine s
+    LEFT JOIN flows f USING (firm_crd, flow_month)
+    WINDOW w AS (PARTITION BY s.firm_crd ORDER BY s.flow_month)
+)
+SELECT firm_crd, flow_month, arrivals, departures, cum_arrivals, cum_departures,
+       cum_arrivals - cum_departures AS headcount
+FROM running
+"""
+
+_APPEND_SQL = """
+INSERT INTO firm_month_flows
+WITH observed AS (
+    SELECT firm_crd, SUM(arrivals) AS cum_arrivals, SUM(departures) AS cum_departures
+    FROM firm_events
+    WHERE event_month <= $month
+    GROUP BY 1
+),
+previous AS (
+    SELECT firm_crd, cum_arrivals, cum_departures
+    FROM firm_month_flows
+    WHERE flow_month = $previous
+),
+totals AS (
+    SELECT
+        COALESCE(o.firm_crd, p.firm_crd) AS firm_crd,
+        COALESCE(o.cum_arrivals, p.cum_arrivals) AS cum_arrivals,
+        COALESCE(o.cum_departures, p.cum_departures) AS cum_departures,
+        COALESCE(p.cum_arrivals, 0) AS prev_arrivals,
+        COALESCE(p.cum_departures, 0) AS prev_departures
+    FROM observed o
+    FULL OUTER JOIN previous p ON o.firm_crd = p.firm_crd
+)
+SELECT firm_crd, CAST($month AS DATE) AS flow_month,
+       cum_arrivals - prev_arrivals AS arrivals,
+       cum_departures - prev_departures AS departures,
+       cum_arrivals, cum_departures,
+       cum_arrivals - cum_departures AS headcount
+FROM totals
+"""
+
+# Prefix-sum read: one row at the window end, one n months earlier
+_WINDOW_SQL = """
+SELECT
+    q.row_id,
+    COALESCE(f.cum_arrivals, 0) - COALESCE(p.cum_arrivals, 0) AS arrivals,
+    COALESCE(f.cum_departures, 0) - COALESCE(p.cum_departures, 0) AS departures,
+    COALESCE(f.headcount, 0) AS headcount,
+    COALESCE(p.headcount, 0) AS headcount_start
+FROM window_queries q
+LEFT JOIN firm_month_flows f
+    ON f.firm_crd = q.firm_crd AND f.flow_month = q.flow_month
+LEFT JOIN firm_month_flows p
+    ON p.firm_crd = q.firm_crd AND p.flow_month = CAST(q.flow_month - to_months($n_months) AS DATE)
+ORDER BY q.row_id
+"""
+
+_SCAN_SQL = """
+SELECT firm_crd, SUM(arrivals) AS arrivals, SUM(departures) AS departures
+FROM firm_events
+WHERE event_month > CAST($month - to_months($n_months) AS DATE)
+  AND event_month <= $month
+GROUP BY 1
+"""
+
+
+def _month(value) -> date:
+    """First day of the month containing a date."""
+    return pd.Timestamp(value).to_period('M').to_timestamp().date()
+
+
+def _add_months(month: date, n: int) -> date:
+    return (pd.Timestamp(month) + pd.DateOffset(months=n)).date()
+
+
+class FirmMonthFlows:
+    """
+    firm_month_flows rollup in a DuckDB database.
+
+    History frames use the engine columns of utils.pit_features
+    (rep_crd, firm_crd, start_date, end_date). Only stints with a firm and
+    a start date are counted. Overlapping stints of one rep at one firm
+    are merged into one spell; a rep who leaves and rejoins counts once per
+    spell in the flows, and headcount counts distinct reps.
+    """
+
+    def __init__(self, database: Union[str, Path] = ':memory:'):
+        self.con = duckdb.connect(str(database))
+        self.con.execute(_CREATE_SQL)
+
+    def _register_history(self, history: pd.DataFrame) -> None:
+        self.con.register('history', history[['rep_crd', 'firm_crd', 'start_date', 'end_date']])
+        self.con.execute(_EVENTS_SQL)
+
+    def latest_month(self):
+        """Newest flow_month in the rollup (None if empty)."""
+        return self.con.execute("SELECT MAX(flow_month) FROM firm_month_flows").fetchone()[0]
+
+    def backfill(self, history: pd.DataFrame, end=None, start=ROLLUP_START) -> int:
+        """
+        Rebuild the rollup from the employment history.
+
+        Args:
+            history: Employment history (load_employment_history)
+            end: Last month to build (default: the last complete month)
+            start: First row per firm; earlier events are folded into it
+
+        Returns:
+            Number of firm-month rows written
+        """
+        end = _month(end) if end is not None else _add_months(_month(date.today()), -1)
+        self._register_history(history)
+        self.con.execute("DELETE FROM firm_month_flows")
+        self.con.execute(_BACKFILL_SQL, {'start': _month(start), 'end': end})
+        return self.con.execute("SELECT COUNT(*) FROM firm_month_flows").fetchone()[0]
+
+    def append_month(self, history: pd.DataFrame, month=None) -> int:
+        """
+        Append one month without touching earlier rows.
+
+        Args:
+            history: Employment history as of the refresh
+            month: Month to append (default: the month after latest_month())
+
+        Returns:
+            Number of firm rows written (0 if the month already exists)
+        """
+        latest = self.latest_month()
+        if latest is None:
+            raise ValueError("firm_month_flows is empty; run backfill() first")
+        month = _month(month) if month is not None else _add_months(latest, 1)
+        if month <= latest:
+            return 0
+        if month != _add_months(latest, 1):
+            raise ValueError(f"Cannot append {month}: rollup ends at {latest} (append months in order)")
+
+        self._register_history(history)
+        self.con.execute(_APPEND_SQL, {'month': month, 'previous': latest})
+        return self.con.execute("SELECT COUNT(*) FROM firm_month_flows WHERE flow_month = ?",
+                                [month]).fetchone()[0]
+
+    def window(self, firm_crds, months, n_months: int = FIRM_STABILITY_LOOKBACK_MONTHS) -> pd.DataFrame:
+        """
+        Flows over the n_months ending with each month (inclusive).
+
+        Args:
+            firm_crds: Firm CRDs
+            months: Window end months (any date in the month)
+            n_months: Window length in months
+
+        Returns:
+            DataFrame aligned with the inputs: arrivals, departures,
+            net_change, headcount (end of window), headcount_start
+        """
+        queries = pd.DataFrame({
+            'firm_crd': pd.to_numeric(pd.Series(firm_crds).reset_index(drop=True), errors='coerce').astype('Int64'),
+            'flow_month': pd.to_datetime(pd.Series(months).reset_index(drop=True)).dt.to_period('M').dt.to_timestamp(),
+        })
+        queries['row_id'] = np.arange(len(queries))
+        latest = self.latest_month()
+        if latest is not None and queries['flow_month'].max() > pd.Timestamp(latest):
+            raise ValueError(f"Window ends after the rollup ({latest}); append the missing months first")
+        if queries['flow_month'].min() < pd.Timestamp(_add_months(ROLLUP_START, n_months)):
+            raise ValueError(f"Windows must start on or after {ROLLUP_START}")
+
+        queries['flow_month'] = queries['flow_month'].dt.date
+        self.con.register('window_queries', queries)
+        result = self.con.execute(_WINDOW_SQL, {'n_months': n_months}).df().drop(columns='row_id')
+        self.con.unregister('window_queries')
+        result['net_change'] = result['arrivals'] - result['departures']
+        return result[['arrivals', 'departures', 'net_change', 'headcount', 'headcount_start']]
+
+    def as_of_features(self, firm_crds, as_of_dates) -> pd.DataFrame:
+        """
+        Month-grain firm stability features for the next model version.
+
+        phase_2_feature_engineering.sql and production_scoring.sql keep the
+        v4.0.0 trailing-day definitions until a model retrained on these
+        ships; both switch together. Windows are the 12 completed months
+        before the as-of month; rep
+        counts are the headcount at the end of the month before the as-of
+        month and 12 months earlier (NULL without a firm).
+
+        Args:
+            firm_crds: Firm CRD at the as-of date (NULL when unknown)
+            as_of_dates: contacted_date / prediction_date
+
+        Returns:
+            DataFrame with firm_rep_count_at_contact, firm_rep_count_12mo_ago,
+            firm_departures_12mo, firm_arrivals_12mo, firm_net_change_12mo
+        """
+        months = pd.to_datetime(pd.Series(as_of_dates).reset_index(drop=True)).dt.to_period('M') - 1
+        flows = self.window(firm_crds, months.dt.to_timestamp())
+        has_firm = pd.Series(firm_crds).reset_index(drop=True).notna().to_numpy()
+        return pd.DataFrame({
+            'firm_rep_count_at_contact': flows['headcount'].astype('Int64').where(has_firm),
+            'firm_rep_count_12mo_ago': flows['headcount_start'].astype('Int64').where(has_firm),
+            'firm_departures_12mo': flows['departures'].where(has_firm, 0),
+            'firm_arrivals_12mo': flows['arrivals'].where(has_firm, 0),
+            'firm_net_change_12mo': flows['net_change'].where(has_firm, 0),
+        })
+
+    def scan_window(self, history: pd.DataFrame, month, n_months: int = FIRM_STABILITY_LOOKBACK_MONTHS) -> pd.DataFrame:
+        """Flows over the n_months ending with month, summed directly from the history (for checks)."""
+        self._register_history(history)
+        return self.con.execute(_SCAN_SQL, {'month': _month(month), 'n_months': n_months}).df()
+
+    def to_frame(self) -> pd.DataFrame:
+        """The rollup as a DataFrame, sorted by firm and month."""
+        return self.con.execute(
+            f"SELECT {', '.join(FLOW_COLUMNS)} FROM firm_month_flows ORDER BY firm_crd, flow_month"
+        ).df()
@@ -0,0 +1,215 @@
+"""
+Local Lead List Assembly for the V3+V4 Hybrid List
+
+Reproduces sections L-P of January_2026_Lead_List_V3_V4_Hybrid.sql over a
+scored prospect pool held in memory:
+1. Source priority (new prospect 1, recyclable 2) and rank_within_firm
+2. Firm diversity cap (rank_within_firm <= FIRM_CAP)
+3. V4 upgrade path and per-tier quotas (tier_rank <= quota)
+4. LinkedIn prioritisation (at most NO_LINKEDIN_CAP leads without LinkedIn)
+5. LIST_SIZE cut in overall_rank order
+
+None of the window orderings depend on the quotas or caps, so the firm and
+tier orders are sorted once when the pool is loaded. Each configuration is
+then a linear pass with per-firm and per-tier counters over those orders,
+plus a sort of the few thousand selected rows - fast enough to tune quotas
+interactively.
+
+NULL ordering follows BigQuery: NULLs first in ascending keys, last in
+descending keys (v4_percentile DESC).
+
+Usage:
+    from utils.list_assembly import ListAssembler
+
+    assembler = ListAssembler(pool, recyclable_lead_ids)
+    leads = assembler.assemble()                      # LeadListConfig defaults
+    leads = assembler.assemble(tier_quotas={**LeadListConfig.TIER_QUOTAS,
+                                            'V4_UPGRADE': 800}, firm_cap=30)
+    table = assembler.compare({'current': {}, 'cap_30': {'firm_cap': 30}})
+"""
+
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+import pandas as pd
+
+from config.constants import LeadListConfig
+
+POOL_COLUMNS = ['crd', 'firm_crd', 'prospect_type', 'existing_lead_id', 'score_tier',
+                'priority_rank', 'v4_percentile', 'has_linkedin', 'firm_net_change_12mo']
+
+
+def _asc(values: np.ndarray) -> np.ndarray:
+    """Ascending sort key with NULLs first."""
+    return np.where(np.isnan(values), -np.inf, values)
+
+
+def _desc(values: np.ndarray) -> np.ndarray:
+    """Descending sort key with NULLs last."""
+    return np.where(np.isnan(values), np.inf, -values)
+
+
+def _group_ranks(codes: np.ndarray) -> np.ndarray:
+    """1-based ROW_NUMBER within runs of equal codes (codes already sorted)."""
+    n = len(codes)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+    position = np.arange(n)
+    starts = np.ones(n, dtype=bool)
+    starts[1:] = codes[1:] != codes[:-1]
+    return position - np.maximum.accumulate(np.where(starts, position, 0)) + 1
+
+
+class ListAssembler:
+    """Lead list selection over a scored prospect pool, matching the hybrid SQL."""
+
+    def __init__(self, pool: pd.DataFrame, recyclable_lead_ids: Optional[Iterable] = None,
+                 upgrade_percentile: int = LeadListConfig.V4_UPGRADE_PERCENTILE):
+        """
+        Args:
+            pool: scored_prospects rows (POOL_COLUMNS, plus any passthrough columns)
+            recyclable_lead_ids: Salesforce lead ids eligible for recycling
+            upgrade_percentile: STANDARD leads at/above this V4 percentile become V4_UPGRADE
+        """
+        missing = [c for c in POOL_COLUMNS if c not in pool.columns]
+        if missing:
+            raise ValueError(f"Pool is missing columns: {missing}")
+
+        is_new = (pool['prospect_type'] == 'NEW_PROSPECT').to_numpy()
+        recyclable_ids = set() if recyclable_lead_ids is None else set(recyclable_lead_ids)
+        recyclable = pool['existing_lead_id'].isin(recyclable_ids).to_numpy()
+        source_priority = np.where(is_new, 1, np.where(recyclable, 2, 99))
+
+        # L. only new and recyclable prospects are ranked at all
+        keep = np.flatnonzero(source_priority < 99)
+        self.pool = pool
+        self.upgrade_percentile = upgrade_percentile
+        self._rows = keep
+        self.source_priority = source_priority[keep]
+
+        crd = pool['crd'].to_numpy(dtype=np.float64)[keep]
+        priority = pool['priority_rank'].to_numpy(dtype=np.float64)[keep]
+        v4 = pool['v4_percentile'].to_numpy(dtype=np.float64)[keep]
+        net = pool['firm_net_change_12mo'].to_numpy(dtype=np.float64)[keep]
+        self.has_linkedin = pool['has_linkedin'].to_numpy(dtype=np.int64)[keep]
+        firm_codes, _ = pd.factorize(pool['firm_crd'].to_numpy()[keep], use_na_sentinel=False)
+
+        # rank_within_firm: new first, priority_rank, v4_percentile DESC, crd
+        firm_order = np.lexsort((crd, _desc(v4), _asc(priority), self.source_priority, firm_codes))
+        self.rank_within_firm = np.empty(len(keep), dtype=np.int64)
+        self.rank_within_firm[firm_order] = _group_ranks(firm_codes[firm_order])
+
+        # N. V4 upgrade path; remaining STANDARD rows never reach a quota
+        score_tier = pool['score_tier'].to_numpy(dtype=object)[keep]
+        self.is_v4_upgrade = (score_tier == 'STANDARD') & (v4 >= upgrade_percentile)
+        self.final_tier = np.where(self.is_v4_upgrade, 'V4_UPGRADE', score_tier).astype(object)
+        quota_eligible = np.flatnonzero((score_tier != 'STANDARD') | self.is_v4_upgrade)
+        self._tier_codes, self.tier_names = pd.factorize(self.final_tier, use_na_sentinel=False)
+
+        # tier_rank: source, LinkedIn first, v4_percentile DESC, priority_rank, bleed DESC, crd
+        bleed = np.where(net < 0, np.abs(net), 0.0)
+        sub = quota_eligible
+        tier_order = np.lexsort((crd[sub], -bleed[sub], _asc(priority[sub]), _desc(v4[sub]),
+                                 -self.has_linkedin[sub], self.source_priority[sub],
+                                 self._tier_codes[sub]))
+        self._tier_order = sub[tier_order]
+
+        # Overall-rank keys, ordered at assembly time over the selected rows only
+        self._crd = crd
+        self._v4_key = _desc(v4)
+
+        if 'expected_conversion_rate' in pool.columns:
+            rate = pool['expected_conversion_rate'].to_numpy(dtype=np.float64)[keep]
+        else:
+            rate = np.full(len(keep), np.nan)
+        self.final_expected_rate = np.where(self.is_v4_upgrade, LeadListConfig.V4_UPGRADE_RATE, rate)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def select(self, tier_quotas: Optional[Dict[str, int]] = None, firm_cap: Optional[int] = None,
+               list_size: Optional[int] = None, no_linkedin_cap: Optional[int] = None,
+               list_order: Optional[List[str]] = None) -> Dict[str, np.ndarray]:
+        """
+        Run the selection and return positions into the eligible rows.
+
+        Tiers absent from tier_quotas get no leads, as in the SQL quota filter.
+
+        Returns:
+            Dict of 'rows' (eligible-row positions in list order), 'tier_rank'
+            and 'list_rank' (overall_rank, gaps where no-LinkedIn rows were dropped)
+        """
+        tier_quotas = LeadListConfig.TIER_QUOTAS if tier_quotas is None else tier_quotas
+        firm_cap = LeadListConfig.FIRM_CAP if firm_cap is None else firm_cap
+        list_size = LeadListConfig.LIST_SIZE if list_size is None else list_size
+        no_linkedin_cap = LeadListConfig.NO_LINKEDIN_CAP if no_linkedin_cap is None else no_linkedin_cap
+        list_order = LeadListConfig.LIST_ORDER if list_order is None else list(list_order)
+
+        quotas = np.array([tier_quotas.get(name, 0) for name in self.tier_names], dtype=np.int64)
+        positions = {name: i for i, name in enumerate(list_order)}
+        # Tiers missing from the list order get a NULL CASE value, which sorts first
+        tier_position = np.array([positions.get(name, -1) for name in self.tier_names], dtype=np.int64)
+
+        # M. firm diversity cap, then N/O. per-tier quotas in tier_rank order
+        order = self._tier_order[self.rank_within_firm[self._tier_order] <= firm_cap]
+        codes = self._tier_codes[order]
+        tier_rank = _group_ranks(codes)
+        within = tier_rank <= quotas[codes]
+        selected, tier_rank = order[within], tier_rank[within]
+
+        # O. overall_rank: list order, source, LinkedIn first, v4_percentile DESC, crd
+        overall = np.lexsort((self._crd[selected], self._v4_key[selected],
+                              -self.has_linkedin[selected], self.source_priority[selected],
+                              tier_position[self._tier_codes[selected]]))
+        selected, tier_rank = selected[overall], tier_rank[overall]
+        list_rank = np.arange(1, len(selected) + 1)
+
+        # P. cap leads without LinkedIn, then LIMIT
+        no_linkedin = self.has_linkedin[selected] == 0
+        keep = ~no_linkedin | (np.cumsum(no_linkedin) <= no_linkedin_cap)
+        keep = np.flatnonzero(keep)[:list_size]
+        return {'rows': selected[keep], 'tier_rank': tier_rank[keep], 'list_rank': list_rank[keep]}
+
+    def assemble(self, **config) -> pd.DataFrame:
+        """
+        Build the lead list as a DataFrame (pool columns plus selection columns).
+
+        Keyword arguments are those of select(); omitted ones use LeadListConfig.
+        """
+        selection = self.select(**config)
+        rows = selection['rows']
+        leads = self.pool.iloc[self._rows[rows]].reset_index(drop=True)
+        leads['source_priority'] = self.source_priority[rows]
+        leads['rank_within_firm'] = self.rank_within_firm[rows]
+        leads['original_v3_tier'] = leads['score_tier']
+        leads['score_tier'] = self.final_tier[rows]
+        leads['is_v4_upgrade'] = self.is_v4_upgrade[rows].astype(int)
+        leads['expected_conversion_rate'] = self.final_expected_rate[rows]
+        leads['tier_rank'] = selection['tier_rank']
+        leads['list_rank'] = selection['list_rank']
+        return leads
+
+    def compare(self, configs: Dict[str, Dict]) -> pd.DataFrame:
+        """
+        Summarise alternative configurations side by side.
+
+        Args:
+            configs: Name -> select() keyword arguments
+
+        Returns:
+            One row per configuration: list size, leads per tier, LinkedIn share,
+            firms used, max leads per firm and mean expected conversion rate
+        """
+        records = []
+        for name, config in configs.items():
+            rows = self.select(**config)['rows']
+            firms = pd.Series(self.pool['firm_crd'].to_numpy()[self._rows[rows]]).value_counts()
+            record = {'config': name, 'leads': len(rows),
+                      'linkedin_pct': float(self.has_linkedin[rows].mean() * 100) if len(rows) else 0.0,
+                      'firms': len(firms), 'max_per_firm': int(firms.max()) if len(firms) else 0,
+                      'expected_rate': float(np.nanmean(self.final_expected_rate[rows])) if len(rows) else np.nan}
+            counts = np.bincount(self._tier_codes[rows], minlength=len(self.tier_names))
+            for tier in LeadListConfig.LIST_ORDER:
+                matches = np.flatnonzero(self.tier_names == tier)
+                record[tier] = int(counts[matches[0]]) if len(matches) else 0
+            records.append(record)
+        return pd.DataFrame(records).set_index('config')
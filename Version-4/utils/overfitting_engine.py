@@ -0,0 +1,225 @@
+"""
+Overfitting Diagnostics Engine for Version 4 Lead Scoring Model
+
+Runs the Phase 7 time-based CV and learning-curve fits from a single
+prepared feature matrix:
+1. Features are encoded once (train + test together, so category codes agree)
+2. Folds and sample sizes are DMatrix row slices, not rebuilt frames
+3. Fold and train-size jobs run in parallel threads (XGBoost releases the GIL)
+4. Each fit records per-iteration train/validation metric traces via
+   evals_result, so no checkpoint needs a separate fit
+
+Usage:
+    from utils.overfitting_engine import OverfittingDiagnostics
+
+    diag = OverfittingDiagnostics(train_df, final_features, test_df=test_df)
+    cv_results = diag.run_cv(train_df['cv_fold'], train_df['cv_embargo'])
+    curve = diag.run_learning_curve([0.2, 0.4, 0.6, 0.8, 1.0])
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from sklearn.metrics import roc_auc_score, average_precision_score
+
+from config.constants import ModelConfig
+from utils.split_engine import cv_train_mask
+from utils.feature_dtypes import FeatureDtypePlan
+
+
+def build_model_params(y_train: np.ndarray, n_threads: int = None) -> Dict[str, Any]:
+    """XGBoost parameters from ModelConfig with scale_pos_weight for y_train."""
+    positives = int((y_train == 1).sum())
+    params = {
+        'objective': ModelConfig.OBJECTIVE,
+        'eval_metric': ModelConfig.EVAL_METRIC,
+        'random_state': ModelConfig.RANDOM_STATE,
+        'max_depth': ModelConfig.MAX_DEPTH,
+        'min_child_weight': ModelConfig.MIN_CHILD_WEIGHT,
+        'gamma': ModelConfig.GAMMA,
+        'subsample': ModelConfig.SUBSAMPLE,
+        'colsample_bytree': ModelConfig.COLSAMPLE_BYTREE,
+        'reg_alpha': ModelConfig.REG_ALPHA,
+        'reg_lambda': ModelConfig.REG_LAMBDA,
+        'learning_rate': ModelConfig.LEARNING_RATE,
+        'scale_pos_weight': (y_train == 0).sum() / positives if positives > 0 else 1.0,
+        'tree_method': 'hist',
+        'verbosity': 0
+    }
+    if n_threads:
+        params['nthread'] = n_threads
+    return params
+
+
+def prepare_matrix(df: pd.DataFrame, feature_list: List[str]) -> np.ndarray:
+    """
+    Encode features into one float32 matrix without copying the frame.
+
+    Same encoding as prepare_features in the phase scripts: categoricals get
+    their FEATURE_CONTRACT codes, NaN becomes 0 (see utils/feature_dtypes.py).
+    """
+    return FeatureDtypePlan(feature_list).encode(df)
+
+
+class OverfittingDiagnostics:
+    """
+    Parallel CV and learning-curve runner over one prepared matrix.
+
+    Usage:
+        diag = OverfittingDiagnostics(train_df, features, test_df=test_df, n_jobs=4)
+        cv_results = diag.run_cv(train_df['cv_fold'], train_df['cv_embargo'])
+        curve = diag.run_learning_curve([0.2, 0.6, 1.0])
+        traces = diag.traces  # {job_name: evals_result}
+    """
+
+    def __init__(self, train_df: pd.DataFrame, feature_list: List[str],
+                 test_df: pd.DataFrame = None, target_col: str = 'target',
+                 n_jobs: int = None):
+        """
+        Args:
+            train_df: Training rows (with cv_fold for run_cv)
+            feature_list: Model features
+            test_df: Optional held-out rows used by run_learning_curve
+            target_col: Binary target column
+            n_jobs: Parallel fits (default: number of CPUs)
+        """
+        self.feature_list = list(feature_list)
+        self.n_jobs = n_jobs or os.cpu_count() or 1
+        self.traces: Dict[str, Dict[str, Dict[str, List[float]]]] = {}
+
+        # Encode train + test together so category codes are consistent
+        frames = [train_df] if test_df is None else [train_df, test_df]
+        combined = pd.concat([f[self.feature_list] for f in frames], ignore_index=True)
+        X = prepare_matrix(combined, self.feature_list)
+        n_train = len(train_df)
+
+        self.y_train = train_df[target_col].to_numpy()
+        self.dtrain = xgb.DMatrix(X[:n_train], label=self.y_train, feature_names=self.feature_list)
+
+        self.y_test = None
+        self.dtest = None
+        if test_df is not None:
+            self.y_test = test_df[target_col].to_numpy()
+            self.dtest = xgb.DMatrix(X[n_train:], label=self.y_test, feature_names=self.feature_list)
+
+    def _threads_per_job(self, n_jobs: int) -> int:
+        return max(1, (os.cpu_count() or 1) // max(1, n_jobs))
+
+    def _fit(self, name: str, dtrain: xgb.DMatrix, dvalid: xgb.DMatrix,
+             y_train: np.ndarray, n_threads: int) -> xgb.Booster:
+        """Train once, keeping the per-iteration metric traces."""
+        evals_result: Dict[str, Dict[str, List[float]]] = {}
+        booster = xgb.train(
+            params=build_model_params(y_train, n_threads),
+            dtrain=dtrain,
+            num_boost_round=ModelConfig.N_ESTIMATORS,
+            evals=[(dtrain, 'train'), (dvalid, 'test')],
+            early_stopping_rounds=ModelConfig.EARLY_STOPPING_ROUNDS,
+            evals_result=evals_result,
+            verbose_eval=False
+        )
+        self.traces[name] = evals_result
+        return booster
+
+    def _run_parallel(self, jobs: List[dict], worker) -> List[dict]:
+        """Run jobs on a thread pool, preserving job order."""
+        if not jobs:
+            return []
+        n_workers = min(self.n_jobs, len(jobs))
+        n_threads = self._threads_per_job(n_workers)
+        with ThreadPoolExecutor(max_workers=n_workers) as pool:
+            return list(pool.map(lambda job: worker(job, n_threads), jobs))
+
+    def run_cv(self, cv_fold, cv_embargo=None) -> List[Dict[str, Any]]:
+        """
+        Expanding-window time-based CV: train on earlier folds, validate on each fold.
+
+        Args:
+            cv_fold: Fold per training row (1-indexed, 0 = unassigned)
+            cv_embargo: Optional embargo flags from the split manifest
+
+        Returns:
+            List of dicts with fold, train_size, test_size, auc_roc, auc_pr, best_iteration
+        """
+        cv_fold = np.asarray(cv_fold)
+        if cv_embargo is None:
+            cv_embargo = np.zeros(len(cv_fold), dtype=bool)
+
+        jobs = []
+        for fold in sorted(int(f) for f in np.unique(cv_fold) if f > 0):
+            train_idx = np.flatnonzero(cv_train_mask(cv_fold, cv_embargo, fold))
+            valid_idx = np.flatnonzero(cv_fold == fold)
+            if len(train_idx) == 0 or len(valid_idx) == 0:
+                continue
+            jobs.append({
+                'fold': fold,
+                'train_idx': train_idx,
+                'valid_idx': valid_idx,
+                # Slices share the prepared matrix - no re-encoding per fold
+                'dtrain': self.dtrain.slice(train_idx),
+                'dvalid': self.dtrain.slice(valid_idx),
+            })
+
+        def worker(job, n_threads):
+            y_tr = self.y_train[job['train_idx']]
+            y_va = self.y_train[job['valid_idx']]
+            booster = self._fit(f"cv_fold_{job['fold']}", job['dtrain'], job['dvalid'], y_tr, n_threads)
+            y_pred = booster.predict(job['dvalid'], iteration_range=(0, booster.best_iteration + 1))
+            return {
+                'fold': job['fold'],
+                'train_size': len(job['train_idx']),
+                'test_size': len(job['valid_idx']),
+                'auc_roc': roc_auc_score(y_va, y_pred),
+                'auc_pr': average_precision_score(y_va, y_pred),
+                'best_iteration': booster.best_iteration
+            }
+
+        return self._run_parallel(jobs, worker)
+
+    def run_learning_curve(self, fractions: List[float],
+                           random_state: int = 42) -> List[Dict[str, Any]]:
+        """
+        Fit on nested training subsamples and evaluate against the test set.
+
+        Subsamples are prefixes of one random permutation, so each size
+        contains the smaller ones. Train/test AUC are read from the
+        evals_result trace at the best iteration - no extra predict pass.
+
+        Returns:
+            List of dicts with sample_size, sample_pct, train_auc, test_auc,
+            best_iteration
+        """
+        if self.dtest is None:
+            raise ValueError("run_learning_curve requires test_df")
+
+        order = np.random.RandomState(random_state).permutation(len(self.y_train))
+        jobs = []
+        for pct in fractions:
+            n_samples = int(len(self.y_train) * pct)
+            idx = np.sort(order[:n_samples])
+            jobs.append({'pct': pct, 'idx': idx, 'dtrain': self.dtrain.slice(idx)})
+
+        def worker(job, n_threads):
+            name = f"learning_curve_{job['pct'] * 100:.0f}pct"
+            booster = self._fit(name, job['dtrain'], self.dtest, self.y_train[job['idx']], n_threads)
+            trace = self.traces[name]
+            best = booster.best_iteration
+            return {
+                'sample_size': len(job['idx']),
+                'sample_pct': job['pct'] * 100,
+                'train_auc': trace['train']['auc'][best],
+                'test_auc': trace['test']['auc'][best],
+                'best_iteration': best
+            }
+
+        return self._run_parallel(jobs, worker)
+
+    def trace_summary(self, metric: str = 'auc') -> Dict[str, Dict[str, List[float]]]:
+        """Per-job train/test traces for one metric (for JSON export/plots)."""
+        return {
+            name: {split: values[metric] for split, values in result.items() if metric in values}
+            for name, result in self.traces.items()
+        }
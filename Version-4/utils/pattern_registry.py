@@ -0,0 +1,309 @@
+"""
+Pattern Registry for Firm, Title and Certification Flags
+
+Compiles every substring flag (wirehouse lists, lead-list firm and title
+exclusions, high-value wealth titles, CFP/CFA) into one Aho-Corasick
+automaton per (field, case) group and applies it column-wise: each distinct
+value is scanned once and every flag on that field is read off the same
+pass. The registry also emits the SQL for each flag from the same pattern
+lists, so Python and BigQuery results stay identical.
+
+SQL files hold the generated text between marker comments, one block per
+flag (a field=column mapping emits the OR condition; no mapping emits the
+comma-separated literals for an UNNEST pattern table):
+
+    -- BEGIN pattern_registry: is_excluded_title title=c.TITLE_NAME
+    UPPER(c.TITLE_NAME) LIKE '%FINANCIAL SOLUTIONS ADVISOR%'
+    OR ...
+    -- END pattern_registry
+
+render_sql() rewrites every block from config/constants.py and
+sql_drift() lists the blocks that differ (scripts/verify_sql_patterns.py).
+
+Patterns follow SQL LIKE semantics: each entry is the body of '%...%', an
+inner '%' matches any run of characters, and matching is on UPPER(value)
+unless the flag is case-sensitive. NULL values never match (the CASE ... ELSE
+0 behaviour of the SQL).
+
+Usage:
+    from utils.pattern_registry import PatternRegistry
+
+    registry = PatternRegistry()
+    flags = registry.apply(df, {'firm_name': 'company_name', 'title': 'TITLE_NAME',
+                                'bio': 'CONTACT_BIO'})
+
+    registry.sql_case('is_wirehouse', {'firm_name': 'cf.firm_name'})
+    registry.sql_patterns('is_excluded_firm')   # "'%J.P. MORGAN%', ..." for UNNEST
+    registry.sql_drift(sql_text)                # [] when every block is current
+"""
+
+import re
+from bisect import bisect_left
+from collections import deque
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+
+from config.constants import (
+    WIREHOUSE_PATTERNS, WIREHOUSE_PATTERNS_V3, EXCLUDED_FIRM_PATTERNS,
+    EXCLUDED_TITLE_PATTERNS, HV_WEALTH_TITLE_PATTERNS
+)
+
+
+class PatternFlag:
+    """A named flag: any pattern found in any of its fields."""
+
+    def __init__(self, name: str, patterns: Sequence[str], fields: Sequence[str],
+                 case_sensitive: bool = False):
+        if not patterns:
+            raise ValueError(f"Flag '{name}' has no patterns")
+        for pattern in patterns:
+            if not pattern.strip('%') or '_' in pattern:
+                raise ValueError(f"Flag '{name}': unsupported pattern {pattern!r} "
+                                 "(empty, or uses the '_' wildcard)")
+        self.name = name
+        self.patterns = list(patterns)
+        self.fields = list(fields)
+        self.case_sensitive = case_sensitive
+
+    def parts(self, pattern: str) -> Tuple[str, ...]:
+        """Literal pieces of a pattern, which must occur in order without overlap."""
+        pattern = pattern if self.case_sensitive else pattern.upper()
+        return tuple(part for part in pattern.split('%') if part)
+
+
+DEFAULT_FLAGS = [
+    PatternFlag('is_wirehouse', WIREHOUSE_PATTERNS, ['firm_name']),
+    PatternFlag('is_wirehouse_v3', WIREHOUSE_PATTERNS_V3, ['firm_name']),
+    PatternFlag('is_excluded_firm', EXCLUDED_FIRM_PATTERNS, ['firm_name']),
+    PatternFlag('is_excluded_title', EXCLUDED_TITLE_PATTERNS, ['title']),
+    PatternFlag('is_hv_wealth_title', HV_WEALTH_TITLE_PATTERNS, ['title']),
+    PatternFlag('has_cfp', ['CFP'], ['bio', 'title'], case_sensitive=True),
+    PatternFlag('has_cfa', ['CFA'], ['bio', 'title'], case_sensitive=True),
+]
+
+# Generated SQL block: marker line (flag + field=column mappings), body, end marker
+_SQL_BLOCK = re.compile(
+    r"(?P<header>^(?P<indent>[ \t]*)-- BEGIN pattern_registry: (?P<flag>\w+)"
+    r"(?P<columns>(?:[ \t]+\w+=\S+)*)[ \t]*\n)"
+    r"(?P<body>.*?)"
+    r"(?P<footer>^[ \t]*-- END pattern_registry[ \t]*$)",
+    re.MULTILINE | re.DOTALL
+)
+SQL_PATTERN_LINE_WIDTH = 80
+
+
+class Automaton:
+    """Aho-Corasick automaton over a set of literal words."""
+
+    def __init__(self, words: Sequence[str]):
+        self.words = list(words)
+        self.lengths = [len(w) for w in self.words]
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[int]] = [[]]
+
+        for word_id, word in enumerate(self.words):
+            state = 0
+            for char in word:
+                nxt = self._goto[state].get(char)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][char] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                state = nxt
+            self._out[state].append(word_id)
+
+        # Breadth-first failure links; outputs inherit along them
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(char, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def find_all(self, text: str) -> Dict[int, List[int]]:
+        """Start positions of every word occurrence, keyed by word id (sorted)."""
+        found: Dict[int, List[int]] = {}
+        goto, fail, out, lengths = self._goto, self._fail, self._out, self.lengths
+        state = 0
+        for pos, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if out[state]:
+                for word_id in out[state]:
+                    found.setdefault(word_id, []).append(pos - lengths[word_id] + 1)
+        return found
+
+
+class _FieldGroup:
+    """All flag patterns scanned on one field with one case mode."""
+
+    def __init__(self, field: str, case_sensitive: bool, flags: List[PatternFlag]):
+        self.field = field
+        self.case_sensitive = case_sensitive
+        self.flag_names = [flag.name for flag in flags]
+
+        words: Dict[str, int] = {}
+        self._flag_patterns: List[List[Tuple[int, ...]]] = []
+        for flag in flags:
+            compiled = []
+            for pattern in flag.patterns:
+                compiled.append(tuple(words.setdefault(part, len(words)) for part in flag.parts(pattern)))
+            self._flag_patterns.append(compiled)
+        self.automaton = Automaton(list(words))
+
+    def _matches(self, found: Dict[int, List[int]], parts: Tuple[int, ...]) -> bool:
+        if len(parts) == 1:
+            return parts[0] in found
+        pos = 0
+        for word_id in parts:
+            starts = found.get(word_id)
+            if not starts:
+                return False
+            i = bisect_left(starts, pos)
+            if i == len(starts):
+                return False
+            pos = starts[i] + self.automaton.lengths[word_id]
+        return True
+
+    def scan(self, values: pd.Series) -> np.ndarray:
+        """(n, n_flags) boolean matrix; each distinct value is scanned once."""
+        codes, uniques = pd.factorize(values, use_na_sentinel=True)
+        table = np.zeros((len(uniques) + 1, len(self.flag_names)), dtype=bool)
+        for i, value in enumerate(uniques):
+            text = str(value) if self.case_sensitive else str(value).upper()
+            found = self.automaton.find_all(text)
+            if not found:
+                continue
+            for j, patterns in enumerate(self._flag_patterns):
+                table[i, j] = any(self._matches(found, parts) for parts in patterns)
+        # Sentinel row (last) stays False for NULLs
+        return table[codes]
+
+
+class PatternRegistry:
+    """Named substring flags compiled to automata and to SQL."""
+
+    def __init__(self, flags: Optional[Sequence[PatternFlag]] = None):
+        self._flags = {flag.name: flag for flag in (flags if flags is not None else DEFAULT_FLAGS)}
+        groups: Dict[Tuple[str, bool], List[PatternFlag]] = {}
+        for flag in self._flags.values():
+            for field in flag.fields:
+                groups.setdefault((field, flag.case_sensitive), []).append(flag)
+        self._groups = [_FieldGroup(field, case, flags) for (field, case), flags in groups.items()]
+
+    @property
+    def flag_names(self) -> List[str]:
+        return list(self._flags)
+
+    def flag(self, name: str) -> PatternFlag:
+        if name not in self._flags:
+            raise KeyError(f"Unknown flag '{name}'. Available: {self.flag_names}")
+        return self._flags[name]
+
+    def apply(self, df: pd.DataFrame, columns: Dict[str, str],
+              flags: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """
+        Compute flags for every row in one pass per field.
+
+        Args:
+            df: Input rows
+            columns: Field name -> column in df (e.g. {'firm_name': 'company_name'})
+            flags: Flags to return (default: every flag whose fields are all mapped)
+
+        Returns:
+            DataFrame of int8 flags (1/0) aligned with df.index
+        """
+        if flags is None:
+            flags = [name for name, flag in self._flags.items()
+                     if all(field in columns for field in flag.fields)]
+        else:
+            for name in flags:
+                missing = [f for f in self.flag(name).fields if f not in columns]
+                if missing:
+                    raise ValueError(f"Flag '{name}' needs columns for fields {missing}")
+
+        result = pd.DataFrame(0, index=df.index, columns=list(flags), dtype=np.int8)
+        for group in self._groups:
+            wanted = [j for j, name in enumerate(group.flag_names) if name in result.columns]
+            if not wanted or group.field not in columns:
+                continue
+            matrix = group.scan(df[columns[group.field]])
+            for j in wanted:
+                name = group.flag_names[j]
+                result[name] = (result[name].to_numpy() | matrix[:, j]).astype(np.int8)
+        return result
+
+    # -------------------------------------------------------------------------
+    # SQL emission
+    # -------------------------------------------------------------------------
+    def sql_condition(self, name: str, columns: Dict[str, str], indent: str = '') -> str:
+        """
+        Boolean SQL for a flag: UPPER(col) LIKE '%P%' OR ... over every field.
+
+        Args:
+            name: Flag name
+            columns: Field name -> SQL column expression
+            indent: Prefix for continuation lines
+        """
+        flag = self.flag(name)
+        clauses = []
+        for field in flag.fields:
+            if field not in columns:
+                raise ValueError(f"Flag '{name}' needs a column for field '{field}'")
+            column = columns[field] if flag.case_sensitive else f"UPPER({columns[field]})"
+            for pattern in flag.patterns:
+                clauses.append(f"{column} LIKE {self._like_literal(pattern)}")
+        return f"\n{indent}OR ".join(clauses)
+
+    def sql_case(self, name: str, columns: Dict[str, str], alias: Optional[str] = None,
+                 then: str = '1', otherwise: str = '0', indent: str = '') -> str:
+        """CASE WHEN (<condition>) THEN 1 ELSE 0 END as <alias> (NULLs map to otherwise)."""
+        condition = self.sql_condition(name, columns, indent=indent + '    ')
+        return (f"CASE WHEN (\n{indent}    {condition}\n{indent}) THEN {then} ELSE {otherwise} END "
+                f"as {alias or name}")
+
+    def sql_patterns(self, name: str) -> str:
+        """Comma-separated LIKE literals, for UNNEST([...]) pattern tables."""
+        return ', '.join(self._like_literal(p) for p in self.flag(name).patterns)
+
+    def sql_block(self, name: str, columns: Dict[str, str], indent: str = '') -> str:
+        """Body of a generated SQL block: the condition, or the wrapped pattern literals."""
+        if columns:
+            return f"{indent}{self.sql_condition(name, columns, indent=indent)}\n"
+        lines, line = [], []
+        for literal in (self._like_literal(p) for p in self.flag(name).patterns):
+            if line and len(', '.join(line + [literal])) > SQL_PATTERN_LINE_WIDTH:
+                lines.append(', '.join(line))
+                line = []
+            line.append(literal)
+        lines.append(', '.join(line))
+        return ''.join(f"{indent}{text}{',' if i < len(lines) - 1 else ''}\n" for i, text in enumerate(lines))
+
+    def _render_match(self, match) -> str:
+        columns = dict(item.split('=', 1) for item in match.group('columns').split())
+        body = self.sql_block(match.group('flag'), columns, match.group('indent'))
+        return match.group('header') + body + match.group('footer')
+
+    def render_sql(self, text: str) -> str:
+        """SQL text with every pattern_registry block regenerated."""
+        return _SQL_BLOCK.sub(self._render_match, text)
+
+    def sql_drift(self, text: str) -> List[str]:
+        """Flags whose generated block in text differs from the current pattern lists."""
+        return [m.group('flag') for m in _SQL_BLOCK.finditer(text)
+                if m.group(0) != self._render_match(m)]
+
+    @staticmethod
+    def _like_literal(pattern: str) -> str:
+        return "'%" + pattern.replace('\\', '\\\\').replace("'", "\\'") + "%'"
+
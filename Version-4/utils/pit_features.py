@@ -0,0 +1,584 @@
+"""
+Point-in-Time Feature Engine for Version 4 Lead Scoring Model
+
+Local implementation of the employment-history features in
+sql/phase_2_feature_engineering.sql (also duplicated in
+v4_prospect_features.sql and firm_stability_engineering). The history is
+loaded once and indexed as sorted interval arrays:
+- per rep: rows sorted by (rep, start date), addressed by CSR offsets
+- per firm: start/end event days sorted by (firm, day), searched with one
+  searchsorted over a composite (firm, day) key
+
+Features for any number of (crd, as_of_date) pairs are then vectorized
+array operations instead of correlated subqueries per lead, so training
+rebuilds and what-if date shifts do not need a warehouse job.
+
+Semantics follow the SQL exactly (BigQuery DATE_DIFF month boundaries,
+DATE_SUB with month-end clamping, COUNT DISTINCT reps, NULL end = still
+employed). mobility_3yr is the V3 pit_moves_3yr feature.
+
+Firm stability features default to trailing windows ending at the as-of
+date (PARITY_SQL), the v4.0.0 definitions in phase_2 and production scoring.
+Pass a utils.firm_flows.FirmMonthFlows to compute() for the month-grain
+firm_month_flows definitions, which training and scoring adopt together
+with the next retrained model.
+
+Usage:
+    from utils.pit_features import EmploymentHistory, load_employment_history
+
+    history = EmploymentHistory(load_employment_history(BASE_DIR / "data" / "employment_history.parquet"))
+    features = history.compute(leads['advisor_crd'], leads['contacted_date'])
+"""
+
+from pathlib import Path
+from typing import Dict, Optional, Union
+import numpy as np
+import pandas as pd
+
+from config.constants import (
+    PROJECT_ID,
+    DATASET_FINTRX,
+    MOBILITY_LOOKBACK_YEARS,
+    FIRM_STABILITY_LOOKBACK_MONTHS
+)
+
+HISTORY_TABLE = f"{PROJECT_ID}.{DATASET_FINTRX}.contact_registered_employment_history"
+CURRENT_TABLE = f"{PROJECT_ID}.{DATASET_FINTRX}.ria_contacts_current"
+
+HISTORY_COLUMNS = {
+    'RIA_CONTACT_CRD_ID': 'rep_crd',
+    'PREVIOUS_REGISTRATION_COMPANY_CRD_ID': 'firm_crd',
+    'PREVIOUS_REGISTRATION_COMPANY_NAME': 'firm_name',
+    'PREVIOUS_REGISTRATION_COMPANY_START_DATE': 'start_date',
+    'PREVIOUS_REGISTRATION_COMPANY_END_DATE': 'end_date',
+}
+
+CURRENT_COLUMNS = {
+    'RIA_CONTACT_CRD_ID': 'rep_crd',
+    'LATEST_REGISTERED_EMPLOYMENT_COMPANY_CRD_ID': 'firm_crd',
+    'LATEST_REGISTERED_EMPLOYMENT_COMPANY': 'firm_name',
+    'LATEST_REGISTERED_EMPLOYMENT_START_DATE': 'start_date',
+}
+
+PIT_FEATURES = [
+    'firm_crd', 'firm_name', 'firm_start_date', 'tenure_months', 'industry_tenure_months',
+    'mobility_3yr', 'firm_rep_count_at_contact', 'firm_rep_count_12mo_ago',
+    'firm_departures_12mo', 'firm_arrivals_12mo', 'firm_net_change_12mo', 'is_tenure_missing'
+]
+
+# Day numbers are offset to be positive; NULL end dates sort after every real day
+_DAY_SPAN = np.int64(1 << 22)
+_OPEN_END = _DAY_SPAN - 1
+_PAIR_CHUNK = 20_000_000
+
+
+def _load_table(source: Union[str, Path], table: str, columns: Dict[str, str], client=None) -> pd.DataFrame:
+    """Load a FINTRX table from Parquet or BigQuery and rename to engine columns."""
+    path = Path(source) if source is not None else None
+    if path is not None and (path.suffix == '.parquet' or path.is_dir()):
+        df = pd.read_parquet(path)
+    else:
+        from google.cloud import bigquery
+        client = client or bigquery.Client(project=PROJECT_ID)
+        df = client.query(f"SELECT {', '.join(columns)} FROM `{source or table}`").to_dataframe()
+    df = df.rename(columns=columns)
+    df = df[[col for col in columns.values() if col in df.columns]]
+    for col in ('start_date', 'end_date'):
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col])
+    return df
+
+
+def load_employment_history(source: Union[str, Path] = None, client=None) -> pd.DataFrame:
+    """
+    Load contact_registered_employment_history.
+
+    Args:
+        source: Parquet export path, BigQuery table, or None for the FINTRX table
+        client: Optional BigQuery client (created on demand)
+
+    Returns:
+        DataFrame with rep_crd, firm_crd, firm_name, start_date, end_date
+    """
+    return _load_table(source, HISTORY_TABLE, HISTORY_COLUMNS, client)
+
+
+def load_current_employment(source: Union[str, Path] = None, client=None) -> pd.DataFrame:
+    """Load the ria_contacts_current fallback (latest firm and start date per rep)."""
+    return _load_table(source, CURRENT_TABLE, CURRENT_COLUMNS, client)
+
+
+def _to_days(dates) -> np.ndarray:
+    """Dates as int64 day numbers (NaT -> INT64 min)."""
+    return pd.to_datetime(pd.Series(dates)).to_numpy(dtype='datetime64[D]').astype(np.int64)
+
+
+def _to_months(days: np.ndarray) -> np.ndarray:
+    """Calendar month index of day numbers (BigQuery DATE_DIFF(..., MONTH) units)."""
+    return days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+
+
+def _shift_days(days: np.ndarray, offset: pd.DateOffset) -> np.ndarray:
+    """Subtract a calendar offset with month-end clamping (BigQuery DATE_SUB)."""
+    dates = pd.DatetimeIndex(days.astype('datetime64[D]'))
+    return (dates - offset).to_numpy(dtype='datetime64[D]').astype(np.int64)
+
+
+def _last_per_group(groups: np.ndarray) -> np.ndarray:
+    """Positions of the last element of each run in a sorted group array."""
+    return np.flatnonzero(np.r_[groups[1:] != groups[:-1], True]) if len(groups) else groups
+
+
+class _FirmEvents:
+    """
+    Per-firm sorted event days with exact COUNT DISTINCT rep windows.
+
+    Events of the same (firm, rep) that fall in one window are counted once:
+    an event whose previous event for the same (firm, rep) is also in the
+    window is a repeat and is subtracted. Only repeats closer than the
+    longest window can qualify, and those are rare, so they are expanded
+    per query directly.
+    """
+
+    def __init__(self, firm_codes: np.ndarray, rep_codes: np.ndarray, days: np.ndarray,
+                 max_window_days: int):
+        order = np.lexsort((days, rep_codes, firm_codes))
+        firm, rep, day = firm_codes[order], rep_codes[order], days[order]
+
+        same_key = np.flatnonzero((firm[1:] == firm[:-1]) & (rep[1:] == rep[:-1])) + 1
+        close = day[same_key] - day[same_key - 1] < max_window_days
+        repeat, prev = same_key[close], same_key[close] - 1
+        self.repeat_firm = firm[repeat]
+        self.repeat_prev = day[prev]
+        self.repeat_day = day[repeat]
+
+        self.keys = np.sort(firm * _DAY_SPAN + day)
+
+    def count(self, firm: np.ndarray, lower: np.ndarray, upper: np.ndarray,
+              chunk_pairs: int = _PAIR_CHUNK) -> np.ndarray:
+        """Distinct reps with an event day in [lower, upper) at each firm."""
+        base = firm * _DAY_SPAN
+        n = (np.searchsorted(self.keys, base + upper, side='left')
+             - np.searchsorted(self.keys, base + lower, side='left'))
+
+        if len(self.repeat_firm):
+            lo = np.searchsorted(self.repeat_firm, firm, side='left')
+            hi = np.searchsorted(self.repeat_firm, firm, side='right')
+            for sl in _chunks(hi - lo, chunk_pairs):
+                q, r = _expand(lo[sl], hi[sl])
+                hit = (self.repeat_prev[r] >= lower[sl][q]) & (self.repeat_day[r] < upper[sl][q])
+                n[sl] -= np.bincount(q[hit], minlength=sl.stop - sl.start)
+        return n
+
+
+def _expand(lo: np.ndarray, hi: np.ndarray):
+    """(query index, row index) pairs for every row in each query's [lo, hi) range."""
+    sizes = hi - lo
+    q = np.repeat(np.arange(len(lo)), sizes)
+    starts = np.repeat(lo - np.r_[0, np.cumsum(sizes)[:-1]], sizes)
+    return q, starts + np.arange(len(q))
+
+
+def _chunks(sizes: np.ndarray, limit: int):
+    """Consecutive query slices whose expanded pair count stays under limit."""
+    cum = np.cumsum(sizes)
+    start = 0
+    while start < len(sizes):
+        base = cum[start - 1] if start else 0
+        end = max(int(np.searchsorted(cum, base + limit, side='right')), start + 1)
+        yield slice(start, end)
+        start = end
+
+
+def _nullable(values: np.ndarray, valid: np.ndarray) -> pd.arrays.IntegerArray:
+    """Int64 array with NULL where not valid."""
+    return pd.arrays.IntegerArray(np.where(valid, values, 0).astype(np.int64), ~valid)
+
+
+class EmploymentHistory:
+    """
+    Employment history indexed for point-in-time feature computation.
+
+    Args:
+        history: DataFrame with rep_crd, firm_crd, firm_name, start_date,
+            end_date (see load_employment_history)
+        current: Optional ria_contacts_current fallback (see
+            load_current_employment), used when no history row covers the
+            as-of date, as in the SQL current_snapshot CTE
+    """
+
+    def __init__(self, history: pd.DataFrame, current: Optional[pd.DataFrame] = None):
+        self.n_rows = len(history)
+
+        # Rep index: rows sorted by (rep, start, end), CSR offsets per rep
+        self.rep_keys, rep_codes = self._codes(history['rep_crd'])
+        self.firm_keys, firm_codes = self._codes(history['firm_crd'])
+        self.day0 = self._day0(history)
+        start = self._days(history['start_date'])
+        end = self._days(history['end_date'])
+        end_sort = np.where(end < 0, _OPEN_END, end)
+
+        order = np.lexsort((end_sort, start, rep_codes))
+        self.rep_codes = rep_codes[order]
+        self.start = start[order]
+        self.end = end[order]
+        self.firm_codes = firm_codes[order]
+        self.firm_name = history['firm_name'].to_numpy(dtype=object)[order]
+        self.rep_ptr = np.searchsorted(self.rep_codes, np.arange(len(self.rep_keys) + 1))
+        self.start_month = self._months(self.start)
+        self.end_month = self._months(self.end)
+
+        # Firm index (rows with a firm only)
+        max_window = FIRM_STABILITY_LOOKBACK_MONTHS * 31 + 1
+        has_firm = self.firm_codes >= 0
+        has_start = has_firm & (self.start >= 0)
+        has_end = has_firm & (self.end >= 0)
+        self.arrivals = _FirmEvents(self.firm_codes[has_start], self.rep_codes[has_start],
+                                    self.start[has_start], max_window)
+        self.departures = _FirmEvents(self.firm_codes[has_end], self.rep_codes[has_end],
+                                      self.end[has_end], max_window)
+        self._build_active_index(has_start)
+
+        self.current = None
+        if current is not None:
+            current = current.drop_duplicates('rep_crd')
+            self.current = {
+                'keys': pd.Index(current['rep_crd']),
+                'firm_crd': np.append(current['firm_crd'].to_numpy(dtype=object), None),
+                'firm_name': np.append(current['firm_name'].to_numpy(dtype=object), None),
+                'start': np.append(self._days(current['start_date']), -1),
+            }
+
+    # ------------------------------------------------------------------
+    # Encoding helpers
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _codes(keys: pd.Series):
+        codes, uniques = pd.factorize(keys, sort=True)
+        return pd.Index(uniques), codes.astype(np.int64)
+
+    @staticmethod
+    def _day0(history: pd.DataFrame) -> np.int64:
+        starts = pd.to_datetime(history['start_date']).min()
+        base = min(starts, pd.Timestamp('1900-01-01')) if pd.notna(starts) else pd.Timestamp('1900-01-01')
+        return np.int64(base.to_datetime64().astype('datetime64[D]').astype(np.int64)) - 1
+
+    def _days(self, dates) -> np.ndarray:
+        """Offset day numbers (> 0), -1 for NULL."""
+        raw = _to_days(dates)
+        return np.where(raw == np.iinfo(np.int64).min, -1, raw - self.day0)
+
+    def _months(self, days: np.ndarray) -> np.ndarray:
+        return np.where(days >= 0, _to_months(np.maximum(days, 0) + self.day0), -1)
+
+    def _shift(self, days: np.ndarray, offset: pd.DateOffset) -> np.ndarray:
+        """Offset days minus a calendar offset (DATE_SUB), NULL stays -1."""
+        return np.where(days >= 0, _shift_days(np.maximum(days, 0) + self.day0, offset) - self.day0, -1)
+
+    def _build_active_index(self, has_start: np.ndarray) -> None:
+        """
+        Merge overlapping stints of the same rep at the same firm so the
+        active rep count at a date is #(start <= d) - #(end < d).
+
+        Rows with end < start are never active (start <= d <= end cannot
+        hold) and are dropped.
+        """
+        end = np.where(self.end < 0, _OPEN_END, self.end)
+        keep = has_start & (end >= self.start)
+        firm, rep, start, end = self.firm_codes[keep], self.rep_codes[keep], self.start[keep], end[keep]
+
+        order = np.lexsort((start, rep, firm))
+        firm, rep, start, end = firm[order], rep[order], start[order], end[order]
+        new_key = np.r_[True, (firm[1:] != firm[:-1]) | (rep[1:] != rep[:-1])]
+
+        # Running max of end within each (firm, rep): a stint starts a new
+        # merged interval when it begins after everything before it ended
+        group = np.cumsum(new_key) - 1
+        run_end = end.copy()
+        if len(end):
+            offset = group * (_DAY_SPAN + 1)
+            run_end = np.maximum.accumulate(end + offset) - offset
+        prev_end = np.r_[-1, run_end[:-1]]
+        opens = new_key | (start > prev_end)
+
+        interval = np.cumsum(opens) - 1
+        merged_start = start[opens]
+        merged_end = np.zeros(opens.sum(), dtype=np.int64)
+        if len(end):
+            np.maximum.at(merged_end, interval, end)
+        merged_firm = firm[opens]
+
+        self.active_starts = np.sort(merged_firm * _DAY_SPAN + merged_start)
+        closed = merged_end < _OPEN_END
+        self.active_ends = np.sort(merged_firm[closed] * _DAY_SPAN + merged_end[closed])
+
+    def _active_count(self, firm: np.ndarray, day: np.ndarray) -> np.ndarray:
+        """Distinct reps employed at each firm on each day."""
+        base = firm * _DAY_SPAN
+        started = np.searchsorted(self.active_starts, base + day, side='right') - np.searchsorted(self.active_starts, base, side='left')
+        ended = np.searchsorted(self.active_ends, base + day, side='left') - np.searchsorted(self.active_ends, base, side='left')
+        return started - ended
+
+    # ------------------------------------------------------------------
+    # Feature computation
+    # ------------------------------------------------------------------
+    def compute(self, crds, as_of_dates, chunk_pairs: int = _PAIR_CHUNK, flows=None) -> pd.DataFrame:
+        """
+        Compute the PIT employment features for (crd, as_of_date) pairs.
+
+        Values follow the final v4_features_pit columns: tenure and
+        industry tenure are 0 when unknown (see is_tenure_missing), rep
+        counts are NULL without a firm, flows are 0 without a firm.
+
+        Args:
+            crds: Advisor CRDs (same type as rep_crd in the history)
+            as_of_dates: As-of dates (contacted_date / prediction_date)
+            chunk_pairs: Max (pair, history row) combinations expanded at once
+            flows: Optional FirmMonthFlows; firm stability columns then use the
+                completed-month firm_month_flows windows (next model version)
+
+        Returns:
+            DataFrame aligned with the inputs, columns PIT_FEATURES
+        """
+        crds = pd.Series(crds).reset_index(drop=True)
+        days = self._days(as_of_dates)
+        rep = self.rep_keys.get_indexer(crds)
+        n = len(crds)
+
+        safe_rep = np.maximum(rep, 0)
+        lo = np.where(rep >= 0, self.rep_ptr[safe_rep], 0)
+        hi = np.where((rep >= 0) & (days >= 0), self.rep_ptr[safe_rep + 1], lo)
+
+        # history_firm + mobility, chunked over expanded (pair, history row) combinations
+        firm_row = np.full(n, -1, dtype=np.int64)
+        mobility = np.zeros(n, dtype=np.int64)
+        three_years_ago = self._shift(days, pd.DateOffset(years=MOBILITY_LOOKBACK_YEARS))
+        for sl in _chunks(hi - lo, chunk_pairs):
+            self._rep_features(lo[sl], hi[sl], days[sl], three_years_ago[sl], firm_row[sl], mobility[sl])
+
+        # current_firm: column-wise COALESCE(history, ria_contacts_current)
+        has_row = firm_row >= 0
+        row = np.maximum(firm_row, 0)
+        firm_code = np.where(has_row, self.firm_codes[row], -1) if self.n_rows else np.full(n, -1)
+        firm_crd = np.where(firm_code >= 0, self.firm_keys.to_numpy(dtype=object)[np.maximum(firm_code, 0)]
+                            if len(self.firm_keys) else None, None)
+        firm_name = np.where(has_row, self.firm_name[row] if self.n_rows else None, None)
+        firm_start = np.where(has_row, self.start[row] if self.n_rows else -1, -1)
+
+        if self.current is not None:
+            cur = self.current['keys'].get_indexer(crds)
+            cur_start = self.current['start'][cur]
+            use = (cur_start >= 0) & (days >= 0) & (cur_start <= days)
+            firm_crd = np.where(pd.isna(firm_crd) & use, self.current['firm_crd'][cur], firm_crd)
+            firm_name = np.where(pd.isna(firm_name) & use, self.current['firm_name'][cur], firm_name)
+            firm_start = np.where((firm_start < 0) & use, cur_start, firm_start)
+            firm_code = self.firm_keys.get_indexer(pd.Series(firm_crd).where(pd.notna(firm_crd)))
+
+        has_start = firm_start >= 0
+        tenure = np.where(has_start, self._months(days) - self._months(firm_start), 0)
+
+        # industry_tenure: completed stints that started before the current firm
+        industry = np.zeros(n, dtype=np.int64)
+        for sl in _chunks(np.where(has_start, hi - lo, 0), chunk_pairs):
+            industry[sl] = self._industry_tenure(lo[sl], np.where(has_start[sl], hi[sl], lo[sl]),
+                                                 days[sl], firm_start[sl])
+
+        # firm_stability (firms missing from the history count 0)
+        has_firm = pd.notna(firm_crd)
+        if flows is not None:
+            firm_features = {col: values.array for col, values in
+                             flows.as_of_features(pd.Series(firm_crd, dtype=object).where(has_firm), as_of_dates).items()}
+        else:
+            known = firm_code >= 0
+            fc = np.maximum(firm_code, 0)
+            year_ago = self._shift(days, pd.DateOffset(months=FIRM_STABILITY_LOOKBACK_MONTHS))
+            rep_count = np.where(known, self._active_count(fc, days), 0)
+            rep_count_12mo = np.where(known, self._active_count(fc, year_ago), 0)
+            departures = np.where(known, self.departures.count(fc, year_ago, days, chunk_pairs), 0)
+            arrivals = np.where(known, self.arrivals.count(fc, year_ago, days, chunk_pairs), 0)
+            firm_features = {
+                'firm_rep_count_at_contact': _nullable(rep_count, has_firm),
+                'firm_rep_count_12mo_ago': _nullable(rep_count_12mo, has_firm),
+                'firm_departures_12mo': departures,
+                'firm_arrivals_12mo': arrivals,
+                'firm_net_change_12mo': arrivals - departures,
+            }
+
+        return pd.DataFrame({
+            'firm_crd': pd.Series(firm_crd, dtype=object).where(has_firm),
+            'firm_name': pd.Series(firm_name, dtype=object).where(pd.notna(firm_name)),
+            'firm_start_date': pd.Series((firm_start + self.day0).astype('datetime64[D]')).where(has_start),
+            'tenure_months': tenure,
+            'industry_tenure_months': industry,
+            'mobility_3yr': mobility,
+            **firm_features,
+            'is_tenure_missing': (~has_start).astype(np.int64),
+        })
+
+    def _rep_features(self, lo, hi, days, three_years_ago, firm_row_out, mobility_out) -> None:
+        """Current history row and 3-year mobility for one chunk (written in place)."""
+        q, r = _expand(lo, hi)
+        day = days[q]
+        start, end = self.start[r], self.end[r]
+
+        # history_firm: latest start <= d with end NULL or >= d
+        active = (start >= 0) & (start <= day) & ((end < 0) | (end >= day))
+        qa, ra = q[active], r[active]
+        last = _last_per_group(qa)
+        firm_row_out[qa[last]] = ra[last]
+
+        # mobility: distinct firms started in (d - 3y, d]
+        moved = (start > three_years_ago[q]) & (start <= day) & (self.firm_codes[r] >= 0)
+        pairs = np.unique(q[moved] * np.int64(len(self.firm_keys) + 1) + self.firm_codes[r][moved])
+        mobility_out[:] = np.bincount(pairs // np.int64(len(self.firm_keys) + 1), minlength=len(lo))
+
+    def _industry_tenure(self, lo, hi, days, firm_start) -> np.ndarray:
+        """Months in stints that started before the current firm and ended by d."""
+        q, r = _expand(lo, hi)
+        day, start, end = days[q], self.start[r], self.end[r]
+        prior = ((start >= 0) & (start < firm_start[q])
+                 & ((end < 0) | (end <= day)))
+        end_month = np.where(end[prior] < 0, self._months(day[prior]), self.end_month[r][prior])
+        months = end_month - self.start_month[r][prior]
+        return np.bincount(q[prior], weights=months, minlength=len(lo)).astype(np.int64)
+
+
+# ============================================================================
+# SQL PARITY CHECK
+# ============================================================================
+PARITY_SQL = f"""
+WITH base AS (
+    SELECT i AS lead_id, crd AS advisor_crd, contacted_date
+    FROM UNNEST(@crds) AS crd WITH OFFSET i
+    JOIN UNNEST(@dates) AS contacted_date WITH OFFSET j ON i = j
+),
+current_firm AS (
+    SELECT
+        b.lead_id, b.contacted_date, b.advisor_crd,
+        eh.PREVIOUS_REGISTRATION_COMPANY_CRD_ID as firm_crd,
+        eh.PREVIOUS_REGISTRATION_COMPANY_START_DATE as firm_start_date,
+        DATE_DIFF(b.contacted_date, eh.PREVIOUS_REGISTRATION_COMPANY_START_DATE, MONTH) as tenure_months
+    FROM base b
+    LEFT JOIN `{HISTORY_TABLE}` eh
+        ON b.advisor_crd = eh.RIA_CONTACT_CRD_ID
+        AND eh.PREVIOUS_REGISTRATION_COMPANY_START_DATE <= b.contacted_date
+        AND (eh.PREVIOUS_REGISTRATION_COMPANY_END_DATE IS NULL
+             OR eh.PREVIOUS_REGISTRATION_COMPANY_END_DATE >= b.contacted_date)
+    QUALIFY ROW_NUMBER() OVER(
+        PARTITION BY b.lead_id
+        ORDER BY eh.PREVIOUS_REGISTRATION_COMPANY_START_DATE DESC
+    ) = 1
+)
+SELECT
+    cf.lead_id,
+    cf.firm_crd,
+    cf.tenure_months,
+    (SELECT SUM(DATE_DIFF(COALESCE(eh2.PREVIOUS_REGISTRATION_COMPANY_END_DATE, cf.contacted_date),
+                          eh2.PREVIOUS_REGISTRATION_COMPANY_START_DATE, MONTH))
+     FROM `{HISTORY_TABLE}` eh2
+     WHERE eh2.RIA_CONTACT_CRD_ID = cf.advisor_crd
+       AND eh2.PREVIOUS_REGISTRATION_COMPANY_START_DATE < cf.firm_start_date
+       AND (eh2.PREVIOUS_REGISTRATION_COMPANY_END_DATE IS NULL
+            OR eh2.PREVIOUS_REGISTRATION_COMPANY_END_DATE <= cf.contacted_date)) as industry_tenure_months,
+    (SELECT COUNT(DISTINCT eh.PREVIOUS_REGISTRATION_COMPANY_CRD_ID)
+     FROM `{HISTORY_TABLE}` eh
+     WHERE eh.RIA_CONTACT_CRD_ID = cf.advisor_crd
+       AND eh.PREVIOUS_REGISTRATION_COMPANY_START_DATE > DATE_SUB(cf.contacted_date, INTERVAL {MOBILITY_LOOKBACK_YEARS} YEAR)
+       AND eh.PREVIOUS_REGISTRATION_COMPANY_START_DATE <= cf.contacted_date) as mobility_3yr,
+    (SELECT COUNT(DISTINCT e.RIA_CONTACT_CRD_ID) FROM `{HISTORY_TABLE}` e
+     WHERE e.PREVIOUS_REGISTRATION_COMPANY_CRD_ID = cf.firm_crd
+       AND e.PREVIOUS_REGISTRATION_COMPANY_START_DATE <= cf.contacted_date
+       AND (e.PREVIOUS_REGISTRATION_COMPANY_END_DATE IS NULL
+            OR e.PREVIOUS_REGISTRATION_COMPANY_END_DATE >= cf.contacted_date)) as firm_rep_count_at_contact,
+    (SELECT COUNT(DISTINCT e.RIA_CONTACT_CRD_ID) FROM `{HISTORY_TABLE}` e
+     WHERE e.PREVIOUS_REGISTRATION_COMPANY_CRD_ID = cf.firm_crd
+       AND e.PREVIOUS_REGISTRATION_COMPANY_START_DATE <= DATE_SUB(cf.contacted_date, INTERVAL {FIRM_STABILITY_LOOKBACK_MONTHS} MONTH)
+       AND (e.PREVIOUS_REGISTRATION_COMPANY_END_DATE IS NULL
+            OR e.PREVIOUS_REGISTRATION_COMPANY_END_DATE >= DATE_SUB(cf.contacted_date, INTERVAL {FIRM_STABILITY_LOOKBACK_MONTHS} MONTH))) as firm_rep_count_12mo_ago,
+    (SELECT COUNT(DISTINCT e.RIA_CONTACT_CRD_ID) FROM `{HISTORY_TABLE}` e
+     WHERE e.PREVIOUS_REGISTRATION_COMPANY_CRD_ID = cf.firm_crd
+       AND e.PREVIOUS_REGISTRATION_COMPANY_END_DATE >= DATE_SUB(cf.contacted_date, INTERVAL {FIRM_STABILITY_LOOKBACK_MONTHS} MONTH)
+       AND e.PREVIOUS_REGISTRATION_COMPANY_END_DATE < cf.contacted_date) as firm_departures_12mo,
+    (SELECT COUNT(DISTINCT e.RIA_CONTACT_CRD_ID) FROM `{HISTORY_TABLE}` e
+     WHERE e.PREVIOUS_REGISTRATION_COMPANY_CRD_ID = cf.firm_crd
+       AND e.PREVIOUS_REGISTRATION_COMPANY_START_DATE >= DATE_SUB(cf.contacted_date, INTERVAL {FIRM_STABILITY_LOOKBACK_MONTHS} MONTH)
+       AND e.PREVIOUS_REGISTRATION_COMPANY_START_DATE < cf.contacted_date) as firm_arrivals_12mo
+FROM current_firm cf
+ORDER BY cf.lead_id
+"""
+
+PARITY_FEATURES = [
+    'firm_crd', 'tenure_months', 'industry_tenure_months', 'mobility_3yr',
+    'firm_rep_count_at_contact', 'firm_rep_count_12mo_ago',
+    'firm_departures_12mo', 'firm_arrivals_12mo'
+]
+
+
+def _firm_key(firm_crd: pd.Series) -> pd.Series:
+    """Firm CRDs as nullable strings (12, 12.0 and '12' compare equal)."""
+    numeric = pd.to_numeric(firm_crd, errors='coerce')
+    if numeric.notna().sum() == firm_crd.notna().sum():
+        return numeric.astype('Int64').astype('string')
+    return firm_crd.astype('string')
+
+
+def compare_features(engine: pd.DataFrame, sql: pd.DataFrame,
+                     features=PARITY_FEATURES) -> pd.DataFrame:
+    """
+    Per-feature mismatch counts between engine output and SQL output.
+
+    Features the final table COALESCEs to 0 are compared after filling
+    NULLs with 0. Firm-dependent features are only compared where both
+    sides picked the same firm; rows where they differ (ties on start date
+    are broken arbitrarily by ROW_NUMBER) are counted in n_firm_tie_rows.
+    """
+    engine = engine.reset_index(drop=True)
+    sql = sql.reset_index(drop=True)
+    firm_a, firm_b = _firm_key(engine['firm_crd']), _firm_key(sql['firm_crd'])
+    same_firm = ((firm_a == firm_b) | (firm_a.isna() & firm_b.isna())).to_numpy(dtype=bool, na_value=False)
+    has_firm = firm_b.notna().to_numpy()
+
+    rows = []
+    for feature in features:
+        if feature == 'firm_crd':
+            a, b = firm_a, firm_b
+        else:
+            a, b = pd.to_numeric(engine[feature], errors='coerce'), pd.to_numeric(sql[feature], errors='coerce')
+        if feature in ('tenure_months', 'industry_tenure_months', 'firm_departures_12mo', 'firm_arrivals_12mo'):
+            # COALESCE(..., 0) in the final table
+            a, b = a.fillna(0), b.fillna(0)
+        if feature == 'mobility_3yr':
+            compare = np.ones(len(sql), dtype=bool)
+        elif feature.startswith('firm_rep_count'):
+            # NULL without a firm in the final table (firm_stability only covers leads with one)
+            compare = same_firm & has_firm
+        else:
+            compare = same_firm
+        equal = ((a == b) | (a.isna() & b.isna())).to_numpy(dtype=bool, na_value=False)
+        rows.append({
+            'feature': feature,
+            'n_compared': int(compare.sum()),
+            'n_mismatch': int((~equal & compare).sum()),
+            'n_firm_tie_rows': int((~same_firm & has_firm).sum()),
+        })
+    return pd.DataFrame(rows)
+
+
+def sql_parity_check(history: EmploymentHistory, crds, as_of_dates, client=None) -> pd.DataFrame:
+    """
+    Run PARITY_SQL on BigQuery for a sample of pairs and compare with the engine.
+
+    The engine must be built without the ria_contacts_current fallback
+    (the parity SQL covers the employment-history path only).
+    """
+    from google.cloud import bigquery
+    client = client or bigquery.Client(project=PROJECT_ID)
+
+    crds = pd.Series(crds).reset_index(drop=True)
+    dates = pd.to_datetime(pd.Series(as_of_dates)).dt.date.reset_index(drop=True)
+    job_config = bigquery.QueryJobConfig(query_parameters=[
+        bigquery.ArrayQueryParameter('crds', 'INT64', crds.astype('int64').tolist()),
+        bigquery.ArrayQueryParameter('dates', 'DATE', dates.tolist()),
+    ])
+    sql = client.query(PARITY_SQL, job_config=job_config).to_dataframe()
+    return compare_features(history.compute(crds, dates), sql)
@@ -0,0 +1,284 @@
+"""
+Ranking Metrics Kernel for Lead Scoring Evaluation
+
+Sorts each score column once and derives every ranking metric from the
+cumulative positive/negative counts of that sort:
+- AUC-ROC and AUC-PR (average precision), tie-aware like sklearn
+- KS statistic (max |TPR - FPR|, same value as scipy's ks_2samp)
+- Lift at any count k or top percent
+- Decile (or any n-bin) tables
+- Precision/recall/ROC at every distinct threshold
+
+Several score columns (V3 vs V4 vs hybrid) are evaluated together: one
+argsort over the (n, m) score matrix and one cumsum along it.
+
+Usage:
+    from utils.ranking_metrics import RankingMetrics, top_n_lift
+
+    metrics = RankingMetrics(y_test, {'v4': v4_scores, 'v3': v3_scores})
+    metrics.summary()             # one row per score column
+    metrics.lift_at_percent(10)   # array, one value per column
+    metrics.decile_table('v4')    # per-decile conversions and lift
+
+    lift = top_n_lift(y_test, y_pred, n_percent=10)
+"""
+
+from typing import Dict, List, Tuple, Union
+import numpy as np
+import pandas as pd
+
+ScoreInput = Union[np.ndarray, pd.Series, pd.DataFrame, Dict[str, np.ndarray]]
+
+
+def _as_score_matrix(scores: ScoreInput) -> Tuple[np.ndarray, List[str]]:
+    """Normalize score input to an (n, m) float64 matrix and column names."""
+    if isinstance(scores, pd.DataFrame):
+        return scores.to_numpy(dtype=np.float64), [str(c) for c in scores.columns]
+    if isinstance(scores, dict):
+        names = [str(k) for k in scores]
+        return np.column_stack([np.asarray(v, dtype=np.float64) for v in scores.values()]), names
+    name = scores.name if isinstance(scores, pd.Series) and scores.name is not None else 'score'
+    values = np.asarray(scores, dtype=np.float64)
+    if values.ndim == 1:
+        return values[:, None], [str(name)]
+    return values, [f"score_{j}" for j in range(values.shape[1])]
+
+
+class RankingMetrics:
+    """
+    One-sort ranking metrics for one or more score columns.
+
+    All per-column methods return an array with one value per score column
+    (in the order given); single-column helpers below return scalars.
+    """
+
+    def __init__(self, y_true, scores: ScoreInput):
+        """
+        Args:
+            y_true: Binary outcomes (n,)
+            scores: One score vector, a DataFrame, or a dict of named score vectors
+        """
+        S, self.names = _as_score_matrix(scores)
+        y = np.asarray(y_true, dtype=np.float64).ravel()
+        if S.shape[0] != len(y):
+            raise ValueError(f"y_true has {len(y)} rows but scores have {S.shape[0]}")
+
+        self.n = len(y)
+        self.n_pos = float(y.sum())
+        self.n_neg = float(self.n - self.n_pos)
+        self.base_rate = self.n_pos / self.n if self.n else 0.0
+
+        # Single sort (descending, stable) of every column
+        order = np.argsort(-S, axis=0, kind='stable')
+        self.sorted_scores = np.take_along_axis(S, order, axis=0)
+        self.sorted_y = y[order]
+        self.tp = np.cumsum(self.sorted_y, axis=0)
+        self.fp = np.arange(1, self.n + 1, dtype=np.float64)[:, None] - self.tp
+
+        # Threshold ends: last position of each run of tied scores
+        self.is_end = np.ones_like(self.sorted_scores, dtype=bool)
+        self.is_end[:-1] = self.sorted_scores[:-1] != self.sorted_scores[1:]
+
+        # Cumulative counts at the previous threshold end (0 before the first)
+        positions = np.where(self.is_end, np.arange(self.n)[:, None], -1)
+        prev_end = np.vstack([np.full((1, S.shape[1]), -1), np.maximum.accumulate(positions, axis=0)[:-1]])
+        has_prev = prev_end >= 0
+        safe_prev = np.where(has_prev, prev_end, 0)
+        self._tp_prev = np.where(has_prev, np.take_along_axis(self.tp, safe_prev, axis=0), 0.0)
+        self._fp_prev = np.where(has_prev, np.take_along_axis(self.fp, safe_prev, axis=0), 0.0)
+
+    def _col(self, column: Union[int, str]) -> int:
+        return self.names.index(column) if isinstance(column, str) else int(column)
+
+    # ------------------------------------------------------------------
+    # Global metrics
+    # ------------------------------------------------------------------
+    def auc_roc(self) -> np.ndarray:
+        """Area under the ROC curve (trapezoidal over distinct thresholds)."""
+        if self.n_pos == 0 or self.n_neg == 0:
+            return np.full(len(self.names), np.nan)
+        area = (self.fp - self._fp_prev) * (self.tp + self._tp_prev) / 2.0
+        return np.where(self.is_end, area, 0.0).sum(axis=0) / (self.n_pos * self.n_neg)
+
+    def auc_pr(self) -> np.ndarray:
+        """Average precision (step-wise AUC-PR, matches average_precision_score)."""
+        if self.n_pos == 0:
+            return np.full(len(self.names), np.nan)
+        precision = self.tp / (self.tp + self.fp)
+        recall_step = (self.tp - self._tp_prev) / self.n_pos
+        return np.where(self.is_end, recall_step * precision, 0.0).sum(axis=0)
+
+    def ks(self) -> np.ndarray:
+        """Kolmogorov-Smirnov statistic between positive and negative score distributions."""
+        if self.n_pos == 0 or self.n_neg == 0:
+            return np.zeros(len(self.names))
+        gap = np.abs(self.tp / self.n_pos - self.fp / self.n_neg)
+        return np.where(self.is_end, gap, 0.0).max(axis=0)
+
+    # ------------------------------------------------------------------
+    # Lift
+    # ------------------------------------------------------------------
+    def lift_at_k(self, k: int) -> np.ndarray:
+        """Lift of the k highest-scored rows (ties broken by input order)."""
+        k = int(k)
+        if k <= 0 or self.base_rate == 0:
+            return np.zeros(len(self.names))
+        k = min(k, self.n)
+        return (self.tp[k - 1] / k) / self.base_rate
+
+    def count_at_threshold(self, thresholds) -> np.ndarray:
+        """Number of rows with score >= threshold, per column."""
+        thresholds = np.broadcast_to(np.asarray(thresholds, dtype=np.float64), (len(self.names),))
+        return np.array([
+            np.searchsorted(-self.sorted_scores[:, j], -thresholds[j], side='right')
+            for j in range(len(self.names))
+        ])
+
+    def percentile(self, q: float) -> np.ndarray:
+        """np.percentile (linear) of each score column, from the sorted scores."""
+        pos = q / 100.0 * (self.n - 1)
+        lo, hi = int(np.floor(pos)), int(np.ceil(pos))
+        ascending_lo = self.sorted_scores[self.n - 1 - lo]
+        ascending_hi = self.sorted_scores[self.n - 1 - hi]
+        return ascending_lo + (ascending_hi - ascending_lo) * (pos - lo)
+
+    def lift_at_percent(self, n_percent: float) -> np.ndarray:
+        """
+        Lift of rows scoring at or above the (100 - n_percent) percentile.
+
+        Same rule as Phase 6 calculate_top_n_lift: ties at the cut are included.
+        """
+        if self.n == 0 or self.base_rate == 0:
+            return np.full(len(self.names), np.nan)
+        counts = self.count_at_threshold(self.percentile(100 - n_percent))
+        cols = np.arange(len(self.names))
+        rates = self.tp[np.maximum(counts, 1) - 1, cols] / np.maximum(counts, 1)
+        return np.where(counts > 0, rates / self.base_rate, np.nan)
+
+    def top_decile_lift(self) -> np.ndarray:
+        """Lift of the top len // 10 rows (head of the sorted list)."""
+        return self.lift_at_k(self.n // 10) if self.n >= 10 else np.zeros(len(self.names))
+
+    # ------------------------------------------------------------------
+    # Tables and curves
+    # ------------------------------------------------------------------
+    def bin_positions(self, n_bins: int = 10, remainder: str = 'spread') -> np.ndarray:
+        """
+        Bin index (0 = highest scores) for each sorted position.
+
+        Args:
+            n_bins: Number of bins
+            remainder: 'spread' - position i goes to floor(i / (n / n_bins))
+                       (Phase 8 rule); 'last' - equal bins of n // n_bins
+                       with the remainder in the last bin
+        """
+        positions = np.arange(self.n)
+        if remainder == 'last':
+            size = max(self.n // n_bins, 1)
+            return np.minimum(positions // size, n_bins - 1)
+        return np.minimum((positions // (self.n / n_bins)).astype(int), n_bins - 1)
+
+    def decile_table(self, column: Union[int, str] = 0, n_bins: int = 10,
+                     remainder: str = 'spread') -> pd.DataFrame:
+        """
+        Per-bin leads, conversions, average score, conversion rate and lift.
+
+        Bins are numbered so bin n_bins holds the highest scores (as in
+        Phase 8's lift by decile); rows are ordered by bin ascending.
+        """
+        j = self._col(column)
+        bins = self.bin_positions(n_bins, remainder)
+        n_leads = np.bincount(bins, minlength=n_bins)
+        n_conv = np.bincount(bins, weights=self.sorted_y[:, j], minlength=n_bins)
+        score_sum = np.bincount(bins, weights=self.sorted_scores[:, j], minlength=n_bins)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            conv_rate = np.where(n_leads > 0, n_conv / n_leads, 0.0)
+            avg_score = np.where(n_leads > 0, score_sum / n_leads, np.nan)
+        lift = conv_rate / self.base_rate if self.base_rate > 0 else np.zeros(n_bins)
+
+        table = pd.DataFrame({
+            'decile': n_bins - np.arange(n_bins),
+            'n_leads': n_leads,
+            'n_conversions': np.rint(n_conv).astype(np.int64),
+            'avg_score': avg_score,
+            'conv_rate': conv_rate,
+            'lift': lift
+        })
+        table = table[table['n_leads'] > 0]
+        return table.sort_values('decile').reset_index(drop=True)
+
+    def roc_curve(self, column: Union[int, str] = 0) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(fpr, tpr, thresholds) at every distinct threshold."""
+        j = self._col(column)
+        end = self.is_end[:, j]
+        return (self.fp[end, j] / self.n_neg if self.n_neg else self.fp[end, j] * np.nan,
+                self.tp[end, j] / self.n_pos if self.n_pos else self.tp[end, j] * np.nan,
+                self.sorted_scores[end, j])
+
+    def precision_recall_curve(self, column: Union[int, str] = 0) -> pd.DataFrame:
+        """Precision, recall, list size and lift at every distinct threshold."""
+        j = self._col(column)
+        end = self.is_end[:, j]
+        tp = self.tp[end, j]
+        n_selected = tp + self.fp[end, j]
+        precision = tp / n_selected
+        return pd.DataFrame({
+            'threshold': self.sorted_scores[end, j],
+            'n_selected': n_selected.astype(np.int64),
+            'true_positives': tp.astype(np.int64),
+            'precision': precision,
+            'recall': tp / self.n_pos if self.n_pos else np.nan,
+            'lift': precision / self.base_rate if self.base_rate else np.nan
+        })
+
+    def summary(self, lift_percents: Tuple[float, ...] = (5, 10, 20)) -> pd.DataFrame:
+        """One row per score column with AUCs, KS and lift at each percent."""
+        table = pd.DataFrame({
+            'score': self.names,
+            'auc_roc': self.auc_roc(),
+            'auc_pr': self.auc_pr(),
+            'ks': self.ks()
+        })
+        for pct in lift_percents:
+            table[f'lift_top_{pct:g}pct'] = self.lift_at_percent(pct)
+        return table
+
+
+# =============================================================================
+# Single-column helpers (scalar results)
+# =============================================================================
+def auc_roc(y_true, y_score) -> float:
+    """AUC-ROC of one score vector."""
+    return float(RankingMetrics(y_true, y_score).auc_roc()[0])
+
+
+def auc_pr(y_true, y_score) -> float:
+    """Average precision of one score vector."""
+    return float(RankingMetrics(y_true, y_score).auc_pr()[0])
+
+
+def ks_statistic(y_true, y_score) -> float:
+    """KS statistic of one score vector."""
+    return float(RankingMetrics(y_true, y_score).ks()[0])
+
+
+def top_n_lift(y_true, y_score, n_percent: float = 10):
+    """Lift in the top n_percent (threshold rule, ties included); None if no positives."""
+    metrics = RankingMetrics(y_true, y_score)
+    if metrics.n == 0 or metrics.base_rate == 0:
+        return None
+    return float(metrics.lift_at_percent(n_percent)[0])
+
+
+def top_decile_lift(y_true, y_score) -> float:
+    """Lift of the top len // 10 rows; 0.0 when undefined."""
+    metrics = RankingMetrics(y_true, y_score)
+    if metrics.n < 10 or metrics.base_rate == 0:
+        return 0.0
+    return float(metrics.top_decile_lift()[0])
+
+
+def lift_by_decile(y_true, y_score, n_deciles: int = 10, remainder: str = 'spread') -> pd.DataFrame:
+    """Decile table of one score vector (decile n_deciles = highest scores)."""
+    return RankingMetrics(y_true, y_score).decile_table(0, n_deciles, remainder)
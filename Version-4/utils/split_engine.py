@@ -0,0 +1,256 @@
+"""
+Split Engine for Version 4 Lead Scoring Model
+
+Vectorized temporal split and CV fold assignment. Phase 5 builds a compact
+split manifest (lead_id -> split, cv_fold) once and persists it as Parquet;
+Phases 6-9 load the manifest instead of re-deriving the split.
+
+Usage:
+    from utils.split_engine import build_split_manifest, save_split_manifest, load_split_frame
+
+    manifest = build_split_manifest(df, TRAINING_START_DATE, TRAINING_END_DATE,
+                                    TEST_START_DATE, TEST_END_DATE)
+    save_split_manifest(manifest, BASE_DIR / "data" / "splits")
+
+    train_df = load_split_frame(BASE_DIR / "data" / "splits", "TRAIN")
+"""
+
+from pathlib import Path
+from typing import Tuple, Union
+import numpy as np
+import pandas as pd
+
+MANIFEST_FILENAME = "split_manifest.parquet"
+FEATURES_FILENAME = "features.parquet"
+
+# Label for each interval between the sorted boundaries
+# [train_start, train_end], (train_end, test_start), [test_start, test_end]
+SPLIT_LABELS = np.array(['EXCLUDE', 'TRAIN', 'EXCLUDE', 'TEST', 'EXCLUDE'])
+
+_ONE_NS = np.timedelta64(1, 'ns')
+
+
+def _to_datetime64(values) -> np.ndarray:
+    """Convert dates (Series, array or list) to a datetime64[ns] array."""
+    return pd.to_datetime(pd.Series(values)).to_numpy(dtype='datetime64[ns]')
+
+
+def split_boundaries(train_start, train_end, test_start, test_end) -> np.ndarray:
+    """
+    Build the sorted boundary array used by assign_splits.
+
+    End dates are inclusive, so the boundary is placed 1ns after them.
+
+    Args:
+        train_start: First training date (inclusive)
+        train_end: Last training date (inclusive)
+        test_start: First test date (inclusive)
+        test_end: Last test date (inclusive)
+
+    Returns:
+        datetime64[ns] array of 4 boundaries
+    """
+    return np.array([
+        np.datetime64(pd.Timestamp(train_start), 'ns'),
+        np.datetime64(pd.Timestamp(train_end), 'ns') + _ONE_NS,
+        np.datetime64(pd.Timestamp(test_start), 'ns'),
+        np.datetime64(pd.Timestamp(test_end), 'ns') + _ONE_NS,
+    ])
+
+
+def assign_splits(contacted_dates, boundaries: np.ndarray) -> np.ndarray:
+    """
+    Assign TRAIN/TEST/EXCLUDE labels with a single searchsorted call.
+
+    Args:
+        contacted_dates: Contact dates (Series or array)
+        boundaries: Output of split_boundaries()
+
+    Returns:
+        Array of split labels (missing dates are EXCLUDE)
+    """
+    dates = _to_datetime64(contacted_dates)
+    idx = np.searchsorted(boundaries, dates, side='right')
+    # NaT sorts last, but make it explicit
+    idx[np.isnat(dates)] = len(SPLIT_LABELS) - 1
+    return SPLIT_LABELS[idx]
+
+
+def assign_cv_folds(contacted_dates, is_train, n_folds: int = 5,
+                    gap_days: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Assign time-ordered, gap-aware CV folds in one vectorized pass.
+
+    Folds are equal-count quantiles of the training contact dates. Fold
+    boundaries are dates, so all leads contacted on the same day land in the
+    same fold. Leads contacted within gap_days before the start of the next
+    fold are flagged as embargoed: they are dropped from the training window
+    when that next fold is used for validation.
+
+    Args:
+        contacted_dates: Contact dates (Series or array)
+        is_train: Boolean mask of TRAIN rows
+        n_folds: Number of folds
+        gap_days: Embargo window (days) before each fold start
+
+    Returns:
+        Tuple of (cv_fold int8 array, 1-indexed with 0 for non-train rows,
+                  cv_embargo bool array)
+    """
+    dates = _to_datetime64(contacted_dates)
+    is_train = np.asarray(is_train, dtype=bool)
+
+    cv_fold = np.zeros(len(dates), dtype=np.int8)
+    cv_embargo = np.zeros(len(dates), dtype=bool)
+
+    train_dates = dates[is_train]
+    n_train = len(train_dates)
+    if n_train == 0:
+        return cv_fold, cv_embargo
+
+    sorted_dates = np.sort(train_dates)
+    cut_positions = (np.arange(1, n_folds) * n_train) // n_folds
+    fold_starts = sorted_dates[cut_positions]
+
+    train_folds = np.searchsorted(fold_starts, train_dates, side='right')
+    cv_fold[is_train] = train_folds + 1
+
+    if gap_days > 0 and len(fold_starts) > 0:
+        # Start of the fold that follows each row's fold (none for the last fold)
+        next_start = np.append(fold_starts.astype(np.int64), np.iinfo(np.int64).max)[train_folds]
+        gap_ns = np.int64(gap_days) * np.int64(86_400 * 10**9)
+        cv_embargo[is_train] = train_dates.astype(np.int64) >= next_start - gap_ns
+
+    return cv_fold, cv_embargo
+
+
+def cv_train_mask(cv_fold, cv_embargo, valid_fold: int) -> np.ndarray:
+    """
+    Expanding-window training mask for a validation fold.
+
+    Uses all folds before valid_fold, minus the embargoed tail of the fold
+    immediately preceding it.
+    """
+    cv_fold = np.asarray(cv_fold)
+    cv_embargo = np.asarray(cv_embargo, dtype=bool)
+    mask = (cv_fold > 0) & (cv_fold < valid_fold)
+    return mask & ~((cv_fold == valid_fold - 1) & cv_embargo)
+
+
+def build_split_manifest(df: pd.DataFrame, train_start, train_end, test_start, test_end,
+                         n_folds: int = 5, gap_days: int = 0,
+                         date_col: str = 'contacted_date',
+                         id_col: str = 'lead_id') -> pd.DataFrame:
+    """
+    Build the compact split manifest for a feature frame.
+
+    Args:
+        df: Feature frame with id_col and date_col
+        train_start, train_end, test_start, test_end: Split boundaries (inclusive)
+        n_folds: Number of time-based CV folds
+        gap_days: CV embargo window in days
+
+    Returns:
+        DataFrame with lead_id, split (category), cv_fold (int8),
+        cv_embargo (bool) and contacted_date, in the row order of df
+    """
+    boundaries = split_boundaries(train_start, train_end, test_start, test_end)
+    split = assign_splits(df[date_col], boundaries)
+    cv_fold, cv_embargo = assign_cv_folds(df[date_col], split == 'TRAIN', n_folds, gap_days)
+
+    return pd.DataFrame({
+        id_col: df[id_col].to_numpy(),
+        'split': pd.Categorical(split, categories=['TRAIN', 'TEST', 'EXCLUDE']),
+        'cv_fold': cv_fold,
+        'cv_embargo': cv_embargo,
+        date_col: _to_datetime64(df[date_col]),
+    })
+
+
+def save_split_manifest(manifest: pd.DataFrame, splits_dir: Path,
+                        features: pd.DataFrame = None) -> Path:
+    """
+    Persist the manifest (and optionally the feature snapshot) as Parquet.
+
+    Args:
+        manifest: Output of build_split_manifest()
+        splits_dir: Directory for split artifacts
+        features: Optional feature frame, saved once so later phases only
+            need the manifest to select rows
+
+    Returns:
+        Path to the manifest file
+    """
+    splits_dir = Path(splits_dir)
+    splits_dir.mkdir(parents=True, exist_ok=True)
+
+    manifest_path = splits_dir / MANIFEST_FILENAME
+    manifest.to_parquet(manifest_path, index=False, compression='zstd')
+
+    if features is not None:
+        features.drop(columns=['split', 'cv_fold', 'cv_embargo'], errors='ignore').to_parquet(
+            splits_dir / FEATURES_FILENAME, index=False, compression='zstd'
+        )
+
+    return manifest_path
+
+
+def load_split_manifest(splits_dir: Path) -> pd.DataFrame:
+    """Load the split manifest written by Phase 5."""
+    return pd.read_parquet(Path(splits_dir) / MANIFEST_FILENAME)
+
+
+def load_split_frame(splits_dir: Path, split: Union[str, None] = None,
+                     columns: list = None, dtype_plan=None) -> pd.DataFrame:
+    """
+    Load features joined to the split manifest, filtered to one split.
+
+    Falls back to the legacy train.csv/test.csv files when no manifest has
+    been written yet.
+
+    Args:
+        splits_dir: Directory for split artifacts (data/splits)
+        split: 'TRAIN', 'TEST', 'EXCLUDE' or None for all rows
+        columns: Optional subset of feature columns to read
+        dtype_plan: Optional FeatureDtypePlan applied as the frame is loaded
+
+    Returns:
+        DataFrame with feature columns plus split, cv_fold and cv_embargo
+    """
+    splits_dir = Path(splits_dir)
+    manifest_path = splits_dir / MANIFEST_FILENAME
+    features_path = splits_dir / FEATURES_FILENAME
+
+    if not (manifest_path.exists() and features_path.exists()):
+        if split is None:
+            legacy = pd.concat(
+                [pd.read_csv(splits_dir / "train.csv"), pd.read_csv(splits_dir / "test.csv")],
+                ignore_index=True
+            )
+        else:
+            legacy = pd.read_csv(splits_dir / f"{split.lower()}.csv")
+        return dtype_plan.apply(legacy) if dtype_plan is not None else legacy
+
+    manifest = load_split_manifest(splits_dir)
+    if columns is not None:
+        columns = list(dict.fromkeys(['lead_id'] + list(columns)))
+    features = pd.read_parquet(features_path, columns=columns)
+
+    if len(features) == len(manifest) and np.array_equal(
+        features['lead_id'].to_numpy(), manifest['lead_id'].to_numpy()
+    ):
+        # Written together by Phase 5 - rows are aligned, no join needed
+        for col in ['split', 'cv_fold', 'cv_embargo']:
+            features[col] = manifest[col].to_numpy()
+    else:
+        features = features.merge(
+            manifest[['lead_id', 'split', 'cv_fold', 'cv_embargo']], on='lead_id', how='inner'
+        )
+
+    if split is not None:
+        features = features[features['split'].to_numpy() == split].reset_index(drop=True)
+
+    features['split'] = features['split'].astype(str)
+    if dtype_plan is not None:
+        dtype_plan.apply(features)
+    return features
@@ -0,0 +1,290 @@
+"""
+Threshold Sweep Engine for V4 Deprioritize / Upgrade Cuts
+
+Evaluates every candidate V4 percentile cut (or every distinct score) from
+one sort and cumulative sums instead of re-counting `scores >= t` per
+threshold:
+1. Percentile sweep: list size, conversion rate, lift and conversions lost
+   above/below each cut, with bootstrap bands
+2. Deprioritize recommendation: the largest bottom cut that keeps
+   conversions lost under LeadListConfig.MAX_DEPRIORITIZE_CONVERSION_LOSS
+3. Joint upgrade sweep: the V4_UPGRADE cut evaluated against the V3 tier
+   quotas and list size of the monthly hybrid list
+
+Bootstrap bands use Poisson(1) row weights with the cut positions held
+fixed, so each replicate is one weighted cumsum - no re-sorting.
+
+Usage:
+    from utils.threshold_sweep import ThresholdSweep, joint_upgrade_sweep
+
+    sweep = ThresholdSweep(y_test, v4_scores)
+    table = sweep.percentile_sweep()
+    cut = sweep.recommend_deprioritize()
+
+    joint = joint_upgrade_sweep(y_test, v4_scores, df['score_tier'])
+"""
+
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+
+from config.constants import LeadListConfig
+from utils.ranking_metrics import RankingMetrics
+
+_BAND = (5, 95)
+_CHUNK = 50  # Bootstrap replicates per weight matrix
+
+
+def v4_percentiles(scores) -> np.ndarray:
+    """Percentile ranks (1-100) - same rule as LeadScorerV4.get_percentiles."""
+    scores = np.asarray(scores, dtype=np.float64)
+    ascending = np.sort(scores)
+    rank_min = np.searchsorted(ascending, scores, side='left') + 1
+    return ((rank_min / len(scores)) * 100).astype(int)
+
+
+def _poisson_weights(rng: np.random.Generator, n_rows: int, n_bootstrap: int):
+    """Yield (chunk, n) Poisson(1) bootstrap weight matrices."""
+    for start in range(0, n_bootstrap, _CHUNK):
+        size = min(_CHUNK, n_bootstrap - start)
+        yield rng.poisson(1.0, size=(size, n_rows)).astype(np.float32)
+
+
+def _band(values: np.ndarray) -> np.ndarray:
+    """(2, k) array of lower/upper percentile bands over replicates (axis 0)."""
+    return np.nanpercentile(values, _BAND, axis=0)
+
+
+class ThresholdSweep:
+    """
+    O(n log n) sweep over V4 percentile cuts with bootstrap bands.
+
+    Usage:
+        sweep = ThresholdSweep(y_true, scores, n_bootstrap=200)
+        table = sweep.percentile_sweep(range(1, 100))
+        curve = sweep.score_sweep()
+    """
+
+    def __init__(self, y_true, scores, n_bootstrap: int = LeadListConfig.N_BOOTSTRAP,
+                 random_state: int = 42):
+        """
+        Args:
+            y_true: Binary outcomes
+            scores: V4 scores
+            n_bootstrap: Bootstrap replicates for the bands (0 disables)
+            random_state: Seed for the bootstrap weights
+        """
+        self.metrics = RankingMetrics(y_true, scores)
+        self.n = self.metrics.n
+        self.n_bootstrap = n_bootstrap
+        self.random_state = random_state
+
+        self.y_sorted = self.metrics.sorted_y[:, 0]
+        self.cum_y = self.metrics.tp[:, 0]
+        # Percentile of each row in descending score order (non-increasing)
+        self.pct_sorted = v4_percentiles(self.metrics.sorted_scores[:, 0])
+
+    def rows_at_or_above(self, percentiles) -> np.ndarray:
+        """Number of rows with v4_percentile >= each cut."""
+        return np.searchsorted(-self.pct_sorted, -np.asarray(percentiles), side='right')
+
+    def percentile_sweep(self, percentiles=range(1, 100)) -> pd.DataFrame:
+        """
+        Tradeoffs at every percentile cut.
+
+        Upgrade side columns (percentile >= cut) are prefixed 'top_'; the
+        deprioritize side (percentile <= cut) is prefixed 'bottom_'.
+        Efficiency is the share of leads removed per share of conversions lost.
+        """
+        cuts = np.asarray(list(percentiles))
+        n_top = self.rows_at_or_above(cuts)
+        n_bottom = self.n - self.rows_at_or_above(cuts + 1)
+        total_conv = self.cum_y[-1]
+        base = total_conv / self.n
+
+        conv_top = np.where(n_top > 0, self.cum_y[np.maximum(n_top, 1) - 1], 0.0)
+        conv_above_bottom = np.where(self.n - n_bottom > 0,
+                                     self.cum_y[np.maximum(self.n - n_bottom, 1) - 1], 0.0)
+        conv_bottom = total_conv - conv_above_bottom
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            table = pd.DataFrame({
+                'percentile': cuts,
+                'top_n': n_top,
+                'top_pct_of_leads': n_top / self.n * 100,
+                'top_conversions': conv_top.astype(np.int64),
+                'top_conv_rate': conv_top / n_top,
+                'top_lift': conv_top / n_top / base,
+                'top_recall': conv_top / total_conv,
+                'bottom_n': n_bottom,
+                'bottom_pct_of_leads': n_bottom / self.n * 100,
+                'bottom_conv_rate': conv_bottom / n_bottom,
+                'bottom_lift': conv_bottom / n_bottom / base,
+                'conversions_lost_pct': conv_bottom / total_conv * 100,
+                'efficiency': (n_bottom / self.n) / (conv_bottom / total_conv),
+            })
+
+        if self.n_bootstrap > 0:
+            bands = self._bootstrap_bands(n_top, n_bottom)
+            for name, band in bands.items():
+                table[f'{name}_lo'] = band[0]
+                table[f'{name}_hi'] = band[1]
+        return table
+
+    def _bootstrap_bands(self, n_top: np.ndarray, n_bottom: np.ndarray) -> Dict[str, np.ndarray]:
+        """Bands for top/bottom conversion rate and lift at fixed cut positions."""
+        rng = np.random.default_rng(self.random_state)
+        top_idx = np.maximum(n_top, 1) - 1
+        split_idx = self.n - n_bottom - 1  # Last row above the bottom group (-1 = none)
+        replicates = {'top_conv_rate': [], 'top_lift': [], 'bottom_conv_rate': [], 'bottom_lift': []}
+
+        for W in _poisson_weights(rng, self.n, self.n_bootstrap):
+            cw = np.cumsum(W, axis=1)
+            cwy = np.cumsum(W * self.y_sorted, axis=1)
+            base = cwy[:, -1:] / cw[:, -1:]
+            above_w = np.where(split_idx >= 0, cw[:, np.maximum(split_idx, 0)], 0.0)
+            above_wy = np.where(split_idx >= 0, cwy[:, np.maximum(split_idx, 0)], 0.0)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                top_rate = np.where(n_top > 0, cwy[:, top_idx] / cw[:, top_idx], np.nan)
+                bottom_rate = (cwy[:, -1:] - above_wy) / (cw[:, -1:] - above_w)
+            replicates['top_conv_rate'].append(top_rate)
+            replicates['top_lift'].append(top_rate / base)
+            replicates['bottom_conv_rate'].append(bottom_rate)
+            replicates['bottom_lift'].append(bottom_rate / base)
+
+        return {name: _band(np.vstack(values)) for name, values in replicates.items()}
+
+    def score_sweep(self) -> pd.DataFrame:
+        """Precision, recall, list size and lift at every distinct score."""
+        return self.metrics.precision_recall_curve(0)
+
+    def recommend_deprioritize(self, table: pd.DataFrame = None,
+                               max_conversion_loss: float = LeadListConfig.MAX_DEPRIORITIZE_CONVERSION_LOSS
+                               ) -> Optional[int]:
+        """
+        Largest bottom cut whose deprioritized leads hold at most
+        max_conversion_loss of conversions (upper band when available).
+        """
+        table = table if table is not None else self.percentile_sweep()
+        lost = table['conversions_lost_pct'] / 100
+        if 'bottom_conv_rate_hi' in table.columns:
+            # Conversions lost if the bottom group converts at its upper band
+            lost = table['bottom_conv_rate_hi'] * table['bottom_n'] / self.cum_y[-1]
+        eligible = table.loc[lost <= max_conversion_loss, 'percentile']
+        return int(eligible.max()) if len(eligible) else None
+
+
+def joint_upgrade_sweep(y_true, scores, tiers, percentiles=range(50, 100),
+                        tier_quotas: Dict[str, int] = None,
+                        list_order: List[str] = None,
+                        list_size: int = LeadListConfig.LIST_SIZE,
+                        quota_scale: float = 1.0,
+                        n_bootstrap: int = LeadListConfig.N_BOOTSTRAP,
+                        random_state: int = 42) -> pd.DataFrame:
+    """
+    Sweep the V4 upgrade cut against the V3 tier quotas.
+
+    STANDARD leads at or above the cut become V4_UPGRADE. Each tier keeps
+    its highest-V4 leads up to its quota, tiers are stacked in list order
+    and the list is truncated to list_size - so a lower cut only helps if
+    upgraded leads convert better than the tier rows they displace.
+
+    Args:
+        y_true: Binary outcomes
+        scores: V4 scores
+        tiers: V3 score_tier per lead
+        percentiles: Candidate upgrade cuts
+        tier_quotas: Leads per final tier (default LeadListConfig.TIER_QUOTAS)
+        list_order: Final tier priority (default LeadListConfig.LIST_ORDER)
+        list_size: Final list size (LIMIT)
+        quota_scale: Multiplier on quotas and list size (e.g. historical
+            volume / monthly prospect volume)
+        n_bootstrap: Bootstrap replicates for list conversion rate bands
+
+    Returns:
+        DataFrame with one row per cut: upgrade eligibility/selection,
+        upgrade conversion rate, list size, conversions, conversion rate
+        (with bands) and rows displaced from lower tiers
+    """
+    tier_quotas = tier_quotas or LeadListConfig.TIER_QUOTAS
+    list_order = list_order or LeadListConfig.LIST_ORDER
+    y = np.asarray(y_true, dtype=np.float64)
+    scores = np.asarray(scores, dtype=np.float64)
+    tiers = np.asarray(pd.Series(tiers).fillna('STANDARD').astype(str))
+    pct = v4_percentiles(scores)
+
+    # Group rows by list tier (STANDARD as the upgrade pool), highest V4 first
+    groups = list(list_order)
+    pool = {name: np.flatnonzero(tiers == name) for name in groups if name != 'V4_UPGRADE'}
+    pool['V4_UPGRADE'] = np.flatnonzero(tiers == 'STANDARD')
+    order = {name: rows[np.argsort(-scores[rows], kind='stable')] for name, rows in pool.items()}
+
+    quotas = np.array([int(round(tier_quotas.get(name, 0) * quota_scale)) for name in groups])
+    limit = int(round(list_size * quota_scale))
+    upgrade_pos = groups.index('V4_UPGRADE')
+    cuts = np.asarray(list(percentiles))
+
+    # Rows taken per tier for every cut: (n_cuts, n_tiers), then apply LIMIT in list order
+    available = np.array([len(order[name]) for name in groups])
+    taken = np.tile(np.minimum(quotas, available), (len(cuts), 1))
+    upgrade_pct = pct[order['V4_UPGRADE']]
+    eligible = (upgrade_pct[None, :] >= cuts[:, None]).sum(axis=1)
+    taken[:, upgrade_pos] = np.minimum(quotas[upgrade_pos], eligible)
+    before = np.cumsum(taken, axis=1) - taken
+    in_list = np.clip(limit - before, 0, taken)
+    # V3 tier rows in the list with no upgrades, to count displacement
+    baseline = np.minimum(quotas, available)
+    baseline[upgrade_pos] = 0
+    baseline_in_list = np.clip(limit - (np.cumsum(baseline) - baseline), 0, baseline).sum()
+
+    def list_conversions(weights: np.ndarray):
+        """Weighted (leads, conversions) of the assembled list per cut."""
+        leads = np.zeros((weights.shape[0], len(cuts)))
+        conv = np.zeros_like(leads)
+        for j, name in enumerate(groups):
+            rows = order[name]
+            w = weights[:, rows]
+            cw = np.concatenate([np.zeros((len(w), 1)), np.cumsum(w, axis=1)], axis=1)
+            cwy = np.concatenate([np.zeros((len(w), 1)), np.cumsum(w * y[rows], axis=1)], axis=1)
+            leads += cw[:, in_list[:, j]]
+            conv += cwy[:, in_list[:, j]]
+        return leads, conv
+
+    leads, conv = list_conversions(np.ones((1, len(y))))
+    upgrade_rows = order['V4_UPGRADE']
+    cum_upgrade = np.concatenate([[0.0], np.cumsum(y[upgrade_rows])])
+    n_upgrade = in_list[:, upgrade_pos]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        table = pd.DataFrame({
+            'percentile': cuts,
+            'upgrade_eligible': eligible,
+            'upgrade_in_list': n_upgrade,
+            'upgrade_conv_rate': cum_upgrade[n_upgrade] / n_upgrade,
+            'list_size': leads[0].astype(np.int64),
+            'list_conversions': conv[0].astype(np.int64),
+            'list_conv_rate': conv[0] / leads[0],
+            'displaced_tier_rows': baseline_in_list - (in_list.sum(axis=1) - n_upgrade),
+        })
+
+    if n_bootstrap > 0:
+        rng = np.random.default_rng(random_state)
+        rates = []
+        for W in _poisson_weights(rng, len(y), n_bootstrap):
+            b_leads, b_conv = list_conversions(W)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                rates.append(b_conv / b_leads)
+        band = _band(np.vstack(rates))
+        table['list_conv_rate_lo'] = band[0]
+        table['list_conv_rate_hi'] = band[1]
+
+    return table
+
+
+def recommend_upgrade(joint: pd.DataFrame) -> Optional[int]:
+    """Cut with the highest list conversion rate (highest cut on ties)."""
+    valid = joint.dropna(subset=['list_conv_rate'])
+    if len(valid) == 0:
+        return None
+    best = valid['list_conv_rate'].max()
+    return int(valid.loc[np.isclose(valid['list_conv_rate'], best), 'percentile'].max())
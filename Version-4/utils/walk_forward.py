@@ -0,0 +1,236 @@
+"""
+Walk-Forward Backtest Engine for Version 4 Lead Scoring Model
+
+Rolling-origin backtest over the point-in-time feature table (v4_features_pit
+or a Parquet export of it). For each monthly origin:
+1. Train V4 on leads contacted in the trailing window, ending a maturity gap
+   before the origin (only outcomes that were observable at the origin)
+2. Score leads contacted in the month starting at the origin
+3. Record V4 AUC/lift and, when a V3 tier column is present, V3 tier
+   AUC/lift on the same leads
+
+The frame is sorted by contact date and encoded into one float32 matrix up
+front; every window is a contiguous row range of that shared matrix, so
+parallel window threads never copy the feature table. Trained boosters are
+cached on disk by a hash of the window contents and parameters.
+
+Usage:
+    from utils.walk_forward import WalkForwardBacktest, load_pit_features
+
+    df = load_pit_features(BASE_DIR / "data" / "v4_features_pit.parquet")
+    backtest = WalkForwardBacktest(df, final_features, cache_dir=BacktestConfig.CACHE_DIR)
+    results = backtest.run()
+"""
+
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from sklearn.metrics import roc_auc_score
+
+from config.constants import (
+    PROJECT_ID,
+    DATASET_ML,
+    MATURITY_WINDOW_DAYS,
+    BacktestConfig,
+    V3_TIER_PRIORITY
+)
+from utils.overfitting_engine import build_model_params, prepare_matrix
+from utils.ranking_metrics import top_n_lift
+
+
+def load_pit_features(source: Union[str, Path], client=None, dtype_plan=None) -> pd.DataFrame:
+    """
+    Load the point-in-time feature table.
+
+    Args:
+        source: Path to a Parquet export, or a BigQuery table name
+            (e.g. "v4_features_pit" in the ML dataset)
+        client: Optional BigQuery client (created on demand)
+        dtype_plan: Optional FeatureDtypePlan applied as the table is loaded
+
+    Returns:
+        DataFrame with contacted_date parsed as datetime
+    """
+    path = Path(source)
+    if path.suffix == '.parquet' or path.is_dir():
+        df = pd.read_parquet(path)
+    else:
+        from google.cloud import bigquery
+        client = client or bigquery.Client(project=PROJECT_ID)
+        table = str(source) if '.' in str(source) else f"{PROJECT_ID}.{DATASET_ML}.{source}"
+        df = client.query(f"SELECT * FROM `{table}`").to_dataframe()
+
+    df['contacted_date'] = pd.to_datetime(df['contacted_date'])
+    if dtype_plan is not None:
+        dtype_plan.apply(df)
+    return df
+
+
+def v3_tier_scores(tiers: pd.Series) -> np.ndarray:
+    """Map V3 tier names to an ordinal score (higher = better priority)."""
+    worst = max(V3_TIER_PRIORITY.values())
+    priority = tiers.map(V3_TIER_PRIORITY).fillna(worst).to_numpy(dtype=np.float32)
+    return worst + 1 - priority
+
+
+class WalkForwardBacktest:
+    """
+    Rolling-origin V4 retraining backtest with V3 tiers side by side.
+
+    Usage:
+        backtest = WalkForwardBacktest(df, features, train_months=12)
+        results = backtest.run(start="2024-08-01", end="2025-10-01")
+    """
+
+    def __init__(self, df: pd.DataFrame, feature_list: List[str],
+                 target_col: str = 'target',
+                 v3_tier_col: str = 'score_tier',
+                 train_months: int = BacktestConfig.TRAIN_WINDOW_MONTHS,
+                 gap_days: int = MATURITY_WINDOW_DAYS,
+                 cache_dir: Path = None,
+                 n_jobs: int = None):
+        """
+        Args:
+            df: Point-in-time features with contacted_date and target
+            feature_list: V4 model features
+            target_col: Binary target column
+            v3_tier_col: V3 tier column (skipped if absent)
+            train_months: Trailing training window length
+            gap_days: Days between the end of training and the origin
+            cache_dir: Directory for cached boosters (None disables caching;
+                BacktestConfig.CACHE_DIR is the standard location)
+            n_jobs: Parallel windows (default: number of CPUs)
+        """
+        self.feature_list = list(feature_list)
+        self.train_months = train_months
+        self.gap_days = gap_days
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.n_jobs = n_jobs or os.cpu_count() or 1
+
+        # Sort once: every window becomes a contiguous row range
+        order = np.argsort(df['contacted_date'].to_numpy(dtype='datetime64[ns]'), kind='stable')
+        frame = df.iloc[order]
+        self.dates = frame['contacted_date'].to_numpy(dtype='datetime64[ns]')
+        self.y = frame[target_col].to_numpy(dtype=np.float32)
+        self.X = prepare_matrix(frame, self.feature_list)
+        self.v3_scores = v3_tier_scores(frame[v3_tier_col]) if v3_tier_col in frame.columns else None
+
+    def origins(self, start=None, end=None) -> List[pd.Timestamp]:
+        """Monthly origins with a full training window behind them."""
+        first = pd.Timestamp(self.dates[0]).normalize()
+        earliest = first + pd.DateOffset(months=self.train_months) + pd.Timedelta(days=self.gap_days)
+        if earliest.day != 1:
+            earliest += pd.offsets.MonthBegin(1)
+        start = max(pd.Timestamp(start), earliest) if start is not None else earliest
+        last = pd.Timestamp(self.dates[-1]).to_period('M').to_timestamp()
+        end = min(pd.Timestamp(end), last) if end is not None else last
+        return list(pd.date_range(start.to_period('M').to_timestamp(), end, freq='MS'))
+
+    def _rows(self, start: pd.Timestamp, end: pd.Timestamp) -> slice:
+        """Row range with start <= contacted_date < end."""
+        lo, hi = np.searchsorted(self.dates, [np.datetime64(start, 'ns'), np.datetime64(end, 'ns')])
+        return slice(int(lo), int(hi))
+
+    def _window_hash(self, rows: slice, params: Dict[str, Any]) -> str:
+        """Content hash of a training window (features, labels, params)."""
+        digest = hashlib.sha1()
+        digest.update(json.dumps(
+            {'features': self.feature_list, 'params': params,
+             'rounds': BacktestConfig.NUM_BOOST_ROUND}, sort_keys=True, default=str
+        ).encode())
+        digest.update(np.ascontiguousarray(self.X[rows]).tobytes())
+        digest.update(self.y[rows].tobytes())
+        return digest.hexdigest()[:16]
+
+    def _train(self, rows: slice, n_threads: int) -> xgb.Booster:
+        """Train (or load from cache) the booster for one window."""
+        y_train = self.y[rows]
+        params = build_model_params(y_train)
+        window_hash = self._window_hash(rows, params)
+        params['nthread'] = n_threads
+
+        cache_path = self.cache_dir / f"{window_hash}.json" if self.cache_dir else None
+        if cache_path is not None and cache_path.exists():
+            booster = xgb.Booster()
+            booster.load_model(str(cache_path))
+            return booster
+
+        dtrain = xgb.DMatrix(self.X[rows], label=y_train, feature_names=self.feature_list)
+        booster = xgb.train(params=params, dtrain=dtrain,
+                            num_boost_round=BacktestConfig.NUM_BOOST_ROUND, verbose_eval=False)
+
+        if cache_path is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            booster.save_model(str(cache_path))
+        return booster
+
+    def _evaluate(self, origin: pd.Timestamp, n_threads: int) -> Dict[str, Any]:
+        """Train on the trailing window and score the origin month."""
+        train_end = origin - pd.Timedelta(days=self.gap_days)
+        train_start = train_end - pd.DateOffset(months=self.train_months)
+        score_end = origin + pd.DateOffset(months=1)
+
+        train_rows = self._rows(train_start, train_end)
+        score_rows = self._rows(origin, score_end)
+        y_train = self.y[train_rows]
+        y_test = self.y[score_rows]
+
+        result = {
+            'origin': origin.date(),
+            'train_start': train_start.date(),
+            'train_end': train_end.date(),
+            'n_train': len(y_train),
+            'n_test': len(y_test),
+            'conversions': int(y_test.sum()),
+            'conv_rate': float(y_test.mean()) if len(y_test) else None,
+        }
+        if (len(y_train) < BacktestConfig.MIN_TRAIN_ROWS or y_train.sum() == 0
+                or len(y_test) == 0 or len(np.unique(y_test)) < 2):
+            result['skipped'] = True
+            return result
+
+        booster = self._train(train_rows, n_threads)
+        v4_scores = booster.predict(xgb.DMatrix(self.X[score_rows], feature_names=self.feature_list))
+        result.update({
+            'skipped': False,
+            'v4_auc': roc_auc_score(y_test, v4_scores),
+            'v4_top_decile_lift': top_n_lift(y_test, v4_scores, 10),
+            'v4_top_5pct_lift': top_n_lift(y_test, v4_scores, 5),
+        })
+
+        if self.v3_scores is not None:
+            v3 = self.v3_scores[score_rows]
+            prioritized = v3 > 1  # Anything above STANDARD
+            base = y_test.mean()
+            result['v3_auc'] = roc_auc_score(y_test, v3) if len(np.unique(v3)) > 1 else None
+            result['v3_prioritized_pct'] = float(prioritized.mean() * 100)
+            result['v3_prioritized_lift'] = (
+                y_test[prioritized].mean() / base if prioritized.any() else None
+            )
+            # V4 at the same list volume as the V3 priority tiers
+            result['v4_lift_at_v3_volume'] = (
+                top_n_lift(y_test, v4_scores, prioritized.mean() * 100) if prioritized.any() else None
+            )
+        return result
+
+    def run(self, start=None, end=None) -> pd.DataFrame:
+        """
+        Run every monthly origin in parallel.
+
+        Returns:
+            DataFrame with one row per origin (lift/AUC time series)
+        """
+        origins = self.origins(start, end)
+        if not origins:
+            return pd.DataFrame()
+        n_workers = min(self.n_jobs, len(origins))
+        n_threads = max(1, (os.cpu_count() or 1) // n_workers)
+        with ThreadPoolExecutor(max_workers=n_workers) as pool:
+            results = list(pool.map(lambda origin: self._evaluate(origin, n_threads), origins))
+        return pd.DataFrame(results)
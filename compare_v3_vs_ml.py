@@ -3,6 +3,7 @@
 
 import sys
 import warnings
+from pathlib import Path
 warnings.filterwarnings("ignore")
 
 print("=" * 70)
@@ -15,6 +16,9 @@ import numpy as np
 from xgboost import XGBClassifier
 from sklearn.metrics import average_precision_score, roc_auc_score
 
+sys.path.insert(0, str(Path(__file__).resolve().parent / "Version-4"))
+from utils.ranking_metrics import top_decile_lift
+
 PROJECT_ID = "savvy-gtm-analytics"
 LOCATION = "northamerica-northeast2"
 
@@ -78,21 +82,8 @@ print("      Test:  {:,} leads ({:,} conversions)".format(
 # =============================================================================
 
 def calculate_top_decile_lift(y_true, y_scores):
-    df_temp = pd.DataFrame({"true": y_true, "score": y_scores})
-    df_temp = df_temp.sort_values("score", ascending=False)
-    
-    n_decile = len(df_temp) // 10
-    if n_decile == 0:
-        return 0.0
-    
-    top_decile = df_temp.head(n_decile)
-    top_decile_rate = top_decile["true"].mean()
-    baseline_rate = df_temp["true"].mean()
-    
-    if baseline_rate == 0:
-        return 0.0
-    
-    return top_decile_rate / baseline_rate
+    # Top len // 10 rows by score; 0.0 when the list or baseline is empty
+    return top_decile_lift(y_true, y_scores)
 
 
 # =============================================================================
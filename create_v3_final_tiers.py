@@ -9,9 +9,13 @@ print("=" * 70)
 print("V3 FINAL TIER SCORING - CREATE & VALIDATE")
 print("=" * 70)
 
+from pathlib import Path
 from google.cloud import bigquery
 import pandas as pd
 
+sys.path.insert(0, str(Path(__file__).resolve().parent / "Version-4"))
+from utils.pattern_registry import PatternRegistry
+
 PROJECT_ID = "savvy-gtm-analytics"
 LOCATION = "northamerica-northeast2"
 
@@ -23,6 +27,12 @@ client = bigquery.Client(project=PROJECT_ID, location=LOCATION)
 
 print("\n[1/3] Creating lead_scores_v3_final table...")
 
+# Wirehouse CASE generated from the shared pattern registry (WIREHOUSE_PATTERNS_V3)
+wirehouse_case = PatternRegistry().sql_case(
+    'is_wirehouse_v3', {'firm_name': 'company_name'}, alias='is_wirehouse',
+    then='TRUE', otherwise='FALSE', indent='        '
+)
+
 create_sql = """
 CREATE OR REPLACE TABLE `savvy-gtm-analytics.ml_features.lead_scores_v3_final` AS
 
@@ -54,24 +64,7 @@ WITH lead_features AS (
 wirehouse_flagged AS (
     SELECT
         *,
-        CASE 
-            WHEN UPPER(company_name) LIKE '%MERRILL%' THEN TRUE
-            WHEN UPPER(company_name) LIKE '%MORGAN STANLEY%' THEN TRUE
-            WHEN UPPER(company_name) LIKE '%UBS %' THEN TRUE
-            WHEN UPPER(company_name) LIKE '%WELLS FARGO%' THEN TRUE
-            WHEN UPPER(company_name) LIKE '%EDWARD JONES%' THEN TRUE
-            WHEN UPPER(company_name) LIKE '%RAYMOND JAMES%' THEN TRUE
-            WHEN UPPER(company_name) LIKE '%AMERIPRISE%' THEN TRUE
-            WHEN UPPER(company_name) LIKE '% LPL %' THEN TRUE
-            WHEN UPPER(company_name) LIKE '%LPL FINANCIAL%' THEN TRUE
-            WHEN UPPER(company_name) LIKE '%NORTHWESTERN MUTUAL%' THEN TRUE
-            WHEN UPPER(company_name) LIKE '%STIFEL%' THEN TRUE
-            WHEN UPPER(company_name) LIKE '%RBC %' THEN TRUE
-            WHEN UPPER(company_name) LIKE '%JANNEY%' THEN TRUE
-            WHEN UPPER(company_name) LIKE '%BAIRD%' THEN TRUE
-            WHEN UPPER(company_name) LIKE '%OPPENHEIMER%' THEN TRUE
-            ELSE FALSE
-        END as is_wirehouse,
+        {wirehouse_case},
         CASE
             WHEN firm_rep_count_at_contact IS NULL OR firm_rep_count_at_contact = 0 THEN 'UNKNOWN'
             WHEN firm_rep_count_at_contact <= 10 THEN 'SMALL'
@@ -214,7 +207,7 @@ SELECT
     'v3-final-20251221' as model_version
 FROM scored
 ORDER BY tier_rank, expected_lift DESC, contacted_date DESC
-"""
+""".format(wirehouse_case=wirehouse_case)
 
 try:
     job = client.query(create_sql)
@@ -81,3 +81,35 @@ CLUSTER BY firm_crd_at_entry
 OPTIONS(
   description = 'Lead-level PIT firm stability features for ML training. Target: Contacting to MQL conversion.'
 );
+
+-- ============================================================================
+-- TABLE 3: Firm-Month Flows (rollup read by every firm stability feature)
+-- ============================================================================
+-- One row per firm per month from the firm's first month on. 12-month
+-- windows are prefix-sum differences:
+--   departures over months (m-12, m] = cum_departures[m] - cum_departures[m-12]
+--   headcount at end of month m      = cum_arrivals[m] - cum_departures[m]
+-- Backfilled by 02_backfill_firm_scores.sql, appended by 04_monthly_refresh.sql
+CREATE TABLE IF NOT EXISTS `savvy-gtm-analytics.ml_features.firm_month_flows`
+(
+  -- Keys
+  firm_crd INT64 NOT NULL,
+  flow_month DATE NOT NULL,
+  
+  -- Flows in the month (distinct reps)
+  arrivals INT64,
+  departures INT64,
+  
+  -- Running totals through the end of the month
+  cum_arrivals INT64,
+  cum_departures INT64,
+  headcount INT64,
+  
+  -- Metadata
+  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP()
+)
+PARTITION BY flow_month
+CLUSTER BY firm_crd
+OPTIONS(
+  description = 'Monthly firm arrivals/departures with running totals. Append-only; one month added per FINTRX refresh.'
+);
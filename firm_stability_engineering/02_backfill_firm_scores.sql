@@ -2,14 +2,121 @@
 -- PIT FIRM STABILITY SCORING: BACKFILL HISTORICAL SCORES
 -- ============================================================================
 -- Run this SECOND to populate historical firm scores
--- This creates monthly scores from January 2024 to current month
--- Takes ~10-15 minutes to run
+-- Step 1 builds the firm_month_flows rollup (one-time; 04_monthly_refresh.sql
+-- appends each new month), Step 2 scores every month from January 2024 to
+-- the last complete month by reading 12-month windows from the rollup
+
+DECLARE rollup_start DATE DEFAULT DATE('2020-01-01');
+DECLARE last_month DATE DEFAULT DATE_SUB(DATE_TRUNC(CURRENT_DATE(), MONTH), INTERVAL 1 MONTH);
 
 -- Clear existing data (optional - for fresh start)
+-- TRUNCATE TABLE `savvy-gtm-analytics.ml_features.firm_month_flows`;
 -- TRUNCATE TABLE `savvy-gtm-analytics.ml_features.firm_stability_scores_monthly`;
 
 -- ============================================================================
--- BACKFILL PROCEDURE
+-- STEP 1: BACKFILL FIRM-MONTH FLOWS
+-- ============================================================================
+-- Arrivals/departures are employment spells per firm and month (overlapping
+-- stints of a rep merged), so headcount counts distinct reps. The
+-- rollup_start row also carries all earlier events so running totals are
+-- complete. Mirrors utils/firm_flows.py in Version-4.
+
+INSERT INTO `savvy-gtm-analytics.ml_features.firm_month_flows`
+  (firm_crd, flow_month, arrivals, departures, cum_arrivals, cum_departures, headcount)
+
+WITH
+stints AS (
+  SELECT DISTINCT
+    SAFE_CAST(PREVIOUS_REGISTRATION_COMPANY_CRD_ID AS INT64) as firm_crd,
+    RIA_CONTACT_CRD_ID as rep_crd,
+    PREVIOUS_REGISTRATION_COMPANY_START_DATE as start_date,
+    PREVIOUS_REGISTRATION_COMPANY_END_DATE as end_date
+  FROM `savvy-gtm-analytics.FinTrx_data_CA.contact_registered_employment_history`
+  WHERE SAFE_CAST(PREVIOUS_REGISTRATION_COMPANY_CRD_ID AS INT64) IS NOT NULL
+    AND PREVIOUS_REGISTRATION_COMPANY_START_DATE IS NOT NULL
+),
+
+ordered AS (
+  SELECT *,
+    MAX(COALESCE(end_date, DATE '9999-12-31')) OVER (
+      PARTITION BY firm_crd, rep_crd ORDER BY start_date, end_date
+      ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+    ) as prev_end
+  FROM stints
+),
+
+-- Overlapping (or touching) stints of a rep at a firm become one spell,
+-- so headcount (cum_arrivals - cum_departures) counts distinct reps
+spells AS (
+  SELECT firm_crd, rep_crd, MIN(start_date) as start_date,
+         NULLIF(MAX(COALESCE(end_date, DATE '9999-12-31')), DATE '9999-12-31') as end_date
+  FROM (
+    SELECT *,
+      SUM(CASE WHEN prev_end IS NULL OR start_date > prev_end THEN 1 ELSE 0 END) OVER (
+        PARTITION BY firm_crd, rep_crd ORDER BY start_date, end_date
+        ROWS UNBOUNDED PRECEDING
+      ) as spell
+    FROM ordered
+  )
+  GROUP BY firm_crd, rep_crd, spell
+),
+
+events AS (
+  SELECT firm_crd, DATE_TRUNC(start_date, MONTH) as event_month,
+         COUNT(*) as arrivals, 0 as departures
+  FROM spells
+  GROUP BY 1, 2
+  UNION ALL
+  SELECT firm_crd, DATE_TRUNC(end_date, MONTH) as event_month,
+         0 as arrivals, COUNT(*) as departures
+  FROM spells
+  WHERE end_date IS NOT NULL
+  GROUP BY 1, 2
+),
+
+flows AS (
+  SELECT
+    firm_crd,
+    GREATEST(event_month, rollup_start) as flow_month,
+    SUM(arrivals) as arrivals,
+    SUM(departures) as departures
+  FROM events
+  WHERE event_month <= last_month
+  GROUP BY 1, 2
+),
+
+-- Every month from the firm's first month, so windows are equality joins
+firm_spine AS (
+  SELECT f.firm_crd, flow_month
+  FROM (SELECT firm_crd, MIN(flow_month) as first_month FROM flows GROUP BY 1) f,
+  UNNEST(GENERATE_DATE_ARRAY(f.first_month, last_month, INTERVAL 1 MONTH)) as flow_month
+),
+
+running AS (
+  SELECT
+    s.firm_crd,
+    s.flow_month,
+    COALESCE(f.arrivals, 0) as arrivals,
+    COALESCE(f.departures, 0) as departures,
+    SUM(COALESCE(f.arrivals, 0)) OVER w as cum_arrivals,
+    SUM(COALESCE(f.departures, 0)) OVER w as cum_departures
+  FROM firm_spine s
+  LEFT JOIN flows f ON s.firm_crd = f.firm_crd AND s.flow_month = f.flow_month
+  WINDOW w AS (PARTITION BY s.firm_crd ORDER BY s.flow_month)
+)
+
+SELECT
+  firm_crd,
+  flow_month,
+  arrivals,
+  departures,
+  cum_arrivals,
+  cum_departures,
+  cum_arrivals - cum_departures as headcount
+FROM running;
+
+-- ============================================================================
+-- STEP 2: BACKFILL MONTHLY SCORES
 -- ============================================================================
 -- This query calculates scores for ALL months in a single pass
 
@@ -21,7 +128,7 @@ months_to_calculate AS (
   SELECT score_month
   FROM UNNEST(GENERATE_DATE_ARRAY(
     DATE('2024-01-01'),
-    DATE_TRUNC(CURRENT_DATE(), MONTH),
+    last_month,
     INTERVAL 1 MONTH
   )) as score_month
 ),
@@ -37,31 +144,18 @@ firm_headcount AS (
   HAVING rep_count >= 5
 ),
 
--- Calculate departures for each firm-month combination
-departures AS (
+-- Departures/arrivals over the 12 months ending with score_month (prefix sums)
+flows_12mo AS (
   SELECT
-    eh.PREVIOUS_REGISTRATION_COMPANY_CRD_ID as firm_crd,
-    m.score_month,
-    COUNT(DISTINCT eh.RIA_CONTACT_CRD_ID) as departures_12mo
-  FROM `savvy-gtm-analytics.FinTrx_data_CA.contact_registered_employment_history` eh
-  CROSS JOIN months_to_calculate m
-  WHERE eh.PREVIOUS_REGISTRATION_COMPANY_END_DATE IS NOT NULL
-    AND eh.PREVIOUS_REGISTRATION_COMPANY_END_DATE > DATE_SUB(m.score_month, INTERVAL 12 MONTH)
-    AND eh.PREVIOUS_REGISTRATION_COMPANY_END_DATE <= m.score_month
-  GROUP BY firm_crd, score_month
-),
-
--- Calculate arrivals for each firm-month combination
-arrivals AS (
-  SELECT
-    eh.PREVIOUS_REGISTRATION_COMPANY_CRD_ID as firm_crd,
-    m.score_month,
-    COUNT(DISTINCT eh.RIA_CONTACT_CRD_ID) as arrivals_12mo
-  FROM `savvy-gtm-analytics.FinTrx_data_CA.contact_registered_employment_history` eh
-  CROSS JOIN months_to_calculate m
-  WHERE eh.PREVIOUS_REGISTRATION_COMPANY_START_DATE > DATE_SUB(m.score_month, INTERVAL 12 MONTH)
-    AND eh.PREVIOUS_REGISTRATION_COMPANY_START_DATE <= m.score_month
-  GROUP BY firm_crd, score_month
+    f.firm_crd,
+    f.flow_month as score_month,
+    f.cum_departures - COALESCE(f_12.cum_departures, 0) as departures_12mo,
+    f.cum_arrivals - COALESCE(f_12.cum_arrivals, 0) as arrivals_12mo
+  FROM `savvy-gtm-analytics.ml_features.firm_month_flows` f
+  LEFT JOIN `savvy-gtm-analytics.ml_features.firm_month_flows` f_12
+    ON f_12.firm_crd = f.firm_crd
+    AND f_12.flow_month = DATE_SUB(f.flow_month, INTERVAL 12 MONTH)
+  WHERE f.flow_month IN (SELECT score_month FROM months_to_calculate)
 ),
 
 -- Combine all firm-month combinations
@@ -80,25 +174,24 @@ firm_metrics AS (
     fm.firm_crd,
     fm.score_month,
     fm.rep_count_at_month,
-    COALESCE(d.departures_12mo, 0) as departures_12mo,
-    COALESCE(a.arrivals_12mo, 0) as arrivals_12mo,
-    COALESCE(a.arrivals_12mo, 0) - COALESCE(d.departures_12mo, 0) as net_change_12mo,
+    COALESCE(fl.departures_12mo, 0) as departures_12mo,
+    COALESCE(fl.arrivals_12mo, 0) as arrivals_12mo,
+    COALESCE(fl.arrivals_12mo, 0) - COALESCE(fl.departures_12mo, 0) as net_change_12mo,
     
     -- Turnover rate
     CASE 
       WHEN fm.rep_count_at_month > 0 
-      THEN ROUND(COALESCE(d.departures_12mo, 0) * 100.0 / fm.rep_count_at_month, 2)
+      THEN ROUND(COALESCE(fl.departures_12mo, 0) * 100.0 / fm.rep_count_at_month, 2)
       ELSE 0
     END as turnover_rate_pct,
     
     -- Net change score (0-100)
     ROUND(GREATEST(0, LEAST(100, 
-      50 + ((COALESCE(a.arrivals_12mo, 0) - COALESCE(d.departures_12mo, 0)) * 3.5)
+      50 + ((COALESCE(fl.arrivals_12mo, 0) - COALESCE(fl.departures_12mo, 0)) * 3.5)
     )), 1) as net_change_score
     
   FROM firm_months fm
-  LEFT JOIN departures d ON fm.firm_crd = d.firm_crd AND fm.score_month = d.score_month
-  LEFT JOIN arrivals a ON fm.firm_crd = a.firm_crd AND fm.score_month = a.score_month
+  LEFT JOIN flows_12mo fl ON fm.firm_crd = fl.firm_crd AND fm.score_month = fl.score_month
 ),
 
 -- Calculate percentiles within each month
@@ -1,24 +1,127 @@
 -- ============================================================================
 -- PIT FIRM STABILITY SCORING: MONTHLY REFRESH
 -- ============================================================================
--- Schedule this to run monthly (e.g., 5th of each month at 6 AM)
--- Calculates scores for the prior month only
+-- Schedule this to run monthly (e.g., 5th of each month at 6 AM), before
+-- v4_prospect_features.sql and the monthly lead list
+-- Appends the prior month to firm_month_flows, then scores that month only.
+-- Both writes are MERGEs, so re-running a month is safe.
 
 -- ============================================================================
--- STEP 1: Set the score month (prior month)
+-- STEP 1: Set the refresh month (prior month)
 -- ============================================================================
-DECLARE score_month DATE DEFAULT DATE_TRUNC(DATE_SUB(CURRENT_DATE(), INTERVAL 1 MONTH), MONTH);
+-- Named refresh_month: a variable called score_month is shadowed by the
+-- column of the same name inside queries on the scores table
+DECLARE refresh_month DATE DEFAULT DATE_TRUNC(DATE_SUB(CURRENT_DATE(), INTERVAL 1 MONTH), MONTH);
 
 -- ============================================================================
--- STEP 2: Delete existing data for this month (if re-running)
+-- STEP 2: Append the month to firm_month_flows
 -- ============================================================================
-DELETE FROM `savvy-gtm-analytics.ml_features.firm_stability_scores_monthly`
-WHERE score_month = score_month;
+-- Only the new month is written. Its running totals are the history's
+-- current totals through refresh_month; its flows are the change from the
+-- previous row, so late-reported stints land in the month they were
+-- observed and earlier rows (and the windows built on them) never change.
+ASSERT (
+  SELECT DATE_DIFF(refresh_month, MAX(flow_month), MONTH)
+  FROM `savvy-gtm-analytics.ml_features.firm_month_flows`
+) IN (0, 1)
+AS 'firm_month_flows must end at the prior month (or this month on a re-run): backfill with 02_backfill_firm_scores.sql or refresh missing months in order';
+
+MERGE `savvy-gtm-analytics.ml_features.firm_month_flows` t
+USING (
+  WITH
+  stints AS (
+    SELECT DISTINCT
+      SAFE_CAST(PREVIOUS_REGISTRATION_COMPANY_CRD_ID AS INT64) as firm_crd,
+      RIA_CONTACT_CRD_ID as rep_crd,
+      PREVIOUS_REGISTRATION_COMPANY_START_DATE as start_date,
+      PREVIOUS_REGISTRATION_COMPANY_END_DATE as end_date
+    FROM `savvy-gtm-analytics.FinTrx_data_CA.contact_registered_employment_history`
+    WHERE SAFE_CAST(PREVIOUS_REGISTRATION_COMPANY_CRD_ID AS INT64) IS NOT NULL
+      AND PREVIOUS_REGISTRATION_COMPANY_START_DATE IS NOT NULL
+  ),
+
+  ordered AS (
+    SELECT *,
+      MAX(COALESCE(end_date, DATE '9999-12-31')) OVER (
+        PARTITION BY firm_crd, rep_crd ORDER BY start_date, end_date
+        ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+      ) as prev_end
+    FROM stints
+  ),
+
+  -- Overlapping (or touching) stints of a rep at a firm become one spell,
+  -- so headcount (cum_arrivals - cum_departures) counts distinct reps
+  spells AS (
+    SELECT firm_crd, rep_crd, MIN(start_date) as start_date,
+           NULLIF(MAX(COALESCE(end_date, DATE '9999-12-31')), DATE '9999-12-31') as end_date
+    FROM (
+      SELECT *,
+        SUM(CASE WHEN prev_end IS NULL OR start_date > prev_end THEN 1 ELSE 0 END) OVER (
+          PARTITION BY firm_crd, rep_crd ORDER BY start_date, end_date
+          ROWS UNBOUNDED PRECEDING
+        ) as spell
+      FROM ordered
+    )
+    GROUP BY firm_crd, rep_crd, spell
+  ),
+
+  events AS (
+    SELECT firm_crd, DATE_TRUNC(start_date, MONTH) as event_month,
+           COUNT(*) as arrivals, 0 as departures
+    FROM spells
+    GROUP BY 1, 2
+    UNION ALL
+    SELECT firm_crd, DATE_TRUNC(end_date, MONTH) as event_month,
+           0 as arrivals, COUNT(*) as departures
+    FROM spells
+    WHERE end_date IS NOT NULL
+    GROUP BY 1, 2
+  ),
+
+  observed AS (
+    SELECT firm_crd, SUM(arrivals) as cum_arrivals, SUM(departures) as cum_departures
+    FROM events
+    WHERE event_month <= refresh_month
+    GROUP BY 1
+  ),
+
+  previous AS (
+    SELECT firm_crd, cum_arrivals, cum_departures
+    FROM `savvy-gtm-analytics.ml_features.firm_month_flows`
+    WHERE flow_month = DATE_SUB(refresh_month, INTERVAL 1 MONTH)
+  ),
+
+  totals AS (
+    SELECT
+      COALESCE(o.firm_crd, p.firm_crd) as firm_crd,
+      COALESCE(o.cum_arrivals, p.cum_arrivals) as cum_arrivals,
+      COALESCE(o.cum_departures, p.cum_departures) as cum_departures,
+      COALESCE(p.cum_arrivals, 0) as prev_arrivals,
+      COALESCE(p.cum_departures, 0) as prev_departures
+    FROM observed o
+    FULL OUTER JOIN previous p ON o.firm_crd = p.firm_crd
+  )
+
+  SELECT
+    firm_crd,
+    refresh_month as flow_month,
+    cum_arrivals - prev_arrivals as arrivals,
+    cum_departures - prev_departures as departures,
+    cum_arrivals,
+    cum_departures,
+    cum_arrivals - cum_departures as headcount
+  FROM totals
+) s
+ON t.firm_crd = s.firm_crd AND t.flow_month = s.flow_month
+WHEN NOT MATCHED THEN
+  INSERT (firm_crd, flow_month, arrivals, departures, cum_arrivals, cum_departures, headcount)
+  VALUES (s.firm_crd, s.flow_month, s.arrivals, s.departures, s.cum_arrivals, s.cum_departures, s.headcount);
 
 -- ============================================================================
--- STEP 3: Insert new scores for this month
+-- STEP 3: Merge scores for this month
 -- ============================================================================
-INSERT INTO `savvy-gtm-analytics.ml_features.firm_stability_scores_monthly`
+MERGE `savvy-gtm-analytics.ml_features.firm_stability_scores_monthly` t
+USING (
 
 WITH 
 -- Get current headcount for all firms
@@ -32,52 +135,41 @@ firm_headcount AS (
   HAVING rep_count >= 5
 ),
 
--- Calculate departures (12 months ending at score_month)
-departures AS (
-  SELECT
-    PREVIOUS_REGISTRATION_COMPANY_CRD_ID as firm_crd,
-    COUNT(DISTINCT RIA_CONTACT_CRD_ID) as departures_12mo
-  FROM `savvy-gtm-analytics.FinTrx_data_CA.contact_registered_employment_history`
-  WHERE PREVIOUS_REGISTRATION_COMPANY_END_DATE IS NOT NULL
-    AND PREVIOUS_REGISTRATION_COMPANY_END_DATE > DATE_SUB(score_month, INTERVAL 12 MONTH)
-    AND PREVIOUS_REGISTRATION_COMPANY_END_DATE <= score_month
-  GROUP BY firm_crd
-),
-
--- Calculate arrivals (12 months ending at score_month)
-arrivals AS (
+-- Departures/arrivals over the 12 months ending with refresh_month (prefix sums)
+flows_12mo AS (
   SELECT
-    PREVIOUS_REGISTRATION_COMPANY_CRD_ID as firm_crd,
-    COUNT(DISTINCT RIA_CONTACT_CRD_ID) as arrivals_12mo
-  FROM `savvy-gtm-analytics.FinTrx_data_CA.contact_registered_employment_history`
-  WHERE PREVIOUS_REGISTRATION_COMPANY_START_DATE > DATE_SUB(score_month, INTERVAL 12 MONTH)
-    AND PREVIOUS_REGISTRATION_COMPANY_START_DATE <= score_month
-  GROUP BY firm_crd
+    f.firm_crd,
+    f.cum_departures - COALESCE(f_12.cum_departures, 0) as departures_12mo,
+    f.cum_arrivals - COALESCE(f_12.cum_arrivals, 0) as arrivals_12mo
+  FROM `savvy-gtm-analytics.ml_features.firm_month_flows` f
+  LEFT JOIN `savvy-gtm-analytics.ml_features.firm_month_flows` f_12
+    ON f_12.firm_crd = f.firm_crd
+    AND f_12.flow_month = DATE_SUB(refresh_month, INTERVAL 12 MONTH)
+  WHERE f.flow_month = refresh_month
 ),
 
 -- Combine metrics
 firm_metrics AS (
   SELECT
     h.firm_crd,
-    score_month as score_month,
+    refresh_month as score_month,
     h.rep_count as rep_count_at_month,
-    COALESCE(d.departures_12mo, 0) as departures_12mo,
-    COALESCE(a.arrivals_12mo, 0) as arrivals_12mo,
-    COALESCE(a.arrivals_12mo, 0) - COALESCE(d.departures_12mo, 0) as net_change_12mo,
+    COALESCE(fl.departures_12mo, 0) as departures_12mo,
+    COALESCE(fl.arrivals_12mo, 0) as arrivals_12mo,
+    COALESCE(fl.arrivals_12mo, 0) - COALESCE(fl.departures_12mo, 0) as net_change_12mo,
     
     CASE 
       WHEN h.rep_count > 0 
-      THEN ROUND(COALESCE(d.departures_12mo, 0) * 100.0 / h.rep_count, 2)
+      THEN ROUND(COALESCE(fl.departures_12mo, 0) * 100.0 / h.rep_count, 2)
       ELSE 0
     END as turnover_rate_pct,
     
     ROUND(GREATEST(0, LEAST(100, 
-      50 + ((COALESCE(a.arrivals_12mo, 0) - COALESCE(d.departures_12mo, 0)) * 3.5)
+      50 + ((COALESCE(fl.arrivals_12mo, 0) - COALESCE(fl.departures_12mo, 0)) * 3.5)
     )), 1) as net_change_score
     
   FROM firm_headcount h
-  LEFT JOIN departures d ON h.firm_crd = d.firm_crd
-  LEFT JOIN arrivals a ON h.firm_crd = a.firm_crd
+  LEFT JOIN flows_12mo fl ON h.firm_crd = fl.firm_crd
 ),
 
 -- Calculate percentiles
@@ -112,15 +204,33 @@ SELECT
 
 FROM firm_with_percentiles fp
 LEFT JOIN `savvy-gtm-analytics.FinTrx_data_CA.ria_firms_current` f
-  ON fp.firm_crd = f.CRD_ID;
+  ON fp.firm_crd = f.CRD_ID
+
+) s
+ON t.firm_crd = s.firm_crd AND t.score_month = s.score_month
+WHEN MATCHED THEN
+  UPDATE SET
+    departures_12mo = s.departures_12mo,
+    arrivals_12mo = s.arrivals_12mo,
+    net_change_12mo = s.net_change_12mo,
+    rep_count_at_month = s.rep_count_at_month,
+    turnover_rate_pct = s.turnover_rate_pct,
+    net_change_score = s.net_change_score,
+    net_change_percentile = s.net_change_percentile,
+    recruiting_priority = s.recruiting_priority,
+    firm_name = s.firm_name,
+    firm_state = s.firm_state,
+    created_at = s.created_at
+WHEN NOT MATCHED THEN
+  INSERT ROW;
 
 -- ============================================================================
 -- STEP 4: Log the refresh
 -- ============================================================================
 SELECT
-  FORMAT('Monthly refresh completed for %t', score_month) as status,
+  FORMAT('Monthly refresh completed for %t', refresh_month) as status,
   COUNT(*) as firms_scored,
   COUNTIF(recruiting_priority = 'HIGH_PRIORITY') as high_priority_count,
   COUNTIF(recruiting_priority = 'STABLE') as stable_count
 FROM `savvy-gtm-analytics.ml_features.firm_stability_scores_monthly`
-WHERE score_month = score_month;
+WHERE score_month = refresh_month;
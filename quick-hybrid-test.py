@@ -4,6 +4,7 @@
 
 import sys
 import warnings
+from pathlib import Path
 warnings.filterwarnings("ignore")
 
 print("=" * 70)
@@ -18,6 +19,9 @@ try:
     from google.cloud import bigquery
     from xgboost import XGBClassifier
     from sklearn.metrics import average_precision_score, roc_auc_score
+    sys.path.insert(0, str(Path(__file__).resolve().parent / "Version-4"))
+    from utils.ranking_metrics import top_decile_lift
+    from utils.pattern_registry import PatternRegistry
     print("      Done - All libraries loaded")
 except ImportError as e:
     print("      ERROR - Missing library: " + str(e))
@@ -28,13 +32,6 @@ except ImportError as e:
 PROJECT_ID = "savvy-gtm-analytics"
 LOCATION = "northamerica-northeast2"
 
-WIREHOUSE_PATTERNS = [
-    "MERRILL", "MORGAN STANLEY", "UBS", "WELLS FARGO", "EDWARD JONES",
-    "RAYMOND JAMES", "AMERIPRISE", "LPL", "NORTHWESTERN MUTUAL",
-    "STIFEL", "RBC", "JANNEY", "BAIRD", "OPPENHEIMER"
-]
-
-
 def fetch_training_data(client):
     query = """
     WITH lead_features AS (
@@ -83,16 +80,6 @@ def fetch_training_data(client):
     return df
 
 
-def is_wirehouse(company_name):
-    if pd.isna(company_name):
-        return False
-    company_upper = str(company_name).upper()
-    for pattern in WIREHOUSE_PATTERNS:
-        if pattern in company_upper:
-            return True
-    return False
-
-
 def engineer_hybrid_features(df):
     print("")
     print("[3/6] Engineering hybrid features...")
@@ -101,7 +88,9 @@ def engineer_hybrid_features(df):
     
     result["tenure_years"] = result["current_firm_tenure_months"] / 12.0
     result["experience_years"] = result["industry_tenure_months"] / 12.0
-    result["is_wirehouse"] = result["company_name"].apply(is_wirehouse).astype(int)
+    # Same patterns as the V3 tier SQL (create_v3_final_tiers.py)
+    flags = PatternRegistry().apply(result, {"firm_name": "company_name"}, flags=["is_wirehouse_v3"])
+    result["is_wirehouse"] = flags["is_wirehouse_v3"].astype(int)
     
     # Tier 1: SGA Platinum components
     result["rule_small_firm"] = (result["firm_rep_count"] <= 10).astype(int)
@@ -128,20 +117,17 @@ def engineer_hybrid_features(df):
         (result["rule_veteran"] == 1)
     ).astype(int)
     
-    # Tier assignment
-    def assign_tier(row):
-        if row["rule_platinum_all"] == 1:
-            return 1
-        elif row["rule_dz_all"] == 1:
-            return 2
-        elif row["rule_danger_zone_tenure"] == 1 and row["rule_not_wirehouse"] == 1:
-            return 3
-        elif row["rule_danger_zone_tenure"] == 1:
-            return 4
-        else:
-            return 5
-    
-    result["rule_tier"] = result.apply(assign_tier, axis=1)
+    # Tier assignment (first matching rule wins)
+    result["rule_tier"] = np.select(
+        [
+            result["rule_platinum_all"] == 1,
+            result["rule_dz_all"] == 1,
+            (result["rule_danger_zone_tenure"] == 1) & (result["rule_not_wirehouse"] == 1),
+            result["rule_danger_zone_tenure"] == 1,
+        ],
+        [1, 2, 3, 4],
+        default=5
+    )
     
     # Interaction features
     result["interaction_mobile_bleeding"] = result["pit_moves_3yr"] * np.maximum(-result["firm_net_change_12mo"], 0)
@@ -157,21 +143,8 @@ def engineer_hybrid_features(df):
 
 
 def calculate_top_decile_lift(y_true, y_scores):
-    df = pd.DataFrame({"true": y_true, "score": y_scores})
-    df = df.sort_values("score", ascending=False)
-    
-    n_decile = len(df) // 10
-    if n_decile == 0:
-        return 0.0
-    
-    top_decile = df.head(n_decile)
-    top_decile_rate = top_decile["true"].mean()
-    baseline_rate = df["true"].mean()
-    
-    if baseline_rate == 0:
-        return 0.0
-    
-    return top_decile_rate / baseline_rate
+    # Top len // 10 rows by score; 0.0 when the list or baseline is empty
+    return top_decile_lift(y_true, y_scores)
 
 
 def run_comparison(df):
@@ -13,11 +13,15 @@ from sklearn.metrics import (
 )
 from sklearn.model_selection import TimeSeriesSplit
 import json
+import sys
 import pickle
 import matplotlib.pyplot as plt
 import warnings
 warnings.filterwarnings('ignore')
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "Version-4"))
+from utils.ranking_metrics import lift_by_decile
+
 class BaselineXGBoostTrainer:
     def __init__(self, data_dir: str = "data/processed"):
         self.data_dir = Path(data_dir)
@@ -257,32 +261,20 @@ class BaselineXGBoostTrainer:
     def calculate_lift_chart(self, y_true, y_pred, n_deciles: int = 10):
         """Calculate lift chart by deciles"""
         
-        # Create dataframe for sorting
-        df = pd.DataFrame({
-            'y_true': y_true,
-            'y_pred': y_pred
-        })
-        
-        # Sort by predicted probability (descending)
-        df = df.sort_values('y_pred', ascending=False).reset_index(drop=True)
-        
-        # Calculate deciles
-        n_samples = len(df)
-        decile_size = n_samples // n_deciles
-        
-        decile_rates = []
-        for i in range(n_deciles):
-            start_idx = i * decile_size
-            end_idx = (i + 1) * decile_size if i < n_deciles - 1 else n_samples
-            decile_df = df.iloc[start_idx:end_idx]
-            decile_rate = decile_df['y_true'].mean()
-            decile_rates.append({
-                'decile': i + 1,
-                'conversion_rate': float(decile_rate),
-                'n_samples': len(decile_df)
-            })
+        # Equal deciles from the top, remainder in the last one (decile 1 = highest scores)
+        table = lift_by_decile(y_true, y_pred, n_deciles, remainder='last')
+        table = table.sort_values('decile', ascending=False)
+        
+        decile_rates = [
+            {
+                'decile': n_deciles + 1 - int(row.decile),
+                'conversion_rate': float(row.conv_rate),
+                'n_samples': int(row.n_leads)
+            }
+            for row in table.itertuples()
+        ]
         
-        baseline_rate = y_true.mean()
+        baseline_rate = np.mean(y_true)
         top_decile_rate = decile_rates[0]['conversion_rate']
         top_decile_lift = top_decile_rate / baseline_rate if baseline_rate > 0 else 0
         